@@ -0,0 +1,21 @@
+from django.contrib import admin
+from .models import AuditEvent
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    """
+    Consultation du journal d'audit, en lecture seule (le journal est en ajout seul).
+    """
+    list_display = ('timestamp', 'model', 'object_id', 'action', 'user_id')
+    list_filter = ('model', 'action')
+    # Recherche par identifiant d'objet (index (model, object_id, timestamp) avec le filtre par modèle)
+    search_fields = ('=object_id',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
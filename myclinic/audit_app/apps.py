@@ -0,0 +1,16 @@
+import atexit
+
+from django.apps import AppConfig
+from django.core.signals import request_finished
+
+
+class AuditAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'audit_app'
+
+    def ready(self):
+        # Enregistre les récepteurs de signaux (capture des modifications) et le vidage du tampon d'audit
+        # à la fin de chaque requête et à l'arrêt du processus (voir recorder.py)
+        from . import recorder, signals  # noqa: F401
+        request_finished.connect(recorder.flush_quietly, dispatch_uid='audit_app.flush')
+        atexit.register(recorder.flush_quietly)
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:15
+
+import audit_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('patient_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=6)),
+                ('changes', models.JSONField(encoder=audit_app.models.CompactJSONEncoder)),
+                ('user_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id', 'timestamp'], name='audit_object_idx'), models.Index(fields=['patient_id', 'timestamp'], name='audit_patient_idx')],
+            },
+        ),
+    ]
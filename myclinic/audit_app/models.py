@@ -0,0 +1,70 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import NotSupportedError, models
+
+APPEND_ONLY_MESSAGE = "Le journal d'audit est en ajout seul : un événement ne peut être ni modifié ni supprimé."
+
+
+class CompactJSONEncoder(DjangoJSONEncoder):
+    """
+    Encodeur JSON sans espaces superflus (dates et heures au format ISO, comme DjangoJSONEncoder).
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs['separators'] = (',', ':')
+        super().__init__(*args, **kwargs)
+
+
+class AuditEventQuerySet(models.QuerySet):
+    """
+    QuerySet des événements d'audit : les modifications et suppressions en masse sont refusées.
+    """
+    def update(self, **kwargs):
+        raise NotSupportedError(APPEND_ONLY_MESSAGE)
+
+    def delete(self):
+        raise NotSupportedError(APPEND_ONLY_MESSAGE)
+
+
+class AuditEvent(models.Model):
+    """
+    Un événement du journal d'audit : création, modification ou suppression d'un patient ou d'un rendez-vous,
+    avec les seuls champs changés ({champ: [ancienne valeur, nouvelle valeur]}).
+
+    Le journal est en ajout seul. Les événements sont écrits par lots (voir recorder.py). L'utilisateur et le patient
+    sont de simples identifiants, sans clé étrangère : le journal survit à la suppression de ce qu'il décrit.
+    """
+    CREATE, UPDATE, DELETE = 'create', 'update', 'delete'
+    ACTION_CHOICES = [(CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete')]
+
+    # Modèle concerné ('patient_app.patient', 'scheduler_app.appointment') et identifiant de l'objet
+    model = models.CharField(max_length=50)
+    object_id = models.PositiveBigIntegerField()
+    # Patient concerné : le patient lui-même, ou celui du rendez-vous
+    patient_id = models.PositiveBigIntegerField(blank=True, null=True)
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    # Champs changés, en JSON compact
+    changes = models.JSONField(encoder=CompactJSONEncoder)
+    # Utilisateur à l'origine de la modification (vide hors requête : commandes, scripts)
+    user_id = models.PositiveBigIntegerField(blank=True, null=True)
+    # Moment de la modification (et non de l'écriture du lot)
+    timestamp = models.DateTimeField()
+
+    objects = AuditEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Index pour l'historique d'un objet, dans l'ordre chronologique
+            models.Index(fields=['model', 'object_id', 'timestamp'], name='audit_object_idx'),
+            # Index pour l'historique d'un patient et de ses rendez-vous (y compris supprimés)
+            models.Index(fields=['patient_id', 'timestamp'], name='audit_patient_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise NotSupportedError(APPEND_ONLY_MESSAGE)
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise NotSupportedError(APPEND_ONLY_MESSAGE)
+
+    def __str__(self):
+        return f"{self.timestamp:%Y-%m-%d %H:%M:%S} {self.action} {self.model} #{self.object_id}"
@@ -0,0 +1,162 @@
+"""
+Enregistrement des événements d'audit, hors du chemin critique des écritures.
+
+Les événements ne sont pas écrits au moment de la modification (ce qui doublerait le coût de chaque enregistrement) :
+ils sont ajoutés, au commit de la transaction qui les a produits, à un tampon propre au processus, puis écrits par lots
+(un seul bulk_create) :
+- à la fin de chaque requête (signal request_finished, envoyé une fois la réponse transmise au client) ;
+- dès que le tampon atteint AUDIT_BUFFER_SIZE événements (commandes et scripts) ;
+- à l'arrêt du processus (atexit).
+
+Cohérence :
+- une modification annulée (rollback) ne produit aucun événement : ils ne sont mis en tampon qu'après le commit ;
+- un lot est écrit dans une transaction : entièrement ou pas du tout. En cas d'échec, ses événements restent
+  en tampon, dans l'ordre, pour le prochain vidage (jamais de doublon) ;
+- en cas d'arrêt brutal du processus, les événements pas encore écrits sont perdus (au plus ceux des requêtes
+  en cours et d'un lot) : c'est le prix d'un journal qui ne ralentit pas les écritures ;
+- les événements ne sont écrits que dans la base où les modifications ont été faites : si le processus change
+  de base entre-temps (tests, benchmarks sur une base jetable), ils sont abandonnés.
+"""
+import logging
+import threading
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from .models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'événements en tampon au-delà duquel le tampon est vidé aussitôt
+DEFAULT_BUFFER_SIZE = 500
+# Nombre de lignes par requête INSERT lors d'un vidage
+FLUSH_BATCH_SIZE = 500
+
+# Requête en cours (posée par AuditMiddleware), pour attribuer les modifications à l'utilisateur connecté
+_current_request = ContextVar('audit_request', default=None)
+
+
+def current_user_id():
+    """
+    Identifiant de l'utilisateur connecté de la requête en cours, ou None (hors requête, ou utilisateur anonyme).
+    """
+    user = getattr(_current_request.get(), 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def _database_name():
+    return connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+
+
+class AuditBuffer:
+    """
+    Tampon des événements d'audit en attente d'écriture, partagé par les fils d'exécution du processus.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._database = None
+
+    def add(self, events):
+        """
+        Ajoute des événements ; vide le tampon s'il est plein.
+        """
+        database = _database_name()
+        with self._lock:
+            stale = self._events if database != self._database else []
+            if stale:
+                self._events = []
+            self._database = database
+            self._events.extend(events)
+            full = len(self._events) >= getattr(settings, 'AUDIT_BUFFER_SIZE', DEFAULT_BUFFER_SIZE)
+        if stale:
+            logger.info("%d événements d'audit d'une autre base abandonnés.", len(stale))
+        if full:
+            flush_quietly()
+
+    def flush(self):
+        """
+        Écrit les événements en attente, dans une transaction. Retourne le nombre d'événements écrits.
+        En cas d'échec, les événements sont remis en tête du tampon et l'exception est propagée.
+        """
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return 0
+        if self._database != _database_name():
+            logger.info("%d événements d'audit d'une autre base abandonnés.", len(events))
+            return 0
+        try:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                AuditEvent.objects.bulk_create(events, batch_size=FLUSH_BATCH_SIZE)
+        except Exception:
+            for event in events:
+                # Les lots déjà insérés ont été annulés : leurs identifiants ne sont plus valables
+                event.pk = None
+                event._state.adding = True
+            with self._lock:
+                self._events[:0] = events
+            raise
+        return len(events)
+
+    def clear(self):
+        with self._lock:
+            self._events = []
+
+    def __len__(self):
+        return len(self._events)
+
+
+buffer = AuditBuffer()
+
+
+def record(events, using=DEFAULT_DB_ALIAS):
+    """
+    Met des événements en tampon au commit de la transaction en cours (tout de suite hors transaction).
+    """
+    if events:
+        transaction.on_commit(lambda: buffer.add(events), using=using)
+
+
+def flush_quietly(**kwargs):
+    """
+    Vide le tampon sans propager les erreurs de base (récepteur de request_finished et fonction atexit) :
+    les événements restent en tampon pour le prochain vidage.
+    """
+    try:
+        buffer.flush()
+    except DatabaseError:
+        logger.exception("Écriture du journal d'audit impossible : %d événements restent en attente.", len(buffer))
+
+
+class AuditMiddleware:
+    """
+    Mémorise la requête en cours, pour attribuer les modifications à l'utilisateur connecté.
+    À placer après AuthenticationMiddleware. Le tampon est vidé à la fin de la requête (signal request_finished).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_request.reset(token)
@@ -0,0 +1,96 @@
+"""
+Capture des modifications des patients et des rendez-vous pour le journal d'audit.
+
+Chaque enregistrement ou suppression produit un événement avec les seuls champs changés, comparés aux valeurs
+chargées depuis la base (Patient._loaded_values et Appointment._loaded_values, sans requête supplémentaire).
+Les écritures en masse, qui n'émettent pas post_save (suppression logique des patients, opérations par lots
+sur les rendez-vous), sont capturées par leurs propres signaux.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from patient_app.signals import patients_soft_deleted
+from scheduler_app.batch import appointments_batch_changed
+from . import recorder
+from .models import AuditEvent
+
+# Modèles suivis (étiquettes _meta.label_lower)
+PATIENT, APPOINTMENT = 'patient_app.patient', 'scheduler_app.appointment'
+# Champs suivis par modèle (les champs dénormalisés, recalculés automatiquement, ne le sont pas)
+AUDITED_FIELDS = {
+    PATIENT: ('name', 'date_of_birth', 'contact_info', 'basic_medical_history', 'verified_by_admin', 'deleted_at'),
+    APPOINTMENT: ('patient_id', 'date', 'time', 'doctor_id', 'duration', 'status', 'internal_admin_notes'),
+}
+
+
+def _event(model, object_id, patient_id, action, changes):
+    return AuditEvent(
+        model=model, object_id=object_id, patient_id=patient_id, action=action, changes=changes,
+        user_id=recorder.current_user_id(), timestamp=timezone.now(),
+    )
+
+
+def _patient_id(instance):
+    return instance.pk if instance._meta.label_lower == PATIENT else instance.patient_id
+
+
+def _values(instance):
+    """
+    Valeurs des champs suivis déjà chargés (un champ différé n'est pas lu, ce qui coûterait une requête).
+    """
+    deferred = instance.get_deferred_fields()
+    return {name: getattr(instance, name) for name in AUDITED_FIELDS[instance._meta.label_lower] if name not in deferred}
+
+
+def _same(old, new):
+    # Un champ texte vidé par un formulaire passe de None à '' : ce n'est pas une modification
+    return old == new or (old in (None, '') and new in (None, ''))
+
+
+@receiver(post_save, sender='patient_app.Patient')
+@receiver(post_save, sender='scheduler_app.Appointment')
+def audit_save(sender, instance, created, raw, using, **kwargs):
+    """
+    Enregistre la création ou la modification d'un patient ou d'un rendez-vous (champs changés seulement).
+    """
+    if raw:
+        return
+    values = _values(instance)
+    if created:
+        changes = {name: [None, value] for name, value in values.items() if value not in (None, '')}
+    else:
+        loaded = getattr(instance, '_loaded_values', {})
+        changes = {name: [loaded[name], value] for name, value in values.items() if name in loaded and not _same(loaded[name], value)}
+    if changes:
+        action = AuditEvent.CREATE if created else AuditEvent.UPDATE
+        recorder.record([_event(instance._meta.label_lower, instance.pk, _patient_id(instance), action, changes)], using)
+
+
+@receiver(post_delete, sender='patient_app.Patient')
+@receiver(post_delete, sender='scheduler_app.Appointment')
+def audit_delete(sender, instance, using, **kwargs):
+    """
+    Enregistre la suppression d'un patient ou d'un rendez-vous, avec ses dernières valeurs.
+    """
+    changes = {name: [value, None] for name, value in _values(instance).items() if value not in (None, '')}
+    recorder.record([_event(instance._meta.label_lower, instance.pk, _patient_id(instance), AuditEvent.DELETE, changes)], using)
+
+
+@receiver(patients_soft_deleted)
+def audit_soft_delete(sender, pks, using, **kwargs):
+    """
+    Enregistre la suppression logique de patients.
+    """
+    deleted_at = timezone.now()
+    recorder.record([_event(PATIENT, pk, pk, AuditEvent.DELETE, {'deleted_at': [None, deleted_at]}) for pk in pks], using)
+
+
+@receiver(appointments_batch_changed)
+def audit_appointment_batch(sender, action, changes, **kwargs):
+    """
+    Enregistre les rendez-vous créés ou modifiés par une opération par lots (voir scheduler_app/batch.py).
+    """
+    recorder.record([
+        _event(APPOINTMENT, pk, patient_id, action, diff) for pk, (patient_id, diff) in changes.items()
+    ])
@@ -0,0 +1,177 @@
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import NotSupportedError, OperationalError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from patient_app.models import Patient
+from scheduler_app import batch
+from scheduler_app.models import Appointment, Doctor
+from . import recorder
+from .models import AuditEvent
+
+
+class AuditTestCase(TestCase):
+    def setUp(self):
+        # Mise en place : un tampon vide, un administrateur connecté, un patient et un médecin.
+        recorder.buffer.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.client.login(username='admin', password='testpassword')
+        self.patient = Patient.objects.create(name="Marc Durand", date_of_birth=date(1975, 3, 2))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+
+    def events(self, **filters):
+        return list(AuditEvent.objects.filter(**filters).order_by('pk').values('model', 'object_id', 'patient_id', 'action', 'changes', 'user_id'))
+
+
+class AuditCaptureTests(AuditTestCase):
+    def test_update_records_field_diff(self):
+        # Vérifie qu'une modification par la vue patient_update produit un événement avec les seuls champs changés et l'utilisateur.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('patient_update', args=[self.patient.pk]), {
+                'name': "Marc Bernard", 'date_of_birth': '1975-03-02', 'contact_info': '0600000000',
+            })
+        recorder.buffer.flush()
+        self.assertEqual(self.events(), [{
+            'model': 'patient_app.patient', 'object_id': self.patient.pk, 'patient_id': self.patient.pk, 'action': 'update',
+            'changes': {'name': ["Marc Durand", "Marc Bernard"], 'contact_info': [None, '0600000000']}, 'user_id': self.user.pk,
+        }])
+
+    def test_appointment_lifecycle_and_batches(self):
+        # Vérifie la création, la modification, la suppression d'un rendez-vous et les opérations par lots, rattachées au patient.
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=date(2099, 3, 2), time=time(9, 0))
+            appointment = Appointment.objects.get(pk=appointment.pk)
+            appointment.duration = 45
+            appointment.save()
+            batch.reschedule(Appointment.objects.filter(pk=appointment.pk), timedelta(days=1))
+            batch.cancel(Appointment.objects.filter(pk=appointment.pk))
+            Appointment.all_objects.get(pk=appointment.pk).delete()
+            self.patient.delete()
+        recorder.buffer.flush()
+        events = self.events(model='scheduler_app.appointment')
+        self.assertEqual([event['action'] for event in events], ['create', 'update', 'update', 'update', 'delete'])
+        self.assertEqual({event['patient_id'] for event in events}, {self.patient.pk})
+        self.assertEqual(events[0]['changes']['date'], [None, '2099-03-02'])
+        self.assertEqual(events[1]['changes'], {'duration': [30, 45]})
+        self.assertEqual(events[2]['changes'], {'date': ['2099-03-02', '2099-03-03']})
+        self.assertEqual(events[3]['changes'], {'status': ['scheduled', 'cancelled']})
+        self.assertEqual(events[4]['changes']['status'], ['cancelled', None])
+        self.assertEqual(self.events(model='patient_app.patient', action='delete')[0]['changes']['deleted_at'][0], None)
+        self.assertTrue(all(event['user_id'] is None for event in events))  # Hors requête : aucun utilisateur
+
+    def test_events_are_written_in_one_batch_at_request_end(self):
+        # Vérifie que les modifications ne sont pas écrites au moment de l'enregistrement, mais par un seul INSERT en fin de requête.
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            for index in range(5):
+                Patient.objects.create(name=f"Patient {index}", date_of_birth=date(2000, 1, 1))
+        self.assertFalse(any('audit_app_auditevent' in query['sql'] for query in queries))
+        self.assertEqual(len(recorder.buffer), 5)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('home'))
+        self.assertEqual(sum(query['sql'].startswith('INSERT INTO "audit_app_auditevent"') for query in queries), 1)
+        self.assertEqual(len(recorder.buffer), 0)
+        self.assertEqual(AuditEvent.objects.filter(action='create').count(), 5)
+
+    def test_full_buffer_is_flushed(self):
+        # Vérifie que le tampon est écrit dès qu'il atteint AUDIT_BUFFER_SIZE événements (commandes, scripts).
+        with self.settings(AUDIT_BUFFER_SIZE=3), self.captureOnCommitCallbacks(execute=True):
+            for index in range(4):
+                Patient.objects.create(name=f"Patient {index}", date_of_birth=date(2000, 1, 1))
+        self.assertEqual((AuditEvent.objects.count(), len(recorder.buffer)), (3, 1))
+
+    def test_patient_history_view(self):
+        # Vérifie l'historique d'un patient : réservé aux administrateurs, avec les rendez-vous, même après la suppression du patient.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('patient_update', args=[self.patient.pk]), {'name': "Marc Bernard", 'date_of_birth': '1975-03-02'})
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=date(2099, 3, 2), time=time(9, 0))
+            self.patient.delete()
+        url = reverse('patient_audit_history', args=[self.patient.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "Marc Durand → Marc Bernard")
+        self.assertContains(response, "admin")
+        self.assertContains(response, "scheduled → cancelled")
+        self.assertEqual([event.action for event in response.context['events']], ['delete', 'update', 'create', 'update'])
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class AuditConsistencyTests(AuditTestCase):
+    def test_rolled_back_changes_leave_no_event(self):
+        # Vérifie qu'une modification annulée par un rollback ne laisse aucun événement, même dans une transaction englobante validée.
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.patient.name = "Kept"
+                self.patient.save()
+                try:
+                    with transaction.atomic():
+                        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=date(2099, 3, 2), time=time(9, 0))
+                        raise RuntimeError("échec")
+                except RuntimeError:
+                    pass
+        recorder.buffer.flush()
+        self.assertEqual([(event['model'], event['action']) for event in self.events()], [('patient_app.patient', 'update')])
+
+    def test_failed_flush_keeps_events(self):
+        # Vérifie qu'un vidage en échec garde les événements en tampon, dans l'ordre, et que le suivant les écrit une seule fois.
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(3):
+                Patient.objects.create(name=f"Patient {index}", date_of_birth=date(2000, 1, 1))
+        with mock.patch.object(AuditEvent.objects, 'bulk_create', side_effect=OperationalError("database is locked")):
+            with self.assertLogs('audit_app.recorder', 'ERROR'):
+                recorder.flush_quietly()
+        self.assertEqual(len(recorder.buffer), 3)
+        self.assertEqual(recorder.buffer.flush(), 3)
+        self.assertEqual(recorder.buffer.flush(), 0)
+        names = [event['changes']['name'][1] for event in self.events()]
+        self.assertEqual(names, ["Patient 0", "Patient 1", "Patient 2"])
+
+    def test_interrupted_flush_writes_nothing(self):
+        # Vérifie qu'un lot interrompu entre deux INSERT n'écrit rien, puis est écrit en entier sans doublon à la tentative suivante.
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(5):
+                Patient.objects.create(name=f"Patient {index}", date_of_birth=date(2000, 1, 1))
+        inserts = []
+
+        def crash_on_second_insert(execute, sql, params, many, context):
+            if sql.startswith('INSERT INTO "audit_app_auditevent"'):
+                inserts.append(sql)
+                if len(inserts) == 2:
+                    raise OperationalError("disk I/O error")
+            return execute(sql, params, many, context)
+
+        with mock.patch.object(recorder, 'FLUSH_BATCH_SIZE', 2), connection.execute_wrapper(crash_on_second_insert):
+            with self.assertRaises(OperationalError):
+                recorder.buffer.flush()
+        self.assertEqual((AuditEvent.objects.count(), len(recorder.buffer)), (0, 5))
+        self.assertEqual(recorder.buffer.flush(), 5)
+        self.assertEqual(AuditEvent.objects.count(), 5)
+
+    def test_events_of_another_database_are_dropped(self):
+        # Vérifie que des événements en attente ne sont jamais écrits dans une autre base que celle des modifications.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.delete()
+        with mock.patch.object(recorder, '_database_name', return_value='other.sqlite3'):
+            with self.assertLogs('audit_app.recorder', 'INFO'):
+                self.assertEqual(recorder.buffer.flush(), 0)
+        self.assertEqual((AuditEvent.objects.count(), len(recorder.buffer)), (0, 0))
+
+    def test_log_is_append_only(self):
+        # Vérifie qu'un événement ne peut être ni modifié ni supprimé par l'ORM.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.delete()
+        recorder.buffer.flush()
+        event = AuditEvent.objects.get()
+        with self.assertRaises(NotSupportedError):
+            event.save()
+        with self.assertRaises(NotSupportedError):
+            event.delete()
+        with self.assertRaises(NotSupportedError):
+            AuditEvent.objects.update(action='update')
+        with self.assertRaises(NotSupportedError):
+            AuditEvent.objects.all().delete()
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('patients/<int:pk>/', views.patient_history, name='patient_audit_history'),
+]
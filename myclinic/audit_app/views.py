@@ -0,0 +1,33 @@
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404, render
+
+from patient_app.models import Patient
+from . import recorder
+from .models import AuditEvent
+
+# Nombre maximal d'événements affichés par l'historique d'un patient
+AUDIT_HISTORY_LIMIT = 500
+
+
+@login_required
+def patient_history(request, pk):
+    """
+    Affiche l'historique des modifications d'un patient et de ses rendez-vous, des plus récentes aux plus anciennes
+    (recherche dans l'index (patient_id, timestamp)). Réservé aux administrateurs ; les patients supprimés
+    restent consultables.
+
+    Args:
+        pk: La clé primaire (identifiant) du patient.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    patient = get_object_or_404(Patient.all_objects, pk=pk)
+    # Les événements encore en tampon dans ce processus sont écrits d'abord
+    recorder.flush_quietly()
+    events = list(AuditEvent.objects.filter(patient_id=pk).order_by('-timestamp', '-pk')[:AUDIT_HISTORY_LIMIT])
+    users = User.objects.in_bulk({event.user_id for event in events if event.user_id})
+    for event in events:
+        event.user = users.get(event.user_id)
+    return render(request, 'audit_app/patient_history.html', {'patient': patient, 'events': events})
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Suivi de la file de tâches de fond : état, tentatives et dernière erreur de chaque tâche.
+    """
+    list_display = ('name', 'status', 'run_at', 'attempts', 'max_attempts', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ('retry_now',)
+
+    @admin.action(description="Retry selected jobs now")
+    def retry_now(self, request, queryset):
+        # Une tâche en cours n'est pas touchée : son processus de travail enregistrera son résultat
+        retried = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0, finished_at=None,
+        )
+        self.message_user(request, f"{retried} job(s) queued.")
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs_app'
+
+    def ready(self):
+        # Importe le module 'jobs' de chaque application : ses tâches de fond s'enregistrent (décorateur queue.task)
+        autodiscover_modules('jobs')
@@ -0,0 +1,28 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from jobs_app import queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Met en file une tâche de fond, par exemple depuis cron : "
+        "python manage.py enqueue_job scheduler_app.send_reminders"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Nom de la tâche enregistrée.")
+        parser.add_argument('--payload', type=json.loads, default={}, help="Arguments nommés de la tâche, en JSON.")
+        parser.add_argument('--delay', type=float, default=0.0, help="Délai (secondes) avant l'exécution.")
+
+    def handle(self, *args, **options):
+        if not isinstance(options['payload'], dict):
+            raise CommandError("Les arguments de la tâche doivent être un objet JSON.")
+        try:
+            job = queue.enqueue(options['name'], options['payload'], run_at=timezone.now() + timedelta(seconds=options['delay']))
+        except LookupError as exc:
+            raise CommandError(f"{exc} Tâches enregistrées : {', '.join(queue.registered_tasks()) or 'aucune'}.")
+        self.stdout.write(f"Tâche {job} mise en file.")
@@ -0,0 +1,72 @@
+import os
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs_app import queue
+from jobs_app.workers import WorkerPool
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les tâches de fond en file d'attente avec un ensemble de fils d'exécution ou de processus de travail, "
+        "jusqu'à Ctrl-C ou SIGTERM (les tâches en cours sont terminées). Affiche régulièrement le débit et l'état de la file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Nombre de processus de travail.")
+        parser.add_argument('--mode', choices=('thread', 'process'), default='thread',
+                            help="Fils d'exécution (tâches qui attendent : courriels, requêtes) ou processus (tâches de calcul).")
+        parser.add_argument('--batch-size', type=int, default=1, help="Nombre de tâches réclamées à la fois par un processus de travail.")
+        parser.add_argument('--poll', type=float, default=1.0, help="Attente (secondes) entre deux consultations d'une file vide.")
+        parser.add_argument('--report', type=float, default=10.0, help="Intervalle (secondes) entre deux affichages des mesures.")
+        parser.add_argument('--once', action='store_true', help="S'arrête dès que la file ne contient plus de tâche prête.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1 or options['poll'] <= 0 or options['report'] <= 0:
+            raise CommandError("Le nombre de processus de travail, la taille des lots et les intervalles doivent être strictement positifs.")
+        pool = WorkerPool(
+            options['workers'], options['mode'], batch_size=options['batch_size'], poll=options['poll'], drain=options['once'],
+        )
+        self.stdout.write(
+            f"{options['workers']} processus de travail ({options['mode']}, pid {os.getpid()}) ; "
+            f"tâches : {', '.join(queue.registered_tasks()) or 'aucune'}."
+        )
+        # SIGTERM (arrêt du service) : même arrêt que Ctrl-C. Un signal ne peut être intercepté que par le fil principal
+        # (la commande peut aussi être appelée par call_command depuis un autre fil)
+        main = threading.current_thread() is threading.main_thread()
+        if main:
+            previous = signal.signal(signal.SIGTERM, lambda signum, frame: pool.stop.set())
+        began = last = time.perf_counter()
+        last_done = 0
+        pool.start()
+        try:
+            while True:
+                try:
+                    finished = pool.join(options['report'])
+                except KeyboardInterrupt:
+                    self.stdout.write("Arrêt demandé : fin des tâches en cours...")
+                    pool.stop.set()
+                    continue
+                now, metrics = time.perf_counter(), pool.metrics.snapshot()
+                processed = metrics['done'] + metrics['retried'] + metrics['failed']
+                self.report(metrics, (processed - last_done) / (now - last))
+                last, last_done = now, processed
+                if finished:
+                    break
+        finally:
+            if main:
+                signal.signal(signal.SIGTERM, previous)
+        elapsed = time.perf_counter() - began
+        self.stdout.write(f"{processed:.0f} tâches traitées en {elapsed:.1f} s ({processed / elapsed:.1f} tâches/s).")
+
+    def report(self, metrics, rate):
+        stats = queue.queue_stats()
+        mean = metrics['busy'] / max(metrics['done'] + metrics['retried'] + metrics['failed'], 1)
+        self.stdout.write(
+            f"{rate:.1f} tâches/s ; terminées {metrics['done']:.0f}, relancées {metrics['retried']:.0f}, "
+            f"en échec {metrics['failed']:.0f}, durée moyenne {mean * 1000:.0f} ms ; "
+            f"file : {stats['queued']} en attente, {stats['running']} en cours, retard {stats['lag']:.0f} s."
+        )
@@ -0,0 +1,41 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Une tâche de fond en file d'attente : le nom d'une tâche enregistrée (voir queue.py) et ses arguments.
+    Les tâches sont exécutées par la commande run_workers ; une tâche en échec est relancée plus tard,
+    jusqu'à max_attempts tentatives.
+    """
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    # Nom de la tâche enregistrée (par exemple 'scheduler_app.send_reminders')
+    name = models.CharField(max_length=100)
+    # Arguments nommés de la tâche, en JSON (les dates y sont des chaînes ISO)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    # Moment à partir duquel la tâche peut être exécutée (repoussé après un échec)
+    run_at = models.DateTimeField(default=timezone.now)
+    # Nombre de tentatives commencées, et nombre maximal
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=1)
+    # Processus de travail qui exécute la tâche, et moment où il l'a réclamée (pour reprendre les tâches d'un processus arrêté)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(blank=True, null=True)
+    # Dernière erreur (trace de l'exception)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Index pour la réclamation des tâches prêtes, dans l'ordre (status='queued', run_at <= maintenant),
+            # et pour la reprise des tâches abandonnées (status='running')
+            models.Index(fields=['status', 'run_at'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,169 @@
+"""
+File de tâches de fond, dans la base de données.
+
+Une tâche est une fonction enregistrée par le décorateur @task (dans le module 'jobs' d'une application),
+mise en file par enqueue() : une ligne Job, écrite dans la transaction en cours (la tâche n'est visible des
+processus de travail qu'après son commit, et disparaît avec un rollback). La commande run_workers l'exécute.
+
+Réclamation : claim() choisit les tâches prêtes et les marque 'running' dans une seule transaction d'écriture.
+Sur SQLite, les transactions commencent par BEGIN IMMEDIATE (voir myclinic/database.py) : le verrou d'écriture est
+pris avant la lecture, deux processus ne peuvent donc pas réclamer la même tâche (les autres attendent busy_timeout).
+Sur une base qui le permet, SELECT ... FOR UPDATE SKIP LOCKED joue ce rôle.
+
+Exécution : au moins une fois. Une tâche qui lève une exception est relancée après un délai exponentiel
+(avec une part d'aléa, pour étaler les relances de tâches qui échouent ensemble), jusqu'à max_attempts tentatives.
+Une tâche réclamée par un processus arrêté brutalement est reprise après JOBS_LOCK_TIMEOUT secondes.
+Une tâche peut donc être exécutée plusieurs fois : elle doit pouvoir être rejouée sans dommage.
+"""
+import functools
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Nombre de tentatives par défaut d'une tâche
+DEFAULT_MAX_ATTEMPTS = 5
+# Délai avant la première relance (secondes), doublé à chaque échec, et délai maximal
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+# Délai (secondes) au-delà duquel une tâche réclamée est considérée comme abandonnée
+DEFAULT_LOCK_TIMEOUT = 600
+
+# Tâches enregistrées : nom -> fonction
+_tasks = {}
+
+
+def task(name, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Décorateur : enregistre une fonction comme tâche de fond sous le nom 'name'.
+    La fonction reçoit les arguments nommés de la tâche ; function.enqueue(**kwargs) la met en file.
+    """
+    def decorator(function):
+        if _tasks.get(name, function) is not function:
+            raise ValueError(f"Une autre tâche est déjà enregistrée sous le nom {name!r}.")
+        _tasks[name] = function
+        function.task_name = name
+        function.max_attempts = max_attempts
+        function.enqueue = functools.partial(_enqueue_function, function)
+        return function
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"Tâche inconnue : {name!r}.") from None
+
+
+def registered_tasks():
+    return sorted(_tasks)
+
+
+def enqueue(name, payload=None, run_at=None):
+    """
+    Met en file la tâche 'name' avec ses arguments nommés 'payload' (sérialisables en JSON), à exécuter dès que possible
+    ou à partir de 'run_at'. Retourne la ligne Job créée.
+    """
+    function = get_task(name)
+    return Job.objects.create(
+        name=name, payload=payload or {}, run_at=run_at or timezone.now(), max_attempts=function.max_attempts,
+    )
+
+
+def _enqueue_function(function, run_at=None, **kwargs):
+    return enqueue(function.task_name, kwargs, run_at=run_at)
+
+
+def backoff(attempts):
+    """
+    Délai avant la relance d'une tâche qui a échoué 'attempts' fois : exponentiel, plafonné, diminué d'au plus un quart au hasard.
+    """
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.75, 1.0))
+
+
+def lock_timeout():
+    return timedelta(seconds=getattr(settings, 'JOBS_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT))
+
+
+def claim(worker, limit=1, now=None):
+    """
+    Réclame pour le processus de travail 'worker' au plus 'limit' tâches prêtes, les plus anciennes d'abord.
+    Reprend au passage les tâches abandonnées. Retourne les tâches réclamées.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        requeue_abandoned(now)
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'pk')[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+            )
+    # Les tâches lues sont mises à jour comme en base, sans les relire
+    for job in jobs:
+        job.status, job.locked_by, job.locked_at, job.attempts = Job.RUNNING, worker, now, job.attempts + 1
+    return jobs
+
+
+def requeue_abandoned(now=None):
+    """
+    Remet en file les tâches réclamées depuis plus de JOBS_LOCK_TIMEOUT secondes (processus arrêté brutalement),
+    ou les marque en échec si elles ont épuisé leurs tentatives. Retourne le nombre de tâches traitées.
+    """
+    now = now or timezone.now()
+    abandoned = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - lock_timeout())
+    error = "Tâche abandonnée : le processus de travail ne l'a pas terminée."
+    failed = abandoned.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', locked_at=None, last_error=error, finished_at=now,
+    )
+    requeued = abandoned.update(status=Job.QUEUED, locked_by='', locked_at=None, last_error=error, run_at=now)
+    return failed + requeued
+
+
+def run(job, worker):
+    """
+    Exécute une tâche réclamée par 'worker' et enregistre son résultat : terminée, relancée plus tard ou en échec.
+    Retourne le nouveau statut (Job.DONE, Job.QUEUED ou Job.FAILED).
+    """
+    # Seul le processus qui détient la tâche enregistre son résultat (elle a pu être reprise entre-temps)
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker)
+    try:
+        get_task(job.name)(**job.payload)
+    except Exception:
+        now = timezone.now()
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            mine.update(status=Job.FAILED, locked_by='', locked_at=None, last_error=error, finished_at=now)
+            logger.error("Tâche %s en échec après %d tentatives.", job, job.attempts, exc_info=True)
+            return Job.FAILED
+        mine.update(status=Job.QUEUED, locked_by='', locked_at=None, last_error=error, run_at=now + backoff(job.attempts))
+        logger.warning("Tâche %s en échec (tentative %d sur %d), relancée plus tard.", job, job.attempts, job.max_attempts, exc_info=True)
+        return Job.QUEUED
+    mine.update(status=Job.DONE, locked_by='', locked_at=None, finished_at=timezone.now())
+    return Job.DONE
+
+
+def queue_stats(now=None):
+    """
+    État de la file : nombre de tâches par statut et retard (secondes) de la plus ancienne tâche prête.
+    """
+    now = now or timezone.now()
+    counts = dict(Job.objects.values_list('status').annotate(count=Count('pk')).order_by())
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    return {
+        **{status: counts.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        'lag': (now - oldest).total_seconds() if oldest else 0.0,
+    }
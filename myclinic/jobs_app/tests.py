@@ -0,0 +1,153 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from myclinic.testing import in_database_file
+from . import queue
+from .models import Job
+
+# Appels reçus par les tâches de test
+calls = []
+
+
+@queue.task('jobs_app.tests.record')
+def record(**kwargs):
+    calls.append(kwargs)
+
+
+@queue.task('jobs_app.tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError("boom")
+
+
+def run_ready(worker='test', now=None):
+    """
+    Exécute les tâches prêtes jusqu'à ce que la file soit vide. Retourne les statuts obtenus.
+    """
+    statuses = []
+    while jobs := queue.claim(worker, now=now):
+        statuses.extend(queue.run(job, worker) for job in jobs)
+    return statuses
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        # Mise en place : aucun appel reçu par les tâches de test.
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        # Vérifie qu'une tâche mise en file est réclamée, exécutée avec ses arguments puis marquée terminée.
+        job = record.enqueue(day=timezone.localdate(), ids=[1, 2])
+        self.assertEqual((job.status, job.max_attempts), (Job.QUEUED, queue.DEFAULT_MAX_ATTEMPTS))
+        self.assertEqual(run_ready(), [Job.DONE])
+        self.assertEqual(calls, [{'day': timezone.localdate().isoformat(), 'ids': [1, 2]}])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.DONE, 1, ''))
+        self.assertIsNotNone(job.finished_at)
+        with self.assertRaises(LookupError):
+            queue.enqueue('jobs_app.tests.unknown')
+
+    def test_enqueue_is_transactional(self):
+        # Vérifie qu'une tâche mise en file dans une transaction annulée disparaît avec elle.
+        try:
+            with transaction.atomic():
+                record.enqueue()
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        # Vérifie qu'une tâche en échec est relancée après un délai exponentiel, puis marquée en échec à la dernière tentative.
+        job = explode.enqueue()
+        with self.assertLogs('jobs_app.queue', 'WARNING'):
+            self.assertEqual(run_ready(), [Job.QUEUED])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("RuntimeError: boom", job.last_error)
+        delay = job.run_at - timezone.now()
+        self.assertTrue(timedelta(seconds=queue.BACKOFF_BASE * 0.7) < delay <= timedelta(seconds=queue.BACKOFF_BASE))
+        self.assertEqual(run_ready(), [])  # Pas encore prête
+        with self.assertLogs('jobs_app.queue', 'ERROR'):
+            self.assertEqual(run_ready(now=job.run_at), [Job.FAILED])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertTrue(timedelta(seconds=queue.BACKOFF_MAX * 0.75) <= queue.backoff(20) <= timedelta(seconds=queue.BACKOFF_MAX))
+
+    def test_abandoned_job_is_taken_over(self):
+        # Vérifie qu'une tâche réclamée par un processus arrêté est reprise après JOBS_LOCK_TIMEOUT, et que seul le repreneur enregistre son résultat.
+        job = record.enqueue()
+        [claimed] = queue.claim('crashed')
+        self.assertEqual(queue.claim('other'), [])
+        later = timezone.now() + queue.lock_timeout() + timedelta(seconds=1)
+        [taken] = queue.claim('other', now=later)
+        self.assertEqual((taken.pk, taken.attempts, taken.locked_by), (job.pk, 2, 'other'))
+        queue.run(claimed, 'crashed')
+        self.assertEqual(Job.objects.get().status, Job.RUNNING)
+        queue.run(taken, 'other')
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_queue_stats(self):
+        # Vérifie le nombre de tâches par statut et le retard de la plus ancienne tâche prête.
+        now = timezone.now()
+        Job.objects.bulk_create([
+            Job(name=record.task_name, run_at=now - timedelta(seconds=90)),
+            Job(name=record.task_name, run_at=now + timedelta(hours=1)),
+            Job(name=record.task_name, status=Job.DONE),
+        ])
+        self.assertEqual(queue.queue_stats(now), {'queued': 2, 'running': 0, 'done': 1, 'failed': 0, 'lag': 90.0})
+
+
+class ConcurrentWorkerTests(TransactionTestCase):
+    def setUp(self):
+        # Mise en place : aucun appel reçu par les tâches de test.
+        calls.clear()
+
+    def test_parallel_claims_never_share_a_job(self):
+        # Lance de nombreuses réclamations simultanées : chaque tâche doit être réclamée par un seul processus de travail.
+        threads_count = 8
+        barrier = threading.Barrier(threads_count)
+        claimed, errors = [], []
+
+        def claim_all(index):
+            try:
+                barrier.wait()
+                while jobs := queue.claim(f'worker-{index}', limit=3):
+                    claimed.extend(job.pk for job in jobs)
+            except Exception as exc:  # Toute exception non gérée fait échouer le test
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        def scenario():
+            Job.objects.bulk_create(Job(name=record.task_name, payload={'index': index}) for index in range(60))
+            threads = [threading.Thread(target=claim_all, args=(index,)) for index in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return sorted(Job.objects.values_list('pk', flat=True)), Job.objects.filter(status=Job.RUNNING, attempts=1).count()
+
+        pks, running = in_database_file(scenario)
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(claimed), pks)
+        self.assertEqual(running, 60)
+
+    def test_run_workers_command(self):
+        # Vérifie que run_workers --once exécute toutes les tâches prêtes avec plusieurs fils d'exécution, puis affiche le débit.
+        out = StringIO()
+
+        def scenario():
+            Job.objects.bulk_create(Job(name=record.task_name, payload={'index': index}) for index in range(20))
+            call_command('run_workers', workers=3, once=True, batch_size=2, stdout=out)
+            return Job.objects.filter(status=Job.DONE).count()
+
+        self.assertEqual(in_database_file(scenario), 20)
+        self.assertEqual(sorted(call['index'] for call in calls), list(range(20)))
+        self.assertIn("terminées 20", out.getvalue())
+        self.assertIn("20 tâches traitées", out.getvalue())
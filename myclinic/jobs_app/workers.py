@@ -0,0 +1,160 @@
+"""
+Processus de travail de la file de tâches (commande run_workers).
+
+Chaque processus de travail (un fil d'exécution ou un processus, selon le mode) répète : réclamer des tâches prêtes
+(queue.claim), les exécuter (queue.run), attendre 'poll' secondes quand la file est vide. Il s'arrête quand
+l'événement 'stop' est posé (après avoir terminé sa tâche en cours), ou dès que la file est vide avec 'drain'.
+
+Les fils d'exécution conviennent aux tâches qui attendent surtout (envoi de courriels, requêtes) ; les processus,
+aux tâches de calcul. Dans les deux cas, les écritures dans SQLite restent sérialisées : c'est le débit des
+transactions courtes de réclamation et de fin de tâche qui borne celui de la file.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import DatabaseError, connections
+
+from . import queue
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Mesures communes à tous les processus de travail : tâches réclamées, terminées, relancées, en échec,
+# et durée cumulée d'exécution (secondes)
+METRICS = ('claimed', 'done', 'retried', 'failed', 'busy')
+
+
+class Metrics:
+    """
+    Compteurs de débit partagés par les processus de travail (en mémoire partagée : valables aussi entre processus).
+    """
+    def __init__(self):
+        self._values = multiprocessing.Array('d', len(METRICS))
+
+    def add(self, **increments):
+        with self._values.get_lock():
+            for name, value in increments.items():
+                self._values[METRICS.index(name)] += value
+
+    def snapshot(self):
+        with self._values.get_lock():
+            return dict(zip(METRICS, self._values[:]))
+
+
+def worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def work(index, stop, metrics, batch_size=1, poll=1.0, drain=False):
+    """
+    Boucle d'un processus de travail (voir le docstring du module).
+    """
+    worker = worker_name(index)
+    counters = {Job.DONE: 'done', Job.QUEUED: 'retried', Job.FAILED: 'failed'}
+    try:
+        while not stop.is_set():
+            try:
+                jobs = queue.claim(worker, batch_size)
+            except DatabaseError:
+                # Base indisponible ou verrouillée au-delà de busy_timeout : nouvel essai au prochain tour
+                logger.exception("Réclamation des tâches impossible.")
+                stop.wait(poll)
+                continue
+            if not jobs:
+                if drain:
+                    break
+                stop.wait(poll)
+                continue
+            metrics.add(claimed=len(jobs))
+            for job in jobs:
+                began = time.perf_counter()
+                try:
+                    status = queue.run(job, worker)
+                except DatabaseError:
+                    # Résultat non enregistré : la tâche sera reprise après JOBS_LOCK_TIMEOUT secondes
+                    logger.exception("Résultat de la tâche %s non enregistré.", job)
+                    continue
+                metrics.add(**{counters[status]: 1, 'busy': time.perf_counter() - began})
+    finally:
+        # Chaque fil d'exécution a sa propre connexion : elle est fermée avec lui
+        connections.close_all()
+
+
+# Événement d'arrêt et mesures d'un processus de travail (mode 'process'), transmis à sa création
+_process_state = None
+
+
+def _init_process(stop, metrics):
+    global _process_state
+    import django
+    django.setup()  # Sans effet après un fork ; nécessaire avec la méthode de démarrage 'spawn'
+    # Ctrl-C est reçu par tout le groupe de processus : seul le processus principal y répond, en posant 'stop'
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _process_state = (stop, metrics)
+
+
+def _work_process(index, options):
+    stop, metrics = _process_state
+    work(index, stop, metrics, **options)
+
+
+class WorkerPool:
+    """
+    Ensemble de 'size' processus de travail, en fils d'exécution (mode 'thread') ou en processus (mode 'process').
+    """
+    def __init__(self, size, mode='thread', **options):
+        self.size, self.mode, self.options = size, mode, options
+        self.metrics = Metrics()
+        if mode == 'thread':
+            self.stop = threading.Event()
+        else:
+            self.stop = multiprocessing.Event()
+        self._threads, self._executor, self._futures = [], None, []
+
+    def start(self):
+        if self.mode == 'thread':
+            self._threads = [
+                threading.Thread(target=work, args=(index, self.stop, self.metrics), kwargs=self.options, name=f'job-worker-{index}')
+                for index in range(self.size)
+            ]
+            for thread in self._threads:
+                thread.start()
+        else:
+            # Une connexion ouverte ne doit pas être partagée avec les processus créés par fork
+            connections.close_all()
+            self._executor = ProcessPoolExecutor(self.size, initializer=_init_process, initargs=(self.stop, self.metrics))
+            self._futures = [self._executor.submit(_work_process, index, self.options) for index in range(self.size)]
+
+    def alive(self):
+        if self.mode == 'thread':
+            return any(thread.is_alive() for thread in self._threads)
+        return not all(future.done() for future in self._futures)
+
+    def join(self, timeout=None):
+        """
+        Attend la fin des processus de travail, au plus 'timeout' secondes. Retourne vrai s'ils sont tous terminés.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.mode == 'thread':
+            for thread in self._threads:
+                thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        else:
+            for future in self._futures:
+                try:
+                    future.exception(None if deadline is None else max(0, deadline - time.monotonic()))
+                except TimeoutError:
+                    break
+        if self.alive():
+            return False
+        if self._executor is not None:
+            for future in self._futures:
+                future.result()  # Propage l'erreur d'un processus de travail
+            self._executor.shutdown()
+            self._executor = None
+        return True
@@ -0,0 +1,255 @@
+"""
+API JSON (version 1) des patients et des rendez-vous, pour la borne de prise de rendez-vous et l'application mobile.
+
+    GET /api/v1/patients/              GET /api/v1/patients/<id>/
+    GET /api/v1/appointments/          GET /api/v1/appointments/<id>/
+
+Les lignes sont lues avec values() et converties directement en JSON : aucun modèle n'est instancié.
+
+Paramètres GET (optionnels) :
+    fields: champs renvoyés, séparés par des virgules (par défaut tous ; 'id' est toujours renvoyé) ;
+    limit: nombre d'éléments d'une page de liste (API_PAGE_SIZE par défaut, au plus API_MAX_PAGE_SIZE) ;
+    after / before: jetons de pagination par curseur, donnés par les champs 'next' et 'previous' d'une page.
+
+ETag : calculé à partir des paramètres, du jour courant et de la date de dernière modification des données (updated_at,
+voir concurrency.py), lue dans la base par une seule requête MAX(updated_at) sur un index (ou sur la ligne demandée) :
+une écriture faite par un autre processus (commandes, travaux de run_workers) change donc l'ETag. Comme pour les pages
+HTML (voir conditional.py), les versions du cache en font aussi partie : elles tiennent compte des suppressions et des
+changements de nom d'un médecin, qui ne laissent pas de date de modification. Une requête conditionnelle (If-None-Match)
+dont l'ETag n'a pas changé reçoit une réponse 304, sans lecture des données ni sérialisation.
+
+Les champs réservés à l'administrateur (verified_by_admin, internal_admin_notes) ne sont jamais exposés,
+comme dans PatientForm et AppointmentForm.
+"""
+import functools
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Callable
+
+from django.core.exceptions import BadRequest
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_safe
+
+from patient_app.models import Patient
+from patient_app.pagination import KeysetPaginator
+from scheduler_app.models import Appointment
+from . import caching
+from .database import read_replica
+
+API_VERSION = 1
+# Nombre d'éléments par page de liste, par défaut et au plus
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+
+def _patients_modified():
+    # Les visites (nombre, dernière et prochaine) exposées dépendent des rendez-vous
+    appointments = Appointment.all_objects.order_by('-updated_at').values('updated_at')[:1]
+    return Patient.all_objects.aggregate(last=Greatest(Max('updated_at'), Coalesce(Subquery(appointments), Max('updated_at'))))['last']
+
+
+def _patient_modified(pk):
+    appointments = (
+        Appointment.all_objects.filter(patient_id=OuterRef('pk')).order_by().values('patient_id')
+        .annotate(last=Max('updated_at')).values('last')
+    )
+    return (
+        Patient.objects.filter(pk=pk)
+        .values_list(Greatest('updated_at', Coalesce(Subquery(appointments), 'updated_at')), flat=True).first()
+    )
+
+
+def _appointments_modified():
+    # Un rendez-vous affiche le nom de son patient
+    patients = Patient.all_objects.order_by('-updated_at').values('updated_at')[:1]
+    return Appointment.all_objects.aggregate(last=Greatest(Max('updated_at'), Coalesce(Subquery(patients), Max('updated_at'))))['last']
+
+
+def _appointment_modified(pk):
+    return Appointment.objects.filter(pk=pk).values_list(Greatest('updated_at', 'patient__updated_at'), flat=True).first()
+
+
+@dataclass(frozen=True)
+class Resource:
+    """
+    Une ressource de l'API : le modèle, les champs exposés ({nom: chemin pour values()}), les versions du cache dont
+    dépendent la liste et un élément, et leurs dates de dernière modification (None pour un élément introuvable).
+    """
+    model: type
+    fields: dict
+    list_versions: tuple
+    detail_versions: Callable
+    list_modified: Callable
+    detail_modified: Callable
+
+
+RESOURCES = {
+    'patients': Resource(
+        Patient,
+        {
+            'id': 'pk',
+            'name': 'name',
+            'date_of_birth': 'date_of_birth',
+            'contact_info': 'contact_info',
+            'basic_medical_history': 'basic_medical_history',
+            'appointment_count': 'appointment_count',
+            'last_visit': 'last_visit',
+            'next_visit': 'next_visit',
+        },
+        list_versions=(caching.PATIENT_LIST,),
+        detail_versions=lambda pk: (caching.patient_version(pk), caching.ALL_PATIENTS),
+        list_modified=_patients_modified,
+        detail_modified=_patient_modified,
+    ),
+    'appointments': Resource(
+        Appointment,
+        {
+            'id': 'pk',
+            'patient_id': 'patient_id',
+            'patient_name': 'patient__name',
+            'doctor_id': 'doctor_id',
+            'doctor': 'doctor__name',
+            'date': 'date',
+            'time': 'time',
+            'duration': 'duration',
+        },
+        # Un rendez-vous affiche les noms du patient et du médecin : les renommer change aussi ces versions
+        list_versions=(caching.APPOINTMENTS, caching.DOCTORS),
+        detail_versions=lambda pk: (caching.APPOINTMENTS, caching.DOCTORS),
+        list_modified=_appointments_modified,
+        detail_modified=_appointment_modified,
+    ),
+}
+
+
+def api_view(view):
+    """
+    Décorateur des vues de l'API : réservées aux utilisateurs connectés (401 sinon, sans redirection vers la page
+    de connexion), erreurs renvoyées en JSON, réponses privées et toujours revalidées auprès du serveur (ETag).
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': "Authentification requise."}, status=401)
+        try:
+            response = view(request, *args, **kwargs)
+        except BadRequest as exc:
+            response = JsonResponse({'error': str(exc)}, status=400)
+        except Http404 as exc:
+            response = JsonResponse({'error': str(exc) or "Introuvable."}, status=404)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    return wrapper
+
+
+def _resource(name):
+    if name not in RESOURCES:
+        raise Http404("Ressource inconnue.")
+    return RESOURCES[name]
+
+
+def _fields(request, resource):
+    """
+    Champs demandés par le paramètre 'fields' : {nom: chemin}, 'id' en premier.
+    """
+    requested = request.GET.get('fields')
+    if not requested:
+        return dict(resource.fields)
+    names = list(dict.fromkeys(['id', *(name.strip() for name in requested.split(',') if name.strip())]))
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        raise BadRequest(f"Champs inconnus : {', '.join(unknown)}.")
+    return {name: resource.fields[name] for name in names}
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("Taille de page invalide.")
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise BadRequest(f"La taille de page doit être comprise entre 1 et {API_MAX_PAGE_SIZE}.")
+    return limit
+
+
+def _etag(request, name, last_modified, versions, pk=None):
+    """
+    ETag d'une réponse : empreinte de la ressource, des paramètres GET, du jour courant (les visites à venir et passées
+    en dépendent), de la date de dernière modification des données et des versions courantes du cache.
+    """
+    current = caching.get_versions(versions)
+    params = sorted((key, value) for key, values in request.GET.lists() for value in values)
+    stamp = last_modified.isoformat() if last_modified else ''
+    raw = json.dumps([
+        API_VERSION, name, pk, params, timezone.localdate().isoformat(), stamp, [current[version] for version in versions],
+    ])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _list_etag(request, resource):
+    # Les paramètres sont validés avant : une requête invalide reçoit une erreur, jamais une réponse 304
+    definition = _resource(resource)
+    _fields(request, definition)
+    _limit(request)
+    return _etag(request, resource, definition.list_modified(), definition.list_versions)
+
+
+def _detail_etag(request, resource, pk):
+    definition = _resource(resource)
+    _fields(request, definition)
+    last_modified = definition.detail_modified(pk)
+    if last_modified is None:
+        return None  # Élément introuvable : la vue répond 404
+    return _etag(request, resource, last_modified, definition.detail_versions(pk), pk)
+
+
+def _serialize(row, fields):
+    return {name: row[path] for name, path in fields.items()}
+
+
+@api_view
+@require_safe
+@condition(etag_func=_list_etag)
+@read_replica
+def resource_list(request, resource):
+    """
+    Renvoie une page de patients ou de rendez-vous, dans l'ordre des identifiants (pagination par curseur).
+
+    Args:
+        resource: 'patients' ou 'appointments'.
+    """
+    definition = _resource(resource)
+    fields = _fields(request, definition)
+    paginator = KeysetPaginator(definition.model.objects.values(*fields.values()), ('pk',), _limit(request))
+    page = paginator.page(request.GET.get('before') or request.GET.get('after'))
+    return JsonResponse({
+        'results': [_serialize(row, fields) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@api_view
+@require_safe
+@condition(etag_func=_detail_etag)
+@read_replica
+def resource_detail(request, resource, pk):
+    """
+    Renvoie un patient ou un rendez-vous.
+
+    Args:
+        resource: 'patients' ou 'appointments'.
+        pk: L'identifiant de l'élément.
+    """
+    definition = _resource(resource)
+    fields = _fields(request, definition)
+    row = definition.model.objects.filter(pk=pk).values(*fields.values()).first()
+    if row is None:
+        raise Http404("Introuvable.")
+    return JsonResponse(_serialize(row, fields))
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class MyclinicConfig(AppConfig):
+    name = 'myclinic'
+
+    def ready(self):
+        # Réglages appliqués à chaque nouvelle connexion SQLite (voir database.py)
+        from .database import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='myclinic.configure_connection')
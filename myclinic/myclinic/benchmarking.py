@@ -0,0 +1,82 @@
+"""
+Outils communs aux commandes de benchmark : base de données jetable, mesure des temps et percentiles.
+"""
+import contextlib
+import math
+import statistics
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextlib.contextmanager
+def benchmark_database(using=DEFAULT_DB_ALIAS, verbosity=0):
+    """
+    Crée une base de test jetable (migrée), la rend active pendant le bloc, puis la détruit.
+    Les benchmarks ne touchent ainsi jamais à la base de développement.
+    """
+    connection = connections[using]
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def percentile(samples, pct):
+    """
+    Percentile par rang le plus proche (pct entre 0 et 100) d'une liste de mesures.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(func, repeat):
+    """
+    Appelle func() 'repeat' fois et retourne la liste des durées en millisecondes.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    """
+    Résume une liste de durées (ms) : nombre, moyenne et percentiles p50 / p95 / p99.
+    """
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples), 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
+
+
+@contextlib.contextmanager
+def database_file(path, using=DEFAULT_DB_ALIAS, **overrides):
+    """
+    Rend active la base SQLite du fichier 'path' pendant le bloc, après l'avoir créée ou mise à jour (migrate).
+    Contrairement à benchmark_database(), le fichier est conservé : un jeu de données coûteux à générer peut être réutilisé.
+    'overrides' remplace d'autres clés de la configuration de la base pendant le bloc (OPTIONS, CONN_MAX_AGE, ...),
+    pour toutes les connexions ouvertes ensuite, quel que soit le fil d'exécution.
+    """
+    from django.core.management import call_command
+
+    connection = connections[using]
+    saved = {key: connection.settings_dict[key] for key in ('NAME', *overrides)}
+    connection.close()
+    connection.settings_dict.update(overrides, NAME=str(path))
+    try:
+        call_command('migrate', database=using, interactive=False, verbosity=0)
+        yield connection
+    finally:
+        connection.close()
+        connection.settings_dict.update(saved)
@@ -0,0 +1,168 @@
+"""
+Cache des vues de lecture (fiche patient, liste des patients, liste des rendez-vous) et des jours de l'agenda
+(voir scheduler_app/agenda.py).
+
+Invalidation par versions : chaque entrée dépend de versions nommées (celle d'un patient, de la liste des patients,
+d'un jour de l'agenda, ...), conservées dans le cache sans expiration, et sa clé contient leurs valeurs courantes.
+Modifier une donnée change sa version (bump) : les anciennes entrées ne sont plus jamais lues et expirent d'elles-mêmes.
+Les versions sont changées par les signaux post_save / post_delete de Patient, Appointment et Doctor, et par les
+opérations en masse qui n'émettent pas ces signaux.
+
+Le cache utilisé est le cache 'default' des réglages : en mémoire locale par défaut, remplaçable par un cache partagé
+(voir CACHES dans settings.py). Les versions sont gardées dans ce même cache : avec le cache local, seules les écritures
+faites dans le processus qui sert les pages les invalident. Les écritures des commandes d'administration et des travaux
+de run_workers, faites dans d'autres processus, ne sont visibles qu'avec un cache partagé (ou à l'expiration des pages).
+
+Les entrées sont sûres d'un utilisateur à l'autre : les vues vérifient la connexion et les droits avant de lire le cache,
+les pages sont rendues sans la requête (ni utilisateur, ni session, ni jeton CSRF), et la clé d'une page contient
+le public visé (administrateur ou non). Deux utilisateurs ne partagent donc une entrée que s'ils verraient la même page.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+# Durée de vie (secondes) d'une page mise en cache
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Versions partagées par plusieurs entrées
+PATIENT_LIST = 'patient-list'  # Pages de la liste des patients
+ALL_PATIENTS = 'patients'  # Toutes les fiches patient (changée par les modifications en masse)
+APPOINTMENTS = 'appointments'  # Liste complète des rendez-vous
+DOCTORS = 'doctors'  # Noms des médecins, affichés dans les fiches, l'agenda et la liste des rendez-vous
+
+
+def patient_version(pk):
+    """
+    Nom de la version de la fiche d'un patient.
+    """
+    return f'patient:{pk}'
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+
+def get_versions(names):
+    """
+    Retourne la version courante de chaque nom, en un seul aller-retour vers le cache.
+    Une version absente (jamais créée ou évincée du cache) est initialisée avec une valeur unique,
+    pour ne jamais retomber sur une ancienne entrée.
+    """
+    keys = {name: _version_key(name) for name in names}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        if key in found:
+            versions[name] = found[key]
+        else:
+            version = time.time_ns()
+            cache.add(key, version, None)
+            versions[name] = cache.get(key, version)
+    return versions
+
+
+def bump(*names):
+    """
+    Change les versions données : les entrées qui en dépendent ne seront plus lues.
+    """
+    version = time.time_ns()
+    cache.set_many({_version_key(name): version for name in names}, None)
+
+
+def bump_on_commit(*names):
+    """
+    Change les versions tout de suite, puis à nouveau après le commit de la transaction en cours :
+    une lecture concurrente faite entre les deux ne peut pas remettre l'ancien état en cache sous la nouvelle version.
+    """
+    bump(*names)
+    transaction.on_commit(lambda: bump(*names))
+
+
+class CacheStats:
+    """
+    Compteurs de succès (hits) et d'échecs (misses) du cache, par espace de noms ('patient_detail', 'agenda', ...).
+    Propres au processus, comme le cache en mémoire locale.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def record(self, namespace, hits=0, misses=0):
+        with self._lock:
+            self.hits[namespace] += hits
+            self.misses[namespace] += misses
+
+    def snapshot(self):
+        """
+        Retourne {espace de noms: {'hits', 'misses', 'hit_rate'}}.
+        """
+        with self._lock:
+            namespaces = sorted(set(self.hits) | set(self.misses))
+            return {
+                namespace: {
+                    'hits': self.hits[namespace],
+                    'misses': self.misses[namespace],
+                    'hit_rate': round(self.hits[namespace] / (self.hits[namespace] + self.misses[namespace] or 1), 3),
+                }
+                for namespace in namespaces
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+
+
+stats = CacheStats()
+
+
+def audience(user):
+    """
+    Public visé par une page : les administrateurs (staff) peuvent voir plus que les autres utilisateurs.
+    """
+    return 'staff' if user.is_staff else 'user'
+
+
+def _lookup(namespace, parts, versions):
+    """
+    Calcule la clé d'une page à partir de ses paramètres et des versions courantes, puis lit l'entrée.
+    Retourne (clé, HTML ou None). Les versions sont lues avant les données : une modification concurrente
+    rend l'entrée écrite ensuite inaccessible.
+    """
+    current = get_versions(versions)
+    raw = ':'.join(str(part) for part in (*parts, *(current[name] for name in versions)))
+    key = f'page:{namespace}:{hashlib.md5(raw.encode()).hexdigest()}'
+    html = cache.get(key)
+    stats.record(namespace, hits=html is not None, misses=html is None)
+    return key, html
+
+
+def cached_page(namespace, parts, versions, render, timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Retourne le HTML d'une page identifiée par 'parts' (paramètres, public visé, ...) et dépendant des versions 'versions'.
+    En cas d'échec, render() est appelée (elle doit rendre la page sans la requête) et son résultat est mis en cache.
+    """
+    key, html = _lookup(namespace, parts, versions)
+    if html is None:
+        html = render()
+        cache.set(key, html, timeout)
+    return html
+
+
+async def acached_page(namespace, parts, versions, render, timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Version asynchrone de cached_page() pour les vues async : render est une coroutine.
+    Les backends de cache de Django étant synchrones, la lecture des versions et de l'entrée se fait
+    en un seul passage par un fil d'exécution (au lieu d'un par appel à l'API asynchrone du cache).
+    """
+    key, html = await sync_to_async(_lookup)(namespace, parts, versions)
+    if html is None:
+        html = await render()
+        await cache.aset(key, html, timeout)
+    return html
@@ -0,0 +1,160 @@
+"""
+Contrôle de concurrence optimiste des fiches modifiables par formulaire (patients, rendez-vous).
+
+Chaque ligne porte un numéro de version, incrémenté à chaque modification. Un enregistrement n'écrit que les champs
+modifiés depuis la lecture de l'instance, par une seule requête de comparaison et échange :
+    UPDATE ... SET <champs modifiés>, version = v + 1 WHERE id = ? AND version = v
+Aucun verrou n'est pris pendant l'édition ni à la lecture : si une autre modification est passée entre-temps, la requête
+ne touche aucune ligne et VersionConflict est levée, sans rien écrire. Le formulaire (VersionedModelForm) renvoie la
+version affichée à l'utilisateur : c'est elle qui est comparée, et un conflit produit une proposition de fusion.
+Chaque modification enregistre aussi sa date (updated_at), d'où sont tirés les validateurs HTTP des pages
+(voir myclinic/conditional.py).
+
+Les modifications en masse (update()) des champs modifiables par formulaire incrémentent aussi la version et changent
+la date de modification (voir scheduler_app/batch.py, PatientQuerySet.delete) ; celles des champs calculés
+(visites, rappels) ne le font pas.
+"""
+from django import forms
+from django.db import models, router, transaction
+from django.db.models.functions import Now
+
+CONFLICT_MESSAGE = (
+    "This record was changed by someone else while you were editing it. Their changes have been merged into the form "
+    "below; review the conflicting fields, then save again."
+)
+DELETED_MESSAGE = "This record was deleted while you were editing it."
+
+
+class VersionConflict(Exception):
+    """
+    L'instance a été modifiée en base depuis sa lecture : la version attendue n'est plus celle de la ligne.
+    """
+    def __init__(self, instance, expected):
+        super().__init__(f"{instance._meta.label} {instance.pk} : la version {expected} n'est plus la version courante.")
+        self.instance, self.expected = instance, expected
+
+
+class VersionedModel(models.Model):
+    """
+    Modèle à version. Les sous-classes mémorisent dans from_db() les valeurs lues (_loaded_values), qui permettent
+    de n'écrire que les champs modifiés.
+    """
+    # Numéro de version de la ligne (valeur par défaut aussi en base, pour les insertions SQL directes)
+    version = models.PositiveIntegerField(default=1, db_default=1, editable=False)
+    # Date de la dernière modification (valeur par défaut aussi en base, pour les insertions SQL directes)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
+
+    class Meta:
+        abstract = True
+
+    def changed_fields(self):
+        """
+        Noms des champs modifiés depuis la lecture de l'instance, ou None si elle n'a pas été lue depuis la base.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in ('version', 'updated_at')
+            and field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Enregistre une instance existante par comparaison et échange de sa version (VersionConflict en cas d'échec),
+        en n'écrivant que les champs modifiés si 'update_fields' n'est pas donné. Sans modification, rien n'est écrit.
+        """
+        if self._state.adding or kwargs.get('force_insert'):
+            return super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = self.changed_fields()
+            if update_fields == []:
+                return
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
+        expected = self._expected_version = self.version
+        self.version = expected + 1
+        try:
+            # Point de sauvegarde dans une transaction en cours : un conflit ne l'interrompt pas (la fusion relit la fiche)
+            with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+                super().save(*args, **kwargs)
+        except BaseException:
+            self.version = expected
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update):
+            return True
+        raise VersionConflict(self, expected)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        # Les valeurs relues sont celles de la base : elles ne comptent plus comme modifiées
+        if hasattr(self, '_loaded_values'):
+            deferred = self.get_deferred_fields()
+            self._loaded_values.update(
+                (field.attname, getattr(self, field.attname)) for field in self._meta.concrete_fields
+                if field.attname not in deferred and (fields is None or field.attname in fields or field.name in fields)
+            )
+
+
+class VersionedModelForm(forms.ModelForm):
+    """
+    Formulaire d'un VersionedModel. La version et les valeurs affichées sont renvoyées dans des champs cachés :
+    l'enregistrement échoue (VersionConflict) si la fiche a changé depuis l'affichage, et merge_conflict() prépare
+    alors la fusion.
+    """
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False, min_value=1)
+    # Après un conflit : [(libellé, valeur saisie, valeur enregistrée)] des champs modifiés des deux côtés
+    conflicts = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial.setdefault('version', self.instance.version)
+            for name in self._meta.fields:
+                self.fields[name].show_hidden_initial = True
+
+    def _post_clean(self):
+        super()._post_clean()
+        # La version comparée est celle que l'utilisateur a vue, pas celle lue au moment de l'envoi
+        if self.cleaned_data.get('version'):
+            self.instance.version = self.cleaned_data['version']
+
+    def _data_value(self, field, value):
+        return '' if value is None else str(field.prepare_value(value))
+
+    def merge_conflict(self):
+        """
+        Prépare la fusion après un VersionConflict : chaque champ que l'utilisateur n'a pas modifié prend la valeur
+        enregistrée par l'autre modification, chaque champ qu'il a modifié garde la valeur saisie ; ceux que les deux ont
+        modifiés différemment sont listés dans self.conflicts. La version enregistrée remplace la version affichée :
+        enregistrer de nouveau le formulaire fusionné réussit, sauf nouvelle modification entre-temps.
+        La fiche est relue par le gestionnaire par défaut : une fiche qu'il exclut (patient supprimé logiquement,
+        rendez-vous annulé) ne peut plus être modifiée par la vue, et elle est donc signalée comme supprimée.
+        """
+        current = type(self.instance)._default_manager.filter(pk=self.instance.pk).first()
+        if current is None:
+            self.add_error(None, DELETED_MESSAGE)
+            return
+        data, conflicts = self.data.copy(), []
+        changed = set(self.changed_data)
+        for name in self._meta.fields:
+            field, bound = self.fields[name], self[name]
+            theirs = getattr(current, name)
+            saved = self._data_value(field, theirs)
+            if name not in changed:
+                data[bound.html_name] = saved
+            elif self._widget_data_value(field.hidden_widget(), bound.html_initial_name) != saved and self.cleaned_data[name] != theirs:
+                conflicts.append((bound.label, self.cleaned_data[name], theirs))
+            data[bound.html_initial_name] = saved
+        data[self.add_prefix('version')] = current.version
+        self.data, self.conflicts = data, conflicts
+        self.add_error(None, CONFLICT_MESSAGE)
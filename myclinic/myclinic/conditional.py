@@ -0,0 +1,94 @@
+"""
+Réponses conditionnelles (304 Not Modified) des pages HTML : fiche patient, liste des rendez-vous et agenda.
+
+Avant la requête principale et le rendu, les validateurs de la page sont calculés :
+- Last-Modified : la date de dernière modification (updated_at, voir myclinic/concurrency.py) des lignes affichées,
+  lue par une seule requête MAX(updated_at) sur un index ;
+- ETag : une empreinte de cette date, des paramètres de la page (dont le public visé) et des versions du cache dont
+  elle dépend (voir myclinic/caching.py). Les suppressions, l'archivage et les changements de nom d'un médecin ne
+  laissent pas de date de modification, mais changent ces versions : c'est l'ETag, prioritaire sur Last-Modified
+  (If-None-Match), qui en tient compte.
+Un navigateur ou le proxy qui présente un validateur encore valable reçoit 304, sans que la vue ne s'exécute.
+
+Les pages dépendent de l'utilisateur connecté (droits, public visé) : elles restent privées (Cache-Control: private)
+et varient selon le cookie de session (Vary: Cookie), pour qu'un cache ne serve jamais la page d'un utilisateur à un autre.
+
+Le décorateur @condition de Django appelle ses fonctions de façon synchrone, ce qui est impossible dans une vue
+asynchrone (requêtes SQL) : conditional_page() fait le même travail avec get_conditional_response(), et calcule
+les validateurs d'une vue asynchrone dans un fil d'exécution.
+"""
+import functools
+import hashlib
+from typing import NamedTuple
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from myclinic import caching
+
+
+class Validators(NamedTuple):
+    etag: str
+    # Date de dernière modification, ou None si aucune ligne affichée n'en a (seul l'ETag est alors envoyé)
+    last_modified: object
+
+
+def _conditional(request):
+    # Seules les lectures ont des validateurs
+    return request.method in ('GET', 'HEAD')
+
+
+def page_validators(last_modified, parts, versions):
+    """
+    Calcule les validateurs d'une page identifiée par 'parts' et dépendant des versions du cache 'versions'.
+    """
+    current = caching.get_versions(versions)
+    stamp = last_modified.isoformat() if last_modified else ''
+    raw = ':'.join(str(part) for part in (stamp, *parts, *(current[name] for name in versions)))
+    return Validators(quote_etag(hashlib.md5(raw.encode()).hexdigest()), last_modified)
+
+
+def not_modified(request, validators):
+    """
+    Retourne la réponse 304 (ou 412) si la requête présente un validateur encore valable, sinon None.
+    """
+    if validators is None or not _conditional(request):
+        return None
+    timestamp = int(validators.last_modified.timestamp()) if validators.last_modified else None
+    return get_conditional_response(request, etag=validators.etag, last_modified=timestamp)
+
+
+def add_validators(response, validators):
+    """
+    Ajoute à la réponse ses validateurs (si elle est complète ou 304) et l'en-tête Vary: Cookie.
+    """
+    patch_vary_headers(response, ('Cookie',))
+    if validators is not None and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', validators.etag)
+        if validators.last_modified:
+            response.headers.setdefault('Last-Modified', http_date(validators.last_modified.timestamp()))
+    return response
+
+
+def conditional_page(compute):
+    """
+    Décorateur de vue (synchrone ou asynchrone) : compute(request, *args, **kwargs) retourne les Validators de la page,
+    ou None quand la vue doit s'exécuter dans tous les cas (page introuvable, redirection, ...).
+    Pour une vue asynchrone, compute() s'exécute dans un fil d'exécution.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                validators = await sync_to_async(compute)(request, *args, **kwargs) if _conditional(request) else None
+                response = not_modified(request, validators) or await view(request, *args, **kwargs)
+                return add_validators(response, validators)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                validators = compute(request, *args, **kwargs) if _conditional(request) else None
+                response = not_modified(request, validators) or view(request, *args, **kwargs)
+                return add_validators(response, validators)
+        return wrapper
+    return decorator
@@ -0,0 +1,100 @@
+"""
+Configuration des connexions à la base SQLite pour la production.
+
+À l'ouverture de chaque connexion (signal connection_created), les PRAGMA de SQLITE_PRAGMAS (settings.py) sont appliqués :
+- journal_mode=WAL : les lectures ne bloquent plus l'écriture en cours (et inversement) ; une seule écriture à la fois ;
+- synchronous=NORMAL : en WAL, pas de fsync à chaque commit (un commit peut être perdu en cas de coupure de courant,
+  jamais la cohérence du fichier) ;
+- mmap_size et cache_size : lectures par projection en mémoire et cache de pages plus grand ;
+- busy_timeout : une connexion qui trouve la base verrouillée attend son tour au lieu d'échouer ("database is locked").
+
+Les transactions (transaction.atomic) commencent par BEGIN IMMEDIATE (OPTIONS 'transaction_mode' dans settings.py) :
+le verrou d'écriture est pris dès le début. Sinon, une transaction qui lit puis écrit pendant qu'une autre écrit
+échoue aussitôt, sans profiter de busy_timeout (SQLite ne peut pas l'attendre sans risquer un interblocage).
+
+Réplique en lecture (optionnelle) : si la base READ_REPLICA est déclarée dans DATABASES, les lectures des vues
+décorées par @read_replica (listes et fiches) passent par cette connexion en lecture seule, par exemple le même
+fichier ouvert en mode 'ro' ou une copie répliquée (Litestream, LiteFS). Les écritures, et les lectures faites
+dans une transaction de la base principale, restent sur 'default'.
+La réplique doit être à jour au commit près (même fichier, réplication synchrone) : une page lue sur une copie
+en retard serait mise en cache sous la nouvelle version des données (voir myclinic/caching.py).
+"""
+import functools
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Alias de la réplique en lecture dans DATABASES
+READ_REPLICA = 'replica'
+# PRAGMA propres au fichier (fixés par la connexion d'écriture), non appliqués à une connexion en lecture seule
+FILE_PRAGMAS = ('journal_mode',)
+
+# Vrai pendant l'exécution d'une vue décorée par @read_replica
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Récepteur du signal connection_created : applique SQLITE_PRAGMAS à une nouvelle connexion SQLite.
+    Une connexion à la réplique est en plus limitée aux lectures (query_only).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if connection.alias == READ_REPLICA:
+        for name in FILE_PRAGMAS:
+            pragmas.pop(name, None)
+        pragmas['query_only'] = 'on'
+    # Connexion sqlite3 brute : ces réglages ne sont ni journalisés ni comptés par le profilage
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def replica_configured():
+    return READ_REPLICA in settings.DATABASES
+
+
+def read_replica(view):
+    """
+    Décorateur de vue (synchrone ou asynchrone) : ses lectures passent par la réplique en lecture, si elle est configurée.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """
+    Routeur de bases (DATABASE_ROUTERS) : voir le docstring du module.
+    Les objets lus sur la réplique sont toujours enregistrés sur la base principale.
+    """
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return READ_REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplique contient les mêmes données que la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != READ_REPLICA
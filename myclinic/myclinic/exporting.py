@@ -0,0 +1,140 @@
+"""
+Export en masse des patients et des rendez-vous (CSV, JSONL ou colonnes JSON), utilisé par la commande
+export_clinic_data et par la vue d'export en streaming.
+
+Les lignes sont lues avec values_list().iterator(chunk_size=...) : aucun modèle n'est instancié et seul le lot courant
+est en mémoire. Chaque lot est converti en un morceau de texte, éventuellement compressé en gzip à la volée :
+la mémoire utilisée ne dépend pas de la taille des tables.
+Sous ASGI, la vue d'export utilise aexport_stream : un itérateur synchrone y serait lu en entier avant l'envoi.
+"""
+import csv
+import io
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from patient_app.models import Patient
+from scheduler_app.models import Appointment
+
+# Nombre de lignes lues à la fois depuis le curseur de la base
+EXPORT_CHUNK_SIZE = 2000
+# Formats disponibles et extension de fichier associée.
+# 'columns' : une ligne JSON par lot, au format colonnes ({"colonne": [valeurs...]}), plus compacte et plus rapide à charger
+# pour les outils d'analyse, sans dépendance à une bibliothèque de format colonne.
+EXPORT_FORMATS = {'csv': 'csv', 'jsonl': 'jsonl', 'columns': 'columns.jsonl'}
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'columns': 'application/x-ndjson'}
+
+# Colonnes exportées : {nom de colonne: chemin du champ}. Les champs réservés à l'administrateur
+# (verified_by_admin, internal_admin_notes) ne sont pas exportés.
+EXPORTS = {
+    'patients': (Patient, {
+        'id': 'pk',
+        'name': 'name',
+        'date_of_birth': 'date_of_birth',
+        'contact_info': 'contact_info',
+        'basic_medical_history': 'basic_medical_history',
+    }),
+    'appointments': (Appointment, {
+        'id': 'pk',
+        'patient_id': 'patient_id',
+        'patient_name': 'patient__name',
+        'patient_date_of_birth': 'patient__date_of_birth',
+        'doctor_id': 'doctor_id',
+        'doctor': 'doctor__name',
+        'date': 'date',
+        'time': 'time',
+        'duration': 'duration',
+    }),
+}
+
+
+def export_rows(kind, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Retourne (colonnes, lots) : 'lots' génère des listes de tuples, dans l'ordre des clés primaires.
+    """
+    model, columns = EXPORTS[kind]
+    rows = model.objects.order_by('pk').values_list(*columns.values()).iterator(chunk_size=chunk_size)
+
+    def chunks():
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    return list(columns), chunks()
+
+
+def _csv_chunks(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def _jsonl_chunks(columns, chunks):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for chunk in chunks:
+        yield ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in chunk)
+
+
+def _columns_chunks(columns, chunks):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for chunk in chunks:
+        yield encoder.encode(dict(zip(columns, map(list, zip(*chunk))))) + '\n'
+
+
+WRITERS = {'csv': _csv_chunks, 'jsonl': _jsonl_chunks, 'columns': _columns_chunks}
+
+
+def gzip_stream(pieces):
+    """
+    Compresse à la volée une suite de morceaux de texte (format gzip), morceau par morceau.
+    """
+    compressor = zlib.compressobj(wbits=31)  # 16 + 15 : en-tête et pied de page gzip
+    for piece in pieces:
+        data = compressor.compress(piece.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(kind, fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Génère l'export de 'kind' ('patients' ou 'appointments') au format 'fmt', en octets, lot par lot.
+    """
+    columns, chunks = export_rows(kind, chunk_size)
+    pieces = WRITERS[fmt](columns, chunks)
+    if compress:
+        return gzip_stream(pieces)
+    return (piece.encode() for piece in pieces)
+
+
+async def aexport_stream(kind, fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Version asynchrone d'export_stream, pour les réponses en streaming sous ASGI. Comme QuerySet.aiterator(), chaque
+    morceau est produit dans un fil d'exécution (toujours le même : le curseur de la base reste ouvert d'un morceau
+    à l'autre), et un seul morceau à la fois est en mémoire.
+    """
+    pieces = export_stream(kind, fmt, compress, chunk_size)
+    while True:
+        piece = await sync_to_async(next)(pieces, None)
+        if piece is None:
+            return
+        yield piece
+
+
+def export_filename(kind, fmt, compress=False):
+    """
+    Nom de fichier proposé pour un export, par exemple 'patients.csv.gz'.
+    """
+    return f"{kind}.{EXPORT_FORMATS[fmt]}{'.gz' if compress else ''}"
@@ -0,0 +1,338 @@
+"""
+Benchmark HTTP des vues de patient_app et scheduler_app (commande bench_http).
+
+Chaque URL nommée de patient_app.urls et scheduler_app.urls (et quelques variantes : recherche, tri, streaming, filtres)
+forme un "cas". Ses requêtes sont tirées avec un générateur initialisé avec la graine : mêmes données, mêmes URL.
+Un cas est joué soit avec le client de test de Django (sans réseau), soit contre un vrai serveur démarré dans
+le processus, avec plusieurs clients HTTP concurrents : serveur WSGI multi-thread (un fil par connexion, ou un nombre
+de fils borné comme un déploiement gunicorn --threads), ou serveur ASGI uvicorn (dépendance optionnelle).
+Pour chaque cas sont relevés les percentiles de latence, le débit et le nombre de requêtes SQL par requête HTTP
+(mesuré par le middleware de profilage).
+
+Des clients lents (qui envoient leur requête octet par octet) peuvent occuper le serveur pendant les mesures :
+un serveur WSGI leur consacre un fil chacun, un serveur ASGI les attend dans sa boucle d'événements.
+"""
+import contextlib
+import http.client
+import random
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, WSGIServer
+from django.db import connections
+from django.db.models import Max, Min
+from django.urls import reverse
+
+from patient_app.models import Patient
+from scheduler_app.models import Appointment, Doctor
+from . import profiling
+from .benchmarking import summarize
+
+# Applications dont toutes les URL nommées sont mesurées
+BENCH_APPS = ('patient_app', 'scheduler_app')
+# Nombre minimal de requêtes d'un cas, même lorsque son budget de temps est dépassé
+MIN_REQUESTS = 3
+
+# Variantes mesurées en plus de l'URL nue : {nom d'URL: [(suffixe, fonction (générateur, jeu de données) -> paramètres GET)]}
+VARIANTS = {
+    'patient_list': [
+        ('search', lambda rng, data: {'q': rng.choice(data.search_terms)}),
+        ('next_visit', lambda rng, data: {'sort': 'next_visit'}),
+        ('stream', lambda rng, data: {'stream': '1'}),
+    ],
+    'appointment_agenda': [
+        ('week_doctor', lambda rng, data: {**data.week(rng), 'doctor': rng.choice(data.doctor_ids)}),
+    ],
+    'appointment_free_slots': [
+        ('doctor', lambda rng, data: {**data.week(rng), 'doctor': rng.choice(data.doctor_ids)}),
+    ],
+}
+
+
+@dataclass
+class Dataset:
+    """
+    Bornes du jeu de données mesuré, utilisées pour construire des URL valides.
+    """
+    patient_ids: tuple
+    appointment_ids: tuple
+    doctor_ids: list
+    first_day: object
+    last_day: object
+    search_terms: list = field(default_factory=list)
+
+    @classmethod
+    def load(cls, sample=20):
+        patients = Patient.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        appointments = Appointment.objects.aggregate(low=Min('pk'), high=Max('pk'), first=Min('date'), last=Max('date'))
+        names = Patient.objects.order_by('pk').values_list('name', flat=True)[:sample]
+        return cls(
+            patient_ids=(patients['low'], patients['high']),
+            appointment_ids=(appointments['low'], appointments['high']),
+            doctor_ids=list(Doctor.objects.order_by('pk').values_list('pk', flat=True)[:1000]),
+            first_day=appointments['first'],
+            last_day=appointments['last'],
+            search_terms=[name.split()[-1][:5].lower() for name in names if name.strip()],
+        )
+
+    def day(self, rng):
+        return self.first_day + timedelta(days=rng.randrange((self.last_day - self.first_day).days + 1))
+
+    def week(self, rng):
+        start = self.day(rng)
+        return {'start': start.isoformat(), 'end': (start + timedelta(days=6)).isoformat()}
+
+    def kwargs(self, app, converters, rng):
+        """
+        Paramètres d'URL pour un motif : 'pk' désigne un patient dans patient_app, un rendez-vous dans scheduler_app.
+        """
+        kwargs = {}
+        for name in converters:
+            if name == 'pk':
+                low, high = self.patient_ids if app == 'patient_app' else self.appointment_ids
+                kwargs['pk'] = rng.randint(low, high)
+            elif name == 'day':
+                kwargs['day'] = self.day(rng)
+            else:
+                raise ValueError(f"Paramètre d'URL non géré par le benchmark : {name}")
+        return kwargs
+
+
+@dataclass
+class Case:
+    """
+    Un cas de benchmark : un nom ('patient_list', 'patient_list[search]', ...), le nom d'URL de la vue et ses URL.
+    """
+    name: str
+    url_name: str
+    urls: list
+
+
+def build_cases(data, requests, seed):
+    """
+    Construit les cas de toutes les URL nommées de BENCH_APPS, chacun avec 'requests' URL tirées de façon reproductible.
+    Un cas dont les URL ne peuvent pas être construites (table vide) est ignoré.
+    """
+    cases = []
+    for app in BENCH_APPS:
+        for pattern in import_module(f'{app}.urls').urlpatterns:
+            if not pattern.name:
+                continue
+            for suffix, params in [('', None), *VARIANTS.get(pattern.name, [])]:
+                name = f'{pattern.name}[{suffix}]' if suffix else pattern.name
+                rng = random.Random(f'{seed}:{name}')
+                try:
+                    urls = []
+                    for _ in range(requests):
+                        url = reverse(pattern.name, kwargs=data.kwargs(app, pattern.pattern.converters, rng))
+                        query = params(rng, data) if params else None
+                        urls.append(f'{url}?{urlencode(query)}' if query else url)
+                except (TypeError, IndexError, ValueError):
+                    continue
+                cases.append(Case(name, pattern.name, urls))
+    return cases
+
+
+def _summary(latencies, elapsed, errors, url_name):
+    """
+    Résume un cas : percentiles de latence, débit (requêtes/s) et requêtes SQL par requête HTTP.
+    """
+    queries = [p.query_count for p in profiling.buffer.snapshot() if p.url_name == url_name]
+    return {
+        **summarize(latencies),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'errors': errors,
+        'queries_p50': statistics.median(queries) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def run_client_case(case, client, budget):
+    """
+    Joue un cas avec le client de test, requête après requête, jusqu'à épuisement des URL ou du budget (secondes).
+    """
+    cache.clear()
+    profiling.buffer.clear()
+    latencies, errors = [], 0
+    began = time.perf_counter()
+    for url in case.urls:
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += response.status_code >= 400
+        if time.perf_counter() - began > budget and len(latencies) >= MIN_REQUESTS:
+            break
+    return _summary(latencies, time.perf_counter() - began, errors, case.url_name)
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    Serveur WSGI au nombre de fils borné, comme un déploiement gunicorn --threads : une connexion occupe un fil
+    du début de la lecture de la requête jusqu'à l'envoi de la réponse ; les suivantes attendent un fil libre.
+    """
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            connections.close_all()
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(cancel_futures=True)
+
+
+@contextlib.contextmanager
+def wsgi_server(threads=None):
+    """
+    Démarre un serveur WSGI sur un port libre, dans un fil d'exécution du processus : celui de runserver (un fil
+    par connexion) ou, avec 'threads', un serveur au nombre de fils borné. Retourne l'adresse (hôte, port).
+    """
+    if threads:
+        server = PooledWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler, threads=threads, allow_reuse_address=False)
+    else:
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[:2]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@contextlib.contextmanager
+def asgi_server():
+    """
+    Démarre l'application ASGI (myclinic/asgi.py) avec uvicorn sur un port libre, dans un fil d'exécution du processus.
+    Retourne l'adresse (hôte, port). Lève ImportError si uvicorn n'est pas installé.
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(get_asgi_application(), host='127.0.0.1', port=0, log_level='warning', lifespan='off'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        while not server.started:
+            if not thread.is_alive():
+                raise RuntimeError("Le serveur uvicorn n'a pas démarré.")
+            time.sleep(0.01)
+        yield server.servers[0].sockets[0].getsockname()[:2]
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+@contextlib.contextmanager
+def slow_clients(address, cookie, url, count, seconds):
+    """
+    Fait tourner 'count' clients lents pendant le bloc : chacun envoie une requête GET sur 'url' par petits morceaux
+    étalés sur 'seconds' secondes, lit la réponse, puis recommence.
+    """
+    stop = threading.Event()
+    payload = f'GET {url} HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\nConnection: close\r\n\r\n'.encode()
+    step = max(len(payload) // 20, 1)
+    pause = seconds / -(-len(payload) // step)
+
+    def loop():
+        while not stop.is_set():
+            with contextlib.suppress(OSError), socket.create_connection(address, timeout=seconds + 60) as sock:
+                for offset in range(0, len(payload), step):
+                    if stop.wait(pause):
+                        return
+                    sock.sendall(payload[offset:offset + step])
+                while sock.recv(65536):
+                    pass
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def run_server_case(case, address, cookie, concurrency, budget):
+    """
+    Joue un cas contre le serveur WSGI avec 'concurrency' clients HTTP simultanés, jusqu'à épuisement des URL
+    ou du budget (secondes). Le débit est donc mesuré sous charge concurrente.
+    """
+    cache.clear()
+    profiling.buffer.clear()
+    latencies, errors, lock = [], [0], threading.Lock()
+    began = time.perf_counter()
+
+    def fetch(url):
+        with lock:
+            if time.perf_counter() - began > budget and len(latencies) >= MIN_REQUESTS:
+                return
+        start = time.perf_counter()
+        connection = http.client.HTTPConnection(*address, timeout=max(budget, 60))
+        try:
+            connection.request('GET', url, headers={'Cookie': cookie, 'Host': 'localhost'})
+            response = connection.getresponse()
+            response.read()
+        finally:
+            connection.close()
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors[0] += response.status >= 400
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(fetch, case.urls))
+    return _summary(latencies, time.perf_counter() - began, errors[0], case.url_name)
+
+
+def find_regressions(results, baseline, threshold, min_delta_ms):
+    """
+    Compare des résultats à une référence de même forme ({'results': {taille: {mode: {cas: mesures}}}}).
+    Un cas régresse si son p95 dépasse celui de la référence de plus de 'threshold' (fraction) et d'au moins
+    'min_delta_ms', ou s'il exécute plus de requêtes SQL. Retourne une liste de messages.
+    """
+    regressions = []
+    for size, modes in results['results'].items():
+        for mode, cases in modes.items():
+            for name, stats in cases.items():
+                reference = baseline.get('results', {}).get(size, {}).get(mode, {}).get(name)
+                if not reference:
+                    continue
+                label = f"{size} {mode} {name}"
+                limit = reference['p95_ms'] * (1 + threshold)
+                if stats['p95_ms'] > limit and stats['p95_ms'] - reference['p95_ms'] >= min_delta_ms:
+                    regressions.append(f"{label} : p95 {stats['p95_ms']:.1f} ms au lieu de {reference['p95_ms']:.1f} ms")
+                if None not in (stats.get('queries_max'), reference.get('queries_max')) and stats['queries_max'] > reference['queries_max']:
+                    regressions.append(f"{label} : {stats['queries_max']} requêtes SQL au lieu de {reference['queries_max']}")
+    return regressions
+
@@ -0,0 +1,407 @@
+"""
+Import en masse de patients et de rendez-vous depuis des fichiers CSV ou JSONL (éventuellement compressés en .gz).
+
+Le fichier est lu en flux, par lots de 'chunk_size' lignes : seul le lot courant est en mémoire.
+Chaque ligne est nettoyée par les champs de PatientForm / AppointmentForm (et leurs méthodes clean_<champ>),
+sans requête SQL ; les patients référencés par les rendez-vous sont retrouvés par leur clé naturelle
+(nom, date de naissance) dans un dictionnaire chargé une seule fois.
+Chaque lot est écrit par bulk_create dans sa propre transaction, puis un point de reprise (position dans le fichier
+et compteurs) est enregistré : un import interrompu reprend au premier lot non validé. Les lignes refusées sont
+écrites, avec leurs erreurs, dans un fichier de rejets au format JSONL.
+"""
+import csv
+import gzip
+import json
+import os
+from datetime import date, time
+from itertools import islice
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from patient_app.forms import PatientForm
+from patient_app.models import Patient
+from scheduler_app.agenda import invalidate_days
+from scheduler_app.booking import CONFLICT_MESSAGE, MIDNIGHT_MESSAGE, DaySchedule, ends_after_midnight, minutes
+from scheduler_app.doctors import clean_doctor_name, doctor_key
+from scheduler_app.forms import AppointmentForm
+from scheduler_app.models import DEFAULT_DURATION, Appointment, Doctor
+from scheduler_app.visits import update_patient_visits
+from stats_app.rollups import recount_days
+
+# Nombre de lignes lues, validées et écrites par transaction
+CHUNK_SIZE = 5000
+# Formats reconnus, déduits de l'extension du fichier si besoin
+FORMATS = ('csv', 'jsonl')
+# Valeur du dictionnaire des clés naturelles lorsque plusieurs patients partagent la même clé
+AMBIGUOUS = -1
+
+
+class RowRejected(Exception):
+    """
+    Ligne refusée ; 'errors' est un dictionnaire {colonne: [messages]}.
+    """
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def detect_format(path):
+    """
+    Déduit le format ('csv' ou 'jsonl') de l'extension du fichier.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Format de fichier inconnu : {path}")
+
+
+def open_source(path):
+    """
+    Ouvre le fichier source en texte ; les fichiers .gz sont décompressés à la volée.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, encoding='utf-8-sig', newline='')
+
+
+def read_chunks(stream, fmt, chunk_size=CHUNK_SIZE, offset=None, first_row=1):
+    """
+    Génère des lots (lignes, position) : 'lignes' est une liste [(numéro de ligne, dictionnaire ou erreur)],
+    'position' est la position dans le fichier juste après le lot, utilisable comme point de reprise.
+
+    Le fichier est lu ligne à ligne avec readline() (et non par itération), ce qui permet de demander la position
+    courante à la fin de chaque lot ; le lecteur CSV ne lit jamais au-delà de l'enregistrement demandé.
+    """
+    lines = iter(stream.readline, '')
+    if fmt == 'csv':
+        header = next(csv.reader(lines), None)
+        if offset is not None:
+            stream.seek(offset)
+        records = csv.DictReader(lines, fieldnames=header) if header else iter(())
+    else:
+        if offset is not None:
+            stream.seek(offset)
+        records = (_parse_json_line(line) for line in lines if line.strip())
+    number = first_row
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield list(enumerate(chunk, start=number)), stream.tell()
+        number += len(chunk)
+
+
+def _parse_json_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError as exc:
+        return RowRejected({'__all__': [f"JSON invalide : {exc}"]})
+    if not isinstance(record, dict):
+        return RowRejected({'__all__': ["Chaque ligne doit être un objet JSON."]})
+    return record
+
+
+class RowCleaner:
+    """
+    Nettoie une ligne avec les champs d'un formulaire, comme le ferait form.is_valid() champ par champ
+    (field.clean() puis la méthode clean_<champ> du formulaire), sans les validations qui interrogent la base.
+
+    Args:
+        form_class: Le formulaire dont les champs sont utilisés.
+        columns: Dictionnaire {colonne du fichier: champ du formulaire}.
+    """
+    # Conversion rapide des dates et heures ISO, avant le champ (dont l'analyse passe par les formats localisés)
+    ISO_PARSERS = {forms.DateField: date.fromisoformat, forms.TimeField: time.fromisoformat}
+
+    def __init__(self, form_class, columns):
+        self.form = form_class()
+        self.columns = {
+            column: (name, field, self.ISO_PARSERS.get(type(field)))
+            for column, name in columns.items()
+            for field in [self.form.fields[name]]
+        }
+
+    def clean(self, row):
+        form = self.form
+        form.cleaned_data = {}
+        errors = {}
+        for column, (name, field, parse_iso) in self.columns.items():
+            value = row.get(column)
+            if value is not None:
+                value = str(value)
+                if parse_iso is not None:
+                    try:
+                        value = parse_iso(value)
+                    except ValueError:
+                        pass  # Format non ISO : laissé au champ du formulaire
+            try:
+                form.cleaned_data[name] = field.clean(value)
+                if hasattr(form, f'clean_{name}'):
+                    form.cleaned_data[name] = getattr(form, f'clean_{name}')()
+            except ValidationError as exc:
+                errors[column] = exc.messages
+        if errors:
+            raise RowRejected(errors)
+        return form.cleaned_data
+
+
+def patient_key(name, date_of_birth):
+    """
+    Clé naturelle d'un patient : nom (espaces et casse ignorés) et date de naissance.
+    """
+    return ' '.join(name.split()).casefold(), date_of_birth
+
+
+def load_patient_keys():
+    """
+    Retourne le dictionnaire {clé naturelle: identifiant} de tous les patients, lu en flux.
+    Les clés partagées par plusieurs patients sont marquées AMBIGUOUS.
+    """
+    keys = {}
+    rows = Patient.objects.order_by().values_list('name', 'date_of_birth', 'pk')
+    for name, date_of_birth, pk in rows.iterator(chunk_size=10_000):
+        key = patient_key(name, date_of_birth)
+        keys[key] = AMBIGUOUS if key in keys else pk
+    return keys
+
+
+class PatientImporter:
+    """
+    Import des patients. Colonnes : name, date_of_birth, contact_info, basic_medical_history.
+    'verified_by_admin' n'est pas importé (il reste réservé à l'administrateur).
+    Un patient déjà présent (même clé naturelle) est ignoré, ce qui rend l'import rejouable.
+    """
+    def __init__(self):
+        self.cleaner = RowCleaner(PatientForm, {name: name for name in PatientForm.Meta.fields})
+        self.keys = load_patient_keys()
+
+    def import_chunk(self, rows):
+        """
+        Valide et écrit un lot. Retourne (créés, ignorés, rejets) où rejets est une liste [(numéro, ligne, erreurs)].
+        """
+        patients, pending, rejects, skipped = [], {}, [], 0
+        for number, row in rows:
+            try:
+                if isinstance(row, RowRejected):
+                    raise row
+                data = self.cleaner.clean(row)
+            except RowRejected as exc:
+                rejects.append((number, row, exc.errors))
+                continue
+            key = patient_key(data['name'], data['date_of_birth'])
+            if key in self.keys or key in pending:
+                skipped += 1
+                continue
+            pending[key] = len(patients)
+            patients.append(Patient(**data))
+
+        with transaction.atomic():
+            Patient.objects.bulk_create(patients)
+        # Les nouvelles clés ne sont retenues qu'une fois le lot validé
+        self.keys.update((key, patients[index].pk) for key, index in pending.items())
+        return len(patients), skipped, rejects
+
+
+class AppointmentImporter:
+    """
+    Import des rendez-vous. Colonnes : patient_name, patient_date_of_birth, doctor, date, time, duration.
+
+    Le patient est retrouvé par sa clé naturelle ; un médecin inconnu est créé. Les chevauchements avec les rendez-vous
+    existants ou avec ceux du même lot sont refusés ; un rendez-vous déjà présent à l'identique (même patient, médecin
+    et début) est ignoré, ce qui rend l'import rejouable.
+    """
+    def __init__(self):
+        self.cleaner = RowCleaner(AppointmentForm, {'date': 'date', 'time': 'time', 'duration': 'duration'})
+        self.patient_cleaner = RowCleaner(PatientForm, {'patient_name': 'name', 'patient_date_of_birth': 'date_of_birth'})
+        self.doctor_field = Doctor._meta.get_field('name').formfield()
+        self.keys = load_patient_keys()
+        self.doctors = {doctor_key(name): pk for name, pk in Doctor.objects.values_list('name', 'pk')}
+
+    def _clean(self, row):
+        if isinstance(row, RowRejected):
+            raise row
+        errors = {}
+        data = patient = None
+        try:
+            data = self.cleaner.clean(row)
+            if ends_after_midnight(data['time'], data['duration']):
+                params = {'duration': data['duration'], 'time': data['time'].strftime('%H:%M')}
+                errors['__all__'] = [MIDNIGHT_MESSAGE % params]
+        except RowRejected as exc:
+            errors.update(exc.errors)
+        try:
+            reference = self.patient_cleaner.clean(row)
+            patient = self.keys.get(patient_key(reference['name'], reference['date_of_birth']))
+            if patient is None:
+                errors['patient_name'] = ["Patient inconnu."]
+            elif patient == AMBIGUOUS:
+                errors['patient_name'] = ["Plusieurs patients ont ce nom et cette date de naissance."]
+        except RowRejected as exc:
+            errors.update(exc.errors)
+        try:
+            doctor = clean_doctor_name(self.doctor_field.clean(row.get('doctor')))
+        except ValidationError as exc:
+            errors['doctor'] = exc.messages
+        if errors:
+            raise RowRejected(errors)
+        return {**data, 'patient_id': patient, 'doctor': doctor}
+
+    def import_chunk(self, rows):
+        """
+        Valide et écrit un lot. Retourne (créés, ignorés, rejets) où rejets est une liste [(numéro, ligne, erreurs)].
+        """
+        valid, rejects = [], []
+        for number, row in rows:
+            try:
+                valid.append((number, row, self._clean(row)))
+            except RowRejected as exc:
+                rejects.append((number, row, exc.errors))
+
+        with transaction.atomic():
+            new_doctors = self._create_doctors(data['doctor'] for _, _, data in valid)
+            doctors = {**self.doctors, **new_doctors}
+            for _, _, data in valid:
+                data['doctor_id'] = doctors[doctor_key(data.pop('doctor'))]
+            schedules, existing = self._load_schedules(valid)
+
+            appointments, skipped = [], 0
+            for number, row, data in valid:
+                start, pair = minutes(data['time']), (data['doctor_id'], data['date'])
+                if existing.get((*pair, data['time'])) == data['patient_id']:
+                    skipped += 1
+                    continue
+                end = start + (data['duration'] or DEFAULT_DURATION)
+                if schedules[pair].conflicts(start, end):
+                    params = {'doctor': row.get('doctor'), 'date': data['date'], 'time': data['time'].strftime('%H:%M')}
+                    rejects.append((number, row, {'__all__': [CONFLICT_MESSAGE % params]}))
+                    continue
+                schedules[pair].add(start, end)
+                appointments.append(Appointment(**data))
+            Appointment.objects.bulk_create(appointments)
+            # bulk_create() n'émet pas post_save : on recalcule nous-mêmes les visites des patients,
+            # on invalide l'agenda des jours touchés et on recompte leurs statistiques du tableau de bord
+            # (sans passer par appointments_batch_changed : comme pour les patients, l'import n'est pas audité)
+            update_patient_visits(appointment.patient_id for appointment in appointments)
+            buckets = {(appointment.date, appointment.doctor_id) for appointment in appointments}
+            invalidate_days(buckets)
+            recount_days(buckets)
+        self.doctors.update(new_doctors)
+        rejects.sort(key=lambda reject: reject[0])
+        return len(appointments), skipped, rejects
+
+    def _create_doctors(self, names):
+        """
+        Crée les médecins inconnus du lot et retourne {clé de regroupement: identifiant} pour ceux-ci.
+        """
+        missing = {}
+        for name in names:
+            key = doctor_key(name)
+            if key not in self.doctors:
+                missing.setdefault(key, name)
+        if not missing:
+            return {}
+        Doctor.objects.bulk_create([Doctor(name=name) for name in missing.values()], ignore_conflicts=True)
+        # Relecture : un nom identique à un médecin existant n'a pas été recréé (ignore_conflicts)
+        created = dict(Doctor.objects.filter(name__in=missing.values()).values_list('name', 'pk'))
+        return {key: created[name] for key, name in missing.items()}
+
+    def _load_schedules(self, valid):
+        """
+        Charge en une requête les rendez-vous existants des (médecin, jour) du lot.
+        Retourne ({(médecin, jour): DaySchedule}, {(médecin, jour, heure): patient}).
+        """
+        pairs = {(data['doctor_id'], data['date']) for _, _, data in valid}
+        intervals = {pair: [] for pair in pairs}
+        existing = {}
+        if pairs:
+            rows = Appointment.objects.filter(
+                doctor_id__in={doctor_id for doctor_id, _ in pairs},
+                date__gte=min(day for _, day in pairs),
+                date__lte=max(day for _, day in pairs),
+            ).values_list('doctor_id', 'date', 'time', 'duration', 'patient_id', 'pk')
+            for doctor_id, day, start_time, duration, patient_id, pk in rows.iterator(chunk_size=CHUNK_SIZE):
+                if (doctor_id, day) in intervals:
+                    start = minutes(start_time)
+                    intervals[(doctor_id, day)].append((start, start + (duration or DEFAULT_DURATION), pk))
+                    existing[(doctor_id, day, start_time)] = patient_id
+        return {pair: DaySchedule(rows) for pair, rows in intervals.items()}, existing
+
+
+IMPORTERS = {
+    'patients': PatientImporter,
+    'appointments': AppointmentImporter,
+}
+
+
+class Checkpoint:
+    """
+    Point de reprise d'un import, enregistré dans un fichier JSON après chaque lot validé.
+    L'écriture passe par un fichier temporaire renommé, pour ne jamais laisser de point de reprise tronqué.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as stream:
+                return json.load(stream)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            json.dump(state, stream)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, self.path)
+
+
+def import_file(path, kind, fmt=None, chunk_size=CHUNK_SIZE, checkpoint_path=None, rejects_path=None, restart=False, progress=None):
+    """
+    Importe le fichier 'path' ('kind' : 'patients' ou 'appointments') et retourne l'état final :
+    {'rows', 'imported', 'skipped', 'rejected', 'offset', 'done', ...}.
+
+    Si un point de reprise existe pour ce fichier (et sauf 'restart'), l'import reprend après le dernier lot validé.
+    'progress', s'il est donné, est appelé avec l'état après chaque lot.
+    """
+    fmt = fmt or detect_format(path)
+    checkpoint = Checkpoint(checkpoint_path or f'{path}.checkpoint.json')
+    rejects_path = rejects_path or f'{path}.rejects.jsonl'
+    source = os.path.abspath(path)
+
+    state = None if restart else checkpoint.load()
+    if state is not None and (state.get('source') != source or state.get('kind') != kind):
+        raise ValueError(f"Le point de reprise {checkpoint.path} concerne un autre import ({state.get('kind')} depuis {state.get('source')}).")
+    resuming = state is not None
+    if state is None:
+        state = {'source': source, 'kind': kind, 'format': fmt, 'offset': None, 'rows': 0, 'imported': 0, 'skipped': 0, 'rejected': 0, 'done': False}
+    if state['done']:
+        return state
+
+    importer = IMPORTERS[kind]()
+    with open_source(path) as stream, open(rejects_path, 'a' if resuming else 'w', encoding='utf-8') as rejects:
+        for rows, offset in read_chunks(stream, fmt, chunk_size, offset=state['offset'], first_row=state['rows'] + 1):
+            created, skipped, rejected = importer.import_chunk(rows)
+            for number, row, errors in rejected:
+                data = None if isinstance(row, RowRejected) else row
+                rejects.write(json.dumps({'row': number, 'data': data, 'errors': errors}, ensure_ascii=False, default=str) + '\n')
+            rejects.flush()
+            state.update(
+                offset=offset,
+                rows=state['rows'] + len(rows),
+                imported=state['imported'] + created,
+                skipped=state['skipped'] + skipped,
+                rejected=state['rejected'] + len(rejected),
+            )
+            checkpoint.save(state)
+            if progress is not None:
+                progress(state)
+    state['done'] = True
+    checkpoint.save(state)
+    return state
@@ -0,0 +1,137 @@
+"""
+Génération de données synthétiques pour les tests de charge (commande generate_load_data).
+
+Les lignes sont produites par lots, dans des processus séparés. Chaque processus construit une fois ses vocabulaires
+(prénoms, noms, téléphones, phrases) avec une instance de Faker initialisée avec la graine de base : ils sont identiques
+dans tous les processus. Chaque lot tire ensuite ses valeurs dans ces vocabulaires avec un générateur aléatoire
+initialisé avec (graine, numéro du lot) : le résultat est le même quels que soient le nombre de processus et l'ordre
+dans lequel les lots se terminent, et une ligne coûte quelques microsecondes au lieu de plusieurs centaines avec Faker.
+
+Ce module n'importe aucun modèle : les processus de travail peuvent le charger sans configurer Django.
+"""
+import random
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from math import gcd
+from types import SimpleNamespace
+
+from patient_app.search import build_search_text
+
+# Taille des vocabulaires générés par Faker dans chaque processus
+VOCABULARY_SIZE = 2000
+# Les dates de naissance sont tirées dans cet intervalle (fixe, pour que la génération soit reproductible)
+BIRTH_DATES = (date(1935, 1, 1), date(2024, 12, 31))
+# Créneaux proposés chaque jour : de 8h00 à 18h00, toutes les 30 minutes
+OPENING = datetime(2000, 1, 1, 8, 0)
+SLOTS_PER_DAY = 20
+SLOT_MINUTES = 30
+
+_vocabulary = None
+
+
+def init_worker(seed, locale='en_US'):
+    """
+    Initialise un processus de travail : construit les vocabulaires avec Faker, à partir de la graine de base.
+    """
+    global _vocabulary
+    from faker import Faker  # Importé ici : Faker n'est nécessaire que pour générer des données
+
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    _vocabulary = SimpleNamespace(
+        first_names=[fake.first_name() for _ in range(VOCABULARY_SIZE)],
+        last_names=[fake.last_name() for _ in range(VOCABULARY_SIZE)],
+        phone_numbers=[fake.phone_number() for _ in range(VOCABULARY_SIZE)],
+        sentences=[fake.sentence(nb_words=8) for _ in range(VOCABULARY_SIZE)],
+    )
+
+
+def _rng(seed, batch):
+    # Générateur propre à un lot : la graine combine la graine de base et le numéro du lot
+    return random.Random(f'{seed}:{batch}')
+
+
+def patient_batch(seed, batch, count):
+    """
+    Génère 'count' patients : tuples (name, date_of_birth, contact_info, basic_medical_history, verified_by_admin, search_text).
+    """
+    words, rng = _vocabulary, _rng(seed, batch)
+    first, span = BIRTH_DATES[0], (BIRTH_DATES[1] - BIRTH_DATES[0]).days
+    rows = []
+    for _ in range(count):
+        patient = SimpleNamespace(
+            name=f'{rng.choice(words.first_names)} {rng.choice(words.last_names)}',
+            contact_info=rng.choice(words.phone_numbers),
+            basic_medical_history=' '.join(rng.choices(words.sentences, k=rng.randint(1, 3))),
+        )
+        date_of_birth = (first + timedelta(days=rng.randrange(span))).isoformat()
+        rows.append((
+            patient.name, date_of_birth, patient.contact_info, patient.basic_medical_history,
+            rng.random() < 0.5, build_search_text(patient),
+        ))
+    return rows
+
+
+class SlotPlan:
+    """
+    Répartition des rendez-vous sur les créneaux (médecin, jour, heure), sans collision.
+
+    Le k-ième rendez-vous occupe le créneau (k * stride + offset) mod capacité ; 'stride' étant premier avec la capacité,
+    deux rendez-vous ne tombent jamais sur le même créneau tant que leur nombre ne dépasse pas la capacité,
+    et les rendez-vous consécutifs sont dispersés sur tous les médecins et tous les jours.
+    """
+    def __init__(self, doctor_ids, start, days, seed):
+        self.doctor_ids = doctor_ids
+        self.start = start
+        self.days = days
+        self.capacity = len(doctor_ids) * days * SLOTS_PER_DAY
+        self.offset = random.Random(seed).randrange(self.capacity) if self.capacity else 0
+        stride = int(self.capacity * 0.6180339887) | 1
+        while self.capacity and gcd(stride, self.capacity) != 1:
+            stride += 2
+        self.stride = stride
+
+    def slot(self, index):
+        """
+        Retourne (identifiant du médecin, date ISO, heure ISO) du créneau du rendez-vous numéro 'index'.
+        """
+        slot = (index * self.stride + self.offset) % self.capacity
+        doctor, rest = divmod(slot, self.days * SLOTS_PER_DAY)
+        day, slot_of_day = divmod(rest, SLOTS_PER_DAY)
+        start = OPENING + timedelta(minutes=slot_of_day * SLOT_MINUTES)
+        return self.doctor_ids[doctor], (self.start + timedelta(days=day)).isoformat(), start.time().isoformat()
+
+
+class PatientSampler:
+    """
+    Tire des identifiants de patients uniformément dans des intervalles de clés primaires [(premier, dernier)],
+    sans charger les patients.
+    """
+    def __init__(self, ranges):
+        self.ranges = ranges
+        self.ends = []
+        total = 0
+        for low, high in ranges:
+            total += high - low + 1
+            self.ends.append(total)
+        self.total = total
+
+    def sample(self, rng):
+        position = rng.randrange(self.total)
+        index = bisect_right(self.ends, position)
+        low, _ = self.ranges[index]
+        return low + position - (self.ends[index - 1] if index else 0)
+
+
+def appointment_batch(seed, batch, first_index, count, plan, sampler):
+    """
+    Génère les rendez-vous numéro 'first_index' à 'first_index + count - 1' :
+    tuples (patient_id, doctor_id, date, time, duration, internal_admin_notes).
+    """
+    words, rng = _vocabulary, _rng(seed, f'appointments:{batch}')
+    rows = []
+    for index in range(first_index, first_index + count):
+        doctor_id, day, start = plan.slot(index)
+        notes = rng.choice(words.sentences) if rng.random() < 0.1 else None
+        rows.append((sampler.sample(rng), doctor_id, day, start, rng.choice((15, 20, 30)), notes))
+    return rows
@@ -0,0 +1,295 @@
+"""
+Profilage des requêtes : un middleware mesure, pour une fraction des requêtes (échantillonnage), le temps total,
+le nombre et la durée des requêtes SQL (via connection.execute_wrapper), le temps de rendu des templates
+et le pic d'allocation mémoire, puis range la mesure dans un tampon circulaire borné.
+La vue /debug/perf/ en présente les percentiles p50 / p95 / p99 par nom d'URL.
+
+Une requête SQL répétée à l'identique (même texte, paramètres différents ou non) au moins PERF_NPLUSONE_THRESHOLD fois
+au cours d'une même requête HTTP est signalée comme un probable problème "N+1" (une requête par ligne affichée).
+
+Réglages (settings.py) :
+    PERF_SAMPLE_RATE: fraction des requêtes mesurées (0 désactive le profilage, 1 mesure tout).
+    PERF_BUFFER_SIZE: nombre de mesures conservées (les plus anciennes sont oubliées).
+    PERF_NPLUSONE_THRESHOLD: nombre de répétitions d'une même requête SQL à partir duquel elle est signalée.
+    PERF_TRACE_MEMORY: mesure du pic d'allocation avec tracemalloc (qui ralentit nettement les allocations).
+
+Les requêtes non échantillonnées ne coûtent qu'un tirage aléatoire. Les mesures sont propres au processus.
+Le middleware est aussi asynchrone : sous ASGI, il n'impose pas de passage par un fil d'exécution aux vues async.
+"""
+import contextlib
+import logging
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+from .benchmarking import percentile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_BUFFER_SIZE = 2000
+DEFAULT_NPLUSONE_THRESHOLD = 5
+# Nombre de caractères de SQL conservés pour un motif N+1 signalé
+SQL_PREVIEW_LENGTH = 200
+
+# Mesure en cours dans ce fil d'exécution (ou cette tâche asynchrone), None si la requête n'est pas échantillonnée
+_current = ContextVar('perf_current', default=None)
+
+
+@dataclass
+class RequestProfile:
+    """
+    Mesures d'une requête HTTP. Les durées sont en millisecondes, la mémoire en kilo-octets.
+    """
+    url_name: str
+    method: str
+    path: str
+    status: int = 0
+    wall_ms: float = 0.0
+    query_count: int = 0
+    query_ms: float = 0.0
+    template_ms: float = 0.0
+    peak_kb: float | None = None
+    n_plus_one: list = field(default_factory=list)
+    timestamp: float = field(default_factory=time.time)
+    # Nombre d'exécutions de chaque texte SQL, et profondeur de rendu de templates en cours
+    _statements: Counter = field(default_factory=Counter, repr=False)
+    _template_depth: int = field(default=0, repr=False)
+
+    def __call__(self, execute, sql, params, many, context):
+        # Enveloppe d'exécution SQL (connection.execute_wrapper)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_ms += (time.perf_counter() - start) * 1000
+            self.query_count += 1
+            self._statements[sql] += 1
+
+    def finish(self, threshold):
+        """
+        Termine la mesure : repère les requêtes SQL répétées au moins 'threshold' fois.
+        """
+        self.n_plus_one = [
+            (sql[:SQL_PREVIEW_LENGTH], count) for sql, count in self._statements.most_common() if count >= threshold
+        ]
+        self._statements = Counter()
+
+
+class ProfileBuffer:
+    """
+    Tampon circulaire borné des dernières mesures, partagé par les fils d'exécution du processus.
+    """
+    def __init__(self, size=DEFAULT_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._profiles = deque(maxlen=size)
+
+    def resize(self, size):
+        with self._lock:
+            if self._profiles.maxlen != size:
+                self._profiles = deque(self._profiles, maxlen=size)
+
+    def append(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._profiles)
+
+    def __len__(self):
+        return len(self._profiles)
+
+
+buffer = ProfileBuffer()
+
+
+def summarize_profiles(profiles):
+    """
+    Regroupe les mesures par nom d'URL : nombre, percentiles du temps total, requêtes SQL, rendu, mémoire et N+1.
+    Retourne une liste de dictionnaires triée par p95 décroissant.
+    """
+    groups = {}
+    for profile in profiles:
+        groups.setdefault(profile.url_name, []).append(profile)
+    rows = []
+    for url_name, group in groups.items():
+        walls = [p.wall_ms for p in group]
+        peaks = [p.peak_kb for p in group if p.peak_kb is not None]
+        rows.append({
+            'url_name': url_name,
+            'count': len(group),
+            'p50_ms': round(percentile(walls, 50), 2),
+            'p95_ms': round(percentile(walls, 95), 2),
+            'p99_ms': round(percentile(walls, 99), 2),
+            'queries_mean': round(statistics.fmean(p.query_count for p in group), 1),
+            'queries_max': max(p.query_count for p in group),
+            'query_ms_p95': round(percentile([p.query_ms for p in group], 95), 2),
+            'template_ms_p95': round(percentile([p.template_ms for p in group], 95), 2),
+            'peak_kb_max': round(max(peaks), 1) if peaks else None,
+            'n_plus_one': sum(1 for p in group if p.n_plus_one),
+        })
+    rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return rows
+
+
+def _timed_render(render):
+    """
+    Enveloppe Template.render : mesure le rendu des templates de premier niveau (les {% include %} imbriqués
+    sont comptés dans le template qui les inclut). Sans mesure en cours, le coût se limite à la lecture d'une ContextVar.
+    """
+    def wrapper(self, context):
+        profile = _current.get()
+        if profile is None or profile._template_depth:
+            return render(self, context)
+        profile._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile._template_depth -= 1
+            profile.template_ms += (time.perf_counter() - start) * 1000
+
+    wrapper.perf_original = render
+    return wrapper
+
+
+def install_template_timer():
+    """
+    Installe (une seule fois) la mesure du rendu des templates.
+    """
+    if not hasattr(Template.render, 'perf_original'):
+        Template.render = _timed_render(Template.render)
+
+
+class _MemoryTracer:
+    """
+    Mesure du pic d'allocation avec tracemalloc. tracemalloc étant global au processus, une seule requête
+    à la fois est tracée ; les requêtes concurrentes ne mesurent pas la mémoire (pic None).
+    """
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.active = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing() and self._lock.acquire(blocking=False):
+            tracemalloc.start()
+            self.active = True
+        return self
+
+    def peak_kb(self):
+        return tracemalloc.get_traced_memory()[1] / 1024 if self.active else None
+
+    def __exit__(self, *exc_info):
+        if self.active:
+            tracemalloc.stop()
+            self._lock.release()
+            self.active = False
+
+
+def _attach(profile):
+    # Les connexions sont propres au fil d'exécution : l'enveloppe est posée sur celles du fil qui exécute le SQL
+    for connection in connections.all():
+        connection.execute_wrappers.append(profile)
+
+
+def _detach(profile):
+    for connection in connections.all():
+        if profile in connection.execute_wrappers:
+            connection.execute_wrappers.remove(profile)
+
+
+class ProfilingMiddleware:
+    """
+    Middleware de profilage (voir le docstring du module). À placer en tête de MIDDLEWARE pour que le temps total
+    couvre aussi les autres middlewares (session, authentification, ...).
+    Pour une réponse en streaming, seul le temps jusqu'à l'envoi des en-têtes est mesuré.
+
+    En mode asynchrone, l'ORM exécute le SQL d'une requête dans un fil d'exécution dédié à cette requête
+    (sync_to_async, thread_sensitive) : l'enveloppe SQL y est posée et retirée. Le pic mémoire (tracemalloc, global
+    au processus) inclut alors les allocations des requêtes traitées en même temps par la boucle d'événements.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        self.threshold = getattr(settings, 'PERF_NPLUSONE_THRESHOLD', DEFAULT_NPLUSONE_THRESHOLD)
+        self.trace_memory = getattr(settings, 'PERF_TRACE_MEMORY', True)
+        buffer.resize(getattr(settings, 'PERF_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+        install_template_timer()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        profile = RequestProfile(url_name='', method=request.method, path=request.path)
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                memory = stack.enter_context(_MemoryTracer()) if self.trace_memory else None
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+                profile.peak_kb = memory.peak_kb() if memory else None
+        finally:
+            _current.reset(token)
+        self._record(profile, request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        profile = RequestProfile(url_name='', method=request.method, path=request.path)
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                memory = stack.enter_context(_MemoryTracer()) if self.trace_memory else None
+                await sync_to_async(_attach)(profile)
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    await sync_to_async(_detach)(profile)
+                profile.peak_kb = memory.peak_kb() if memory else None
+        finally:
+            _current.reset(token)
+        self._record(profile, request, response, start)
+        return response
+
+    def _record(self, profile, request, response, start):
+        profile.wall_ms = (time.perf_counter() - start) * 1000
+        match = getattr(request, 'resolver_match', None)
+        profile.url_name = (match.view_name if match else None) or '<unresolved>'
+        profile.status = response.status_code
+        profile.finish(self.threshold)
+        if profile.n_plus_one:
+            sql, count = profile.n_plus_one[0]
+            logger.warning("N+1 probable sur %s (%s) : %d exécutions de %s", profile.url_name, profile.path, count, sql)
+        buffer.append(profile)
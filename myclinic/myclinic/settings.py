@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,22 +40,56 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
      # Les applications crées pour ce projet ce projet
+    'myclinic.apps.MyclinicConfig',  # Configuration du projet (réglages des connexions SQLite, voir myclinic/database.py)
     'patient_app',                # Application pour la gestion des patients
     'scheduler_app',              # Application pour la gestion des rendez-vous
+    'audit_app',                  # Journal d'audit des modifications des patients et des rendez-vous
+    'jobs_app',                   # File de tâches de fond (rappels de rendez-vous, ...), exécutées par run_workers
+    'stats_app',                  # Statistiques précalculées du tableau de bord de la page d'accueil
 ]
 
 MIDDLEWARE = [
+    # Profilage des requêtes (voir myclinic/profiling.py et /debug/perf/) : en tête, pour mesurer toute la chaîne
+    'myclinic.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Attribution des modifications à l'utilisateur connecté, pour le journal d'audit (voir audit_app/recorder.py)
+    'audit_app.recorder.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'myclinic.urls'
 
+# Profilage : fraction des requêtes mesurées (toutes en développement, 5 % en production),
+# taille du tampon de mesures et seuil de signalement des requêtes SQL répétées (N+1).
+# Le pic mémoire (tracemalloc) rend une requête mesurée environ 4 fois plus lente : en développement seulement.
+PERF_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+PERF_BUFFER_SIZE = 2000
+PERF_NPLUSONE_THRESHOLD = 5
+PERF_TRACE_MEMORY = DEBUG
+
+# Archivage : les rendez-vous de plus de deux ans sont déplacés dans la table d'archive par la commande
+# archive_appointments (voir scheduler_app/archiving.py)
+APPOINTMENT_ARCHIVE_DAYS = int(os.environ.get('CLINIC_APPOINTMENT_ARCHIVE_DAYS', 730))
+
+# Journal d'audit : nombre d'événements en tampon au-delà duquel ils sont écrits sans attendre la fin de la requête
+AUDIT_BUFFER_SIZE = 500
+
+# Tâches de fond (voir jobs_app/queue.py) : délai (secondes) au-delà duquel une tâche réclamée par un processus de travail
+# arrêté brutalement est reprise par un autre
+JOBS_LOCK_TIMEOUT = 600
+
+# Courriels (rappels de rendez-vous) : affichés dans la console en développement, envoyés par SMTP sinon
+EMAIL_BACKEND = os.environ.get(
+    'CLINIC_EMAIL_BACKEND',
+    'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend',
+)
+DEFAULT_FROM_EMAIL = os.environ.get('CLINIC_FROM_EMAIL', 'clinic@localhost')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -77,14 +112,76 @@ WSGI_APPLICATION = 'myclinic.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Réglages de production de SQLite (voir myclinic/database.py) :
+# - WAL et PRAGMA appliqués à chaque connexion (SQLITE_PRAGMAS), transactions en BEGIN IMMEDIATE ;
+# - connexions persistantes (CLINIC_DB_CONN_MAX_AGE, en secondes) : réutilisées d'une requête à l'autre par un même fil,
+#   vérifiées avant réutilisation. Désactivées par défaut : sous ASGI, chaque requête s'exécute dans un nouveau fil et
+#   ses connexions ne seraient jamais réutilisées ni fermées. Le point d'entrée WSGI (myclinic/wsgi.py), dont les fils
+#   servent une requête après l'autre, les garde 600 secondes ;
+# - réplique en lecture optionnelle : CLINIC_DB_READ_REPLICA=<fichier> (éventuellement le fichier principal)
+#   est ouvert en lecture seule pour les listes et les fiches.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('CLINIC_DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+if os.environ.get('CLINIC_DB_READ_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': f"file:{os.environ['CLINIC_DB_READ_REPLICA']}?mode=ro",
+        'OPTIONS': {},
+        # Pendant les tests, la réplique désigne la base de test principale
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['myclinic.database.ReadReplicaRouter']
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,  # 256 Mio
+    'cache_size': -64 * 1024,  # En Kio lorsque la valeur est négative : 64 Mio
+    'busy_timeout': 5000,  # Millisecondes
+    'temp_store': 'memory',
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Cache des vues de lecture et de l'agenda (voir myclinic/caching.py) : en mémoire locale, propre à chaque processus, par défaut.
+# Les versions qui invalident ce cache sont alors, elles aussi, propres à chaque processus : une écriture faite par un autre
+# processus (autre processus serveur, commandes import_clinic_data, archive_appointments, generate_load_data, travaux
+# de run_workers) n'invalide pas les pages déjà en cache ici, qui restent servies jusqu'à PAGE_CACHE_TIMEOUT (une heure).
+# Le cache local ne convient donc qu'à un seul processus serveur dans lequel se font toutes les écritures (développement).
+# Dès que plusieurs processus écrivent, un cache partagé est nécessaire ; il se branche sans modifier le code, par exemple :
+#   CLINIC_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CLINIC_CACHE_LOCATION=redis://127.0.0.1:6379
+
+if os.environ.get('CLINIC_CACHE_BACKEND'):
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ['CLINIC_CACHE_BACKEND'],
+            'LOCATION': os.environ.get('CLINIC_CACHE_LOCATION', ''),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'myclinic',
+            # Au-delà, un tiers des entrées est évincé ; une version évincée est simplement recréée
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -121,6 +218,12 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Feuilles de style communes (static/css/style.css), à côté des templates communes (templates/)
+STATICFILES_DIRS = [BASE_DIR / 'static']
+# Dossier rempli par collectstatic, servi en production par myclinic.staticfiles.StaticFilesMiddleware
+# (voir myclinic/settings_production.py)
+STATIC_ROOT = os.environ.get('CLINIC_STATIC_ROOT', BASE_DIR / 'staticfiles')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
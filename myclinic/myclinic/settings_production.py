@@ -0,0 +1,62 @@
+"""
+Réglages de production : DJANGO_SETTINGS_MODULE=myclinic.settings_production.
+
+Reprend myclinic/settings.py, avec :
+- DEBUG désactivé ; clé secrète et noms d'hôte lus dans l'environnement (CLINIC_SECRET_KEY, CLINIC_ALLOWED_HOSTS) ;
+- chargeur de templates en cache, sans rechargement automatique : chaque template n'est lue et compilée qu'une fois
+  par processus (la page de base myclinic/base.html, partagée par toutes les pages, comprise) ;
+- fichiers statiques hachés et compressés (voir myclinic/staticfiles.py), servis par l'application avec un cache d'un an.
+  Ils doivent être collectés avant le démarrage, avec ces réglages :
+      DJANGO_SETTINGS_MODULE=myclinic.settings_production python manage.py collectstatic --noinput
+
+Le cache des pages reste celui de settings.py : en mémoire locale si CLINIC_CACHE_BACKEND n'est pas défini. Avec plusieurs
+processus serveur, ou avec run_workers et les commandes d'import et d'archivage, définissez un cache partagé
+(CLINIC_CACHE_BACKEND, CLINIC_CACHE_LOCATION) pour que leurs écritures invalident les pages en cache.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('CLINIC_SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured("La variable d'environnement CLINIC_SECRET_KEY doit être définie en production.")
+
+ALLOWED_HOSTS = os.environ.get('CLINIC_ALLOWED_HOSTS', 'localhost').split(',')
+
+# Réglages qui dépendent de DEBUG dans settings.py (profilage, courriels)
+PERF_SAMPLE_RATE = 0.05
+PERF_TRACE_MEMORY = False
+EMAIL_BACKEND = os.environ.get('CLINIC_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+
+# Chargeur en cache explicite (APP_DIRS est incompatible avec 'loaders')
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+# Fichiers statiques servis juste après SecurityMiddleware (avant la session et l'authentification)
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'myclinic.staticfiles.StaticFilesMiddleware')
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'myclinic.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+# Durée de cache (secondes) des fichiers statiques au nom non haché
+STATIC_MAX_AGE = 60
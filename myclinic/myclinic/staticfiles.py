@@ -0,0 +1,167 @@
+"""
+Fichiers statiques en production, servis par l'application elle-même (à la manière de WhiteNoise).
+
+- CompressedManifestStaticFilesStorage : collectstatic copie chaque fichier sous un nom qui contient l'empreinte de son
+  contenu (css/style.3c1f0e4b9a2d.css ; les références entre feuilles de style sont réécrites), et écrit à côté une copie
+  compressée (.gz) des fichiers texte quand elle est plus petite. {% static %} donne le nom haché (manifeste).
+- StaticFilesMiddleware : sert les fichiers de STATIC_ROOT avant les autres middlewares (ni session, ni authentification,
+  ni base de données). Un nom haché ne change jamais de contenu : il est gardé un an par les navigateurs et les proxys
+  (Cache-Control: public, max-age=31536000, immutable) ; les autres noms, STATIC_MAX_AGE secondes. La copie compressée
+  est envoyée aux clients qui l'acceptent (Accept-Encoding: gzip, Vary: Accept-Encoding).
+
+Les fichiers sont indexés et chargés en mémoire au démarrage du processus (après collectstatic) : une requête ne touche
+pas au système de fichiers. Ils sont peu nombreux et petits (feuilles de style, fichiers de l'admin).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Extensions des fichiers compressés par collectstatic (images et polices le sont déjà)
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.map', '.xml')
+# Durée de cache (secondes) d'un fichier au nom haché : son contenu ne change jamais
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Durée de cache par défaut d'un fichier au nom fixe (réglage STATIC_MAX_AGE)
+DEFAULT_MAX_AGE = 60
+
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage qui écrit aussi une copie compressée (nom + '.gz') des fichiers texte.
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Noms d'origine et noms hachés : les deux sont servis
+        for name in {*self.hashed_files, *self.hashed_files.values()}:
+            if name.endswith(COMPRESSED_EXTENSIONS) and self.exists(name):
+                self._compress(name)
+
+    def _compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        # mtime=0 : la copie compressée d'un même fichier est identique d'un collectstatic à l'autre
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            with open(f'{path}.gz', 'wb') as target:
+                target.write(compressed)
+
+
+class StaticFile(NamedTuple):
+    content: bytes
+    # Copie compressée, ou None
+    gzipped: bytes
+    content_type: str
+    etag: str
+    last_modified: float
+    max_age: int
+
+
+def index_static_files(root, prefix, immutable_names=(), max_age=DEFAULT_MAX_AGE):
+    """
+    Charge les fichiers du dossier 'root' : retourne {chemin d'URL: StaticFile}.
+    'immutable_names' contient les noms hachés (relatifs à 'root'), mis en cache un an.
+    """
+    files = {}
+    immutable_names = set(immutable_names)
+    for directory, _, names in os.walk(root):
+        for filename in names:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name.endswith('.gz') and os.path.exists(path[:-3]):
+                continue  # Copie compressée, rattachée à son original
+            with open(path, 'rb') as source:
+                content = source.read()
+            gzipped = None
+            if os.path.exists(f'{path}.gz'):
+                with open(f'{path}.gz', 'rb') as source:
+                    gzipped = source.read()
+            content_type, _ = mimetypes.guess_type(filename)
+            content_type = content_type or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+                content_type += '; charset=utf-8'
+            files[prefix + name] = StaticFile(
+                content=content,
+                gzipped=gzipped,
+                content_type=content_type,
+                etag=f'"{hashlib.md5(content).hexdigest()}"',
+                last_modified=os.path.getmtime(path),
+                max_age=IMMUTABLE_MAX_AGE if name in immutable_names else max_age,
+            )
+    return files
+
+
+class StaticFilesMiddleware:
+    """
+    Sert les fichiers collectés dans STATIC_ROOT (voir le docstring du module). À placer juste après SecurityMiddleware.
+    Sans effet si STATIC_URL désigne un autre domaine (CDN).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.files = {}
+        url = urlsplit(settings.STATIC_URL or '')
+        if not url.netloc and settings.STATIC_ROOT:
+            prefix = '/' + url.path.strip('/') + '/'
+            hashed = getattr(staticfiles_storage, 'hashed_files', {})
+            max_age = getattr(settings, 'STATIC_MAX_AGE', DEFAULT_MAX_AGE)
+            self.files = index_static_files(settings.STATIC_ROOT, prefix, hashed.values(), max_age)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _find(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return self.files.get(request.path_info)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        static = self._find(request)
+        return self.serve(request, static) if static else self.get_response(request)
+
+    async def __acall__(self, request):
+        # Le fichier est déjà en mémoire : aucune attente, pas de passage par un fil d'exécution
+        static = self._find(request)
+        return self.serve(request, static) if static else await self.get_response(request)
+
+    def serve(self, request, static):
+        """
+        Réponse d'un fichier : 304 si le client l'a déjà, sinon son contenu (compressé si le client l'accepte).
+        """
+        response = get_conditional_response(request, etag=static.etag, last_modified=int(static.last_modified))
+        if response is None:
+            content = static.content
+            response = HttpResponse(content_type=static.content_type)
+            if static.gzipped is not None and _ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')):
+                content = static.gzipped
+                response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Content-Length'] = len(content)
+            if request.method != 'HEAD':
+                response.content = content
+        response.headers['ETag'] = static.etag
+        response.headers['Last-Modified'] = http_date(static.last_modified)
+        if static.gzipped is not None:
+            response.headers['Vary'] = 'Accept-Encoding'
+        if static.max_age == IMMUTABLE_MAX_AGE:
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={static.max_age}'
+        return response
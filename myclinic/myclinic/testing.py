@@ -0,0 +1,50 @@
+"""
+Outils communs aux tests des applications : base SQLite dans un fichier temporaire, données d'un formulaire affiché.
+"""
+import tempfile
+import threading
+from pathlib import Path
+
+from django.db import connections
+
+from .benchmarking import database_file
+
+
+def in_database_file(function):
+    """
+    Exécute function() dans un nouveau fil d'exécution, sur une base SQLite dans un fichier temporaire (WAL, busy_timeout,
+    BEGIN IMMEDIATE, comme en production) : la base de test en mémoire partagée verrouille ses tables sans attendre.
+    La connexion du fil principal, qui reste ouverte sur la base de test, n'est pas utilisée.
+    """
+    outcome = []
+
+    def target():
+        try:
+            with tempfile.TemporaryDirectory() as directory, database_file(Path(directory) / 'tests.sqlite3'):
+                outcome.append(function())
+        except Exception as exc:  # Propagée dans le fil principal
+            outcome.append(exc)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if isinstance(outcome[0], Exception):
+        raise outcome[0]
+    return outcome[0]
+
+
+def form_data(form):
+    """
+    Données envoyées par le navigateur pour un formulaire affiché : valeurs des champs et champs cachés (version, valeurs initiales).
+    """
+    if form.is_bound:
+        return form.data.dict()
+    data = {}
+    for bound in form:
+        value = bound.value()
+        data[bound.html_name] = '' if value is None else str(value)
+        if bound.field.show_hidden_initial:
+            data[bound.html_initial_name] = data[bound.html_name]
+    return data
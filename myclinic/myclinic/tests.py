@@ -0,0 +1,597 @@
+import csv
+import gzip
+import json
+import os
+import random
+import runpy
+import tempfile
+import tracemalloc
+from datetime import date, time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings as django_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import AsyncClient, Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from patient_app.models import Patient
+from scheduler_app.models import Appointment, Doctor
+from stats_app import dashboard
+from . import api, caching, database, httpbench, loadgen, profiling, staticfiles
+from .exporting import export_stream
+from .importing import PatientImporter
+
+
+class ImportClinicDataTests(TestCase):
+    def setUp(self):
+        # Mise en place : un dossier temporaire pour les fichiers importés, un patient et un rendez-vous existants.
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.patient = Patient.objects.create(name="Jean Dupont", date_of_birth=date(1980, 5, 1))
+        self.doctor = Doctor.objects.create(name="Dr. House")
+        Appointment.objects.create(patient=self.patient, date=date(2099, 3, 2), time=time(10, 0), doctor=self.doctor)
+
+    def write(self, name, content):
+        # Écrit un fichier dans le dossier temporaire et retourne son chemin.
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def run_import(self, kind, path, *args):
+        # Lance la commande d'import et retourne le point de reprise et les lignes refusées.
+        call_command('import_clinic_data', kind, path, *args, stdout=StringIO())
+        with open(f'{path}.checkpoint.json', encoding='utf-8') as stream:
+            state = json.load(stream)
+        with open(f'{path}.rejects.jsonl', encoding='utf-8') as stream:
+            rejects = [json.loads(line) for line in stream]
+        return state, rejects
+
+    def test_import_patients_csv(self):
+        # Vérifie l'import de patients : lignes valides créées, ligne invalide rejetée, patient déjà présent ignoré.
+        path = self.write('patients.csv', (
+            "name,date_of_birth,contact_info,basic_medical_history\n"
+            "Hélène Dupré,1975-02-03,0600000000,\"asthme,\n allergie\"\n"
+            "Marc Petit,12/24/1990,,\n"
+            ",not-a-date,,\n"
+            "jean  DUPONT,1980-05-01,,\n"
+        ))
+        state, rejects = self.run_import('patients', path)
+        self.assertEqual((state['rows'], state['imported'], state['skipped'], state['rejected']), (4, 2, 1, 1))
+        self.assertTrue(state['done'])
+        self.assertEqual(Patient.objects.get(name="Hélène Dupré").basic_medical_history, "asthme,\n allergie")
+        self.assertTrue(Patient.objects.filter(name="Marc Petit", date_of_birth=date(1990, 12, 24)).exists())
+        self.assertEqual(rejects[0]['row'], 3)
+        self.assertEqual(set(rejects[0]['errors']), {'name', 'date_of_birth'})
+
+    def test_import_appointments_jsonl(self):
+        # Vérifie l'import de rendez-vous : patient retrouvé par sa clé naturelle, médecin créé, conflits et erreurs rejetés.
+        rows = [
+            {'patient_name': "Jean Dupont", 'patient_date_of_birth': "1980-05-01", 'doctor': "Dr. Wilson", 'date': "2099-03-02", 'time': "09:00"},
+            {'patient_name': "Jean Dupont", 'patient_date_of_birth': "1980-05-01", 'doctor': "dr wilson", 'date': "2099-03-02", 'time': "09:15"},
+            {'patient_name': "Jean Dupont", 'patient_date_of_birth': "1980-05-01", 'doctor': "Dr. House", 'date': "2099-03-02", 'time': "10:15"},
+            {'patient_name': "Inconnu", 'patient_date_of_birth': "1980-05-01", 'doctor': "Dr. House", 'date': "2099-03-02", 'time': "14:00"},
+            {'patient_name': "Jean Dupont", 'patient_date_of_birth': "1980-05-01", 'doctor': "Dr. House", 'date': "2099-03-02", 'time': "11:00", 'duration': 45},
+        ]
+        path = self.write('appointments.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n{not json}\n')
+        state, rejects = self.run_import('appointments', path)
+        self.assertEqual((state['imported'], state['rejected']), (2, 4))
+        self.assertEqual([reject['row'] for reject in rejects], [2, 3, 4, 6])
+        self.assertIn("already has an appointment", rejects[0]['errors']['__all__'][0])  # Chevauche 9h00-9h30 du même lot
+        self.assertIn('patient_name', rejects[2]['errors'])
+        self.assertEqual(Doctor.objects.filter(name__icontains="wilson").count(), 1)
+        self.assertEqual(Appointment.objects.get(time=time(11, 0)).duration, 45)
+        # Rejouer l'import ignore les rendez-vous déjà présents au lieu de les signaler en conflit
+        state, _ = self.run_import('appointments', path, '--restart')
+        self.assertEqual((state['imported'], state['skipped'], state['rejected']), (0, 2, 4))
+
+    def test_appointment_past_midnight_is_rejected(self):
+        # Vérifie qu'un rendez-vous importé qui déborderait sur le jour suivant est rejeté.
+        row = {'patient_name': "Jean Dupont", 'patient_date_of_birth': "1980-05-01", 'doctor': "Dr. House", 'date': "2099-03-02", 'time': "23:45", 'duration': 30}
+        state, rejects = self.run_import('appointments', self.write('appointments.jsonl', json.dumps(row) + '\n'))
+        self.assertEqual((state['imported'], state['rejected']), (0, 1))
+        self.assertIn("must end by midnight", rejects[0]['errors']['__all__'][0])
+
+    def test_imports_are_counted_on_dashboard(self):
+        # Vérifie que les patients et rendez-vous importés apparaissent dans les statistiques du tableau de bord.
+        patients = self.write('patients.csv', "name,date_of_birth\nHélène Dupré,1975-02-03\n")
+        self.run_import('patients', patients)
+        rows = [
+            {'patient_name': "Hélène Dupré", 'patient_date_of_birth': "1975-02-03", 'doctor': "Dr. House", 'date': "2099-03-02", 'time': "11:00"},
+            {'patient_name': "Jean Dupont", 'patient_date_of_birth': "1980-05-01", 'doctor': "Dr. Wilson", 'date': "2099-03-03", 'time': "09:00"},
+        ]
+        self.run_import('appointments', self.write('appointments.jsonl', ''.join(json.dumps(row) + '\n' for row in rows)))
+        data = dashboard.build(days=2, today=date(2099, 3, 3))
+        self.assertEqual({doctor['name']: doctor['booked'] for doctor in data['doctors']}, {"Dr. House": [2, 0], "Dr. Wilson": [0, 1]})
+        self.assertEqual((data['total'], data['patients']), (3, 2))
+
+    def test_resume_after_interruption(self):
+        # Vérifie qu'un import interrompu reprend après le dernier lot validé, sans doublon ni ligne perdue.
+        path = self.write('patients.jsonl', ''.join(
+            json.dumps({'name': f"Patient {index}", 'date_of_birth': "2000-01-01"}) + '\n' for index in range(7)
+        ))
+        original = PatientImporter.import_chunk
+        calls = []
+
+        def failing_import_chunk(importer, rows):
+            calls.append(rows)
+            if len(calls) == 3:
+                raise RuntimeError("Interruption simulée")
+            return original(importer, rows)
+
+        with mock.patch.object(PatientImporter, 'import_chunk', failing_import_chunk):
+            with self.assertRaises(RuntimeError):
+                call_command('import_clinic_data', 'patients', path, '--chunk-size', '2', stdout=StringIO())
+        self.assertEqual(Patient.objects.filter(name__startswith="Patient ").count(), 4)
+        state, _ = self.run_import('patients', path, '--chunk-size', '2')
+        self.assertEqual((state['rows'], state['imported'], state['skipped']), (7, 7, 0))
+        self.assertEqual(Patient.objects.filter(name__startswith="Patient ").count(), 7)
+
+
+class ExportClinicDataTests(TestCase):
+    def setUp(self):
+        # Mise en place : un administrateur connecté, deux patients et un rendez-vous.
+        self.client = Client()
+        self.user = User.objects.create_user(username='staff', password='staffpassword', is_staff=True)
+        self.client.login(username='staff', password='staffpassword')
+        self.patient = Patient.objects.create(name="Hélène Dupré", date_of_birth=date(1975, 2, 3), basic_medical_history="asthme,\nallergie")
+        Patient.objects.create(name="Marc Petit", date_of_birth=date(1990, 12, 24))
+        self.doctor = Doctor.objects.create(name="Dr. House")
+        Appointment.objects.create(patient=self.patient, date=date(2099, 3, 2), time=time(10, 0), doctor=self.doctor, internal_admin_notes="secret")
+
+    def test_export_view_csv(self):
+        # Vérifie l'export CSV des patients en streaming, dans l'ordre des clés primaires.
+        response = self.client.get(reverse('export_data', args=['patients']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="patients.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines(keepends=True)))
+        self.assertEqual(rows[0], ['id', 'name', 'date_of_birth', 'contact_info', 'basic_medical_history'])
+        self.assertEqual(rows[1][1:3], ["Hélène Dupré", "1975-02-03"])
+        self.assertEqual(rows[1][4], "asthme,\nallergie")
+        self.assertEqual(len(rows), 3)
+
+    def test_export_view_jsonl_gzip(self):
+        # Vérifie l'export JSONL compressé des rendez-vous, sans les champs réservés à l'administrateur.
+        response = self.client.get(reverse('export_data', args=['appointments']), {'format': 'jsonl', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()]
+        self.assertEqual(rows[0]['doctor'], "Dr. House")
+        self.assertEqual(rows[0]['patient_name'], "Hélène Dupré")
+        self.assertEqual(rows[0]['time'], "10:00:00")
+        self.assertNotIn('internal_admin_notes', rows[0])
+
+    def test_export_columns_format(self):
+        # Vérifie le format colonnes : une ligne JSON par lot, une liste de valeurs par colonne.
+        lines = b''.join(export_stream('patients', 'columns', chunk_size=1)).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])['name'], ["Marc Petit"])
+
+    def test_export_view_access(self):
+        # Vérifie que l'export est réservé aux administrateurs connectés et que les paramètres sont validés.
+        self.assertEqual(self.client.get(reverse('export_data', args=['patients']), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_data', args=['users'])).status_code, 404)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('export_data', args=['patients'])).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('export_data', args=['patients'])).status_code, 302)
+
+    def test_export_command(self):
+        # Vérifie la commande d'export vers un fichier compressé.
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'appointments.csv.gz')
+            call_command('export_clinic_data', 'appointments', '--output', path, stdout=StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8', newline='') as stream:
+                rows = list(csv.DictReader(stream))
+        self.assertEqual([(row['patient_name'], row['doctor'], row['date']) for row in rows], [("Hélène Dupré", "Dr. House", "2099-03-02")])
+
+    def test_export_memory_is_flat(self):
+        # Vérifie avec tracemalloc que la mémoire maximale de l'export ne dépend pas du nombre de lignes exportées.
+        def peak(kind, fmt, compress):
+            tracemalloc.start()
+            try:
+                for _ in export_stream(kind, fmt, compress=compress, chunk_size=500):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        Patient.objects.bulk_create(Patient(name=f"Patient {index}", date_of_birth=date(2000, 1, 1), contact_info="0600000000") for index in range(1000))
+        small = {fmt: peak('patients', fmt, fmt == 'jsonl') for fmt in ('csv', 'jsonl', 'columns')}
+        Patient.objects.bulk_create(Patient(name=f"Patient {index}", date_of_birth=date(2000, 1, 1), contact_info="0600000000") for index in range(10_000))
+        for fmt in small:
+            large = peak('patients', fmt, fmt == 'jsonl')
+            self.assertLess(large, 2 * 1024 * 1024, fmt)  # Plafond absolu : 2 Mo pour 11 000 patients
+            self.assertLess(large, small[fmt] * 2, fmt)  # 11 fois plus de lignes, pas deux fois plus de mémoire
+
+    async def test_export_view_memory_is_flat_under_asgi(self):
+        # Vérifie avec tracemalloc que, sous ASGI, la réponse d'export est asynchrone et que sa mémoire maximale ne dépend pas du nombre de lignes.
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        async def peak():
+            tracemalloc.start()
+            try:
+                response = await client.get(reverse('export_data', args=['patients']))
+                self.assertTrue(response.is_async)
+                size = 0
+                async for chunk in response:
+                    size += len(chunk)
+                return tracemalloc.get_traced_memory()[1], size
+            finally:
+                tracemalloc.stop()
+
+        await peak()  # Premier appel : chargements faits une fois par processus (modules, URL, middlewares)
+        await Patient.objects.abulk_create(Patient(name=f"Patient {index}", date_of_birth=date(2000, 1, 1), contact_info="0600000000") for index in range(5000))
+        small, small_size = await peak()
+        await Patient.objects.abulk_create(Patient(name=f"Patient {index}", date_of_birth=date(2000, 1, 1), contact_info="0600000000") for index in range(50_000))
+        large, large_size = await peak()
+        self.assertGreater(large_size - small_size, 2 * 1024 * 1024)
+        self.assertLess(large - small, 512 * 1024)  # Plus de 2 Mo d'export en plus, moins de 512 Kio de mémoire en plus
+
+
+class GenerateLoadDataTests(TestCase):
+    def test_generate_load_data(self):
+        # Vérifie la génération : nombres de lignes, médecins créés, patients existants et créneaux sans collision.
+        call_command('generate_load_data', patients=120, appointments=300, days=5, workers=1, batch_size=50, start_date=date(2099, 1, 5), stdout=StringIO())
+        self.assertEqual(Patient.objects.count(), 120)
+        self.assertEqual(Appointment.objects.count(), 300)
+        self.assertEqual(Doctor.objects.count(), 6)  # 300 rendez-vous / (5 jours x 20 créneaux x 50 %)
+        patient = Patient.objects.first()
+        self.assertTrue(patient.search_text.startswith(patient.name.lower()))
+        self.assertFalse(Appointment.objects.exclude(patient__in=Patient.objects.all()).exists())
+        self.assertEqual(Appointment.objects.filter(date__gte=date(2099, 1, 5), date__lte=date(2099, 1, 9)).count(), 300)
+        self.assertEqual(sum(Patient.objects.values_list('appointment_count', flat=True)), 300)  # Compteurs recalculés après l'insertion directe
+
+    def test_batches_are_reproducible(self):
+        # Vérifie qu'un lot dépend seulement de la graine et de son numéro, pas du processus qui le génère.
+        loadgen.init_worker(7)
+        first = loadgen.patient_batch(7, 3, 20)
+        loadgen.init_worker(7)
+        loadgen.patient_batch(7, 0, 20)
+        self.assertEqual(loadgen.patient_batch(7, 3, 20), first)
+        self.assertNotEqual(loadgen.patient_batch(7, 4, 20), first)
+
+    def test_slot_plan_and_patient_sampler(self):
+        # Vérifie que les créneaux ne se répètent pas et que les patients sont tirés dans les intervalles de clés existants.
+        plan = loadgen.SlotPlan([1, 2, 3], date(2099, 1, 5), 7, seed=1)
+        slots = [plan.slot(index) for index in range(plan.capacity)]
+        self.assertEqual(len(set(slots)), plan.capacity)
+        sampler = loadgen.PatientSampler([(1, 3), (10, 11)])
+        rng = random.Random(0)
+        self.assertEqual({sampler.sample(rng) for _ in range(200)}, {1, 2, 3, 10, 11})
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        # Mise en place : un tampon de mesures vide, un administrateur connecté et quelques rendez-vous.
+        profiling.buffer.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.client.login(username='admin', password='testpassword')
+        doctor = Doctor.objects.create(name="Dr. Smith")
+        patients = Patient.objects.bulk_create(Patient(name=f"Patient {i}", date_of_birth=date(2000, 1, 1)) for i in range(6))
+        Appointment.objects.bulk_create(
+            Appointment(patient=patient, doctor=doctor, date=date(2099, 1, 5), time=time(8 + i, 0)) for i, patient in enumerate(patients)
+        )
+
+    def test_records_request_metrics(self):
+        # Vérifie qu'une requête est mesurée : nom d'URL, statut, temps, requêtes SQL, rendu des templates et pic mémoire.
+        self.client.get(reverse('appointment_list'))
+        [profile] = profiling.buffer.snapshot()
+        self.assertEqual((profile.url_name, profile.status), ('appointment_list', 200))
+        self.assertGreater(profile.query_count, 0)
+        self.assertGreater(profile.wall_ms, profile.query_ms)
+        self.assertGreater(profile.template_ms, 0)
+        self.assertIsNotNone(profile.peak_kb)
+        self.assertEqual(profile.n_plus_one, [])  # select_related : une seule requête pour les rendez-vous
+
+    def test_flags_repeated_queries(self):
+        # Vérifie qu'une boucle qui lit le patient de chaque rendez-vous (N+1) est signalée.
+        def view(request):
+            return HttpResponse(', '.join(appointment.patient.name for appointment in Appointment.objects.all()))
+
+        with self.assertLogs('myclinic.profiling', 'WARNING'):
+            profiling.ProfilingMiddleware(view)(RequestFactory().get('/n-plus-one/'))
+        [profile] = profiling.buffer.snapshot()
+        self.assertEqual(profile.url_name, '<unresolved>')
+        [(sql, count)] = profile.n_plus_one
+        self.assertEqual(count, 6)
+        self.assertIn('patient_app_patient', sql)
+
+    async def test_records_async_requests(self):
+        # Vérifie la mesure d'une vue asynchrone servie en ASGI, requêtes SQL de l'ORM asynchrone comprises.
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('appointment_list'))
+        self.assertContains(response, '<li>', count=6)
+        [profile] = profiling.buffer.snapshot()
+        self.assertEqual((profile.url_name, profile.status), ('appointment_list', 200))
+        self.assertGreater(profile.query_count, 0)
+        self.assertGreater(profile.template_ms, 0)
+        self.user.is_staff = False
+        await self.user.asave()
+        response = await client.get(reverse('appointment_list'))
+        self.assertRedirects(response, reverse('appointment_agenda'), fetch_redirect_response=False)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_sampling(self):
+        # Vérifie qu'une requête non échantillonnée n'est pas mesurée.
+        self.client.get(reverse('appointment_list'))
+        self.assertEqual(len(profiling.buffer), 0)
+
+    @override_settings(PERF_BUFFER_SIZE=3)
+    def test_buffer_is_bounded(self):
+        # Vérifie que seules les dernières mesures sont conservées.
+        for _ in range(5):
+            self.client.get(reverse('appointment_agenda'))
+        self.assertEqual(len(profiling.buffer), 3)
+
+    def test_dashboard(self):
+        # Vérifie le tableau de bord : percentiles par nom d'URL pour les administrateurs, accès refusé aux autres.
+        for _ in range(3):
+            self.client.get(reverse('appointment_list'))
+        data = self.client.get(reverse('perf_dashboard'), {'format': 'json'}).json()
+        row = next(row for row in data['urls'] if row['url_name'] == 'appointment_list')
+        self.assertEqual(row['count'], 3)
+        self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+        self.assertLessEqual(row['p95_ms'], row['p99_ms'])
+        self.assertContains(self.client.get(reverse('perf_dashboard')), 'appointment_list')
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('perf_dashboard')).status_code, 403)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        # Mise en place : collectstatic avec le stockage haché et compressé du profil de production, dans un dossier temporaire.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(
+            STATIC_ROOT=directory.name,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'myclinic.staticfiles.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.root = directory.name
+        self.middleware = staticfiles.StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+        self.url = static('css/style.css')
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        # Vérifie que la feuille de style commune est copiée sous un nom haché, avec une copie compressée identique une fois décompressée.
+        self.assertRegex(self.url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, self.url.removeprefix('/static/'))
+        with open(path, 'rb') as original, gzip.open(f'{path}.gz') as compressed:
+            self.assertEqual(compressed.read(), original.read())
+
+    def test_middleware_serves_with_far_future_cache(self):
+        # Vérifie le service des fichiers : compression négociée, cache d'un an pour un nom haché, court sinon, 304 et chemins inconnus laissés à la vue.
+        factory = RequestFactory()
+        response = self.middleware(factory.get(self.url, headers={'accept-encoding': 'gzip, deflate'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response.headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertIn(b'.patient-list', gzip.decompress(response.content))
+        plain = self.middleware(factory.get(self.url))
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.content, gzip.decompress(response.content))
+        self.assertEqual(self.middleware(factory.get(self.url, headers={'if-none-match': plain.headers['ETag']})).status_code, 304)
+        unhashed = self.middleware(factory.get('/static/css/style.css'))
+        self.assertEqual(unhashed.headers['Cache-Control'], 'public, max-age=60')
+        head = self.middleware(factory.head(self.url))
+        self.assertEqual((head.content, head.headers['Content-Length']), (b'', str(len(plain.content))))
+        self.assertEqual(self.middleware(factory.get('/static/css/missing.css')).status_code, 404)
+        self.assertEqual(self.middleware(factory.post(self.url)).status_code, 404)
+
+
+class ProductionSettingsTests(TestCase):
+    def load(self, **environ):
+        # Exécute le module de réglages de production avec les variables d'environnement données et retourne ses réglages.
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_module('myclinic.settings_production')
+
+    def test_production_profile(self):
+        # Vérifie le profil de production : DEBUG désactivé, chargeur de templates en cache, fichiers statiques hachés servis par le middleware.
+        production = self.load(CLINIC_SECRET_KEY='secret', CLINIC_ALLOWED_HOSTS='clinic.example,www.clinic.example')
+        self.assertFalse(production['DEBUG'])
+        self.assertEqual(production['ALLOWED_HOSTS'], ['clinic.example', 'www.clinic.example'])
+        [loader] = production['TEMPLATES'][0]['OPTIONS']['loaders']
+        self.assertEqual(loader[0], 'django.template.loaders.cached.Loader')
+        middleware = production['MIDDLEWARE']
+        self.assertEqual(middleware.index('myclinic.staticfiles.StaticFilesMiddleware'), middleware.index('django.middleware.security.SecurityMiddleware') + 1)
+        self.assertEqual(production['STORAGES']['staticfiles']['BACKEND'], 'myclinic.staticfiles.CompressedManifestStaticFilesStorage')
+        self.assertNotIn('myclinic.staticfiles.StaticFilesMiddleware', django_settings.MIDDLEWARE)  # Réglages de développement inchangés
+        with self.assertRaises(ImproperlyConfigured):
+            self.load(CLINIC_SECRET_KEY='')
+
+
+class BenchHttpTests(TestCase):
+    def setUp(self):
+        # Mise en place : un administrateur connecté et quelques patients avec leurs rendez-vous.
+        profiling.buffer.clear()
+        self.user = User.objects.create_user(username='bench', password='testpassword', is_staff=True)
+        self.client.force_login(self.user)
+        doctor = Doctor.objects.create(name="Dr. Smith")
+        patients = Patient.objects.bulk_create(Patient(name=f"Patient Dupont{i}", date_of_birth=date(2000, 1, 1)) for i in range(4))
+        Appointment.objects.bulk_create(
+            Appointment(patient=patient, doctor=doctor, date=date(2099, 1, 5 + i), time=time(9, 0)) for i, patient in enumerate(patients)
+        )
+
+    def test_cases_cover_every_url(self):
+        # Vérifie qu'un cas existe pour chaque URL nommée des deux applications et que les URL sont reproductibles.
+        data = httpbench.Dataset.load()
+        cases = httpbench.build_cases(data, 5, seed=1)
+        names = {case.url_name for case in cases}
+        self.assertTrue({'patient_list', 'patient_detail', 'patient_delete', 'appointment_list', 'appointment_agenda_week', 'appointment_update'} <= names)
+        self.assertIn('patient_list[search]', [case.name for case in cases])
+        self.assertTrue(all(len(case.urls) == 5 for case in cases))
+        self.assertEqual([case.urls for case in httpbench.build_cases(data, 5, seed=1)], [case.urls for case in cases])
+
+    def test_run_client_case(self):
+        # Vérifie les mesures d'un cas : percentiles, débit, absence d'erreur et requêtes SQL par requête HTTP.
+        case = next(case for case in httpbench.build_cases(httpbench.Dataset.load(), 4, seed=1) if case.name == 'patient_detail')
+        stats = httpbench.run_client_case(case, self.client, budget=60)
+        self.assertEqual((stats['count'], stats['errors']), (4, 0))
+        self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+        self.assertGreater(stats['rps'], 0)
+        self.assertGreater(stats['queries_max'], 0)
+
+    def test_find_regressions(self):
+        # Vérifie qu'une hausse du p95 au-delà du seuil ou du nombre de requêtes SQL est signalée, mais pas un faible écart.
+        baseline = {'results': {'1k': {'client': {
+            'patient_list': {'p95_ms': 10.0, 'queries_max': 3},
+            'patient_detail': {'p95_ms': 2.0, 'queries_max': 4},
+        }}}}
+        results = {'results': {'1k': {'client': {
+            'patient_list': {'p95_ms': 20.0, 'queries_max': 4},
+            'patient_detail': {'p95_ms': 3.0, 'queries_max': 4},  # +50 % mais seulement 1 ms
+            'appointment_list': {'p95_ms': 50.0, 'queries_max': 2},  # absent de la référence
+        }}}}
+        regressions = httpbench.find_regressions(results, baseline, threshold=0.25, min_delta_ms=5)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all('patient_list' in message for message in regressions))
+
+
+class DatabaseConfigurationTests(TestCase):
+    def test_connection_pragmas(self):
+        # Vérifie les réglages appliqués à chaque connexion SQLite : PRAGMA de production et transactions BEGIN IMMEDIATE.
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -64 * 1024)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_persistent_connections_only_under_wsgi(self):
+        # Vérifie que les connexions persistantes sont désactivées par défaut (ASGI) et gardées 600 secondes par le point d'entrée WSGI.
+        with mock.patch.dict(os.environ):
+            os.environ.pop('CLINIC_DB_CONN_MAX_AGE', None)
+            self.assertEqual(runpy.run_module('myclinic.settings')['DATABASES']['default']['CONN_MAX_AGE'], 0)
+            runpy.run_module('myclinic.asgi')
+            self.assertNotIn('CLINIC_DB_CONN_MAX_AGE', os.environ)
+            runpy.run_module('myclinic.wsgi')
+            self.assertEqual(runpy.run_module('myclinic.settings')['DATABASES']['default']['CONN_MAX_AGE'], 600)
+
+    def test_read_replica_router(self):
+        # Vérifie que seules les lectures des vues marquées @read_replica vont à la réplique, hors transaction, et jamais les écritures.
+        router = database.ReadReplicaRouter()
+        seen = []
+        view = database.read_replica(lambda request: seen.append(router.db_for_read(Patient)))
+        primary = mock.Mock(in_atomic_block=False)
+        with mock.patch.object(database, 'replica_configured', return_value=True), \
+                mock.patch.object(database, 'connections', {DEFAULT_DB_ALIAS: primary}):
+            self.assertEqual(router.db_for_read(Patient), DEFAULT_DB_ALIAS)
+            view(None)
+            primary.in_atomic_block = True
+            view(None)
+        view(None)  # Réplique non configurée
+        self.assertEqual(seen, [database.READ_REPLICA, DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+        self.assertEqual(router.db_for_write(Patient), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate(database.READ_REPLICA, 'patient_app'))
+
+
+class JsonApiTests(TestCase):
+    def setUp(self):
+        # Mise en place : un utilisateur connecté, trois patients (dont un vérifié) et un rendez-vous avec des notes internes.
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='kiosk', password='testpassword')
+        self.client.login(username='kiosk', password='testpassword')
+        self.patients = [
+            Patient.objects.create(name=f"Patient {i}", date_of_birth=date(2000, 1, 1), verified_by_admin=(i == 0)) for i in range(3)
+        ]
+        self.doctor = Doctor.objects.create(name="Dr. House")
+        self.appointment = Appointment.objects.create(
+            patient=self.patients[0], doctor=self.doctor, date=date(2099, 3, 2), time=time(10, 0), internal_admin_notes="secret"
+        )
+
+    def test_patient_list_pagination_and_fields(self):
+        # Vérifie la pagination par curseur, la sélection de champs et l'absence d'instanciation des modèles.
+        url = reverse('api_list', args=['patients'])
+        with mock.patch.object(Patient, 'from_db') as from_db:
+            data = self.client.get(url, {'fields': 'name,next_visit', 'limit': 2}).json()
+        from_db.assert_not_called()
+        self.assertEqual(data['results'], [
+            {'id': self.patients[0].pk, 'name': "Patient 0", 'next_visit': '2099-03-02'},
+            {'id': self.patients[1].pk, 'name': "Patient 1", 'next_visit': None},
+        ])
+        self.assertIsNone(data['previous'])
+        page = self.client.get(url, {'fields': 'name', 'limit': 2, 'after': data['next']}).json()
+        self.assertEqual([row['name'] for row in page['results']], ["Patient 2"])
+        self.assertIsNone(page['next'])
+        self.assertNotIn('verified_by_admin', self.client.get(url).json()['results'][0])
+
+    def test_appointment_detail(self):
+        # Vérifie un rendez-vous : noms du patient et du médecin, sans les notes réservées à l'administrateur.
+        data = self.client.get(reverse('api_detail', args=['appointments', self.appointment.pk])).json()
+        self.assertEqual(data, {
+            'id': self.appointment.pk, 'patient_id': self.patients[0].pk, 'patient_name': "Patient 0",
+            'doctor_id': self.doctor.pk, 'doctor': "Dr. House", 'date': '2099-03-02', 'time': '10:00:00', 'duration': 30,
+        })
+
+    def test_conditional_get(self):
+        # Vérifie qu'un ETag inchangé donne une réponse 304 sans lire les données, et qu'une modification change l'ETag.
+        url = reverse('api_detail', args=['patients', self.patients[1].pk])
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        [validator] = [query['sql'] for query in queries if 'patient_app_patient' in query['sql']]
+        self.assertNotIn('"name"', validator)  # Seule la date de dernière modification est lue
+        self.assertNotEqual(self.client.get(url, {'fields': 'name'})['ETag'], etag)
+        self.patients[1].name = "Patient One"
+        self.patients[1].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], "Patient One")
+        Appointment.objects.create(patient=self.patients[1], doctor=self.doctor, date=date(2099, 3, 3), time=time(10, 0))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).json()['appointment_count'], 1)
+
+    def test_etag_follows_writes_from_other_processes(self):
+        # Vérifie qu'une modification faite hors de ce processus (sans changer les versions du cache) change l'ETag de la liste et de l'élément.
+        urls = [reverse('api_list', args=['patients']), reverse('api_detail', args=['patients', self.patients[1].pk])]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        names = [caching.PATIENT_LIST, caching.ALL_PATIENTS, caching.patient_version(self.patients[1].pk)]
+        versions = caching.get_versions(names)
+        # Écriture d'un autre processus (commande, travail de run_workers) : aucune version du cache de ce processus ne change
+        Patient.objects.filter(pk=self.patients[1].pk).update(name="Renamed", version=F('version') + 1, updated_at=timezone.now())
+        self.assertEqual(caching.get_versions(names), versions)
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Renamed", response.content.decode())
+        etag = self.client.get(reverse('api_list', args=['appointments']))['ETag']
+        Appointment.objects.filter(pk=self.appointment.pk).update(duration=45, version=F('version') + 1, updated_at=timezone.now())
+        response = self.client.get(reverse('api_list', args=['appointments']), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'][0]['duration'], 45)
+
+    def test_errors(self):
+        # Vérifie les erreurs en JSON : utilisateur non connecté, champ inconnu ou réservé, ressource ou élément introuvable.
+        url = reverse('api_list', args=['patients'])
+        response = self.client.get(url, {'fields': 'name,verified_by_admin'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('verified_by_admin', response.json()['error'])
+        self.assertEqual(self.client.get(url, {'limit': api.API_MAX_PAGE_SIZE + 1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_list', args=['doctors'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_detail', args=['appointments', 0])).json(), {'error': "Introuvable."})
+        self.assertEqual(self.client.post(url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
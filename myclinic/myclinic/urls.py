@@ -16,12 +16,25 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from . import views
+from . import api, views
 
 urlpatterns = [
     # URL pour home page
     path('', views.home, name='home'), 
 
+    # URL de l'export en streaming ('patients' ou 'appointments')
+    path('export/<str:kind>/', views.export_data, name='export_data'),
+
+    # URL de l'API JSON (version 1) : liste et élément ('patients' ou 'appointments')
+    path('api/v1/<str:resource>/', api.resource_list, name='api_list'),
+    path('api/v1/<str:resource>/<int:pk>/', api.resource_detail, name='api_detail'),
+
+    # URL des statistiques du cache (succès / échecs), réservée aux administrateurs
+    path('debug/cache/', views.cache_stats, name='cache_stats'),
+
+    # URL du tableau de bord de profilage (percentiles par vue, N+1), réservée aux administrateurs
+    path('debug/perf/', views.perf_dashboard, name='perf_dashboard'),
+
     # URL pour l'interface admin
     path('admin/', admin.site.urls), 
 
@@ -32,4 +45,7 @@ urlpatterns = [
     # URL pour l'application 'scheduler_app'
     # Toutes les URL commençant par 'appointments/' seront redirigées vers le fichier urls.py de 'scheduler_app'
     path('appointments/', include('scheduler_app.urls')),
+
+    # URL de l'application 'audit_app' (historique des modifications d'un patient)
+    path('audit/', include('audit_app.urls')),
 ]
@@ -1,4 +1,101 @@
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 
+from stats_app import dashboard
+from . import caching, profiling
+from .exporting import CONTENT_TYPES, EXPORTS, aexport_stream, export_filename, export_stream
+
+
 def home(request):
-    return render(request, 'myclinic/home.html')
+    """
+    Page d'accueil. Les administrateurs (staff) y voient le tableau de bord de l'activité, lu dans les statistiques
+    précalculées (voir stats_app/rollups.py) : son coût ne dépend pas du nombre de rendez-vous ni de patients.
+
+    Paramètres GET (optionnels) :
+        days: nombre de jours affichés, jusqu'à aujourd'hui (14 par défaut, au plus 92).
+    """
+    context = {}
+    if request.user.is_staff:
+        try:
+            days = int(request.GET.get('days', dashboard.DEFAULT_DAYS))
+        except ValueError:
+            raise BadRequest("Nombre de jours invalide.")
+        if not 1 <= days <= dashboard.MAX_DAYS:
+            raise BadRequest(f"Le nombre de jours doit être compris entre 1 et {dashboard.MAX_DAYS}.")
+        context['dashboard'] = dashboard.build(days)
+    return render(request, 'myclinic/home.html', context)
+
+
+@login_required
+def export_data(request, kind):
+    """
+    Exporte tous les patients ou tous les rendez-vous en streaming, sous forme de fichier à télécharger.
+    Réservé aux administrateurs (staff), comme la liste complète des rendez-vous.
+
+    Args:
+        kind: 'patients' ou 'appointments'.
+
+    Paramètres GET (optionnels) :
+        format: 'csv' (par défaut), 'jsonl' ou 'columns'.
+        compress: 'gzip' pour compresser le fichier à la volée.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    if kind not in EXPORTS:
+        raise Http404("Export inconnu.")
+    fmt = request.GET.get('format', 'csv')
+    compression = request.GET.get('compress') or None
+    if fmt not in CONTENT_TYPES or compression not in (None, 'gzip'):
+        raise BadRequest("Format d'export invalide.")
+    compress = compression == 'gzip'
+
+    # Sous ASGI, un itérateur synchrone serait lu en entier avant l'envoi : l'export est alors produit de façon asynchrone
+    stream = aexport_stream if isinstance(request, ASGIRequest) else export_stream
+    response = StreamingHttpResponse(
+        stream(kind, fmt, compress=compress),
+        content_type='application/gzip' if compress else f'{CONTENT_TYPES[fmt]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(kind, fmt, compress)}"'
+    return response
+
+
+@login_required
+def cache_stats(request):
+    """
+    Renvoie en JSON les succès et échecs du cache de ce processus, par espace de noms. Réservé aux administrateurs (staff).
+
+    Paramètres GET (optionnels) :
+        reset: '1' pour remettre les compteurs à zéro après les avoir lus.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    snapshot = caching.stats.snapshot()
+    if request.GET.get('reset') == '1':
+        caching.stats.reset()
+    return JsonResponse({'backend': caching.cache.__class__.__name__, 'namespaces': snapshot})
+
+
+@login_required
+def perf_dashboard(request):
+    """
+    Affiche les mesures du middleware de profilage de ce processus : percentiles p50 / p95 / p99 du temps de réponse
+    par nom d'URL, requêtes SQL, rendu des templates, pic mémoire et dernières requêtes signalées N+1.
+    Réservé aux administrateurs (staff).
+
+    Paramètres GET (optionnels) :
+        format: 'json' pour obtenir les mêmes données en JSON.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    profiles = profiling.buffer.snapshot()
+    summary = profiling.summarize_profiles(profiles)
+    flagged = [
+        {'url_name': p.url_name, 'path': p.path, 'timestamp': p.timestamp, 'query_count': p.query_count, 'n_plus_one': p.n_plus_one}
+        for p in reversed(profiles) if p.n_plus_one
+    ][:20]
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'samples': len(profiles), 'urls': summary, 'n_plus_one': flagged})
+    return render(request, 'myclinic/perf.html', {'samples': len(profiles), 'urls': summary, 'flagged': flagged})
@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myclinic.settings')
+# Connexions persistantes : un fil WSGI sert les requêtes l'une après l'autre et réutilise sa connexion (voir settings.py)
+os.environ.setdefault('CLINIC_DB_CONN_MAX_AGE', '600')
 
 application = get_wsgi_application()
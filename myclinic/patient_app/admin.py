@@ -8,10 +8,17 @@ class PatientAdmin(admin.ModelAdmin):
     Cette classe définit comment les objets Patient sont affichés et gérés dans l'interface d'administration Django.
     """
     # Les champs à afficher dans la liste des patients
-    list_display = ('name', 'date_of_birth', 'verified_by_admin')
-    # Les champs par lesquels filtrer la liste des patients
-    list_filter = ('verified_by_admin',)
+    list_display = ('name', 'date_of_birth', 'verified_by_admin', 'deleted_at')
+    # Les champs par lesquels filtrer la liste des patients (dont les patients supprimés)
+    list_filter = ('verified_by_admin', ('deleted_at', admin.EmptyFieldListFilter))
     # Les champs dans lesquels effectuer une recherche de patients
     search_fields = ('name',)
     # Les champs modifiables dans l'interface d'administration (incluant tous les champs du modèle)
-    fields = ('name', 'date_of_birth', 'contact_info', 'basic_medical_history', 'verified_by_admin')
\ No newline at end of file
+    fields = ('name', 'date_of_birth', 'contact_info', 'basic_medical_history', 'verified_by_admin')
+
+    def get_queryset(self, request):
+        # L'administration affiche aussi les patients supprimés (comme ModelAdmin.get_queryset, avec all_objects) ;
+        # la suppression y reste logique (PatientQuerySet.delete)
+        queryset = Patient.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
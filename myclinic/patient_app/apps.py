@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PatientAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'patient_app'
+
+    def ready(self):
+        # Enregistre les récepteurs de signaux de l'application (index de recherche)
+        from . import signals
+        post_migrate.connect(signals.install_search_index, sender=self)
@@ -1,10 +1,11 @@
-from django import forms
+from myclinic.concurrency import VersionedModelForm
 from .models import Patient
 
-class PatientForm(forms.ModelForm):
+class PatientForm(VersionedModelForm):
     """
     Ce formulaire est utilisé pour créer et modifier des instances du modèle Patient.
-    Il hérite de forms.ModelForm, ce qui facilite la création de formulaires liés à des modèles.
+    Il hérite de forms.ModelForm (par VersionedModelForm), ce qui facilite la création de formulaires liés à des modèles ;
+    une modification concurrente de la fiche est détectée par sa version (voir myclinic/concurrency.py).
     """
     class Meta:
         """
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.backends.django import DjangoTemplates
+
+from myclinic.benchmarking import measure, summarize
+from patient_app.models import Patient
+
+# Template mesurée : la page complète de la liste des patients (en-tête partagé myclinic/base.html, une ligne incluse par patient)
+TEMPLATE = 'patient_app/patient_list.html'
+TEMPLATE_LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+# Chargeurs comparés : sans cache (chaque rendu relit et recompile les templates), puis en cache (myclinic/settings_production.py)
+PROFILES = {
+    'sans cache': TEMPLATE_LOADERS,
+    'en cache': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le rendu de la liste des patients (patient_list.html) avec un grand nombre de lignes, avec le chargeur "
+        "de templates sans cache puis avec le chargeur en cache du profil de production : chargement et compilation "
+        "des templates seuls, puis chargement et rendu de la page complète. Aucune base de données n'est lue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help="Nombre de patients affichés.")
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre de mesures par opération.")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 0 or options['repeat'] < 1:
+            raise CommandError("--rows doit être positif et --repeat strictement positif.")
+        # Patients non enregistrés : seuls la clé primaire et le nom sont affichés
+        patients = [Patient(pk=index, name=f"Patient {index:05d}") for index in range(1, options['rows'] + 1)]
+        context = {'patients': patients, 'page': None, 'query': None, 'sort': 'name'}
+        self.stdout.write(f"{TEMPLATE}, {len(patients)} lignes, {options['repeat']} mesures par opération")
+        results = {}
+        for label, loaders in PROFILES.items():
+            engine = DjangoTemplates({
+                'NAME': f'bench-{label}',
+                'DIRS': settings.TEMPLATES[0]['DIRS'],
+                'APP_DIRS': False,
+                'OPTIONS': {'loaders': loaders},
+            })
+            size = len(engine.get_template(TEMPLATE).render(context))
+            compile_ = summarize(measure(lambda: engine.get_template(TEMPLATE), options['repeat']))
+            render = summarize(measure(lambda: engine.get_template(TEMPLATE).render(context), options['repeat']))
+            results[label] = render
+            per_row = f"{render['p50_ms'] * 1000 / len(patients):.2f} µs par ligne, " if patients else ''
+            self.stdout.write(
+                f"  {label:<11} chargement p50 {compile_['p50_ms']:>8.3f} ms   rendu p50 {render['p50_ms']:>9.2f} ms "
+                f"p95 {render['p95_ms']:>9.2f} ms   ({per_row}{size // 1024} Kio)"
+            )
+        uncached, cached = results['sans cache'], results['en cache']
+        if cached['p50_ms']:
+            self.stdout.write(f"Gain du chargeur en cache sur le rendu : x{uncached['p50_ms'] / cached['p50_ms']:.2f}")
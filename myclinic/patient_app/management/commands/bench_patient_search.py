@@ -0,0 +1,62 @@
+import random
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from myclinic.benchmarking import benchmark_database, measure, summarize
+from patient_app.models import Patient
+from patient_app.search import get_search_backend, search_patients
+
+FIRST_NAMES = ['Hélène', 'Marc', 'Paul', 'Zoé', 'Émile', 'Claire', 'Louis', 'Inès', 'Hugo', 'Léa', 'Jules', 'Chloé']
+LAST_NAMES = ['Dupré', 'Durand', 'Martin', 'Bernard', 'Petit', 'Lefèvre', 'Moreau', 'Girard', 'Roux', 'Faure', 'Mercier', 'Blanc']
+HISTORY_WORDS = ['asthme', 'diabète', 'hypertension', 'allergie', 'pénicilline', 'migraine', 'fracture', 'anémie', 'eczéma', 'arthrose']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence de la recherche de patients (moteur indexé) à l'ancien filtre name__icontains, "
+        "sur une base jetable de 10k, 100k et 1M patients."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help="Tailles de table à mesurer.")
+        parser.add_argument('--repeat', type=int, default=50, help="Nombre de recherches mesurées par requête et par taille.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Taille des lots de bulk_create.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Requêtes courantes (beaucoup de résultats) et requêtes sélectives (numéro de téléphone, nom absent)
+        queries = ['durand', 'helene dupre', 'ler', 'penicilline', '0612345678', 'nobody']
+
+        with benchmark_database() as connection:
+            self.stdout.write(f"Moteur de recherche : {type(get_search_backend()).__name__} ({connection.vendor})")
+            self.stdout.write(f"{'lignes':>10} {'requête':<14} {'icontains p50/p99 (ms)':>24} {'indexé p50/p99 (ms)':>22}")
+            created = 0
+            for size in sorted(options['sizes']):
+                start = time.perf_counter()
+                while created < size:
+                    count = min(options['batch_size'], size - created)
+                    Patient.objects.bulk_create(self.make_patient(rng) for _ in range(count))
+                    created += count
+                self.stdout.write(f"  ({size} patients insérés en {time.perf_counter() - start:.1f} s)")
+
+                for query in queries:
+                    # Ancien chemin, tel que la vue l'exécutait : LIKE '%q%' sur le nom, sans index utilisable ni pagination
+                    icontains = summarize(measure(lambda: list(Patient.objects.filter(name__icontains=query)), options['repeat']))
+                    indexed = summarize(measure(lambda: search_patients(query, page_size=25), options['repeat']))
+                    self.stdout.write(
+                        f"{size:>10} {query:<14} "
+                        f"{icontains['p50_ms']:>11.2f} / {icontains['p99_ms']:<10.2f} "
+                        f"{indexed['p50_ms']:>9.2f} / {indexed['p99_ms']:<10.2f}"
+                    )
+
+    def make_patient(self, rng):
+        # Génère un patient synthétique, sans dépendance externe, avec des noms accentués
+        return Patient(
+            name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            date_of_birth=date(rng.randint(1930, 2020), rng.randint(1, 12), rng.randint(1, 28)),
+            contact_info=f"06{rng.randint(0, 99_999_999):08d}",
+            basic_medical_history=' '.join(rng.sample(HISTORY_WORDS, 3)),
+        )
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:47
+
+from django.db import migrations, models
+
+from patient_app.search import build_search_text
+
+BATCH_SIZE = 2000
+
+
+def fill_search_text(apps, schema_editor):
+    """
+    Calcule la colonne de recherche des patients existants, par lots ordonnés par clé primaire.
+    """
+    Patient = apps.get_model('patient_app', 'Patient')
+    patients = Patient.objects.using(schema_editor.connection.alias).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(patients.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for patient in batch:
+            patient.search_text = build_search_text(patient)
+        Patient.objects.using(schema_editor.connection.alias).bulk_update(batch, ['search_text'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0002_patient_name_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0003_patient_search_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='appointment_count',
+            field=models.PositiveIntegerField(db_default=0, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='last_visit',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='next_visit',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['next_visit', 'id'], name='patient_next_visit_id_idx'),
+        ),
+    ]
@@ -1,11 +1,60 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
+from myclinic.concurrency import VersionedModel
+from .search import SEARCH_FIELDS, build_search_text
+from .signals import patients_bulk_created, patients_soft_deleted
+
+
+class PatientQuerySet(models.QuerySet):
+    """
+    QuerySet des patients : bulk_create() remplit la colonne de recherche normalisée,
+    comme le fait Patient.save() pour les créations unitaires.
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for patient in objs:
+            patient.search_text = build_search_text(patient)
+        created = super().bulk_create(objs, *args, **kwargs)
+        # bulk_create() n'émet pas post_save : on prévient les abonnés (index de recherche en mémoire, ...)
+        patients_bulk_created.send(sender=self.model, patients=created, using=self.db)
+        return created
+
+    def delete(self):
+        """
+        Suppression logique : les patients sont marqués supprimés (deleted_at) par une seule requête UPDATE,
+        au lieu de supprimer en cascade leurs rendez-vous. Retourne (nombre, {modèle: nombre}) comme QuerySet.delete().
+        """
+        pks = list(self.filter(deleted_at__isnull=True).values_list('pk', flat=True))
+        now = timezone.now()
+        deleted = self.model.all_objects.using(self.db).filter(pk__in=pks).update(deleted_at=now, updated_at=now, version=F('version') + 1)
+        # update() n'émet pas post_delete : on prévient les abonnés (index de recherche, cache, rendez-vous, ...)
+        if deleted:
+            patients_soft_deleted.send(sender=self.model, pks=pks, using=self.db)
+        return deleted, {self.model._meta.label: deleted}
+
+    def hard_delete(self):
+        """
+        Suppression définitive, avec la suppression en cascade des rendez-vous.
+        """
+        return super().delete()
+
+
+class PatientManager(models.Manager.from_queryset(PatientQuerySet)):
+    """
+    Gestionnaire par défaut des patients : les patients supprimés (suppression logique) sont exclus.
+    Patient.all_objects les inclut.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 # Définition du modèle Patient
-class Patient(models.Model):
+class Patient(VersionedModel):
     '''
     Définit un nouveau modèle nommé Patient.
     models.Model indique que Patient est un modèle Django, qui sera traduit en une table dans la base de données.
+    VersionedModel ajoute le numéro de version des modifications concurrentes (voir myclinic/concurrency.py).
     '''
     # Champ pour le nom du patient de type char, limité à 100 caractères
     name = models.CharField(max_length=100)
@@ -17,6 +66,59 @@ class Patient(models.Model):
     basic_medical_history = models.TextField(blank=True, null=True)
     # Champ booléen pour indiquer si le patient a été vérifié par un administrateur, par défaut à False
     verified_by_admin = models.BooleanField(default=False)  # Admin-only field
+    # Colonne de recherche : nom, contact et antécédents normalisés (minuscules, sans accents), indexée par FTS5
+    search_text = models.TextField(blank=True, default='', editable=False)
+    # Champs dénormalisés, recalculés à chaque modification d'un rendez-vous du patient (voir scheduler_app/visits.py) :
+    # nombre de rendez-vous (valeur par défaut aussi en base, pour les insertions directes en SQL),
+    # jour de la dernière visite passée et de la prochaine visite
+    appointment_count = models.PositiveIntegerField(default=0, db_default=0, editable=False)
+    last_visit = models.DateField(blank=True, null=True, editable=False)
+    next_visit = models.DateField(blank=True, null=True, editable=False)
+    # Date de la suppression logique (voir PatientQuerySet.delete) ; vide pour un patient actif
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = PatientManager()
+    all_objects = PatientQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Index couvrant le tri (name, id) utilisé par la pagination par curseur de la liste des patients
+            models.Index(fields=['name', 'id'], name='patient_name_id_idx'),
+            # Index pour la liste triée par prochaine visite (pagination par curseur sur (next_visit, id))
+            models.Index(fields=['next_visit', 'id'], name='patient_next_visit_id_idx'),
+            # Index pour la date de la dernière modification (MAX(updated_at), validateurs HTTP de la liste des rendez-vous)
+            models.Index(fields=['updated_at'], name='patient_updated_at_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Mémorise les valeurs chargées depuis la base, pour savoir ce qu'un enregistrement modifie (journal d'audit).
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Enregistre le patient en recalculant la colonne de recherche normalisée.
+        """
+        self.search_text = build_search_text(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(SEARCH_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'search_text'}
+        super().save(*args, **kwargs)
+        # Après l'enregistrement, l'état en base est celui de l'instance (les champs différés ne sont pas lus)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields if field.attname not in deferred
+        }
+
+    def delete(self, using=None, keep_parents=False):
+        """
+        Suppression logique du patient (voir PatientQuerySet.delete).
+        """
+        return type(self).all_objects.using(using or self._state.db).filter(pk=self.pk).delete()
 
     # Méthode pour retourner le nom du patient comme représentation en chaîne de caractères de l'objet
     def __str__(self):
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import BadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    Une page de résultats obtenue par pagination par curseur (keyset).
+    Contient les objets de la page ainsi que les jetons opaques vers les pages suivante et précédente.
+    """
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur (keyset) sur un tri stable, par exemple ('name', 'pk').
+
+    Contrairement à OFFSET/LIMIT, chaque page est obtenue par une recherche dans l'index
+    à partir de la dernière clé vue : le coût d'une page ne dépend pas de sa position ni de la taille de la table.
+    Le dernier champ du tri doit être unique (typiquement 'pk') pour que l'ordre soit total.
+    """
+    def __init__(self, queryset, ordering, page_size=25):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    # Encodage / décodage des jetons opaques transmis dans l'URL
+    @staticmethod
+    def encode_cursor(values, direction):
+        payload = json.dumps({'k': list(values), 'd': direction}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values, direction = payload['k'], payload['d']
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise BadRequest("Curseur de pagination invalide.")
+        if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != len(self.ordering):
+            raise BadRequest("Curseur de pagination invalide.")
+        return values, direction
+
+    def _key(self, obj):
+        # Récupère les valeurs de tri d'un objet (instance de modèle ou dictionnaire issu de values())
+        if isinstance(obj, dict):
+            return [obj[field] for field in self.ordering]
+        return [getattr(obj, field) for field in self.ordering]
+
+    def _after(self, values, reverse=False):
+        """
+        Construit le filtre "(f1, f2, ...) > (v1, v2, ...)" (ou "<" si reverse).
+        Le premier champ est aussi borné par >= (ou <=) pour que la base puisse démarrer la recherche dans l'index.
+        """
+        op = 'lt' if reverse else 'gt'
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            condition |= Q(**equal, **{f'{field}__{op}': value})
+            equal[field] = value
+        first, first_value = self.ordering[0], values[0]
+        return Q(**{f'{first}__{op}e': first_value}) & condition
+
+    def _query(self, cursor):
+        """
+        Retourne la requête de la page désignée par 'cursor' (une ligne de plus que la page) et le sens de parcours.
+        """
+        queryset = self.queryset
+        direction = 'n'
+        if cursor:
+            values, direction = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._after(values, reverse=(direction == 'p')))
+
+        if direction == 'p':
+            # Page précédente : on parcourt l'index à l'envers puis on remet les lignes dans l'ordre
+            queryset = queryset.order_by(*[f'-{field}' for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        return queryset[:self.page_size + 1], direction  # Une ligne de plus pour savoir s'il reste une page
+
+    def _page(self, rows, cursor, direction):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if direction == 'p':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(self._key(rows[-1]), 'n')
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(self._key(rows[0]), 'p')
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        """
+        Retourne la page désignée par le jeton 'cursor' (ou la première page si absent).
+        Une seule requête SQL est exécutée, quelle que soit la taille de la table.
+        """
+        queryset, direction = self._query(cursor)
+        return self._page(list(queryset), cursor, direction)
+
+    async def apage(self, cursor=None):
+        """
+        Version asynchrone de page(), pour les vues async (ORM asynchrone).
+        """
+        queryset, direction = self._query(cursor)
+        return self._page([row async for row in queryset], cursor, direction)
+
+
+class OffsetPage:
+    """
+    Une page numérotée obtenue par OFFSET/LIMIT, sans requête COUNT : on lit une ligne de plus que la taille de la page
+    pour savoir s'il reste une page suivante. Adaptée aux listes courtes, comme l'historique des rendez-vous d'un patient.
+    """
+    def __init__(self, rows, number, page_size):
+        self.object_list = list(rows)[:page_size]
+        self.number = number
+        self._has_next = len(rows) > page_size
+
+    @staticmethod
+    def bounds(number, page_size):
+        """
+        Retourne les bornes (début, fin) de la tranche à lire pour la page 'number', ligne supplémentaire comprise.
+        """
+        return (number - 1) * page_size, number * page_size + 1
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
@@ -0,0 +1,341 @@
+"""
+Moteur de recherche des patients.
+
+La recherche porte sur une colonne normalisée ('search_text' : minuscules, sans accents) construite à partir
+du nom, des informations de contact et des antécédents médicaux, et tenue à jour par Patient.save() et bulk_create().
+
+Deux moteurs sont disponibles :
+- FTS5 (SQLite) : une table virtuelle à tokenisation par trigrammes, synchronisée par des triggers SQL,
+  qui permet de chercher une sous-chaîne sans parcourir toute la table et de classer les résultats avec bm25 ;
+- un index de trigrammes en mémoire, utilisé lorsque FTS5 n'est pas disponible (autre base, SQLite trop ancien).
+"""
+import threading
+import unicodedata
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+# Champs du modèle Patient couverts par la recherche
+SEARCH_FIELDS = ('name', 'contact_info', 'basic_medical_history')
+# Séparateur entre les champs dans la colonne normalisée
+FIELD_SEPARATOR = '\n'
+# Taille minimale d'un mot pour être cherché dans l'index de trigrammes
+TRIGRAM_SIZE = 3
+
+FTS_TABLE = 'patient_app_patient_fts'
+PATIENT_TABLE = 'patient_app_patient'
+
+
+def normalize(text):
+    """
+    Normalise un texte pour la recherche : suppression des accents, passage en minuscules et espaces compactés.
+    Par exemple "  Hélène  DUPRÉ " devient "helene dupre".
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    folded = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(folded.casefold().split())
+
+
+def build_search_text(patient):
+    """
+    Construit la valeur de la colonne 'search_text' d'un patient à partir des champs couverts par la recherche.
+    """
+    return FIELD_SEPARATOR.join(normalize(getattr(patient, field)) for field in SEARCH_FIELDS)
+
+
+def split_query(query):
+    """
+    Découpe une requête en mots normalisés, en séparant ceux qui sont assez longs pour l'index de trigrammes.
+    """
+    words = list(dict.fromkeys(normalize(query).split()))  # Supprime les doublons en gardant l'ordre
+    long_words = [word for word in words if len(word) >= TRIGRAM_SIZE]
+    short_words = [word for word in words if len(word) < TRIGRAM_SIZE]
+    return long_words, short_words
+
+
+class SearchPage:
+    """
+    Une page de résultats de recherche, classés par pertinence.
+    Les pages sont numérotées à partir de 1.
+    """
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    @property
+    def next_page_number(self):
+        return self.number + 1
+
+    @property
+    def previous_page_number(self):
+        return self.number - 1
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+# ---------------------------------------------------------------------------
+# Moteur FTS5 (SQLite)
+# ---------------------------------------------------------------------------
+
+def fts_supported(connection):
+    """
+    Indique si la connexion est une base SQLite disposant de FTS5 avec le tokenizer 'trigram' (SQLite >= 3.34).
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.patient_fts_probe USING fts5(x, tokenize='trigram')")
+            cursor.execute("DROP TABLE temp.patient_fts_probe")
+        except OperationalError:
+            return False
+    return True
+
+
+# Présence de l'index FTS par base, mémorisée pour ne pas interroger sqlite_master à chaque recherche
+_fts_installed = {}
+
+
+def _database_key(connection):
+    return (connection.alias, str(connection.settings_dict['NAME']))
+
+
+def fts_installed(connection):
+    key = _database_key(connection)
+    if key not in _fts_installed:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_installed[key] = cursor.fetchone() is not None
+    return _fts_installed[key]
+
+
+def install_fts_index(using=DEFAULT_DB_ALIAS):
+    """
+    Crée la table FTS5 et les triggers qui la synchronisent avec la table des patients, s'ils n'existent pas.
+
+    Appelée après chaque migration : lorsque SQLite reconstruit la table des patients (ALTER TABLE émulé),
+    les triggers sont supprimés avec l'ancienne table et doivent être recréés, puis l'index reconstruit.
+    Retourne True si l'index FTS est en place.
+    """
+    connection = connections[using]
+    if not fts_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [FTS_TABLE + '%'],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        triggers = {
+            f'{FTS_TABLE}_ai': f"""
+                CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {PATIENT_TABLE} BEGIN
+                    INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+                END""",
+            f'{FTS_TABLE}_ad': f"""
+                CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {PATIENT_TABLE} BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+                END""",
+            f'{FTS_TABLE}_au': f"""
+                CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF search_text ON {PATIENT_TABLE} BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+                    INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+                END""",
+        }
+        _fts_installed[_database_key(connection)] = True
+        missing = [name for name in [FTS_TABLE, *triggers] if name not in existing]
+        if not missing:
+            return True
+        if FTS_TABLE not in existing:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"search_text, content='{PATIENT_TABLE}', content_rowid='id', tokenize='trigram')"
+            )
+        for name, sql in triggers.items():
+            if name not in existing:
+                cursor.execute(sql)
+        # L'index peut avoir manqué des écritures pendant l'absence des triggers : reconstruction depuis la table
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+class FtsSearchBackend:
+    """
+    Recherche via la table FTS5 : les mots d'au moins 3 caractères sont cherchés dans l'index de trigrammes,
+    les mots plus courts sont vérifiés sur les lignes déjà sélectionnées. Classement par bm25 puis par nom.
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def search(self, query, offset=0, limit=None):
+        from .models import Patient
+
+        long_words, short_words = split_query(query)
+        if not long_words and not short_words:
+            return []
+        if not long_words:
+            # Aucun mot assez long pour l'index : on se rabat sur la colonne normalisée
+            patients = Patient.objects.using(self.using).only('pk', 'name')
+            for word in short_words:
+                patients = patients.filter(search_text__contains=word)
+            patients = patients.order_by('name', 'pk')
+            return list(patients[offset:offset + limit] if limit is not None else patients[offset:])
+
+        # Chaque mot devient une phrase FTS entre guillemets ; les phrases sont combinées par un ET implicite
+        match = ' '.join('"{}"'.format(word.replace('"', '""')) for word in long_words)
+        conditions = ''.join(' AND instr(p.search_text, %s) > 0' for _ in short_words)
+        sql = (
+            f"SELECT p.id, p.name FROM {FTS_TABLE} f JOIN {PATIENT_TABLE} p ON p.id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND p.deleted_at IS NULL{conditions} "
+            f"ORDER BY bm25({FTS_TABLE}), p.name, p.id LIMIT %s OFFSET %s"
+        )
+        params = [match, *short_words, -1 if limit is None else limit, offset]
+        return list(Patient.objects.using(self.using).raw(sql, params))
+
+
+# ---------------------------------------------------------------------------
+# Index de trigrammes en mémoire (repli lorsque FTS5 n'est pas disponible)
+# ---------------------------------------------------------------------------
+
+def trigrams(text):
+    return {text[i:i + TRIGRAM_SIZE] for i in range(len(text) - TRIGRAM_SIZE + 1)}
+
+
+class TrigramIndex:
+    """
+    Index inversé trigramme -> ensemble de clés primaires, construit à la demande depuis la colonne 'search_text'.
+
+    L'index est propre au processus : il est mis à jour par les signaux de Patient et par bulk_create()
+    dans ce processus, et doit être reconstruit (reset()) si d'autres processus écrivent dans la table.
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.postings = {}
+        self.documents = {}
+        self.built = False
+
+    def _build(self):
+        from .models import Patient
+
+        rows = Patient.objects.using(self.using).values_list('pk', 'search_text')
+        for pk, search_text in rows.iterator(chunk_size=5000):
+            self._add(pk, search_text)
+        self.built = True
+
+    def _add(self, pk, search_text):
+        self.documents[pk] = search_text
+        for gram in trigrams(search_text):
+            self.postings.setdefault(gram, set()).add(pk)
+
+    def _discard(self, pk):
+        search_text = self.documents.pop(pk, None)
+        if search_text is None:
+            return
+        for gram in trigrams(search_text):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(pk)
+                if not posting:
+                    del self.postings[gram]
+
+    def update(self, pk, search_text):
+        with self._lock:
+            if self.built:
+                self._discard(pk)
+                self._add(pk, search_text)
+
+    def discard(self, pk):
+        with self._lock:
+            if self.built:
+                self._discard(pk)
+
+    def matches(self, query):
+        """
+        Retourne les clés primaires correspondant à tous les mots de la requête, classées par pertinence :
+        d'abord les patients dont le nom contient les mots, puis les fiches les plus courtes.
+        """
+        long_words, short_words = split_query(query)
+        words = long_words + short_words
+        if not words:
+            return []
+        with self._lock:
+            if not self.built:
+                self._build()
+            if long_words:
+                grams = set().union(*(trigrams(word) for word in long_words))
+                postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+                candidates = set.intersection(*postings) if postings else set()
+            else:
+                candidates = set(self.documents)
+            results = []
+            for pk in candidates:
+                document = self.documents[pk]
+                if all(word in document for word in words):
+                    name = document.split(FIELD_SEPARATOR, 1)[0]
+                    in_name = sum(word in name for word in words)
+                    results.append((-in_name, len(document), name, pk))
+        results.sort()
+        return [pk for *_, pk in results]
+
+
+class TrigramSearchBackend:
+    """
+    Recherche via l'index de trigrammes en mémoire : les clés primaires sont classées en mémoire,
+    puis seuls les patients de la page demandée sont chargés depuis la base.
+    """
+    def __init__(self, index):
+        self.index = index
+
+    def search(self, query, offset=0, limit=None):
+        from .models import Patient
+
+        pks = self.index.matches(query)
+        pks = pks[offset:offset + limit] if limit is not None else pks[offset:]
+        patients = Patient.objects.using(self.index.using).only('pk', 'name').in_bulk(pks)
+        return [patients[pk] for pk in pks if pk in patients]
+
+
+_trigram_indexes = {}
+_trigram_indexes_lock = threading.Lock()
+
+
+def get_trigram_index(using=DEFAULT_DB_ALIAS):
+    with _trigram_indexes_lock:
+        if using not in _trigram_indexes:
+            _trigram_indexes[using] = TrigramIndex(using)
+        return _trigram_indexes[using]
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    """
+    Retourne le moteur de recherche adapté à la base : FTS5 si la table d'index existe, sinon l'index en mémoire.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and fts_installed(connection):
+        return FtsSearchBackend(using)
+    return TrigramSearchBackend(get_trigram_index(using))
+
+
+def search_patients(query, page=1, page_size=25, using=DEFAULT_DB_ALIAS):
+    """
+    Recherche des patients par nom, contact ou antécédents médicaux, sans tenir compte des accents ni de la casse.
+    Retourne une SearchPage de patients (seuls 'pk' et 'name' sont chargés), classés par pertinence.
+    """
+    page = max(int(page), 1)
+    results = get_search_backend(using).search(query, offset=(page - 1) * page_size, limit=page_size + 1)
+    return SearchPage(results[:page_size], page, has_next=len(results) > page_size)
@@ -0,0 +1,69 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from myclinic import caching
+from . import search
+
+# Signal émis par Patient.objects.bulk_create(), qui n'émet pas post_save pour chaque patient.
+# Arguments : patients (liste des patients créés), using (alias de la base).
+patients_bulk_created = Signal()
+# Signal émis par la suppression logique des patients (PatientQuerySet.delete), qui n'émet pas post_delete.
+# Arguments : pks (identifiants des patients supprimés), using (alias de la base).
+patients_soft_deleted = Signal()
+
+
+@receiver(post_save, sender='patient_app.Patient')
+def update_search_index(sender, instance, using, **kwargs):
+    """
+    Met à jour l'index de trigrammes en mémoire après l'enregistrement d'un patient.
+    (L'index FTS5 est, lui, mis à jour par des triggers SQL.)
+    """
+    search.get_trigram_index(using).update(instance.pk, instance.search_text)
+
+
+@receiver(post_delete, sender='patient_app.Patient')
+def remove_from_search_index(sender, instance, using, **kwargs):
+    """
+    Retire un patient supprimé de l'index de trigrammes en mémoire.
+    """
+    search.get_trigram_index(using).discard(instance.pk)
+
+
+@receiver(post_save, sender='patient_app.Patient')
+@receiver(post_delete, sender='patient_app.Patient')
+def invalidate_patient_pages(sender, instance, **kwargs):
+    """
+    Invalide la fiche du patient et les pages de la liste des patients en cache.
+    """
+    caching.bump_on_commit(caching.patient_version(instance.pk), caching.PATIENT_LIST)
+
+
+@receiver(patients_bulk_created)
+def index_bulk_created_patients(sender, patients, using, **kwargs):
+    """
+    Ajoute à l'index de trigrammes en mémoire les patients créés par bulk_create().
+    """
+    index = search.get_trigram_index(using)
+    for patient in patients:
+        if patient.pk is not None:
+            index.update(patient.pk, patient.search_text)
+    caching.bump_on_commit(caching.PATIENT_LIST)
+
+
+@receiver(patients_soft_deleted)
+def forget_soft_deleted_patients(sender, pks, using, **kwargs):
+    """
+    Retire les patients supprimés de l'index de trigrammes en mémoire et invalide leurs fiches et la liste des patients.
+    (La recherche FTS5 exclut elle-même les patients supprimés.)
+    """
+    index = search.get_trigram_index(using)
+    for pk in pks:
+        index.discard(pk)
+    caching.bump_on_commit(caching.PATIENT_LIST, *map(caching.patient_version, pks))
+
+
+def install_search_index(sender, using, **kwargs):
+    """
+    Après les migrations, installe (ou réinstalle) la table FTS5 et ses triggers sur les bases SQLite.
+    """
+    search.install_fts_index(using)
@@ -1,9 +1,23 @@
-from django.test import TestCase, Client
+import threading
+from django.test import AsyncClient, TestCase, TransactionTestCase, Client
 from django.urls import reverse
 from .models import Patient
 from .forms import PatientForm
+from .search import TrigramIndex, TrigramSearchBackend, normalize
+from .views import PATIENT_HISTORY_PAGE_SIZE, PATIENT_LIST_PAGE_SIZE
 from django.contrib.auth.models import User
-from datetime import date
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import date, time, timedelta
+from io import StringIO
+from myclinic import caching
+from myclinic.concurrency import DELETED_MESSAGE, VersionConflict
+from myclinic.testing import form_data, in_database_file
+from scheduler_app import batch
+from scheduler_app.models import Appointment, Doctor
 
 class PatientModelTests(TestCase):
     def test_patient_creation(self):
@@ -110,4 +124,626 @@ class PatientViewTests(TestCase):
         # Vérifie que les utilisateurs non authentifiés sont redirigés vers la page de connexion lorsqu'ils essaient d'accéder à une vue protégée (@login_required).
         self.client.logout() # Déconnecte l'utilisateur.
         response = self.client.get(reverse('patient_list'))
-        self.assertEqual(response.status_code, 302) # Vérifie que le statut de la réponse HTTP est 302 (redirection).
\ No newline at end of file
+        self.assertEqual(response.status_code, 302) # Vérifie que le statut de la réponse HTTP est 302 (redirection).
+
+class PatientListPaginationTests(TestCase):
+    def setUp(self):
+        # Mise en place : un utilisateur connecté et quelques patients aux noms ordonnés.
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+    def create_patients(self, n, start=0):
+        # Crée n patients nommés "Patient 0000", "Patient 0001", ... en une seule requête.
+        Patient.objects.bulk_create(
+            Patient(name=f"Patient {i:04d}", date_of_birth=date(2000, 1, 1)) for i in range(start, start + n)
+        )
+
+    def count_list_queries(self, **params):
+        # Compte le nombre de requêtes SQL exécutées pour afficher une page de la liste.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('patient_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_first_page_is_limited_and_ordered(self):
+        # Vérifie que la première page contient au plus PATIENT_LIST_PAGE_SIZE patients, triés par nom.
+        self.create_patients(PATIENT_LIST_PAGE_SIZE + 5)
+        response = self.client.get(reverse('patient_list'))
+        names = [patient.name for patient in response.context['patients']]
+        self.assertEqual(len(names), PATIENT_LIST_PAGE_SIZE)
+        self.assertEqual(names, sorted(names))
+        self.assertTrue(response.context['page'].has_next())
+        self.assertFalse(response.context['page'].has_previous())
+
+    def test_next_and_previous_cursors(self):
+        # Vérifie que les jetons 'after' et 'before' permettent de parcourir la liste dans les deux sens sans doublon.
+        self.create_patients(PATIENT_LIST_PAGE_SIZE * 2 + 3)
+        first = self.client.get(reverse('patient_list')).context['page']
+        second = self.client.get(reverse('patient_list'), {'after': first.next_cursor}).context['page']
+        self.assertEqual(second.object_list[0].name, f"Patient {PATIENT_LIST_PAGE_SIZE:04d}")
+        third = self.client.get(reverse('patient_list'), {'after': second.next_cursor}).context['page']
+        self.assertEqual(len(third), 3)
+        self.assertFalse(third.has_next())
+        back = self.client.get(reverse('patient_list'), {'before': second.previous_cursor}).context['page']
+        self.assertEqual([p.pk for p in back], [p.pk for p in first])
+        self.assertFalse(back.has_previous())
+
+    def test_duplicate_names_are_not_skipped(self):
+        # Vérifie que des patients homonymes à la frontière entre deux pages ne sont ni perdus ni répétés.
+        Patient.objects.bulk_create(Patient(name="Same Name", date_of_birth=date(2000, 1, 1)) for _ in range(PATIENT_LIST_PAGE_SIZE + 2))
+        first = self.client.get(reverse('patient_list')).context['page']
+        second = self.client.get(reverse('patient_list'), {'after': first.next_cursor}).context['page']
+        seen = [p.pk for p in first] + [p.pk for p in second]
+        self.assertEqual(sorted(seen), list(Patient.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_invalid_cursor(self):
+        # Vérifie qu'un jeton invalide renvoie une erreur 400 au lieu d'une erreur serveur.
+        response = self.client.get(reverse('patient_list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_is_constant(self):
+        # Vérifie que le nombre de requêtes par page ne dépend pas de la taille de la table.
+        self.create_patients(10)
+        small, _ = self.count_list_queries()
+        self.create_patients(500, start=10)
+        large, response = self.count_list_queries()
+        self.assertEqual(small, large)
+        next_page, _ = self.count_list_queries(after=response.context['page'].next_cursor)
+        self.assertEqual(small, next_page)
+
+    def test_only_loads_listed_fields(self):
+        # Vérifie que seuls les champs utilisés par la template sont chargés depuis la base.
+        self.create_patients(1)
+        response = self.client.get(reverse('patient_list'))
+        patient = response.context['patients'][0]
+        loaded = {field.attname for field in Patient._meta.concrete_fields} - patient.get_deferred_fields()
+        self.assertEqual(loaded, {'id', 'name'})
+
+    def test_streaming_mode(self):
+        # Vérifie que le mode streaming renvoie tous les patients, dans l'ordre, avec une seule requête pour les lignes.
+        self.create_patients(PATIENT_LIST_PAGE_SIZE + 10)
+        response = self.client.get(reverse('patient_list'), {'stream': '1'})
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('<li>'), PATIENT_LIST_PAGE_SIZE + 10)
+        self.assertLess(content.index('Patient 0000'), content.index('Patient 0001'))
+        self.assertIn('Add New Patient', content)
+
+    def test_pages_share_the_base_template(self):
+        # Vérifie que la liste, paginée ou en streaming, est une seule page complète construite sur myclinic/base.html, avec la feuille de style commune.
+        self.create_patients(3)
+        response = self.client.get(reverse('patient_list'))
+        self.assertIn('myclinic/base.html', [template.name for template in response.templates])
+        streamed = b''.join(self.client.get(reverse('patient_list'), {'stream': '1'}).streaming_content).decode()
+        for content in (response.content.decode(), streamed):
+            self.assertEqual((content.count('<html>'), content.count('</body>'), content.count('</html>')), (1, 1, 1))
+            self.assertIn('<title>Patients</title>', content)
+            self.assertIn('css/style.css', content)
+            self.assertNotIn('<style>', content)
+            self.assertLess(content.index('Patient 0002'), content.index('</body>'))
+
+    def test_render_benchmark(self):
+        # Vérifie que le benchmark de rendu de la liste compare les deux chargeurs de templates.
+        out = StringIO()
+        call_command('bench_patient_list', rows=30, repeat=2, stdout=out)
+        self.assertIn("30 lignes", out.getvalue())
+        self.assertIn("sans cache", out.getvalue())
+        self.assertIn("Gain du chargeur en cache", out.getvalue())
+
+
+class PatientSearchTests(TestCase):
+    def setUp(self):
+        # Mise en place : un utilisateur connecté et quelques patients aux champs variés.
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.helene = Patient.objects.create(name="Hélène Dupré", date_of_birth=date(1980, 5, 1), contact_info="helene@example.com")
+        self.marc = Patient.objects.create(name="Marc Durand", date_of_birth=date(1975, 3, 2), basic_medical_history="Allergie à la pénicilline")
+        self.other = Patient.objects.create(name="Paul Martin", date_of_birth=date(1990, 7, 3), contact_info="0600000000")
+
+    def search(self, query, **params):
+        # Lance une recherche via la vue patient_list et retourne les patients affichés.
+        response = self.client.get(reverse('patient_list'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['patients'])
+
+    def test_normalize(self):
+        # Vérifie que la normalisation supprime les accents, la casse et les espaces superflus.
+        self.assertEqual(normalize("  Hélène  DUPRÉ "), "helene dupre")
+        self.assertEqual(normalize(None), "")
+
+    def test_search_text_is_kept_up_to_date(self):
+        # Vérifie que la colonne de recherche est calculée à la création, à la modification et par bulk_create.
+        self.assertEqual(self.helene.search_text, "helene dupre\nhelene@example.com\n")
+        self.helene.name = "Hélène Morel"
+        self.helene.save(update_fields=['name'])
+        self.helene.refresh_from_db()
+        self.assertTrue(self.helene.search_text.startswith("helene morel"))
+        [bulk] = Patient.objects.bulk_create([Patient(name="Zoé Leroy", date_of_birth=date(2000, 1, 1))])
+        self.assertEqual(Patient.objects.get(pk=bulk.pk).search_text, "zoe leroy\n\n")
+
+    def test_accent_and_case_insensitive(self):
+        # Vérifie qu'une recherche sans accents ni majuscules retrouve un nom accentué.
+        self.assertEqual(self.search("helene dupre"), [self.helene])
+        self.assertEqual(self.search("DUPRÉ"), [self.helene])
+
+    def test_substring_match(self):
+        # Vérifie qu'une partie du nom suffit, comme avec l'ancien filtre name__icontains.
+        self.assertEqual(self.search("ura"), [self.marc])
+
+    def test_search_covers_contact_and_history(self):
+        # Vérifie que la recherche porte aussi sur le contact et les antécédents médicaux.
+        self.assertEqual(self.search("example.com"), [self.helene])
+        self.assertEqual(self.search("penicilline"), [self.marc])
+
+    def test_short_words(self):
+        # Vérifie que les mots de moins de 3 caractères sont pris en compte.
+        self.assertEqual(self.search("ma"), [self.marc, self.other])
+        self.assertEqual(self.search("durand ma"), [self.marc])
+
+    def test_index_follows_updates_and_deletes(self):
+        # Vérifie que l'index reflète les modifications et les suppressions.
+        self.marc.name = "Marc Bernard"
+        self.marc.save()
+        self.assertEqual(self.search("durand"), [])
+        self.assertEqual(self.search("bernard"), [self.marc])
+        self.marc.delete()
+        self.assertEqual(self.search("bernard"), [])
+
+    def test_bulk_created_patients_are_searchable(self):
+        # Vérifie que les patients créés par bulk_create sont immédiatement trouvables.
+        Patient.objects.bulk_create([Patient(name="Émile Zola", date_of_birth=date(1940, 4, 2))])
+        self.assertEqual([p.name for p in self.search("emile")], ["Émile Zola"])
+
+    def test_ranking_and_pagination(self):
+        # Vérifie que les résultats sont paginés et que chaque patient n'apparaît qu'une fois.
+        Patient.objects.bulk_create(
+            Patient(name=f"Lefebvre {i:02d}", date_of_birth=date(2000, 1, 1)) for i in range(PATIENT_LIST_PAGE_SIZE + 5)
+        )
+        response = self.client.get(reverse('patient_list'), {'q': 'lefebvre'})
+        first = response.context['page']
+        self.assertEqual(len(first), PATIENT_LIST_PAGE_SIZE)
+        self.assertTrue(first.has_next())
+        second = self.search('lefebvre', page=2)
+        self.assertEqual(len(second), 5)
+        self.assertFalse({p.pk for p in first} & {p.pk for p in second})
+
+    def test_trigram_fallback_backend(self):
+        # Vérifie le moteur de repli (index de trigrammes en mémoire) utilisé lorsque FTS5 n'est pas disponible.
+        cited = Patient.objects.create(name="Anne Roy", date_of_birth=date(1970, 1, 1), basic_medical_history="Adressée par Paul Martin")
+        index = TrigramIndex()
+        backend = TrigramSearchBackend(index)
+        self.assertEqual(backend.search("helene"), [self.helene])
+        self.assertEqual(backend.search("penicilline"), [self.marc])
+        self.assertCountEqual(backend.search("ma"), [self.marc, self.other, cited])
+        self.assertEqual(backend.search("martin"), [self.other, cited])  # Le nom correspond : classé avant les antécédents
+        index.update(self.other.pk, "paul bernard\n\n")
+        self.assertEqual(backend.search("bernard"), [self.other])
+        index.discard(self.other.pk)
+        self.assertEqual(backend.search("bernard"), [])
+
+
+class PatientHistoryTests(TestCase):
+    def setUp(self):
+        # Mise en place : un utilisateur connecté, un médecin et un patient sans rendez-vous.
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.today = timezone.localdate()
+
+    def book(self, days, patient=None, hour=9):
+        # Crée un rendez-vous dans 'days' jours (négatif : dans le passé) à l'heure donnée.
+        return Appointment.objects.create(
+            patient=patient or self.patient, doctor=self.doctor, date=self.today + timedelta(days=days), time=time(hour, 0)
+        )
+
+    def book_many(self, past, upcoming):
+        # Crée en une requête 'past' rendez-vous passés et 'upcoming' à venir (un par jour), sans passer par les signaux.
+        Appointment.objects.bulk_create(
+            [Appointment(patient=self.patient, doctor=self.doctor, date=self.today - timedelta(days=i + 1), time=time(9, 0)) for i in range(past)]
+            + [Appointment(patient=self.patient, doctor=self.doctor, date=self.today + timedelta(days=i), time=time(9, 0)) for i in range(upcoming)]
+        )
+        call_command('refresh_patient_visits', all=True, stdout=StringIO())
+
+    def count_queries(self, url, **params):
+        # Compte le nombre de requêtes SQL exécutées pour afficher une page.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_counters_follow_appointment_changes(self):
+        # Vérifie que le nombre de rendez-vous et les dates de visite suivent les créations, déplacements et suppressions.
+        past = self.book(-10)
+        upcoming = self.book(5)
+        self.book(20)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.appointment_count, 3)
+        self.assertEqual(self.patient.last_visit, self.today - timedelta(days=10))
+        self.assertEqual(self.patient.next_visit, self.today + timedelta(days=5))
+        other = Patient.objects.create(name="Other Patient", date_of_birth=date(1990, 1, 1))
+        upcoming.patient = other
+        upcoming.save()
+        past.delete()
+        self.patient.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.patient.appointment_count, self.patient.last_visit), (1, None))
+        self.assertEqual(self.patient.next_visit, self.today + timedelta(days=20))
+        self.assertEqual((other.appointment_count, other.next_visit), (1, self.today + timedelta(days=5)))
+
+    def test_detail_shows_paginated_history(self):
+        # Vérifie que la fiche affiche les rendez-vous à venir (du plus proche) et passés (du plus récent), paginés séparément.
+        self.book_many(past=PATIENT_HISTORY_PAGE_SIZE + 2, upcoming=3)
+        response = self.client.get(reverse('patient_detail', args=[self.patient.pk]))
+        upcoming, past = response.context['upcoming'], response.context['past']
+        self.assertEqual([a.date for a in upcoming], [self.today + timedelta(days=i) for i in range(3)])
+        self.assertFalse(upcoming.has_next())
+        self.assertEqual(len(past), PATIENT_HISTORY_PAGE_SIZE)
+        self.assertEqual(past.object_list[0].date, self.today - timedelta(days=1))
+        self.assertTrue(past.has_next())
+        response = self.client.get(reverse('patient_detail', args=[self.patient.pk]), {'past': 2})
+        self.assertEqual(len(response.context['past']), 2)
+        self.assertContains(response, "Dr. Smith")
+        self.assertEqual(self.client.get(reverse('patient_detail', args=[self.patient.pk]), {'past': 0}).status_code, 400)
+
+    def test_detail_query_count_is_constant(self):
+        # Vérifie que le nombre de requêtes de la fiche ne dépend pas du nombre de rendez-vous (pas de requête par médecin).
+        url = reverse('patient_detail', args=[self.patient.pk])
+        empty, _ = self.count_queries(url)
+        self.book_many(past=30, upcoming=30)
+        full, response = self.count_queries(url)
+        self.assertEqual(empty, full)
+        self.assertEqual(len(response.context['upcoming']), PATIENT_HISTORY_PAGE_SIZE)
+
+    def test_list_sorted_by_next_visit(self):
+        # Vérifie le tri par prochaine visite : patients sans rendez-vous à venir exclus, nombre de requêtes constant.
+        later = Patient.objects.create(name="A Later Patient", date_of_birth=date(1990, 1, 1))
+        Patient.objects.create(name="No Visit", date_of_birth=date(1990, 1, 1))
+        self.book(2)
+        self.book(7, patient=later)
+        small, response = self.count_queries(reverse('patient_list'), sort='next_visit')
+        self.assertEqual(list(response.context['patients']), [self.patient, later])
+        self.assertContains(response, "Test Patient (next visit:")
+        for i in range(50):
+            self.book(10 + i, patient=Patient.objects.create(name=f"Patient {i:02d}", date_of_birth=date(1990, 1, 1)))
+        large, response = self.count_queries(reverse('patient_list'), sort='next_visit')
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context['patients']), PATIENT_LIST_PAGE_SIZE)
+        self.assertEqual(self.client.get(reverse('patient_list'), {'sort': 'unknown'}).status_code, 400)
+
+    def test_stale_next_visits_are_refreshed(self):
+        # Vérifie qu'une prochaine visite devenue passée est recalculée avant l'affichage de la liste triée.
+        self.book(3)
+        self.book(-1)
+        Patient.objects.filter(pk=self.patient.pk).update(next_visit=self.today - timedelta(days=1))  # Simule le passage du temps
+        response = self.client.get(reverse('patient_list'), {'sort': 'next_visit'})
+        self.assertEqual(list(response.context['patients']), [self.patient])
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.next_visit, self.today + timedelta(days=3))
+
+
+class PatientCacheTests(TestCase):
+    def setUp(self):
+        # Mise en place : un cache vide, un utilisateur connecté et un patient.
+        cache.clear()
+        caching.stats.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.url = reverse('patient_detail', args=[self.patient.pk])
+
+    def patient_queries(self, url):
+        # Retourne la réponse et les requêtes SQL portant sur les patients ou les rendez-vous.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q for q in queries if 'patient_app_patient' in q['sql'] or 'scheduler_app_appointment' in q['sql']]
+
+    def test_detail_is_served_from_cache(self):
+        # Vérifie que la deuxième visite de la fiche ne lit ni le patient ni ses rendez-vous (seulement leur date de modification), et que c'est compté comme un succès.
+        self.client.get(self.url)
+        response, queries = self.patient_queries(self.url)
+        self.assertContains(response, "Test Patient")
+        self.assertEqual([query['sql'][:11] for query in queries], ['SELECT MAX('])
+        self.assertEqual(caching.stats.snapshot()['patient_detail'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        self.assertEqual(response.headers['Cache-Control'], 'private')
+
+    def test_detail_is_invalidated_on_changes(self):
+        # Vérifie qu'une modification du patient (vue ou admin) ou de ses rendez-vous apparaît immédiatement.
+        self.client.get(self.url)
+        self.client.post(reverse('patient_update', args=[self.patient.pk]), {'name': 'Updated Patient', 'date_of_birth': '2000-01-01'})
+        self.assertContains(self.client.get(self.url), "Updated Patient")
+        doctor = Doctor.objects.create(name="Dr. Smith")
+        Appointment.objects.create(patient=self.patient, doctor=doctor, date=timezone.localdate(), time=time(9, 0))
+        self.assertContains(self.client.get(self.url), "Dr. Smith")
+        doctor.name = "Dr. Jones"
+        doctor.save()
+        self.assertContains(self.client.get(self.url), "Dr. Jones")
+        self.patient.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_list_is_invalidated_on_changes(self):
+        # Vérifie que la liste en cache suit les créations, y compris par bulk_create.
+        self.assertContains(self.client.get(reverse('patient_list')), '<li>', count=1)
+        _, queries = self.patient_queries(reverse('patient_list'))
+        self.assertEqual(queries, [])
+        Patient.objects.create(name="Another Patient", date_of_birth=date(2000, 1, 1))
+        self.assertContains(self.client.get(reverse('patient_list')), '<li>', count=2)
+        Patient.objects.bulk_create([Patient(name="Bulk Patient", date_of_birth=date(2000, 1, 1))])
+        self.assertContains(self.client.get(reverse('patient_list')), '<li>', count=3)
+
+    def test_entries_are_not_shared_across_audiences(self):
+        # Vérifie qu'un administrateur ne reçoit pas la page mise en cache pour un utilisateur ordinaire, et que la page ne contient rien de propre à l'utilisateur.
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "testuser")
+        staff = User.objects.create_user(username='staffuser', password='testpassword', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(self.url)
+        self.assertEqual(caching.stats.snapshot()['patient_detail']['misses'], 2)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)  # La connexion est vérifiée avant le cache
+
+    def test_stats_view_is_staff_only(self):
+        # Vérifie que les statistiques du cache sont réservées aux administrateurs et peuvent être remises à zéro.
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(reverse('cache_stats')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get(reverse('cache_stats'), {'reset': '1'}).json()
+        self.assertEqual(data['namespaces']['patient_detail']['misses'], 1)
+        self.assertEqual(self.client.get(reverse('cache_stats')).json()['namespaces'], {})
+
+
+class PatientConditionalTests(TestCase):
+    def setUp(self):
+        # Mise en place : un cache vide, un utilisateur connecté, un patient et un rendez-vous à venir.
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        self.appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=timezone.localdate() + timedelta(days=1), time=time(9, 0)
+        )
+        self.url = reverse('patient_detail', args=[self.patient.pk])
+
+    def test_not_modified_without_reading_history(self):
+        # Vérifie qu'un navigateur qui présente l'ETag ou la date de la fiche reçoit 304, après la seule requête MAX(updated_at), sans rendu.
+        response = self.client.get(self.url)
+        self.assertIn('Cookie', response.headers['Vary'])
+        self.assertEqual(response.headers['Cache-Control'], 'private')
+        stats = caching.stats.snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(self.url, headers={'if-none-match': response.headers['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(caching.stats.snapshot(), stats)  # La vue ne s'est pas exécutée, pas même la lecture du cache des pages
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified.templates, [])
+        self.assertEqual(not_modified.headers['ETag'], response.headers['ETag'])
+        self.assertIn('Cookie', not_modified.headers['Vary'])
+        tables = [q['sql'] for q in queries if 'patient_app_patient' in q['sql'] or 'scheduler_app_appointment' in q['sql']]
+        self.assertEqual(len(tables), 1)
+        self.assertTrue(tables[0].startswith('SELECT MAX('))
+        since = self.client.get(self.url, headers={'if-modified-since': response.headers['Last-Modified']})
+        self.assertEqual(since.status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': '"other"'}).status_code, 200)
+
+    def test_validators_follow_changes(self):
+        # Vérifie que l'ETag change avec le patient, ses rendez-vous (un à un, par lot ou supprimés), la page demandée et le public visé.
+        seen = [self.client.get(self.url).headers['ETag']]
+
+        def assertChanged(**params):
+            response = self.client.get(self.url, params, headers={'if-none-match': seen[-1]})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(response.headers['ETag'], seen)
+            seen.append(response.headers['ETag'])
+
+        self.patient.contact_info = "0601020304"
+        self.patient.save()
+        assertChanged()
+        batch.reschedule(Appointment.objects.filter(pk=self.appointment.pk), timedelta(hours=1))
+        assertChanged()
+        Appointment.all_objects.filter(pk=self.appointment.pk).delete()
+        assertChanged()
+        assertChanged(past=2)
+        self.client.force_login(User.objects.create_user(username='staffuser', password='testpassword', is_staff=True))
+        assertChanged(past=2)
+        self.patient.delete()
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': seen[-1]}).status_code, 404)
+
+
+class PatientSoftDeleteTests(TestCase):
+    def setUp(self):
+        # Mise en place : un utilisateur connecté et un patient avec un rendez-vous passé et un rendez-vous à venir.
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.patient = Patient.objects.create(name="Marc Durand", date_of_birth=date(1975, 3, 2))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        today = timezone.localdate()
+        for day in (today - timedelta(days=7), today + timedelta(days=7)):
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=day, time=time(9, 0))
+
+    def test_delete_is_a_flag(self):
+        # Vérifie que la suppression marque le patient, masque partout le patient et ses rendez-vous (annulés), sans rien supprimer.
+        self.assertEqual(self.client.get(reverse('patient_list'), {'q': 'durand'}).context['patients'][0], self.patient)
+        self.client.post(reverse('patient_delete', args=[self.patient.pk]))
+        self.assertFalse(Patient.objects.exists())
+        self.assertIsNotNone(Patient.all_objects.get(pk=self.patient.pk).deleted_at)
+        self.assertEqual(self.client.get(reverse('patient_detail', args=[self.patient.pk])).status_code, 404)
+        self.assertEqual(list(self.client.get(reverse('patient_list'), {'q': 'durand'}).context['patients']), [])
+        self.assertEqual(list(self.client.get(reverse('patient_list')).context['patients']), [])
+        self.assertFalse(Appointment.objects.exists())
+        self.assertEqual(Appointment.all_objects.filter(status=Appointment.CANCELLED).count(), 2)
+        self.assertEqual(Patient.objects.filter(pk=self.patient.pk).delete(), (0, {'patient_app.Patient': 0}))
+
+    def test_hard_delete_cascades(self):
+        # Vérifie que la suppression définitive supprime aussi les rendez-vous.
+        Patient.all_objects.filter(pk=self.patient.pk).hard_delete()
+        self.assertFalse(Patient.all_objects.exists())
+        self.assertFalse(Appointment.all_objects.exists())
+
+    def test_admin_lists_deleted_patients(self):
+        # Vérifie que l'administration affiche les patients supprimés et permet de les filtrer.
+        self.patient.delete()
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        url = reverse('admin:patient_app_patient_changelist')
+        self.assertContains(self.client.get(url), "Marc Durand")
+        self.assertEqual(self.client.get(url, {'deleted_at__isempty': '0'}).context['cl'].result_count, 1)
+        self.assertEqual(self.client.get(url, {'deleted_at__isempty': '1'}).context['cl'].result_count, 0)
+
+
+class PatientAsyncViewTests(TestCase):
+    def setUp(self):
+        # Mise en place : un client asynchrone (requêtes ASGI) connecté et quelques patients.
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.async_client = AsyncClient()
+        self.patients = Patient.objects.bulk_create(
+            Patient(name=f"Patient {i:02d}", date_of_birth=date(2000, 1, 1)) for i in range(PATIENT_LIST_PAGE_SIZE + 3)
+        )
+
+    async def test_login_required(self):
+        # Vérifie que les vues asynchrones redirigent toujours les utilisateurs non connectés.
+        response = await self.async_client.get(reverse('patient_list'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_list_and_detail(self):
+        # Vérifie la liste paginée, la recherche et la fiche (ou 404) servies par les vues asynchrones.
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('patient_list'))
+        self.assertContains(response, '<li>', count=PATIENT_LIST_PAGE_SIZE)
+        self.assertContains(response, '?after=')
+        response = await self.async_client.get(reverse('patient_list'), {'q': 'patient 07'})
+        self.assertContains(response, 'Patient 07')
+        response = await self.async_client.get(reverse('patient_detail', args=[self.patients[0].pk]))
+        self.assertContains(response, 'Patient 00')
+        response = await self.async_client.get(reverse('patient_detail', args=[self.patients[-1].pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_stream_is_asynchronous(self):
+        # Vérifie que, sous ASGI, la liste en streaming est produite par un itérateur asynchrone (aiterator).
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('patient_list'), {'stream': '1'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(content.count('<li>'), len(self.patients))
+
+
+class PatientVersionTests(TestCase):
+    def setUp(self):
+        # Mise en place : un utilisateur connecté et un patient.
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.patient = Patient.objects.create(name="Marc Durand", date_of_birth=date(1975, 3, 2), contact_info="0600000000")
+        self.url = reverse('patient_update', args=[self.patient.pk])
+
+    def test_save_writes_changed_fields_with_compare_and_swap(self):
+        # Vérifie qu'un enregistrement n'écrit que les champs modifiés, par une requête conditionnée par la version, et qu'une copie périmée est refusée.
+        first, second = Patient.objects.get(pk=self.patient.pk), Patient.objects.get(pk=self.patient.pk)
+        first.contact_info = "0611111111"
+        with CaptureQueriesContext(connection) as queries:
+            first.save()
+        [update] = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "patient_app_patient"')]
+        self.assertIn('"version" = 2', update)
+        self.assertIn('"version" = 1', update.split('WHERE')[1])
+        self.assertNotIn('"name"', update)
+        self.assertEqual(first.version, 2)
+        second.name = "Marc Bernard"
+        with self.assertRaises(VersionConflict):
+            second.save()
+        self.assertEqual(second.version, 1)
+        self.assertEqual(Patient.objects.values_list('name', 'contact_info', 'version').get(), ("Marc Durand", "0611111111", 2))
+        with self.assertNumQueries(0):
+            first.save()  # Rien de modifié : rien n'est écrit
+
+    def test_conflict_shows_merge_prompt(self):
+        # Vérifie qu'un formulaire envoyé après une autre modification propose une fusion, puis que la fusion enregistrée garde les deux modifications.
+        alice, bob = form_data(self.client.get(self.url).context['form']), form_data(self.client.get(self.url).context['form'])
+        self.assertEqual(alice['version'], '1')
+        self.assertRedirects(self.client.post(self.url, {**alice, 'name': "Marc Bernard"}), reverse('patient_detail', args=[self.patient.pk]))
+        response = self.client.post(self.url, {**bob, 'contact_info': "0622222222", 'basic_medical_history': "Asthme"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "changed by someone else")
+        form = response.context['form']
+        self.assertEqual(form.conflicts, [])
+        merged = form_data(form)
+        self.assertEqual((merged['name'], merged['contact_info'], merged['version']), ("Marc Bernard", "0622222222", 2))
+        self.assertEqual(Patient.objects.get().contact_info, "0600000000")  # Rien n'a été écrit
+        self.client.post(self.url, merged)
+        self.assertEqual(Patient.objects.values_list('name', 'contact_info', 'basic_medical_history', 'version').get(), (
+            "Marc Bernard", "0622222222", "Asthme", 3,
+        ))
+        # Les deux côtés modifient le même champ : le conflit est listé, la valeur saisie est gardée
+        response = self.client.post(self.url, {**bob, 'name': "Marc Martin"})
+        self.assertEqual(response.context['form'].conflicts, [("Name", "Marc Martin", "Marc Bernard")])
+        self.assertContains(response, "Saved value")
+        self.assertEqual(form_data(response.context['form'])['name'], "Marc Martin")
+
+    def test_soft_delete_changes_version(self):
+        # Vérifie qu'un formulaire ouvert sur un patient supprimé entre-temps ne peut pas l'enregistrer.
+        stale = Patient.objects.get(pk=self.patient.pk)
+        Patient.objects.filter(pk=self.patient.pk).delete()
+        stale.name = "Marc Bernard"
+        with self.assertRaises(VersionConflict):
+            stale.save()
+
+    def test_edit_after_soft_delete_reports_deletion(self):
+        # Vérifie qu'un formulaire enregistré après la suppression logique du patient signale la suppression au lieu de proposer une fusion.
+        stale = Patient.objects.get(pk=self.patient.pk)
+        data = form_data(PatientForm(instance=stale))
+        Patient.objects.filter(pk=self.patient.pk).delete()
+        form = PatientForm({**data, 'name': "Marc Bernard"}, instance=stale)
+        self.assertTrue(form.is_valid())
+        with self.assertRaises(VersionConflict):
+            form.save()
+        form.merge_conflict()
+        self.assertEqual((form.non_field_errors(), form.conflicts), ([DELETED_MESSAGE], ()))
+
+
+class ConcurrentPatientUpdateTests(TransactionTestCase):
+    def test_parallel_updates_lose_nothing(self):
+        # Lance de nombreuses modifications simultanées du même patient (lecture, modification, comparaison et échange, nouvel essai en cas de conflit) : aucune ne doit être perdue ni bloquée.
+        threads_count, updates = 8, 10
+        barrier = threading.Barrier(threads_count)
+        conflicts, errors = [], []
+
+        def update(pk, index):
+            try:
+                barrier.wait()
+                for number in range(updates):
+                    while True:
+                        patient = Patient.objects.get(pk=pk)
+                        patient.basic_medical_history = f"{patient.basic_medical_history}{index}.{number};"
+                        try:
+                            patient.save()
+                            break
+                        except VersionConflict:
+                            conflicts.append(index)
+            except Exception as exc:  # Toute exception non gérée (base verrouillée, ...) fait échouer le test
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        def scenario():
+            pk = Patient.objects.create(name="Marc Durand", date_of_birth=date(1975, 3, 2), basic_medical_history="").pk
+            threads = [threading.Thread(target=update, args=(pk, index)) for index in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return Patient.objects.values_list('basic_medical_history', 'version').get(pk=pk)
+
+        history, version = in_database_file(scenario)
+        self.assertEqual(errors, [])
+        tokens = history.rstrip(';').split(';')
+        self.assertEqual(sorted(tokens), sorted(f"{index}.{number}" for index in range(threads_count) for number in range(updates)))
+        self.assertEqual(version, threads_count * updates + 1)
@@ -1,39 +1,233 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from datetime import datetime, time
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import BadRequest
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Max, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from myclinic import caching
+from myclinic.concurrency import VersionConflict
+from myclinic.conditional import conditional_page, page_validators
+from myclinic.database import read_replica
+from scheduler_app.models import Appointment
+from scheduler_app.visits import refresh_stale_visits
 from .models import Patient
 from .forms import PatientForm
+from .pagination import KeysetPaginator, OffsetPage
+from .search import get_search_backend, search_patients
+
+# Nombre de patients affichés par page dans la liste
+PATIENT_LIST_PAGE_SIZE = 25
+# Nombre de lignes lues à la fois depuis le curseur de la base en mode streaming
+PATIENT_STREAM_CHUNK_SIZE = 2000
+# Tri stable utilisé pour la pagination par curseur (le nom n'étant pas unique, la clé primaire départage)
+PATIENT_LIST_ORDERING = ('name', 'pk')
+# Tris proposés par la liste des patients (paramètre 'sort') : {nom: (tri stable, champs chargés)}
+PATIENT_LIST_SORTS = {
+    'name': (PATIENT_LIST_ORDERING, ('pk', 'name')),
+    'next_visit': (('next_visit', 'pk'), ('pk', 'name', 'next_visit')),
+}
+# Nombre de rendez-vous affichés par page dans l'historique d'un patient (à venir et passés)
+PATIENT_HISTORY_PAGE_SIZE = 10
+
+
+def _page_number(request, name):
+    """
+    Lit un numéro de page dans les paramètres GET (1 par défaut).
+    """
+    try:
+        number = int(request.GET.get(name, 1))
+    except ValueError:
+        raise BadRequest("Numéro de page invalide.")
+    if number < 1:
+        raise BadRequest("Numéro de page invalide.")
+    return number
 
 # Décorateur @login_required : assure que seules les personnes connectées peuvent accéder à ces vues.
+# cache_control(private=True) : les pages ne doivent pas être conservées par un cache partagé (proxy).
+# Les vues de lecture (liste, fiche) sont asynchrones : sous ASGI, elles s'exécutent dans la boucle d'événements
+# et n'occupent un fil d'exécution que le temps des requêtes SQL (ORM asynchrone).
+# @read_replica : leurs lectures passent par la réplique en lecture seule, si elle est configurée (myclinic/database.py).
 @login_required
-def patient_list(request):
+@cache_control(private=True)
+@read_replica
+async def patient_list(request):
     """
-    Affiche la liste des patients. Permet également de rechercher des patients par nom.
+    Affiche la liste des patients, triée par nom. Permet également de rechercher des patients.
+
+    Sans recherche, la liste est paginée par curseur (paramètres 'after' / 'before' contenant des jetons opaques),
+    ce qui garde un nombre de requêtes constant quelle que soit la taille de la table.
+    Avec une recherche ('q'), les résultats viennent du moteur de recherche indexé, classés par pertinence et paginés par numéro ('page').
+    Avec '?stream=1', toute la liste est envoyée en streaming, ligne par ligne, au fil du curseur SQL.
+    Avec '?sort=next_visit', seuls les patients ayant un rendez-vous à venir sont listés, du plus proche au plus lointain
+    (tri sur le champ dénormalisé Patient.next_visit et son index, sans sous-requête par ligne).
+    Les pages de la liste (hors recherche et streaming) sont mises en cache jusqu'à la prochaine modification d'un patient.
     """
     # Récupère le paramètre 'q' de la requête GET (utilisé pour la recherche)
     query = request.GET.get('q')
-    
+    sort = request.GET.get('sort') or 'name'
+    if sort not in PATIENT_LIST_SORTS:
+        raise BadRequest("Tri invalide.")
+
     if query:  # Si une requête de recherche est présente
-        # Filtre les patients dont le nom contient la chaîne de recherche
-        patients = Patient.objects.filter(name__icontains=query)
-    else:  # Sinon, affiche tous les patients
-        patients = Patient.objects.all()
-    
-    return render(request, 'patient_app/patient_list.html', {'patients': patients, 'query': query})
+        # Le moteur de recherche (SQL brut sur l'index FTS5) est synchrone : il s'exécute dans un fil d'exécution
+        if request.GET.get('stream'):
+            results = await sync_to_async(lambda: get_search_backend().search(query))()
+            return _stream_patient_list(request, results, query)
+        try:
+            page_number = int(request.GET.get('page', 1))
+        except ValueError:
+            raise BadRequest("Numéro de page invalide.")
+        return await sync_to_async(_render_search_page)(request, query, page_number, sort)
+
+    # Sinon, affiche tous les patients
+    ordering, fields = PATIENT_LIST_SORTS[sort]
+    # Ne charge que les champs utilisés par la template de la liste
+    patients = Patient.objects.only(*fields)
+    if sort == 'next_visit':
+        # Les prochaines visites passées depuis le dernier recalcul sont d'abord remises à jour
+        await sync_to_async(refresh_stale_visits)()
+        patients = patients.filter(next_visit__isnull=False)
+    if request.GET.get('stream'):
+        patients = patients.order_by(*ordering)
+        # Sous ASGI, un itérateur synchrone serait lu en entier avant l'envoi : on parcourt le curseur de façon asynchrone
+        if isinstance(request, ASGIRequest):
+            rows = patients.aiterator(chunk_size=PATIENT_STREAM_CHUNK_SIZE)
+        else:
+            rows = patients.iterator(chunk_size=PATIENT_STREAM_CHUNK_SIZE)
+        return _stream_patient_list(request, rows, query, sort)
+    cursor = request.GET.get('before') or request.GET.get('after')
+    paginator = KeysetPaginator(patients, ordering, PATIENT_LIST_PAGE_SIZE)
+
+    async def render_page():
+        page = await paginator.apage(cursor)
+        context = {'patients': page.object_list, 'page': page, 'query': query, 'sort': sort}
+        return render_to_string('patient_app/patient_list.html', context)
+
+    # Le jeton de pagination contient lui-même le sens de parcours
+    parts = (sort, cursor, caching.audience(await request.auser()))
+    return HttpResponse(await caching.acached_page('patient_list', parts, [caching.PATIENT_LIST], render_page))
+
+
+def _render_search_page(request, query, page_number, sort):
+    """
+    Affiche une page de résultats de recherche (moteur synchrone, voir patient_list).
+    """
+    # Recherche dans le nom, le contact et les antécédents, sans tenir compte des accents ni de la casse
+    page = search_patients(query, page=page_number, page_size=PATIENT_LIST_PAGE_SIZE)
+    context = {'patients': page.object_list, 'page': page, 'query': query, 'sort': sort}
+    return render(request, 'patient_app/patient_list.html', context)
+
+
+def _stream_patient_list(request, patients, query, sort='name'):
+    """
+    Construit une réponse en streaming : l'en-tête, puis chaque ligne rendue à mesure qu'elle sort du curseur, puis le pied de page.
+    Pour la liste complète, la mémoire utilisée reste bornée par PATIENT_STREAM_CHUNK_SIZE, quelle que soit la taille de la table.
+    'patients' peut être un itérable synchrone ou asynchrone (aiterator()) : la réponse est alors elle-même asynchrone.
+    """
+    header = get_template('patient_app/patient_list_header.html')
+    row = get_template('patient_app/patient_row.html')
+    footer = get_template('patient_app/patient_list_footer.html')
+
+    if hasattr(patients, '__aiter__'):
+        async def rows():
+            yield header.render({'query': query, 'sort': sort}, request)
+            async for patient in patients:
+                yield row.render({'patient': patient, 'sort': sort})
+            yield footer.render({}, request)
+    else:
+        def rows():
+            yield header.render({'query': query, 'sort': sort}, request)
+            for patient in patients:
+                yield row.render({'patient': patient, 'sort': sort})
+            yield footer.render({}, request)
+
+    return StreamingHttpResponse(rows(), content_type='text/html; charset=utf-8')
+
+
+def _patient_detail_validators(request, pk):
+    """
+    Validateurs HTTP de la fiche patient (voir myclinic/conditional.py) : dernière modification du patient ou de l'un de
+    ses rendez-vous, lue en une requête, et au moins le début du jour (la séparation entre rendez-vous à venir et passés
+    en dépend).
+    """
+    appointments = (
+        Appointment.all_objects.filter(patient_id=OuterRef('pk')).order_by().values('patient_id')
+        .annotate(last=Max('updated_at')).values('last')
+    )
+    last_modified = (
+        Patient.objects.filter(pk=pk)
+        .values_list(Greatest('updated_at', Coalesce(Subquery(appointments), 'updated_at')), flat=True).first()
+    )
+    if last_modified is None:
+        return None  # Patient introuvable : la vue répond 404
+    today = timezone.localdate()
+    last_modified = max(last_modified, timezone.make_aware(datetime.combine(today, time())))
+    parts = ('patient_detail', pk, request.GET.get('upcoming'), request.GET.get('past'), today, caching.audience(request.user))
+    return page_validators(last_modified, parts, [caching.patient_version(pk), caching.ALL_PATIENTS, caching.DOCTORS])
 
 
 @login_required
-def patient_detail(request, pk):
+@cache_control(private=True)
+@read_replica
+@conditional_page(_patient_detail_validators)
+async def patient_detail(request, pk):
     """
-    Affiche les détails d'un patient spécifique.
+    Affiche les détails d'un patient spécifique, avec l'historique de ses rendez-vous :
+    les rendez-vous à venir (du plus proche au plus lointain) et passés (du plus récent au plus ancien),
+    paginés séparément (paramètres 'upcoming' et 'past').
+
+    Les deux pages de rendez-vous (avec leur médecin) sont chargées par un seul prefetch_related(), une requête par liste,
+    limitée à la page demandée : le nombre de requêtes ne dépend pas du nombre de rendez-vous du patient.
+    La page rendue est mise en cache jusqu'à la prochaine modification du patient, de l'un de ses rendez-vous ou d'un médecin,
+    et au plus jusqu'au lendemain (la séparation entre rendez-vous à venir et passés dépend du jour).
+    Un navigateur qui a déjà la page à jour (If-None-Match / If-Modified-Since) reçoit 304, sans lecture de l'historique ni rendu.
 
     Args:
         pk: La clé primaire (identifiant) du patient à afficher.
     """
-    # Récupère le patient dont la clé primaire est 'pk', ou retourne une erreur 404 si non trouvé.
-    patient = get_object_or_404(Patient, pk=pk)
-    
-    # Rend la template avec les données du patient
-    return render(request, 'patient_app/patient_detail.html', {'patient': patient})
+    upcoming_number, past_number = _page_number(request, 'upcoming'), _page_number(request, 'past')
+    today = timezone.localdate()
+    parts = (pk, upcoming_number, past_number, today, caching.audience(await request.auser()))
+    versions = [caching.patient_version(pk), caching.ALL_PATIENTS, caching.DOCTORS]
+    html = await caching.acached_page(
+        'patient_detail', parts, versions, lambda: _render_patient_detail(pk, upcoming_number, past_number, today)
+    )
+    return HttpResponse(html)
+
+
+async def _render_patient_detail(pk, upcoming_number, past_number, today):
+    """
+    Charge le patient et les pages demandées de son historique, puis rend la fiche (sans la requête, pour le cache).
+    """
+    history = Appointment.objects.select_related('doctor').defer('internal_admin_notes')
+    upcoming_start, upcoming_end = OffsetPage.bounds(upcoming_number, PATIENT_HISTORY_PAGE_SIZE)
+    past_start, past_end = OffsetPage.bounds(past_number, PATIENT_HISTORY_PAGE_SIZE)
+    patients = Patient.objects.prefetch_related(
+        Prefetch(
+            'appointment_set',
+            queryset=history.filter(date__gte=today).order_by('date', 'time', 'pk')[upcoming_start:upcoming_end],
+            to_attr='upcoming_appointments',
+        ),
+        Prefetch(
+            'appointment_set',
+            queryset=history.filter(date__lt=today).order_by('-date', '-time', '-pk')[past_start:past_end],
+            to_attr='past_appointments',
+        ),
+    )
+    # Récupère le patient dont la clé primaire est 'pk' (avec ses rendez-vous), ou retourne une erreur 404 si non trouvé.
+    patient = await aget_object_or_404(patients, pk=pk)
+    upcoming = OffsetPage(patient.upcoming_appointments, upcoming_number, PATIENT_HISTORY_PAGE_SIZE)
+    past = OffsetPage(patient.past_appointments, past_number, PATIENT_HISTORY_PAGE_SIZE)
+
+    # Rend la template avec les données du patient et de ses rendez-vous
+    return render_to_string('patient_app/patient_detail.html', {'patient': patient, 'upcoming': upcoming, 'past': past})
 
 
 @login_required
@@ -66,8 +260,12 @@ def patient_update(request, pk):
     if request.method == 'POST':  # Si le formulaire est soumis
         form = PatientForm(request.POST, instance=patient) # Crée un formulaire avec les données soumises et le patient existant
         if form.is_valid(): # Si le formulaire est valide
-            form.save()  # Met à jour les informations du patient dans la base de données
-            return redirect('patient_detail', pk=patient.pk) # Redirige vers la page de détail du patient
+            try:
+                form.save()  # Met à jour les champs modifiés, si le patient n'a pas changé depuis l'affichage du formulaire
+            except VersionConflict:
+                form.merge_conflict()  # Modifié entre-temps : le formulaire fusionné est affiché de nouveau
+            else:
+                return redirect('patient_detail', pk=patient.pk) # Redirige vers la page de détail du patient
     else:  # Si c'est une requête GET (première visite de la page)
         form = PatientForm(instance=patient) # Crée un formulaire pré-rempli avec les données du patient
     
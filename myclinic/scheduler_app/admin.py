@@ -1,5 +1,18 @@
-from django.contrib import admin
-from .models import Appointment
+from datetime import timedelta
+
+from django.contrib import admin, messages
+from . import batch
+from .models import Appointment, ArchivedAppointment, Doctor
+
+@admin.register(Doctor)
+class DoctorAdmin(admin.ModelAdmin):
+    """
+    Configuration de l'interface d'administration pour le modèle Doctor.
+    """
+    # Les champs à afficher dans la liste des médecins
+    list_display = ('name',)
+    # Recherche par nom (utilisée aussi par l'autocomplétion des rendez-vous)
+    search_fields = ('name',)
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
@@ -8,10 +21,77 @@ class AppointmentAdmin(admin.ModelAdmin):
     Cette classe définit comment les objets Appointment sont affichés et gérés dans l'interface d'administration Django.
     """
     # Les champs à afficher dans la liste des rendez-vous
-    list_display = ('patient', 'date', 'time', 'doctor_name')
+    list_display = ('patient', 'date', 'time', 'doctor', 'status')
     # Les champs par lesquels filtrer la liste des rendez-vous
-    list_filter = ('date', 'doctor_name')
+    # (le filtre par médecin lit la table des médecins au lieu d'un SELECT DISTINCT sur les rendez-vous)
+    list_filter = ('status', 'date', 'doctor')
     # Les champs dans lesquels effectuer une recherche de rendez-vous
-    search_fields = ('patient__name', 'doctor_name')
+    search_fields = ('patient__name', 'doctor__name')
+    # Charge le patient et le médecin de chaque ligne dans la même requête
+    list_select_related = ('patient', 'doctor')
+    # Sélection du patient et du médecin par recherche plutôt que par une liste déroulante complète
+    autocomplete_fields = ('patient', 'doctor')
     # Les champs modifiables dans l'interface d'administration (incluant internal_admin_notes)
-    fields = ('patient', 'date', 'time', 'doctor_name', 'internal_admin_notes')
\ No newline at end of file
+    fields = ('patient', 'date', 'time', 'doctor', 'status', 'internal_admin_notes')
+    # Opérations par lots sur la sélection (une seule requête d'écriture chacune, voir batch.py)
+    actions = ('cancel_appointments', 'mark_no_show', 'postpone_one_week', 'repeat_weekly')
+
+    def get_queryset(self, request):
+        # L'administration affiche aussi les rendez-vous annulés (comme ModelAdmin.get_queryset, avec all_objects)
+        queryset = Appointment.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    @admin.action(description="Cancel selected appointments")
+    def cancel_appointments(self, request, queryset):
+        self.message_user(request, f"{batch.cancel(queryset)} appointment(s) cancelled.")
+
+    @admin.action(description="Mark selected past appointments as no-show")
+    def mark_no_show(self, request, queryset):
+        self.message_user(request, f"{batch.mark_no_show(queryset)} appointment(s) marked as no-show.")
+
+    @admin.action(description="Move selected appointments one week later")
+    def postpone_one_week(self, request, queryset):
+        try:
+            moved = batch.reschedule(queryset, timedelta(weeks=1))
+        except batch.BatchConflict as exc:
+            self.message_user(request, f"Nothing moved: {len(exc.conflicts)} appointment(s) would overlap.", messages.ERROR)
+        else:
+            self.message_user(request, f"{moved} appointment(s) moved.")
+
+    @admin.action(description="Repeat selected appointments weekly for 12 weeks")
+    def repeat_weekly(self, request, queryset):
+        # Chaque rendez-vous sélectionné devient le premier d'une série de 12 semaines ; chaque série est créée
+        # entièrement ou pas du tout
+        created, conflicting = 0, 0
+        for appointment in queryset.filter(status=Appointment.SCHEDULED).select_related('patient', 'doctor'):
+            try:
+                created += len(batch.create_series(
+                    appointment.patient, appointment.doctor, appointment.date + timedelta(weeks=1), appointment.time,
+                    count=11, duration=appointment.duration,
+                ))
+            except batch.BatchConflict:
+                conflicting += 1
+        self.message_user(request, f"{created} appointment(s) created.")
+        if conflicting:
+            self.message_user(request, f"{conflicting} series not created: overlapping appointments.", messages.ERROR)
+
+
+@admin.register(ArchivedAppointment)
+class ArchivedAppointmentAdmin(admin.ModelAdmin):
+    """
+    Consultation de l'archive des rendez-vous anciens (voir archiving.py), en lecture seule.
+    """
+    list_display = ('patient', 'date', 'time', 'doctor', 'status', 'archived_at')
+    list_filter = ('status', 'date', 'doctor')
+    search_fields = ('patient__name', 'doctor__name')
+    list_select_related = ('patient', 'doctor')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
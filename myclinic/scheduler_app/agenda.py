@@ -0,0 +1,107 @@
+"""
+Agenda des rendez-vous par fenêtre de dates.
+
+Chaque (médecin, jour) forme un "compartiment" mis en cache : les lignes du jour sont chargées avec un filtre
+d'intervalle sur l'index (date, time) ou (doctor, date, time), sans instancier de modèles.
+Chaque compartiment porte une version (voir myclinic/caching.py), changée à chaque modification d'un rendez-vous
+de ce médecin et de ce jour, ou d'un nom de patient ou de médecin affiché : l'ancienne entrée n'est alors plus jamais lue
+et expire d'elle-même.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import F
+
+from myclinic import caching
+from .models import Appointment
+
+# Durée de vie (secondes) d'un compartiment (médecin, jour) dans le cache
+AGENDA_CACHE_TIMEOUT = 60 * 60
+# Nombre maximal de jours affichés par une requête d'agenda
+AGENDA_MAX_DAYS = 31
+# Clé utilisée pour le compartiment "tous les médecins"
+ALL_DOCTORS = '*'
+
+# Colonnes chargées pour l'agenda : seuls les noms du patient et du médecin sont lus dans les tables liées
+AGENDA_FIELDS = ('id', 'date', 'time', 'duration', 'doctor_id', 'patient_id')
+
+
+def _version(day, doctor):
+    return f'agenda:{day.isoformat()}:{doctor}'
+
+
+def _bucket_key(day, doctor, version, doctors_version):
+    return f'agenda:{day.isoformat()}:{doctor}:{version}:{doctors_version}'
+
+
+def day_versions(start, end, doctor_id=None):
+    """
+    Noms des versions des compartiments des jours de 'start' à 'end' inclus, pour un médecin ou pour tous.
+    """
+    doctor = doctor_id or ALL_DOCTORS
+    return [_version(day, doctor) for day in date_range(start, end)]
+
+
+def invalidate_days(buckets):
+    """
+    Invalide les compartiments d'une suite de couples (jour, médecin) en un seul aller-retour : pour chaque jour,
+    celui du médecin et celui de tous les médecins, ainsi que la liste des rendez-vous.
+    L'invalidation est refaite après le commit, pour qu'une lecture concurrente ne remette pas en cache l'ancien état.
+    """
+    names = {caching.APPOINTMENTS}
+    for day, doctor_id in buckets:
+        names.update((_version(day, doctor_id), _version(day, ALL_DOCTORS)))
+    caching.bump_on_commit(*names)
+
+
+def invalidate_appointment(appointment):
+    """
+    Invalide les compartiments touchés par un rendez-vous : son jour et son médecin actuels,
+    ainsi que ceux chargés depuis la base s'il a été déplacé.
+    """
+    buckets = {(appointment.date, appointment.doctor_id)}
+    loaded = getattr(appointment, '_loaded_values', {})
+    if 'date' in loaded and 'doctor_id' in loaded:
+        buckets.add((loaded['date'], loaded['doctor_id']))
+    invalidate_days(buckets)
+
+
+def date_range(start, end):
+    """
+    Liste des jours de 'start' à 'end' inclus.
+    """
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def load_agenda(start, end, doctor_id=None):
+    """
+    Retourne un dictionnaire {jour: [rendez-vous]} pour les jours de 'start' à 'end' inclus,
+    éventuellement limité à un médecin. Chaque rendez-vous est un dictionnaire (id, date, time, duration,
+    doctor_id, doctor_name, patient_id, patient_name), trié par heure.
+
+    Les jours en cache sont lus en un seul aller-retour ; les jours manquants sont chargés en une seule requête
+    d'intervalle, puis mis en cache.
+    """
+    days = date_range(start, end)
+    doctor = doctor_id or ALL_DOCTORS
+    names = {day: _version(day, doctor) for day in days}
+    versions = caching.get_versions([*names.values(), caching.DOCTORS])
+    keys = {day: _bucket_key(day, doctor, versions[names[day]], versions[caching.DOCTORS]) for day in days}
+    cached = cache.get_many(keys.values())
+    agenda = {day: cached[keys[day]] for day in days if keys[day] in cached}
+
+    missing = [day for day in days if day not in agenda]
+    caching.stats.record('agenda', hits=len(agenda), misses=len(missing))
+    if missing:
+        rows = Appointment.objects.filter(date__gte=missing[0], date__lte=missing[-1])
+        if doctor_id:
+            rows = rows.filter(doctor_id=doctor_id)
+        rows = rows.order_by('date', 'time').values(*AGENDA_FIELDS, patient_name=F('patient__name'), doctor_name=F('doctor__name'))
+        loaded = {day: [] for day in missing}
+        for row in rows:
+            if row['date'] in loaded:
+                loaded[row['date']].append(row)
+        cache.set_many({keys[day]: loaded[day] for day in missing}, AGENDA_CACHE_TIMEOUT)
+        agenda.update(loaded)
+
+    return {day: agenda[day] for day in days}
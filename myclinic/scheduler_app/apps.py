@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SchedulerAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scheduler_app'
+
+    def ready(self):
+        # Enregistre les récepteurs de signaux de l'application (invalidation du cache de l'agenda)
+        from . import signals  # noqa: F401
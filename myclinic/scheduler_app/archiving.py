@@ -0,0 +1,62 @@
+"""
+Archivage des rendez-vous anciens.
+
+Les rendez-vous antérieurs à un horizon (APPOINTMENT_ARCHIVE_DAYS jours avant aujourd'hui, voir settings.py) sont
+déplacés dans la table ArchivedAppointment, par lots pris dans l'ordre de l'index (date, time) : chaque lot est copié
+(INSERT ... SELECT) puis supprimé de la table des rendez-vous dans une même transaction courte. Un archivage interrompu
+reprend donc là où il s'est arrêté : les lots validés sont archivés, le lot en cours est annulé en entier.
+
+Les lignes sont copiées et supprimées en SQL, sans instancier de modèles ni émettre post_delete pour chaque rendez-vous.
+Les visites des patients comptent aussi les rendez-vous archivés (voir visits.py) et ne changent donc pas :
+seuls les jours d'agenda archivés et les fiches des patients concernés (historique) sont invalidés.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from myclinic import caching
+from . import agenda
+from .models import Appointment, ArchivedAppointment
+
+# Nombre de rendez-vous archivés par transaction
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def archive_cutoff(days=None, today=None):
+    """
+    Premier jour non archivé : les rendez-vous antérieurs sont archivés.
+    """
+    today = today or timezone.localdate()
+    return today - timedelta(days=settings.APPOINTMENT_ARCHIVE_DAYS if days is None else days)
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive, dans une transaction, au plus 'batch_size' des plus anciens rendez-vous (annulés compris) antérieurs à 'cutoff'.
+    Retourne le nombre de rendez-vous archivés (0 lorsqu'il n'y a plus rien à archiver).
+    """
+    with transaction.atomic():
+        rows = list(
+            Appointment.all_objects.filter(date__lt=cutoff).order_by('date', 'time')
+            .values_list('pk', 'date', 'doctor_id', 'patient_id')[:batch_size]
+        )
+        if not rows:
+            return 0
+        pks = [pk for pk, _, _, _ in rows]
+        quote = connection.ops.quote_name
+        source, target = quote(Appointment._meta.db_table), quote(ArchivedAppointment._meta.db_table)
+        columns = ', '.join(quote(field.column) for field in Appointment._meta.concrete_fields)
+        archived_at = quote(ArchivedAppointment._meta.get_field('archived_at').column)
+        pk_column, placeholders = quote(Appointment._meta.pk.column), ', '.join(['%s'] * len(pks))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {target} ({columns}, {archived_at}) "
+                f"SELECT {columns}, %s FROM {source} WHERE {pk_column} IN ({placeholders})",
+                [connection.ops.adapt_datetimefield_value(timezone.now()), *pks],
+            )
+            cursor.execute(f"DELETE FROM {source} WHERE {pk_column} IN ({placeholders})", pks)
+        agenda.invalidate_days({(day, doctor_id) for _, day, doctor_id, _ in rows})
+        caching.bump_on_commit(*{caching.patient_version(patient_id) for _, _, _, patient_id in rows})
+    return len(rows)
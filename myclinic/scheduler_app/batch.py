@@ -0,0 +1,173 @@
+"""
+Opérations par lots sur les rendez-vous : déplacer ceux d'un médecin sur une période, annuler un ensemble ou le
+marquer non honoré, créer une série récurrente (par exemple chaque semaine pendant 12 semaines).
+
+Chaque opération s'exécute dans une seule transaction : les créneaux de tous les (médecin, jour) concernés sont
+chargés en une requête (DaySchedule.load_many), tous les chevauchements sont vérifiés en mémoire, puis les lignes
+sont écrites par une seule requête UPDATE ou un seul INSERT (bulk_create). En cas de conflit, rien n'est écrit.
+
+update() et bulk_create() n'envoient pas les signaux post_save : l'agenda (anciens et nouveaux jours) et les visites
+des patients sont donc invalidés ici, une fois pour tout le lot, au lieu d'une fois par rendez-vous, et le signal
+appointments_batch_changed décrit les changements (journal d'audit, statistiques).
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateField, F, TimeField, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import agenda, visits
+from .booking import DaySchedule, ends_after_midnight, minutes
+from .models import DEFAULT_DURATION, Appointment
+
+# Nombre maximal de rendez-vous d'une série récurrente
+SERIES_MAX_COUNT = 52
+
+# Signal émis par chaque opération par lots, dans sa transaction.
+# Arguments : action ('create' ou 'update'), changes ({identifiant: (patient, {champ: [avant, après]})}),
+# buckets (ensemble des (jour, médecin) touchés, avant et après le changement).
+appointments_batch_changed = Signal()
+
+
+class BatchConflict(Exception):
+    """
+    Levée lorsqu'un lot chevaucherait des rendez-vous existants (ou se chevaucherait lui-même) : rien n'est écrit.
+
+    conflicts: liste de dictionnaires {doctor_id, date, time, conflicts: [identifiants des rendez-vous chevauchés]}.
+    """
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} rendez-vous du lot chevauchent d'autres rendez-vous.")
+
+
+def _check_conflicts(slots, exclude_pks=()):
+    """
+    Vérifie en bloc une suite de créneaux (doctor_id, date, time, duration, pk) : contre les rendez-vous existants
+    (hors exclude_pks) et entre eux. Lève BatchConflict s'il y a au moins un chevauchement.
+    Un créneau qui déborde sur le jour suivant est refusé de la même façon, sans rendez-vous chevauché.
+    """
+    schedules = DaySchedule.load_many({(doctor_id, day) for doctor_id, day, _, _, _ in slots}, exclude_pks, lock=True)
+    conflicts = []
+    for doctor_id, day, start_time, duration, pk in slots:
+        start = minutes(start_time)
+        end = start + (duration or DEFAULT_DURATION)
+        schedule = schedules[doctor_id, day]
+        overlapping = schedule.conflicts(start, end)
+        if overlapping or ends_after_midnight(start_time, duration):
+            conflicts.append({'doctor_id': doctor_id, 'date': day, 'time': start_time, 'conflicts': overlapping})
+        schedule.add(start, end, pk)
+    if conflicts:
+        raise BatchConflict(conflicts)
+
+
+def _invalidate(buckets, patient_ids):
+    """
+    Remplace les signaux que update() et bulk_create() n'envoient pas : agenda des (jour, médecin) et visites des patients.
+    """
+    agenda.invalidate_days(buckets)
+    visits.update_patient_visits(patient_ids)
+
+
+def reschedule(appointments, offset):
+    """
+    Déplace les rendez-vous (non annulés) d'un queryset de 'offset' (timedelta : jours et/ou minutes).
+    Retourne le nombre de rendez-vous déplacés ; lève BatchConflict si un nouveau créneau est déjà occupé.
+    """
+    with transaction.atomic():
+        rows = list(
+            appointments.filter(status=Appointment.SCHEDULED)
+            .values_list('pk', 'doctor_id', 'patient_id', 'date', 'time', 'duration')
+        )
+        if not rows or not offset:
+            return 0
+        moves = {}
+        for pk, doctor_id, _, day, start_time, duration in rows:
+            moved = datetime.combine(day, start_time) + offset
+            moves[pk] = (doctor_id, moved.date(), moved.time(), duration, pk)
+        _check_conflicts(moves.values(), exclude_pks=moves.keys())
+
+        # La contrainte d'unicité est vérifiée ligne par ligne : un rendez-vous avancé d'une demi-heure heurterait le
+        # suivant, pas encore déplacé. Les lignes sortent donc d'abord de l'index unique partiel (statut annulé),
+        # puis y reviennent toutes à leur nouvelle place (le lot a été vérifié sans chevauchement). La version et la date
+        # de modification changent : un formulaire ouvert sur l'un de ces rendez-vous ne peut plus l'enregistrer sans fusion
+        # (voir myclinic/concurrency.py), et les pages qui l'affichent ne répondent plus 304 (voir myclinic/conditional.py).
+        Appointment.objects.filter(pk__in=moves).update(status=Appointment.CANCELLED)
+        Appointment.all_objects.filter(pk__in=moves).update(
+            date=Case(*(When(pk=pk, then=Value(slot[1])) for pk, slot in moves.items()), output_field=DateField()),
+            time=Case(*(When(pk=pk, then=Value(slot[2])) for pk, slot in moves.items()), output_field=TimeField()),
+            status=Appointment.SCHEDULED, version=F('version') + 1, updated_at=timezone.now(),
+        )
+        buckets = {(day, doctor_id) for _, doctor_id, _, day, _, _ in rows}
+        buckets.update((day, doctor_id) for doctor_id, day, _, _, _ in moves.values())
+        _invalidate(buckets, {patient_id for _, _, patient_id, _, _, _ in rows})
+        changes = {}
+        for pk, _, patient_id, day, start_time, _ in rows:
+            _, new_day, new_time, _, _ = moves[pk]
+            diff = {'date': [day, new_day], 'time': [start_time, new_time]}
+            changes[pk] = (patient_id, {name: values for name, values in diff.items() if values[0] != values[1]})
+        appointments_batch_changed.send(sender=Appointment, action='update', changes=changes, buckets=buckets)
+    return len(moves)
+
+
+def _change_status(appointments, status):
+    """
+    Passe au statut 'status' les rendez-vous (non annulés, non honorés) d'un queryset par une seule requête UPDATE.
+    Retourne le nombre de rendez-vous modifiés.
+    """
+    with transaction.atomic():
+        rows = list(appointments.filter(status=Appointment.SCHEDULED).values_list('pk', 'date', 'doctor_id', 'patient_id'))
+        if not rows:
+            return 0
+        changed = Appointment.objects.filter(pk__in=[pk for pk, _, _, _ in rows]).update(
+            status=status, version=F('version') + 1, updated_at=timezone.now(),
+        )
+        buckets = {(day, doctor_id) for _, day, doctor_id, _ in rows}
+        _invalidate(buckets, {patient_id for _, _, _, patient_id in rows})
+        appointments_batch_changed.send(sender=Appointment, action='update', buckets=buckets, changes={
+            pk: (patient_id, {'status': [Appointment.SCHEDULED, status]}) for pk, _, _, patient_id in rows
+        })
+    return changed
+
+
+def cancel(appointments):
+    """
+    Annule les rendez-vous (non annulés) d'un queryset par une seule requête UPDATE ; leurs créneaux sont libérés.
+    Retourne le nombre de rendez-vous annulés.
+    """
+    return _change_status(appointments, Appointment.CANCELLED)
+
+
+def mark_no_show(appointments):
+    """
+    Marque non honorés les rendez-vous d'un queryset déjà commencés (jusqu'à aujourd'hui) ; les rendez-vous à venir
+    sont ignorés. Retourne le nombre de rendez-vous marqués.
+    """
+    return _change_status(appointments.filter(date__lte=timezone.localdate()), Appointment.NO_SHOW)
+
+
+def create_series(patient, doctor, first_day, start_time, count, interval=timedelta(weeks=1), duration=DEFAULT_DURATION):
+    """
+    Crée 'count' rendez-vous à partir de 'first_day', tous les 'interval', par un seul INSERT.
+    Retourne la liste des rendez-vous créés ; lève BatchConflict si un créneau de la série est déjà occupé.
+    """
+    days = [first_day + interval * index for index in range(count)]
+    with transaction.atomic():
+        _check_conflicts([(doctor.pk, day, start_time, duration, None) for day in days])
+        try:
+            created = Appointment.objects.bulk_create(
+                Appointment(patient=patient, doctor=doctor, date=day, time=start_time, duration=duration) for day in days
+            )
+        except IntegrityError:
+            # Une réservation concurrente a pris exactement l'un des créneaux entre-temps (bases sans écriture sérialisée)
+            raise BatchConflict([{'doctor_id': doctor.pk, 'date': day, 'time': start_time, 'conflicts': []} for day in days])
+        buckets = {(day, doctor.pk) for day in days}
+        _invalidate(buckets, {patient.pk})
+        appointments_batch_changed.send(sender=Appointment, action='create', buckets=buckets, changes={
+            appointment.pk: (patient.pk, {
+                'patient_id': [None, patient.pk], 'date': [None, appointment.date], 'time': [None, start_time],
+                'doctor_id': [None, doctor.pk], 'duration': [None, duration], 'status': [None, Appointment.SCHEDULED],
+            })
+            for appointment in created
+        })
+    return created
@@ -0,0 +1,166 @@
+"""
+Prévention des doubles réservations.
+
+Les créneaux occupés d'un médecin sur un jour sont chargés une seule fois par vérification (recherche dans l'index
+(doctor, date, time), sans lire les rendez-vous des autres médecins) dans une structure triée,
+DaySchedule, qui répond ensuite à chaque question "ce créneau chevauche-t-il un rendez-vous ?" en O(log n).
+Elle n'est pas conservée d'une requête à l'autre (rien à invalider) : elle sert aux vérifications d'un même
+formulaire ou d'un même lot (import, opérations par lots), qui en ajoutent les créneaux au fur et à mesure.
+
+Un rendez-vous se termine au plus tard à minuit (ends_after_midnight) : les créneaux d'un jour ne peuvent donc
+chevaucher que des rendez-vous du même jour.
+
+En écriture, la vérification et l'enregistrement se font dans la même transaction, après avoir verrouillé la ligne
+du médecin (select_for_update), et la contrainte d'unicité (doctor, date, time) rattrape les réservations concurrentes :
+en cas de base verrouillée, l'opération est retentée ; en cas de conflit, il est signalé sur le formulaire.
+La modification d'un rendez-vous déjà modifié par quelqu'un d'autre depuis l'affichage du formulaire est refusée
+(version, voir myclinic/concurrency.py) : le formulaire propose alors une fusion.
+"""
+import time as time_module
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from django.db import IntegrityError, OperationalError, transaction
+
+from myclinic.concurrency import VersionConflict
+from .models import DEFAULT_DURATION, Appointment, Doctor
+
+# Nombre de tentatives d'enregistrement lorsque la base est verrouillée par une autre transaction
+BOOKING_ATTEMPTS = 5
+# Attente (secondes) avant la première nouvelle tentative ; doublée à chaque essai
+BOOKING_RETRY_DELAY = 0.01
+# Nombre de minutes d'un jour : fin au plus tard d'un rendez-vous
+MINUTES_PER_DAY = 24 * 60
+
+
+def minutes(value):
+    """
+    Convertit une heure (datetime.time) en minutes depuis minuit.
+    """
+    return value.hour * 60 + value.minute
+
+
+def ends_after_midnight(start_time, duration):
+    """
+    Indique si un rendez-vous commencé à 'start_time' et long de 'duration' minutes déborde sur le jour suivant.
+    """
+    return minutes(start_time) + (duration or DEFAULT_DURATION) > MINUTES_PER_DAY
+
+
+class DaySchedule:
+    """
+    Créneaux occupés d'un médecin sur un jour, triés par heure de début (en minutes depuis minuit).
+    Chargés pour une vérification (ou un lot) et non conservés ensuite.
+
+    Les débuts sont triés ; le maximum cumulé des fins l'est donc aussi, ce qui permet de trouver
+    par dichotomie les seuls rendez-vous susceptibles de chevaucher un intervalle.
+    """
+    def __init__(self, intervals=()):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _, _ in intervals]
+        self.ends = [end for _, end, _ in intervals]
+        self.ids = [pk for _, _, pk in intervals]
+        self._max_ends = list(accumulate(self.ends, max))
+
+    @classmethod
+    def load(cls, doctor_id, day, exclude_pk=None, lock=False):
+        """
+        Charge les créneaux d'un médecin pour un jour. Avec lock=True, la ligne du médecin est verrouillée
+        jusqu'à la fin de la transaction sur les bases qui le permettent (SQLite sérialise déjà les écritures) :
+        deux réservations pour le même médecin s'exécutent alors l'une après l'autre.
+        """
+        if lock:
+            list(Doctor.objects.select_for_update().filter(pk=doctor_id).values_list('pk'))
+        appointments = Appointment.objects.filter(doctor_id=doctor_id, date=day)
+        if exclude_pk is not None:
+            appointments = appointments.exclude(pk=exclude_pk)
+        rows = appointments.values_list('time', 'duration', 'pk')
+        return cls((minutes(start), minutes(start) + (duration or DEFAULT_DURATION), pk) for start, duration, pk in rows)
+
+    @classmethod
+    def load_many(cls, buckets, exclude_pks=(), lock=False):
+        """
+        Charge en une seule requête les créneaux de plusieurs couples (médecin, jour).
+        Retourne {(médecin, jour): DaySchedule}. Avec lock=True, les lignes des médecins sont verrouillées (voir load).
+        """
+        buckets = set(buckets)
+        doctor_ids = {doctor_id for doctor_id, _ in buckets}
+        if lock:
+            list(Doctor.objects.select_for_update().filter(pk__in=doctor_ids).values_list('pk'))
+        intervals = {bucket: [] for bucket in buckets}
+        rows = (
+            Appointment.objects.filter(doctor_id__in=doctor_ids, date__in={day for _, day in buckets})
+            .exclude(pk__in=exclude_pks)
+            .values_list('doctor_id', 'date', 'time', 'duration', 'pk')
+        )
+        for doctor_id, day, start, duration, pk in rows:
+            if (doctor_id, day) in intervals:
+                intervals[doctor_id, day].append((minutes(start), minutes(start) + (duration or DEFAULT_DURATION), pk))
+        return {bucket: cls(values) for bucket, values in intervals.items()}
+
+    def conflicts(self, start, end):
+        """
+        Retourne les identifiants des rendez-vous qui chevauchent l'intervalle [start, end[ (en minutes).
+        """
+        last = bisect_left(self.starts, end)  # Rendez-vous qui commencent avant la fin de l'intervalle
+        first = bisect_right(self._max_ends, start, hi=last)  # Premier rendez-vous qui pourrait finir après son début
+        return [self.ids[i] for i in range(first, last) if self.ends[i] > start]
+
+    def add(self, start, end, pk=None):
+        """
+        Ajoute un créneau occupé (utile pour vérifier plusieurs réservations d'un même lot).
+        """
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.ids.insert(index, pk)
+        self._max_ends = list(accumulate(self.ends, max))
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def find_conflicts(doctor_id, day, start_time, duration, exclude_pk=None, lock=False):
+    """
+    Retourne les identifiants des rendez-vous du médecin qui chevauchent le créneau demandé.
+    """
+    start = minutes(start_time)
+    schedule = DaySchedule.load(doctor_id, day, exclude_pk=exclude_pk, lock=lock)
+    return schedule.conflicts(start, start + (duration or DEFAULT_DURATION))
+
+
+CONFLICT_MESSAGE = "%(doctor)s already has an appointment overlapping %(date)s at %(time)s."
+MIDNIGHT_MESSAGE = "An appointment must end by midnight: %(duration)s minutes from %(time)s is too long."
+
+
+def save_appointment(form):
+    """
+    Enregistre un AppointmentForm valide en garantissant l'absence de chevauchement, même sous requêtes concurrentes.
+
+    Retourne le rendez-vous enregistré, ou None si le créneau est pris ou si le rendez-vous a été modifié entre-temps
+    (l'erreur, ou la proposition de fusion, est alors ajoutée au formulaire).
+    """
+    data = form.cleaned_data
+    params = {'doctor': data['doctor'].name, 'date': data['date'], 'time': data['time'].strftime('%H:%M')}
+    delay = BOOKING_RETRY_DELAY
+    for attempt in range(BOOKING_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                if find_conflicts(data['doctor'].pk, data['date'], data['time'], data.get('duration'), exclude_pk=form.instance.pk, lock=True):
+                    form.add_error(None, CONFLICT_MESSAGE % params)
+                    return None
+                return form.save()
+        except IntegrityError:
+            # Une réservation concurrente a pris exactement le même créneau entre-temps
+            form.add_error(None, CONFLICT_MESSAGE % params)
+            return None
+        except VersionConflict:
+            # Transaction annulée : la version enregistrée est relue pour préparer la fusion
+            form.merge_conflict()
+            return None
+        except OperationalError as exc:
+            # Base verrouillée par une écriture concurrente : on attend puis on recommence la vérification
+            if 'locked' not in str(exc) or attempt == BOOKING_ATTEMPTS - 1:
+                raise
+            time_module.sleep(delay)
+            delay *= 2
@@ -0,0 +1,14 @@
+from datetime import date
+
+
+class DateConverter:
+    """
+    Convertisseur d'URL pour les dates au format AAAA-MM-JJ (par exemple /appointments/agenda/day/2024-12-15/).
+    """
+    regex = r'\d{4}-\d{2}-\d{2}'
+
+    def to_python(self, value):
+        return date.fromisoformat(value)
+
+    def to_url(self, value):
+        return value.isoformat() if isinstance(value, date) else value
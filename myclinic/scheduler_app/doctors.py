@@ -0,0 +1,25 @@
+"""
+Normalisation des noms de médecins, utilisée pour regrouper les variantes d'un même nom
+("Dr. Smith", "dr smith", "Smith ") lors de la migration vers le modèle Doctor et des imports.
+"""
+import re
+import unicodedata
+
+# Titre en tête du nom, ignoré pour la comparaison ("Dr.", "Dr", "Docteur", "Doctor")
+TITLE_PATTERN = re.compile(r'^(dr\.?|docteur|doctor)\s+', re.IGNORECASE)
+
+
+def clean_doctor_name(name):
+    """
+    Nom d'affichage : espaces superflus supprimés. Par exemple "  Dr.  Smith " devient "Dr. Smith".
+    """
+    return ' '.join((name or '').split())
+
+
+def doctor_key(name):
+    """
+    Clé de regroupement : sans titre, sans accents, sans casse. "Dr. Émile Roux" et "emile  roux" ont la même clé.
+    """
+    name = TITLE_PATTERN.sub('', clean_doctor_name(name))
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
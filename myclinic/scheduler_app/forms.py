@@ -1,10 +1,18 @@
+from datetime import timedelta
+
 from django import forms
-from .models import Appointment
+from myclinic.concurrency import VersionedModelForm
+from patient_app.models import Patient
+from .models import DEFAULT_DURATION, Appointment, Doctor
+from .batch import SERIES_MAX_COUNT
+from .booking import CONFLICT_MESSAGE, MIDNIGHT_MESSAGE, ends_after_midnight, find_conflicts
 
-class AppointmentForm(forms.ModelForm):
+class AppointmentForm(VersionedModelForm):
     """
     Ce formulaire est utilisé pour créer et modifier des instances du modèle Appointment.
-    Il hérite de forms.ModelForm, ce qui facilite la création de formulaires liés à des modèles.
+    Il hérite de forms.ModelForm (par VersionedModelForm), ce qui facilite la création de formulaires liés à des modèles.
+    Il refuse les créneaux qui chevauchent un autre rendez-vous du même médecin, et détecte une modification concurrente
+    du rendez-vous par sa version (voir myclinic/concurrency.py).
     """
     class Meta:
         """
@@ -13,5 +21,100 @@ class AppointmentForm(forms.ModelForm):
         - fields : Les champs du modèle à inclure dans le formulaire.
         """
         model = Appointment
-        fields = ['patient', 'date', 'time', 'doctor_name']
+        fields = ['patient', 'date', 'time', 'duration', 'doctor']
         # Ne pas inclure 'internal_admin_notes' ici afin qu'il ne puisse être défini que par l'administrateur.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Liste des médecins triée par nom
+        self.fields['doctor'].queryset = Doctor.objects.order_by('name')
+
+    def clean_duration(self):
+        # Une durée laissée vide prend la valeur par défaut
+        return self.cleaned_data.get('duration') or DEFAULT_DURATION
+
+    def clean(self):
+        """
+        Vérifie que le rendez-vous se termine au plus tard à minuit et ne chevauche aucun autre rendez-vous du médecin
+        ce jour-là. (La vérification est refaite dans la transaction d'enregistrement, voir booking.save_appointment.)
+        """
+        cleaned_data = super().clean()
+        doctor, day, start = cleaned_data.get('doctor'), cleaned_data.get('date'), cleaned_data.get('time')
+        if start and cleaned_data.get('duration') and ends_after_midnight(start, cleaned_data['duration']):
+            raise forms.ValidationError(
+                MIDNIGHT_MESSAGE, params={'duration': cleaned_data['duration'], 'time': start.strftime('%H:%M')}
+            )
+        if doctor and day and start:
+            if find_conflicts(doctor.pk, day, start, cleaned_data.get('duration'), exclude_pk=self.instance.pk):
+                raise forms.ValidationError(
+                    CONFLICT_MESSAGE, params={'doctor': doctor.name, 'date': day, 'time': start.strftime('%H:%M')}
+                )
+        return cleaned_data
+
+
+class AppointmentRangeForm(forms.Form):
+    """
+    Sélection des rendez-vous d'un médecin sur une période (bornes incluses), pour les opérations par lots.
+    """
+    doctor = forms.ModelChoiceField(queryset=Doctor.objects.all())
+    start = forms.DateField()
+    end = forms.DateField()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and end < start:
+            raise forms.ValidationError("The end date must not be before the start date.")
+        return cleaned_data
+
+    def appointments(self):
+        """
+        Retourne le queryset des rendez-vous sélectionnés (recherche dans l'index (doctor, date, time)).
+        """
+        data = self.cleaned_data
+        return Appointment.objects.filter(doctor=data['doctor'], date__gte=data['start'], date__lte=data['end'])
+
+
+class RescheduleForm(AppointmentRangeForm):
+    """
+    Déplacement par lot : les rendez-vous sélectionnés sont décalés d'un nombre de jours et/ou de minutes.
+    """
+    days = forms.IntegerField(required=False)
+    minutes = forms.IntegerField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.offset():
+            raise forms.ValidationError("Give a number of days or minutes to move the appointments by.")
+        return cleaned_data
+
+    def offset(self):
+        return timedelta(days=self.cleaned_data.get('days') or 0, minutes=self.cleaned_data.get('minutes') or 0)
+
+
+class SeriesForm(forms.Form):
+    """
+    Série récurrente : 'count' rendez-vous à partir de 'date', tous les 'every' jours (chaque semaine par défaut).
+    """
+    patient = forms.ModelChoiceField(queryset=Patient.objects.all())
+    doctor = forms.ModelChoiceField(queryset=Doctor.objects.all())
+    date = forms.DateField()
+    time = forms.TimeField()
+    duration = forms.IntegerField(required=False, min_value=1)
+    count = forms.IntegerField(min_value=1, max_value=SERIES_MAX_COUNT)
+    every = forms.IntegerField(required=False, min_value=1)
+
+    def clean_duration(self):
+        # Une durée laissée vide prend la valeur par défaut
+        return self.cleaned_data.get('duration') or DEFAULT_DURATION
+
+    def clean_every(self):
+        # Une série est hebdomadaire par défaut
+        return self.cleaned_data.get('every') or 7
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, duration = cleaned_data.get('time'), cleaned_data.get('duration')
+        if start and duration and ends_after_midnight(start, duration):
+            raise forms.ValidationError(MIDNIGHT_MESSAGE, params={'duration': duration, 'time': start.strftime('%H:%M')})
+        return cleaned_data
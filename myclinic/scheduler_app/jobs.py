@@ -0,0 +1,80 @@
+"""
+Tâches de fond des rendez-vous (voir jobs_app/queue.py), exécutées par la commande run_workers.
+
+Rappels : la tâche scheduler_app.send_reminders, mise en file chaque jour (par exemple par cron :
+python manage.py enqueue_job scheduler_app.send_reminders), envoie un courriel aux patients ayant rendez-vous le
+lendemain. Les rendez-vous sont lus par tranches, dans l'ordre de l'index (date, time) : chaque tranche est une tâche,
+qui met en file la suivante en reprenant après le dernier rendez-vous traité (pagination par clé, sans OFFSET).
+Une tranche échoue et est relancée seule ; plusieurs processus de travail peuvent traiter les tranches d'un même jour
+l'une après l'autre, sans garder de transaction ouverte pendant les envois.
+"""
+from datetime import date, time, timedelta
+
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from jobs_app.queue import task
+from .models import Appointment
+
+# Nombre de rendez-vous par tranche (et par connexion au serveur de courriels)
+REMINDER_CHUNK_SIZE = 500
+
+
+def reminder_message(appointment):
+    """
+    Courriel de rappel d'un rendez-vous, ou None si le contact du patient n'est pas une adresse électronique.
+    """
+    address = (appointment.patient.contact_info or '').strip()
+    try:
+        validate_email(address)
+    except ValidationError:
+        return None
+    return mail.EmailMessage(
+        subject="Appointment reminder",
+        body=(
+            f"Dear {appointment.patient.name},\n\n"
+            f"This is a reminder of your appointment with {appointment.doctor.name} "
+            f"on {appointment.date:%A %d %B %Y} at {appointment.time:%H:%M}.\n"
+        ),
+        to=[address],
+    )
+
+
+def reminder_queryset(day, after=None):
+    """
+    Rendez-vous du jour 'day' dont le rappel n'a pas été traité, après le rendez-vous 'after' ((heure, identifiant)),
+    dans l'ordre de l'index (date, time).
+    """
+    appointments = Appointment.objects.filter(date=day).exclude(reminder_date=day)
+    if after:
+        # (time, id) > (after_time, after_id) : le début de la plage est lu directement dans l'index (date, time),
+        # qui contient aussi l'identifiant de chaque ligne
+        after_time, after_pk = after
+        appointments = appointments.filter(time__gte=after_time).exclude(time=after_time, pk__lte=after_pk)
+    return appointments.order_by('time', 'pk')
+
+
+@task('scheduler_app.send_reminders')
+def send_reminders(day=None, after=None):
+    """
+    Envoie les rappels d'une tranche des rendez-vous du jour 'day' (AAAA-MM-JJ, demain par défaut), après le rendez-vous
+    'after' ([heure, identifiant]), puis met en file la tranche suivante. Les rendez-vous dont le rappel a déjà été
+    traité pour ce jour sont ignorés : une tranche relancée n'envoie que les rappels manquants.
+    """
+    day = date.fromisoformat(day) if day else timezone.localdate() + timedelta(days=1)
+    after = (time.fromisoformat(after[0]), after[1]) if after else None
+    chunk = list(reminder_queryset(day, after).select_related('patient', 'doctor')[:REMINDER_CHUNK_SIZE])
+    if not chunk:
+        return
+    messages = [message for message in map(reminder_message, chunk) if message is not None]
+    if messages:
+        # Une seule connexion au serveur de courriels pour la tranche
+        mail.get_connection().send_messages(messages)
+    last = chunk[-1]
+    with transaction.atomic():
+        Appointment.all_objects.filter(pk__in=[appointment.pk for appointment in chunk]).update(reminder_date=day)
+        if len(chunk) == REMINDER_CHUNK_SIZE:
+            send_reminders.enqueue(day=day, after=[last.time, last.pk])
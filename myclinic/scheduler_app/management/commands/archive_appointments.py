@@ -0,0 +1,36 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler_app.archiving import ARCHIVE_BATCH_SIZE, archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les rendez-vous antérieurs à l'horizon d'archivage (APPOINTMENT_ARCHIVE_DAYS jours) dans la table "
+        "d'archive, par lots d'une transaction chacun. La commande peut être interrompue puis relancée : "
+        "elle reprend là où elle s'est arrêtée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Horizon d'archivage en jours (par défaut : APPOINTMENT_ARCHIVE_DAYS).")
+        parser.add_argument('--before', type=date.fromisoformat, help="Archive les rendez-vous antérieurs à ce jour (AAAA-MM-JJ), au lieu de --days.")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help="Nombre de rendez-vous archivés par transaction.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Pause (secondes) entre deux lots, pour laisser passer les autres écritures.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or (options['days'] is not None and options['days'] < 0):
+            raise CommandError("La taille des lots doit être strictement positive et l'horizon positif.")
+        cutoff = options['before'] or archive_cutoff(options['days'])
+        began = time.perf_counter()
+        archived = 0
+        while True:
+            count = archive_batch(cutoff, options['batch_size'])
+            if not count:
+                break
+            archived += count
+            self.stdout.write(f"{archived} rendez-vous archivés...")
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(f"{archived} rendez-vous antérieurs au {cutoff} archivés en {time.perf_counter() - began:.1f} s.")
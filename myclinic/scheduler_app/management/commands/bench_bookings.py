@@ -0,0 +1,137 @@
+import itertools
+import logging
+import tempfile
+import threading
+import time as time_module
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from myclinic.benchmarking import database_file, summarize
+from patient_app.models import Patient
+from scheduler_app.models import Doctor
+
+# Configurations comparées : réglages par défaut de Django et de SQLite (journal DELETE, synchronous=FULL,
+# transactions DEFERRED, nouvelle connexion à chaque requête) et réglages de production (settings.py), avec les
+# connexions persistantes du point d'entrée WSGI (myclinic/wsgi.py) : chaque fil du banc sert ses requêtes l'une après l'autre
+CONFIGS = {
+    'default': lambda: {'pragmas': {}, 'OPTIONS': {}, 'CONN_MAX_AGE': 0},
+    'tuned': lambda: {
+        'pragmas': settings.SQLITE_PRAGMAS,
+        'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {}),
+        'CONN_MAX_AGE': settings.DATABASES['default'].get('CONN_MAX_AGE') or 600,
+    },
+}
+# Premier jour des réservations et créneaux d'une journée (de 8h00 à 17h30, toutes les 30 minutes)
+FIRST_DAY = date(2099, 1, 5)
+SLOTS_PER_DAY = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit d'écriture de la prise de rendez-vous : de nombreux clients envoient en même temps des "
+        "réservations à la vue appointment_create, sur une base jetable, avec les réglages par défaut de SQLite "
+        "puis avec ceux de production (WAL, PRAGMA, BEGIN IMMEDIATE, connexions persistantes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16, help="Nombre de clients simultanés.")
+        parser.add_argument('--bookings', type=int, default=50, help="Réservations envoyées par client.")
+        parser.add_argument('--doctors', type=int, default=4, help="Nombre de médecins (les réservations se les partagent).")
+        parser.add_argument('--configs', default=','.join(CONFIGS), help="Configurations comparées, séparées par des virgules.")
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['configs'].split(',') if name.strip()]
+        if not names or set(names) - set(CONFIGS):
+            raise CommandError(f"Configurations possibles : {', '.join(CONFIGS)}.")
+        if options['clients'] < 1 or options['bookings'] < 1 or options['doctors'] < 1:
+            raise CommandError("Les nombres de clients, de réservations et de médecins doivent être strictement positifs.")
+        self.options = options
+
+        # Les erreurs 500 ("database is locked") sont comptées, pas journalisées une à une
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for name in names:
+                    config = CONFIGS[name]()
+                    path = Path(directory) / f'bookings-{name}.sqlite3'
+                    overrides = override_settings(
+                        DEBUG=False, ALLOWED_HOSTS=['testserver'], SQLITE_PRAGMAS=config['pragmas'], PERF_SAMPLE_RATE=0,
+                    )
+                    with overrides, database_file(path, OPTIONS=config['OPTIONS'], CONN_MAX_AGE=config['CONN_MAX_AGE']):
+                        self.report(name, self.run())
+        finally:
+            request_logger.setLevel(level)
+
+    def run(self):
+        """
+        Lance les clients et retourne les mesures : réservations enregistrées, conflits, erreurs, latences et débit.
+        """
+        user = User.objects.create_user(username='bench', password='bench', is_staff=True)
+        patient = Patient.objects.create(name="Benchmark Patient", date_of_birth=date(1980, 1, 1))
+        doctors = [doctor.pk for doctor in Doctor.objects.bulk_create(
+            Doctor(name=f"Doctor {index:02d}") for index in range(self.options['doctors'])
+        )]
+        # Chaque réservation reçoit un créneau libre distinct : les écritures se concurrencent sans se chevaucher
+        counter, lock = itertools.count(), threading.Lock()
+        barrier = threading.Barrier(self.options['clients'])
+        latencies, statuses = [], []
+
+        def slot():
+            with lock:
+                index = next(counter)
+            doctor = doctors[index % len(doctors)]
+            day, position = divmod(index // len(doctors), SLOTS_PER_DAY)
+            start = datetime(2000, 1, 1, 8) + timedelta(minutes=30 * position)
+            return {
+                'patient': patient.pk, 'doctor': doctor, 'duration': '30',
+                'date': (FIRST_DAY + timedelta(days=day)).isoformat(), 'time': start.strftime('%H:%M'),
+            }
+
+        def book():
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            samples, codes = [], []
+            try:
+                barrier.wait()
+                for _ in range(self.options['bookings']):
+                    start = time_module.perf_counter()
+                    response = client.post(reverse('appointment_create'), slot())
+                    samples.append((time_module.perf_counter() - start) * 1000)
+                    codes.append(response.status_code)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(samples)
+                    statuses.extend(codes)
+
+        threads = [threading.Thread(target=book) for _ in range(self.options['clients'])]
+        began = time_module.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time_module.perf_counter() - began
+        booked = statuses.count(302)
+        return {
+            **summarize(latencies),
+            'booked': booked,
+            'conflicts': statuses.count(200),
+            'errors': sum(status >= 400 for status in statuses),
+            'bookings_per_s': round(booked / elapsed, 1),
+        }
+
+    def report(self, name, stats):
+        self.stdout.write(
+            f"{name:<8} {stats['booked']:>6} réservations  {stats['bookings_per_s']:>7.1f} /s   "
+            f"p50 {stats['p50_ms']:>8.1f} ms   p99 {stats['p99_ms']:>8.1f} ms   "
+            f"conflits {stats['conflicts']:>4}   erreurs {stats['errors']:>4}"
+        )
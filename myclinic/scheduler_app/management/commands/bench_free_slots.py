@@ -0,0 +1,62 @@
+import random
+import time as time_module
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand
+
+from myclinic.benchmarking import benchmark_database, measure, summarize
+from patient_app.models import Patient
+from scheduler_app.models import Appointment, Doctor
+from scheduler_app.slots import SlotFinder
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le moteur de recherche de créneaux libres sur une base jetable : "
+        "chargement d'une fenêtre puis requêtes en mémoire (200 médecins x 90 jours par défaut)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=200, help="Nombre de médecins.")
+        parser.add_argument('--days', type=int, default=90, help="Nombre de jours de la fenêtre.")
+        parser.add_argument('--per-day', type=int, default=12, help="Rendez-vous par médecin et par jour.")
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre de mesures par opération.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = date(2099, 1, 5)
+        end = start + timedelta(days=options['days'] - 1)
+        starts = [time(hour, minute) for hour in range(8, 18) for minute in (0, 30)]
+
+        with benchmark_database():
+            patient = Patient.objects.create(name="Benchmark Patient", date_of_birth=date(1980, 1, 1))
+            doctors = Doctor.objects.bulk_create(Doctor(name=f"Doctor {index:03d}") for index in range(options['doctors']))
+            began = time_module.perf_counter()
+            batch = []
+            for offset in range(options['days']):
+                day = start + timedelta(days=offset)
+                for doctor in doctors:
+                    for slot in rng.sample(starts, min(options['per_day'], len(starts))):
+                        batch.append(Appointment(patient=patient, date=day, time=slot, doctor=doctor))
+                if len(batch) >= 20_000:
+                    Appointment.objects.bulk_create(batch)
+                    batch = []
+            Appointment.objects.bulk_create(batch)
+            total = Appointment.objects.count()
+            self.stdout.write(f"{total} rendez-vous insérés en {time_module.perf_counter() - began:.1f} s")
+
+            finders = []
+            load = summarize(measure(lambda: finders.append(SlotFinder(start, end, doctors=doctors)), options['repeat']))
+            finder = finders[-1]
+            week_end = start + timedelta(days=6)
+            week_finder = SlotFinder(start, week_end, doctors=[doctors[0]])
+            results = {
+                f"chargement de la fenêtre ({options['doctors']} médecins x {options['days']} jours)": load,
+                "chargement d'une semaine, un médecin": summarize(measure(lambda: SlotFinder(start, week_end, doctors=[doctors[0]]), options['repeat'])),
+                "10 prochains créneaux d'un médecin (semaine)": summarize(measure(lambda: week_finder.free_slots(doctors[0], limit=10), options['repeat'])),
+                "premier créneau après 14h, tous médecins": summarize(measure(lambda: finder.first_free_slot(after=time(14, 0)), options['repeat'])),
+                "50 créneaux de 60 min, tous médecins": summarize(measure(lambda: finder.free_slots(duration=60, limit=50), options['repeat'])),
+            }
+            for label, stats in results.items():
+                self.stdout.write(f"{label:<60} p50 {stats['p50_ms']:>9.2f} ms   p99 {stats['p99_ms']:>9.2f} ms")
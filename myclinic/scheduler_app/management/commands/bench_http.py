@@ -0,0 +1,197 @@
+import contextlib
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from myclinic.benchmarking import database_file
+from myclinic.httpbench import (
+    Dataset, asgi_server, build_cases, find_regressions, run_client_case, run_server_case, slow_clients, wsgi_server,
+)
+from patient_app.models import Patient
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+# client : client de test ; server : serveur WSGI ; asgi : serveur ASGI uvicorn (dépendance optionnelle)
+MODES = ('client', 'server', 'asgi')
+# Réglages pendant les mesures : comme en production (sans DEBUG, qui conserve chaque requête SQL),
+# avec le middleware de profilage sur toutes les requêtes mais sans tracemalloc
+BENCH_SETTINGS = {
+    'DEBUG': False,
+    'ALLOWED_HOSTS': ['localhost', '127.0.0.1', 'testserver'],
+    'PERF_SAMPLE_RATE': 1.0,
+    'PERF_TRACE_MEMORY': False,
+    'PERF_BUFFER_SIZE': 100_000,
+}
+
+
+def parse_size(value):
+    """
+    Taille d'un jeu de données : '1k', '100k', '1m' ou un nombre de patients.
+    """
+    value = value.strip().lower()
+    if value in SIZES:
+        return value, SIZES[value]
+    try:
+        return value, int(value)
+    except ValueError:
+        raise CommandError(f"Taille invalide : {value} (attendu : {', '.join(SIZES)} ou un nombre).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark HTTP de toutes les URL de patient_app et scheduler_app sur des jeux de 1k, 100k et 1M patients "
+        "(autant de rendez-vous), avec le client de test, un vrai serveur WSGI et, en option, le serveur ASGI uvicorn. "
+        "Les résultats (percentiles, débit, requêtes SQL) sont écrits en JSON ; avec --baseline, la commande échoue "
+        "si un cas régresse au-delà du seuil. Pour comparer WSGI et ASGI face à des clients lents : "
+        "--modes server,asgi --wsgi-threads 8 --slow-clients 32."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1k,100k,1m', help="Tailles des jeux de données, séparées par des virgules.")
+        parser.add_argument('--modes', default='client,server', help="Modes de mesure : client (client de test), server (serveur WSGI), asgi (uvicorn).")
+        parser.add_argument('--requests', type=int, default=50, help="Nombre de requêtes par cas.")
+        parser.add_argument('--budget', type=float, default=20.0, help="Durée maximale (secondes) d'un cas ; au moins 3 requêtes sont faites.")
+        parser.add_argument('--concurrency', type=int, default=4, help="Nombre de clients HTTP simultanés en mode server.")
+        parser.add_argument('--wsgi-threads', type=int, help="Nombre de fils du serveur WSGI (par défaut : un fil par connexion).")
+        parser.add_argument('--slow-clients', type=int, default=0, help="Nombre de clients lents occupant le serveur pendant les mesures (modes server et asgi).")
+        parser.add_argument('--slow-seconds', type=float, default=2.0, help="Durée d'envoi de la requête d'un client lent (secondes).")
+        parser.add_argument('--only', help="Ne mesure que les cas dont le nom contient ce texte.")
+        parser.add_argument('--data-dir', help="Dossier où conserver et réutiliser les jeux de données (par défaut : dossier temporaire supprimé).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus de génération des données.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', '-o', default='bench-http.json', help="Fichier JSON des résultats.")
+        parser.add_argument('--baseline', help="Fichier JSON de référence à comparer aux résultats.")
+        parser.add_argument('--threshold', type=float, default=0.25, help="Régression tolérée sur le p95 (fraction, 0.25 = +25 %%).")
+        parser.add_argument('--min-delta-ms', type=float, default=5.0, help="Écart minimal de p95 (ms) pour signaler une régression.")
+        parser.add_argument('--update-baseline', action='store_true', help="Écrit les résultats dans le fichier de référence.")
+
+    def handle(self, *args, **options):
+        sizes = [parse_size(value) for value in options['sizes'].split(',') if value.strip()]
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        if not sizes or set(modes) - set(MODES) or not modes:
+            raise CommandError(f"Tailles ou modes invalides (modes possibles : {', '.join(MODES)}).")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("Le nombre de requêtes et de clients doit être strictement positif.")
+        if 'asgi' in modes:
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError("Le mode asgi nécessite uvicorn (pip install uvicorn).")
+        self.options = options
+
+        results = {
+            'meta': {
+                'date': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'wsgi_threads': options['wsgi_threads'],
+                'slow_clients': options['slow_clients'],
+            },
+            'results': {},
+        }
+        with tempfile.TemporaryDirectory() as temporary:
+            data_dir = Path(options['data_dir'] or temporary)
+            data_dir.mkdir(parents=True, exist_ok=True)
+            for label, size in sizes:
+                path = data_dir / f"bench-{label}-seed{options['seed']}.sqlite3"
+                with database_file(path), override_settings(**BENCH_SETTINGS):
+                    self.seed(label, size)
+                    results['results'][label] = self.run_size(label, modes)
+
+        Path(options['output']).write_text(json.dumps(results, indent=2))
+        self.stdout.write(f"Résultats écrits dans {options['output']}")
+        self.compare(results)
+
+    def seed(self, label, size):
+        """
+        Génère le jeu de données, sauf si la base contient déjà le bon nombre de patients (jeu réutilisé).
+        """
+        if Patient.objects.count() == size:
+            self.stdout.write(f"[{label}] Jeu de données réutilisé ({size} patients).")
+            return
+        if Patient.objects.exists():
+            raise CommandError(f"La base du jeu {label} contient des données inattendues : supprimez-la ou changez --data-dir.")
+        began = time.perf_counter()
+        # Rendez-vous répartis sur un an, centré sur aujourd'hui : les fiches ont des rendez-vous passés et à venir
+        call_command(
+            'generate_load_data', patients=size, appointments=size, days=365,
+            start_date=timezone.localdate() - timedelta(days=182), workers=self.options['workers'],
+            seed=self.options['seed'], stdout=StringIO(),
+        )
+        self.stdout.write(f"[{label}] {size} patients et rendez-vous générés en {time.perf_counter() - began:.0f} s.")
+
+    def run_size(self, label, modes):
+        user, _ = User.objects.get_or_create(username='bench', defaults={'is_staff': True})
+        client = Client()
+        client.force_login(user)
+        cases = build_cases(Dataset.load(), self.options['requests'], self.options['seed'])
+        if self.options['only']:
+            cases = [case for case in cases if self.options['only'] in case.name]
+
+        results = {}
+        for mode in modes:
+            self.stdout.write(f"[{label}] mode {mode}")
+            self.stdout.write(f"  {'cas':<36} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8} {'SQL':>5} {'erreurs':>8}")
+            results[mode] = {}
+            if mode == 'client':
+                for case in cases:
+                    results[mode][case.name] = self.report(case, run_client_case(case, client, self.options['budget']))
+                continue
+            cookie = f"sessionid={client.cookies['sessionid'].value}"
+            with contextlib.ExitStack() as stack:
+                server = asgi_server() if mode == 'asgi' else wsgi_server(self.options['wsgi_threads'])
+                address = stack.enter_context(server)
+                if self.options['slow_clients']:
+                    stack.enter_context(slow_clients(
+                        address, cookie, reverse('patient_list'), self.options['slow_clients'], self.options['slow_seconds']
+                    ))
+                for case in cases:
+                    stats = run_server_case(case, address, cookie, self.options['concurrency'], self.options['budget'])
+                    results[mode][case.name] = self.report(case, stats)
+        return results
+
+    def report(self, case, stats):
+        queries = '-' if stats['queries_max'] is None else stats['queries_max']
+        self.stdout.write(
+            f"  {case.name:<36} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+            f"{stats['rps']:>8.1f} {queries:>5} {stats['errors']:>8}"
+        )
+        return stats
+
+    def compare(self, results):
+        baseline_path = self.options['baseline']
+        if not baseline_path:
+            return
+        baseline_file = Path(baseline_path)
+        if baseline_file.exists():
+            regressions = find_regressions(
+                results, json.loads(baseline_file.read_text()), self.options['threshold'], self.options['min_delta_ms']
+            )
+            for regression in regressions:
+                self.stderr.write(f"RÉGRESSION {regression}")
+            if not regressions:
+                self.stdout.write(f"Aucune régression par rapport à {baseline_path} (seuil : +{self.options['threshold']:.0%} sur le p95).")
+        else:
+            regressions = []
+            self.stdout.write(f"Pas de référence {baseline_path} : rien à comparer.")
+        if self.options['update_baseline']:
+            baseline_file.write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Référence mise à jour : {baseline_path}")
+        if regressions:
+            raise CommandError(f"{len(regressions)} régression(s) par rapport à {baseline_path}.")
@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from myclinic.exporting import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORTS, export_stream
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte tous les patients ou tous les rendez-vous en CSV, JSONL ou colonnes JSON, lot par lot "
+        "(mémoire constante quelle que soit la taille des tables), éventuellement compressés en gzip."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS), help="Type de données exportées.")
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', help="Format de sortie (csv par défaut).")
+        parser.add_argument('--output', '-o', default='-', help="Fichier de sortie ('-' pour la sortie standard). Un nom en .gz active la compression.")
+        parser.add_argument('--gzip', action='store_true', help="Compresse la sortie en gzip.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Nombre de lignes lues à la fois.")
+
+    def handle(self, *args, **options):
+        compress = options['gzip'] or options['output'].endswith('.gz')
+        began = time.perf_counter()
+        pieces = export_stream(options['kind'], options['format'], compress=compress, chunk_size=options['chunk_size'])
+        written = 0
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+            for piece in pieces:
+                written += output.write(piece)
+            output.flush()
+        else:
+            with open(options['output'], 'wb') as output:
+                for piece in pieces:
+                    written += output.write(piece)
+            self.stdout.write(f"{written} octets écrits dans {options['output']} en {time.perf_counter() - began:.1f} s.")
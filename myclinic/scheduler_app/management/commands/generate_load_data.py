@@ -0,0 +1,182 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from math import ceil
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from myclinic import loadgen
+from patient_app.models import Patient
+from patient_app.search import get_trigram_index
+from myclinic import caching
+from scheduler_app.agenda import ALL_DOCTORS, date_range, invalidate_days
+from scheduler_app.models import Appointment, Doctor
+from scheduler_app.visits import refresh_all_visits
+
+PATIENT_FIELDS = ('name', 'date_of_birth', 'contact_info', 'basic_medical_history', 'verified_by_admin', 'search_text')
+APPOINTMENT_FIELDS = ('patient', 'doctor', 'date', 'time', 'duration', 'internal_admin_notes')
+# Remplissage visé des créneaux lorsque le nombre de médecins est calculé automatiquement
+TARGET_OCCUPANCY = 0.5
+
+
+def insert_rows(model, fields, rows, ignore_conflicts=False):
+    """
+    Insère des tuples avec un seul executemany, sans instancier de modèles. Retourne le nombre de lignes insérées.
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(opts.get_field(field).column) for field in fields)
+    on_conflict = OnConflict.IGNORE if ignore_conflicts else None
+    sql = (
+        f"{connection.ops.insert_statement(on_conflict=on_conflict)} {quote(opts.db_table)} ({columns}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) {connection.ops.on_conflict_suffix_sql(fields, on_conflict, None, None)}"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+        return cursor.rowcount
+
+
+def patient_id_ranges():
+    """
+    Retourne les intervalles contigus [(premier, dernier)] de clés primaires des patients, calculés par la base
+    (id - ROW_NUMBER() est constant sur une suite d'identifiants consécutifs).
+    """
+    quote = connection.ops.quote_name
+    table, pk = quote(Patient._meta.db_table), quote(Patient._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT MIN(id), MAX(id) FROM (SELECT {pk} AS id, {pk} - ROW_NUMBER() OVER (ORDER BY {pk}) AS grp FROM {table}) runs "
+            "GROUP BY grp ORDER BY 1"
+        )
+        return cursor.fetchall()
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère des patients et des rendez-vous synthétiques pour les tests de charge, en parallèle dans plusieurs processus. "
+        "La génération est reproductible : même graine, mêmes données."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=0, help="Nombre de patients à créer.")
+        parser.add_argument('--appointments', type=int, default=0, help="Nombre de rendez-vous à créer.")
+        parser.add_argument('--doctors', type=int, help="Nombre de médecins à créer (par défaut : calculé pour remplir environ la moitié des créneaux).")
+        parser.add_argument('--days', type=int, default=365, help="Nombre de jours sur lesquels répartir les rendez-vous.")
+        parser.add_argument('--start-date', type=date.fromisoformat, help="Premier jour des rendez-vous (AAAA-MM-JJ, par défaut aujourd'hui).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Nombre de processus de génération.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Nombre de lignes par lot (et par transaction).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--locale', default='en_US', help="Langue des données générées par Faker.")
+
+    def handle(self, *args, **options):
+        if options['patients'] < 0 or options['appointments'] < 0 or options['batch_size'] < 1 or options['workers'] < 1 or options['days'] < 1:
+            raise CommandError("Les nombres de lignes doivent être positifs ; la taille des lots, le nombre de processus et de jours, strictement positifs.")
+        self.options = options
+        initargs = (options['seed'], options['locale'])
+        if options['workers'] > 1:
+            executor = ProcessPoolExecutor(options['workers'], initializer=loadgen.init_worker, initargs=initargs)
+        else:
+            loadgen.init_worker(*initargs)
+            executor = None
+        try:
+            if options['patients']:
+                self.generate_patients(executor)
+            if options['appointments']:
+                self.generate_appointments(executor)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        if options['patients'] or options['appointments']:
+            # Insertion directe, sans signaux : les statistiques du tableau de bord sont recalculées
+            call_command('rebuild_stats', stdout=self.stdout)
+
+    def run_batches(self, executor, function, tasks):
+        """
+        Exécute les lots dans l'ordre, en en gardant au plus deux par processus en cours :
+        la mémoire reste bornée même si la base écrit moins vite que les processus ne génèrent.
+        """
+        if executor is None:
+            for task in tasks:
+                yield function(*task)
+            return
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(function, *task))
+            if len(pending) >= 2 * self.options['workers']:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def report(self, label, done, total, began):
+        elapsed = time.perf_counter() - began
+        self.stdout.write(f"{label} : {done}/{total} ({done / elapsed if elapsed else 0:.0f} lignes/s)")
+
+    def generate_patients(self, executor):
+        total, size, seed = self.options['patients'], self.options['batch_size'], self.options['seed']
+        tasks = ((seed, batch, min(size, total - first)) for batch, first in enumerate(range(0, total, size)))
+        began, done, last_report = time.perf_counter(), 0, 0
+        for rows in self.run_batches(executor, loadgen.patient_batch, tasks):
+            done += insert_rows(Patient, PATIENT_FIELDS, rows)
+            if time.perf_counter() - last_report >= 2 or done == total:
+                self.report("Patients", done, total, began)
+                last_report = time.perf_counter()
+        # Insertion directe : l'index de trigrammes en mémoire (s'il est utilisé) sera reconstruit à la prochaine recherche,
+        # et les pages de la liste des patients en cache sont périmées
+        get_trigram_index(connection.alias).reset()
+        caching.bump(caching.PATIENT_LIST)
+
+    def create_doctors(self, count):
+        """
+        Crée 'count' médecins aux noms générés par Faker (un suffixe numérique évite les noms déjà pris).
+        """
+        from faker import Faker
+
+        fake = Faker(self.options['locale'])
+        fake.seed_instance(self.options['seed'])
+        taken = set(Doctor.objects.values_list('name', flat=True))
+        names = []
+        for index in range(count):
+            name = f"Dr. {fake.name()}"
+            if name in taken:
+                name = f"{name} {index}"
+            taken.add(name)
+            names.append(name)
+        Doctor.objects.bulk_create([Doctor(name=name) for name in names], batch_size=self.options['batch_size'])
+        return list(Doctor.objects.filter(name__in=names).order_by('pk').values_list('pk', flat=True))
+
+    def generate_appointments(self, executor):
+        total, size, seed, days = self.options['appointments'], self.options['batch_size'], self.options['seed'], self.options['days']
+        ranges = patient_id_ranges()
+        if not ranges:
+            raise CommandError("Aucun patient : générez d'abord des patients (--patients).")
+        doctors = self.options['doctors'] or max(1, ceil(total / (days * loadgen.SLOTS_PER_DAY * TARGET_OCCUPANCY)))
+        if total > doctors * days * loadgen.SLOTS_PER_DAY:
+            raise CommandError(f"{total} rendez-vous ne tiennent pas dans {doctors} médecins x {days} jours x {loadgen.SLOTS_PER_DAY} créneaux.")
+        start = self.options['start_date'] or timezone.localdate()
+        plan = loadgen.SlotPlan(self.create_doctors(doctors), start, days, seed)
+        sampler = loadgen.PatientSampler(ranges)
+        self.stdout.write(f"{doctors} médecins, {sampler.total} patients, {days} jours à partir du {start}")
+
+        tasks = ((seed, batch, first, min(size, total - first), plan, sampler) for batch, first in enumerate(range(0, total, size)))
+        began, done, inserted, last_report = time.perf_counter(), 0, 0, 0
+        for rows in self.run_batches(executor, loadgen.appointment_batch, tasks):
+            # Les créneaux déjà occupés par des rendez-vous existants sont ignorés (contrainte d'unicité)
+            inserted += insert_rows(Appointment, APPOINTMENT_FIELDS, rows, ignore_conflicts=True)
+            done += len(rows)
+            if time.perf_counter() - last_report >= 2 or done == total:
+                self.report("Rendez-vous", done, total, began)
+                last_report = time.perf_counter()
+        if inserted < total:
+            self.stdout.write(f"{total - inserted} rendez-vous ignorés (créneau déjà occupé).")
+        # Les médecins sont nouveaux : seuls les compartiments "tous les médecins" de l'agenda peuvent être périmés
+        invalidate_days((day, ALL_DOCTORS) for day in date_range(start, start + timedelta(days=days - 1)))
+        # Insertion directe : les compteurs et les dates de visite des patients sont recalculés en une passe
+        began = time.perf_counter()
+        refresh_all_visits(self.options['batch_size'])
+        self.stdout.write(f"Visites des patients recalculées ({time.perf_counter() - began:.1f} s).")
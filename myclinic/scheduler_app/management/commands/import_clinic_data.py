@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myclinic.importing import CHUNK_SIZE, FORMATS, IMPORTERS, import_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe en masse des patients ou des rendez-vous depuis un fichier CSV ou JSONL (éventuellement .gz), lu en flux. "
+        "Chaque lot est validé puis écrit dans sa propre transaction ; un import interrompu reprend au dernier lot validé."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help="Type de données importées.")
+        parser.add_argument('path', help="Fichier source (.csv, .jsonl ou .ndjson, éventuellement compressé en .gz).")
+        parser.add_argument('--format', choices=FORMATS, help="Format du fichier (par défaut : déduit de l'extension).")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Nombre de lignes par lot et par transaction.")
+        parser.add_argument('--checkpoint', help="Fichier du point de reprise (par défaut : <path>.checkpoint.json).")
+        parser.add_argument('--rejects', help="Fichier des lignes refusées, au format JSONL (par défaut : <path>.rejects.jsonl).")
+        parser.add_argument('--restart', action='store_true', help="Ignore le point de reprise existant et recommence au début du fichier.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size doit être positif.")
+        began = time.perf_counter()
+
+        def progress(state):
+            elapsed = time.perf_counter() - began
+            self.stdout.write(
+                f"{state['rows']} lignes lues : {state['imported']} importées, {state['skipped']} déjà présentes, "
+                f"{state['rejected']} refusées ({state['rows'] / elapsed if elapsed else 0:.0f} lignes/s)"
+            )
+
+        try:
+            state = import_file(
+                options['path'], options['kind'], fmt=options['format'], chunk_size=options['chunk_size'],
+                checkpoint_path=options['checkpoint'], rejects_path=options['rejects'], restart=options['restart'],
+                progress=progress if options['verbosity'] >= 1 else None,
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Import terminé : {state['imported']} importées, {state['skipped']} déjà présentes, {state['rejected']} refusées "
+            f"sur {state['rows']} lignes, en {time.perf_counter() - began:.1f} s."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler_app.visits import VISITS_BATCH_SIZE, refresh_all_visits, refresh_stale_visits
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les champs dénormalisés des patients (nombre de rendez-vous, dernière et prochaine visite). "
+        "Par défaut, seuls les patients dont la prochaine visite est passée sont recalculés (à lancer chaque jour) ; "
+        "avec --all, tous les patients le sont, par lots (après une modification directe des rendez-vous en SQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recalcule tous les patients.")
+        parser.add_argument('--batch-size', type=int, default=VISITS_BATCH_SIZE, help="Nombre de patients par requête UPDATE (avec --all).")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("La taille des lots doit être strictement positive.")
+        if options['all']:
+            updated = refresh_all_visits(options['batch_size'])
+        else:
+            updated = refresh_stale_visits()
+        self.stdout.write(f"{updated} patients recalculés.")
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0003_patient_search_text'),
+        ('scheduler_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date', 'time'], name='appointment_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor_name', 'date', 'time'], name='appointment_doctor_date_idx'),
+        ),
+    ]
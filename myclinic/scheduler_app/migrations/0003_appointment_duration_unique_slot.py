@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:55
+
+import django.core.validators
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def shift_duplicate_slots(apps, schema_editor):
+    """
+    Avant d'ajouter la contrainte d'unicité : les rendez-vous en double sur un même créneau (médecin, date, heure)
+    sont conservés, mais tous sauf le premier sont décalés vers le premier horaire de début libre,
+    avec une note interne indiquant l'heure d'origine.
+    """
+    Appointment = apps.get_model('scheduler_app', 'Appointment')
+    appointments = Appointment.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        appointments.values('doctor_name', 'date', 'time')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for slot in duplicates.iterator():
+        same_slot = appointments.filter(doctor_name=slot['doctor_name'], date=slot['date'], time=slot['time']).order_by('pk')
+        for appointment in list(same_slot)[1:]:
+            start = datetime.combine(appointment.date, appointment.time)
+            new_start = start
+            while appointments.filter(doctor_name=appointment.doctor_name, date=new_start.date(), time=new_start.time()).exists():
+                new_start += timedelta(minutes=appointment.duration)
+            note = f"Déplacé automatiquement de {start:%Y-%m-%d %H:%M} (créneau en double)."
+            appointment.internal_admin_notes = f"{appointment.internal_admin_notes}\n{note}" if appointment.internal_admin_notes else note
+            appointment.date, appointment.time = new_start.date(), new_start.time()
+            appointment.save(update_fields=['date', 'time', 'internal_admin_notes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0003_patient_search_text'),
+        ('scheduler_app', '0002_appointment_agenda_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='duration',
+            field=models.PositiveSmallIntegerField(blank=True, default=30, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(shift_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor_name', 'date', 'time'), name='unique_doctor_slot', violation_error_message='This doctor already has an appointment at this date and time.'),
+        ),
+    ]
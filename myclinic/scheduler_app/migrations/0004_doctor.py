@@ -0,0 +1,142 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:02
+
+import django.db.models.deletion
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.db.models import Case, Count, OuterRef, Subquery, When
+
+from scheduler_app.doctors import clean_doctor_name, doctor_key
+
+# Nombre de rendez-vous traités par requête UPDATE
+BATCH_SIZE = 5000
+
+
+def link_doctors(apps, schema_editor):
+    """
+    Crée un médecin par nom distinct (les variantes "Dr. Smith", "dr smith" sont regroupées, voir doctors.doctor_key),
+    puis relie les rendez-vous à leur médecin par fenêtres de clés primaires.
+
+    Seuls les noms distincts sont gardés en mémoire (lus dans l'ordre de l'index (doctor_name, date, time)) ;
+    les rendez-vous eux-mêmes ne sont jamais chargés.
+    """
+    Appointment = apps.get_model('scheduler_app', 'Appointment')
+    Doctor = apps.get_model('scheduler_app', 'Doctor')
+    alias = schema_editor.connection.alias
+    appointments = Appointment.objects.using(alias)
+
+    # Nom d'origine -> clé de regroupement, et clé -> nom d'affichage (la première variante rencontrée)
+    keys, display_names = {}, {}
+    names = appointments.order_by('doctor_name').values_list('doctor_name', flat=True).distinct()
+    for name in names.iterator(chunk_size=BATCH_SIZE):
+        key = keys[name] = doctor_key(name)
+        display_names.setdefault(key, clean_doctor_name(name) or "Unknown")
+    Doctor.objects.using(alias).bulk_create(
+        [Doctor(name=name) for name in sorted(set(display_names.values()))], batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    ids = dict(Doctor.objects.using(alias).values_list('name', 'pk'))
+    doctor_ids = {name: ids[display_names[key]] for name, key in keys.items()}
+
+    # Une requête UPDATE par fenêtre : CASE doctor_name WHEN ... THEN doctor_id, limité aux noms présents dans la fenêtre
+    last_pk = appointments.order_by('-pk').values_list('pk', flat=True).first() or 0
+    for low in range(0, last_pk + 1, BATCH_SIZE):
+        window = appointments.filter(pk__gte=low, pk__lt=low + BATCH_SIZE)
+        window_names = set(window.values_list('doctor_name', flat=True).distinct())
+        if window_names:
+            window.update(doctor_id=Case(*[When(doctor_name=name, then=doctor_ids[name]) for name in window_names]))
+
+
+def unlink_doctors(apps, schema_editor):
+    """
+    Retour arrière : recopie le nom du médecin dans chaque rendez-vous.
+    """
+    Appointment = apps.get_model('scheduler_app', 'Appointment')
+    Doctor = apps.get_model('scheduler_app', 'Doctor')
+    doctors = Doctor.objects.using(schema_editor.connection.alias)
+    Appointment.objects.using(schema_editor.connection.alias).update(
+        doctor_name=Subquery(doctors.filter(pk=OuterRef('doctor_id')).values('name')[:1])
+    )
+
+
+def shift_duplicate_slots(apps, schema_editor):
+    """
+    Le regroupement des variantes d'un nom peut créer des rendez-vous en double sur un même créneau (médecin, date, heure) :
+    comme dans la migration 0003, tous sauf le premier sont décalés vers le premier horaire de début libre, avec une note interne.
+    """
+    Appointment = apps.get_model('scheduler_app', 'Appointment')
+    appointments = Appointment.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        appointments.values('doctor_id', 'date', 'time')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for slot in list(duplicates):
+        same_slot = appointments.filter(doctor_id=slot['doctor_id'], date=slot['date'], time=slot['time']).order_by('pk')
+        for appointment in list(same_slot)[1:]:
+            start = datetime.combine(appointment.date, appointment.time)
+            new_start = start
+            while appointments.filter(doctor_id=appointment.doctor_id, date=new_start.date(), time=new_start.time()).exists():
+                new_start += timedelta(minutes=appointment.duration)
+            note = f"Déplacé automatiquement de {start:%Y-%m-%d %H:%M} (créneau en double après regroupement des médecins)."
+            appointment.internal_admin_notes = f"{appointment.internal_admin_notes}\n{note}" if appointment.internal_admin_notes else note
+            appointment.date, appointment.time = new_start.date(), new_start.time()
+            appointment.save(update_fields=['date', 'time', 'internal_admin_notes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0003_patient_search_text'),
+        ('scheduler_app', '0003_appointment_duration_unique_slot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Doctor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='scheduler_app.doctor'),
+        ),
+        # L'ancienne contrainte d'unicité (doctor_name, date, time) est retirée avant le remplissage : au retour arrière,
+        # les opérations sont défaites dans l'ordre inverse, et elle n'est donc recréée qu'une fois les noms recopiés
+        # par unlink_doctors (sinon tous les noms valent '' et deux médecins sur un même créneau la violent).
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='unique_doctor_slot',
+        ),
+        migrations.RunPython(link_doctors, unlink_doctors),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_doctor_date_idx',
+        ),
+        migrations.RunPython(shift_duplicate_slots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='scheduler_app.doctor'),
+        ),
+        # Valeur par défaut pour que le retour arrière puisse recréer la colonne avant d'y recopier les noms
+        migrations.AlterField(
+            model_name='appointment',
+            name='doctor_name',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='appointment',
+            name='doctor_name',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'time'], name='appointment_doctor_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date', 'time'), name='unique_doctor_slot', violation_error_message='This doctor already has an appointment at this date and time.'),
+        ),
+    ]
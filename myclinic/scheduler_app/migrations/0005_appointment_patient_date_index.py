@@ -0,0 +1,52 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Nombre de patients recalculés par requête UPDATE
+BATCH_SIZE = 5000
+
+
+def fill_patient_visits(apps, schema_editor):
+    """
+    Calcule le nombre de rendez-vous et les dernière et prochaine visites des patients existants,
+    par fenêtres de clés primaires (voir scheduler_app/visits.py).
+    """
+    Appointment = apps.get_model('scheduler_app', 'Appointment')
+    Patient = apps.get_model('patient_app', 'Patient')
+    alias = schema_editor.connection.alias
+    today = timezone.localdate()
+    appointments = Appointment.objects.using(alias).filter(patient=OuterRef('pk')).order_by().values('patient')
+    values = {
+        'appointment_count': Coalesce(Subquery(appointments.annotate(count=Count('pk')).values('count')), 0),
+        'last_visit': Subquery(appointments.filter(date__lt=today).annotate(day=Max('date')).values('day')),
+        'next_visit': Subquery(appointments.filter(date__gte=today).annotate(day=Min('date')).values('day')),
+    }
+    patients = Patient.objects.using(alias)
+    last_pk = patients.order_by('-pk').values_list('pk', flat=True).first() or 0
+    for low in range(0, last_pk + 1, BATCH_SIZE):
+        patients.filter(pk__gte=low, pk__lt=low + BATCH_SIZE).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0004_patient_visits'),
+        ('scheduler_app', '0004_doctor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='patient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='patient_app.patient'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date', 'time'], name='appointment_patient_date_idx'),
+        ),
+        migrations.RunPython(fill_patient_visits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0004_patient_visits'),
+        ('scheduler_app', '0005_appointment_patient_date_index'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='unique_doctor_slot',
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('cancelled', 'Cancelled')], db_default='scheduled', default='scheduled', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'scheduled')), fields=('doctor', 'date', 'time'), name='unique_doctor_slot', violation_error_message='This doctor already has an appointment at this date and time.'),
+        ),
+    ]
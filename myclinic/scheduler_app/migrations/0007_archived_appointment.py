@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:09
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_app', '0005_patient_deleted_at'),
+        ('scheduler_app', '0006_appointment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('duration', models.PositiveSmallIntegerField(blank=True, default=30, validators=[django.core.validators.MinValueValidator(1)])),
+                ('internal_admin_notes', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('cancelled', 'Cancelled')], db_default='scheduled', default='scheduled', max_length=10)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('archived_at', models.DateTimeField()),
+                ('doctor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='scheduler_app.doctor')),
+                ('patient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='patient_app.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'time'], name='archived_date_time_idx'), models.Index(fields=['patient', 'date'], name='archived_patient_date_idx'), models.Index(fields=['doctor', 'date'], name='archived_doctor_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler_app', '0007_archived_appointment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='reminder_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
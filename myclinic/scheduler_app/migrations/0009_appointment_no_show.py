@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler_app', '0008_reminder_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('cancelled', 'Cancelled'), ('no_show', 'No-show')], db_default='scheduled', default='scheduled', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='archivedappointment',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('cancelled', 'Cancelled'), ('no_show', 'No-show')], db_default='scheduled', default='scheduled', max_length=10),
+        ),
+    ]
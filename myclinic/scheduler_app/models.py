@@ -1,24 +1,136 @@
+from django.core.validators import MinValueValidator
 from django.db import models
+from myclinic.concurrency import VersionedModel
 from patient_app.models import Patient
 
-class Appointment(models.Model):
+# Durée par défaut d'un rendez-vous, en minutes
+DEFAULT_DURATION = 30
+
+class Doctor(models.Model):
     """
-    Définit un nouveau modèle nommé Appointment.
-    Chaque rendez-vous est lié à un patient et contient des informations telles que la date, l'heure et le nom du médecin.
+    Un médecin. Les rendez-vous y font référence par clé étrangère, ce qui évite les variantes d'orthographe d'un même nom.
+    """
+    # Nom du médecin, unique, limité à 100 caractères.
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class AppointmentManager(models.Manager):
+    """
+    Gestionnaire par défaut des rendez-vous : les rendez-vous annulés et non honorés sont exclus (agenda, créneaux libres,
+    visites, listes, API). Appointment.all_objects les inclut.
     """
-    # Clé étrangère vers le modèle Patient. Suppression en cascade si le patient est supprimé.
-    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    def get_queryset(self):
+        return super().get_queryset().filter(status=Appointment.SCHEDULED)
+
+
+class AppointmentFields(VersionedModel):
+    """
+    Champs communs aux rendez-vous (Appointment) et aux rendez-vous archivés (ArchivedAppointment), dont la version
+    des modifications concurrentes (voir myclinic/concurrency.py).
+    """
+    # Clé étrangère vers le modèle Patient. Suppression en cascade si le patient est supprimé définitivement
+    # (la suppression courante est logique, voir PatientQuerySet.delete).
+    # (Pas d'index propre : l'index composite (patient, date, time) commence par cette colonne.)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, db_index=False)
     # Champ pour la date du rendez-vous de type date.
     date = models.DateField()
     # Champ pour l'heure du rendez-vous de type time.
     time = models.TimeField()
-    # Champ pour le nom du médecin, limité à 100 caractères.
-    doctor_name = models.CharField(max_length=100)
+    # Clé étrangère vers le médecin. Un médecin ayant des rendez-vous ne peut pas être supprimé.
+    # (Pas d'index propre : l'index composite (doctor, date, time) commence par cette colonne.)
+    doctor = models.ForeignKey(Doctor, on_delete=models.PROTECT, db_index=False)
+    # Durée du rendez-vous en minutes (30 minutes par défaut).
+    duration = models.PositiveSmallIntegerField(default=DEFAULT_DURATION, blank=True, validators=[MinValueValidator(1)])
     # Champ optionnel pour des notes internes réservées à l'administrateur.
     internal_admin_notes = models.TextField(blank=True, null=True)
+    # Statut du rendez-vous : un rendez-vous annulé est conservé mais libère son créneau ; un rendez-vous passé
+    # auquel le patient ne s'est pas présenté est marqué non honoré (il n'est pas compté comme une visite).
+    # (Valeur par défaut aussi côté base, pour les insertions SQL directes de generate_load_data.)
+    SCHEDULED, CANCELLED, NO_SHOW = 'scheduled', 'cancelled', 'no_show'
+    STATUS_CHOICES = [(SCHEDULED, 'Scheduled'), (CANCELLED, 'Cancelled'), (NO_SHOW, 'No-show')]
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=SCHEDULED, db_default=SCHEDULED)
+    # Jour pour lequel le rappel du rendez-vous a été traité (voir jobs.py) ; un rendez-vous déplacé à un autre jour
+    # est donc rappelé de nouveau.
+    reminder_date = models.DateField(blank=True, null=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+
+class Appointment(AppointmentFields):
+    """
+    Définit un nouveau modèle nommé Appointment.
+    Chaque rendez-vous est lié à un patient et à un médecin, et contient des informations telles que la date et l'heure.
+    Les rendez-vous anciens sont déplacés dans ArchivedAppointment (commande archive_appointments).
+    """
+    objects = AppointmentManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Index pour l'agenda trié par date et heure (évite le tri de toute la table)
+            models.Index(fields=['date', 'time'], name='appointment_date_time_idx'),
+            # Index pour l'agenda d'un médecin, trié par date et heure
+            models.Index(fields=['doctor', 'date', 'time'], name='appointment_doctor_date_idx'),
+            # Index pour l'historique d'un patient et le calcul de ses dernière et prochaine visites
+            models.Index(fields=['patient', 'date', 'time'], name='appointment_patient_date_idx'),
+            # Index pour la date de la dernière modification (MAX(updated_at), validateurs HTTP de la liste des rendez-vous)
+            models.Index(fields=['updated_at'], name='appointment_updated_at_idx'),
+        ]
+        constraints = [
+            # Un médecin ne peut pas avoir deux rendez-vous commençant au même moment (dernier rempart contre les doubles réservations concurrentes) ;
+            # un rendez-vous annulé ne bloque plus son créneau
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=models.Q(status='scheduled'),
+                name='unique_doctor_slot',
+                violation_error_message="This doctor already has an appointment at this date and time.",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Mémorise les valeurs chargées depuis la base, pour savoir ce qu'un enregistrement modifie (par exemple un changement de jour).
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Après l'enregistrement, l'état en base est celui de l'instance
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
 
     def __str__(self):
         """
         Retourne une représentation en chaîne de caractères de l'objet Appointment.
         """
         return f"{self.patient.name} - {self.date} {self.time}"
+
+
+class ArchivedAppointment(AppointmentFields):
+    """
+    Rendez-vous ancien, déplacé hors de la table des rendez-vous par la commande archive_appointments
+    (voir archiving.py) : l'agenda, les listes et l'administration courante ne lisent plus ces lignes.
+    Il garde l'identifiant qu'il avait dans Appointment.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Date et heure de l'archivage
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Index pour la consultation de l'archive par date dans l'administration
+            models.Index(fields=['date', 'time'], name='archived_date_time_idx'),
+            # Index pour l'historique d'un patient et le calcul de ses visites (voir visits.py)
+            models.Index(fields=['patient', 'date'], name='archived_patient_date_idx'),
+            # Index pour le filtre par médecin
+            models.Index(fields=['doctor', 'date'], name='archived_doctor_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.patient.name} - {self.date} {self.time}"
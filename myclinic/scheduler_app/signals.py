@@ -0,0 +1,57 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from myclinic import caching
+from patient_app.signals import patients_soft_deleted
+from . import agenda, batch, visits
+from .models import Appointment
+
+
+@receiver(post_save, sender='scheduler_app.Appointment')
+@receiver(post_delete, sender='scheduler_app.Appointment')
+def invalidate_agenda(sender, instance, **kwargs):
+    """
+    Invalide les compartiments d'agenda (médecin, jour) touchés par la création, la modification ou la suppression d'un rendez-vous.
+    """
+    agenda.invalidate_appointment(instance)
+
+
+@receiver(post_save, sender='scheduler_app.Appointment')
+@receiver(post_delete, sender='scheduler_app.Appointment')
+def update_patient_visits(sender, instance, **kwargs):
+    """
+    Recalcule le nombre de rendez-vous et les dates de dernière et de prochaine visite du patient du rendez-vous
+    (et de l'ancien patient si le rendez-vous a changé de patient).
+    """
+    loaded = getattr(instance, '_loaded_values', {})
+    visits.update_patient_visits({instance.patient_id, loaded.get('patient_id')})
+
+
+@receiver(post_save, sender='patient_app.Patient')
+def invalidate_patient_appointments(sender, instance, created, **kwargs):
+    """
+    Le nom du patient est affiché dans l'agenda et la liste des rendez-vous : après une modification,
+    invalide les jours de l'agenda où il a un rendez-vous (lus sur l'index (patient, date, time)).
+    """
+    if created:
+        return
+    buckets = Appointment.objects.filter(patient=instance).values_list('date', 'doctor_id').distinct()
+    agenda.invalidate_days(buckets)
+
+
+@receiver(patients_soft_deleted)
+def cancel_deleted_patients_appointments(sender, pks, **kwargs):
+    """
+    La suppression d'un patient est logique : ses rendez-vous, au lieu d'être supprimés en cascade, sont annulés
+    par une seule requête UPDATE (ce qui libère leurs créneaux).
+    """
+    batch.cancel(Appointment.objects.filter(patient_id__in=pks))
+
+
+@receiver(post_save, sender='scheduler_app.Doctor')
+@receiver(post_delete, sender='scheduler_app.Doctor')
+def invalidate_doctors(sender, **kwargs):
+    """
+    Le nom des médecins est affiché dans les fiches patient, l'agenda et la liste des rendez-vous : tout est invalidé.
+    """
+    caching.bump_on_commit(caching.DOCTORS)
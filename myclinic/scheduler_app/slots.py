@@ -0,0 +1,164 @@
+"""
+Recherche de créneaux libres ("les 10 prochains créneaux du Dr X cette semaine", "le premier créneau après 14h, tous médecins confondus").
+
+Les rendez-vous de la fenêtre de dates sont chargés une seule fois (une requête d'intervalle sur l'index (date, time)).
+Chaque (médecin, jour) devient une grille d'occupation : un bytearray dont chaque octet représente SLOT_UNIT minutes
+des heures d'ouverture, à 1 si occupé. Les rendez-vous sont "balayés" dans l'ordre pour remplir la grille, puis
+les créneaux libres sont trouvés en cherchant une suite d'octets nuls avec bytearray.find(), exécuté en C.
+"""
+from datetime import time, timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+from .agenda import date_range
+from .booking import minutes
+from .models import DEFAULT_DURATION, Appointment, Doctor
+
+# Heures d'ouverture du cabinet
+OPENING_TIME = time(8, 0)
+CLOSING_TIME = time(18, 0)
+# Résolution de la grille d'occupation, en minutes
+SLOT_UNIT = 5
+# Écart entre deux débuts de créneau proposés, en minutes (multiple de SLOT_UNIT)
+SLOT_STEP = 15
+# Nombre maximal de jours couverts par une recherche
+SLOTS_MAX_DAYS = 92
+
+
+class SlotGrid:
+    """
+    Grille d'occupation d'un médecin pour un jour, de OPENING_TIME à CLOSING_TIME.
+    """
+    opening = minutes(OPENING_TIME)
+    size = (minutes(CLOSING_TIME) - minutes(OPENING_TIME)) // SLOT_UNIT
+
+    def __init__(self):
+        self.cells = bytearray(self.size)
+
+    def mark_busy(self, start, end):
+        """
+        Marque comme occupé l'intervalle [start, end[ (en minutes depuis minuit), arrondi aux cellules qu'il touche.
+        """
+        first = max((start - self.opening) // SLOT_UNIT, 0)
+        last = min(-(-(end - self.opening) // SLOT_UNIT), self.size)  # Arrondi au supérieur
+        if first < last:
+            self.cells[first:last] = b'\x01' * (last - first)
+
+    def free_starts(self, duration, after=None):
+        """
+        Génère les heures de début (en minutes depuis minuit) des créneaux libres d'au moins 'duration' minutes,
+        alignés sur SLOT_STEP et commençant au plus tôt à 'after' (minutes depuis minuit).
+        """
+        length = -(-duration // SLOT_UNIT)
+        step = SLOT_STEP // SLOT_UNIT
+        run = bytes(length)
+        position = 0
+        if after is not None:
+            position = max(-(-(after - self.opening) // SLOT_UNIT), 0)
+        position = -(-position // step) * step  # Premier début aligné
+        while position + length <= self.size:
+            found = self.cells.find(run, position)
+            if found < 0:
+                return
+            aligned = -(-found // step) * step
+            if aligned == found:
+                yield self.opening + found * SLOT_UNIT
+                position = found + step
+            else:
+                position = aligned
+
+
+class SlotFinder:
+    """
+    Répond en mémoire aux recherches de créneaux libres sur une fenêtre de dates, après un unique chargement.
+
+    Args:
+        start, end: Premier et dernier jour (inclus) de la fenêtre.
+        doctors: Médecins concernés (instances de Doctor) ; par défaut tous les médecins.
+        not_before: Aucun créneau n'est proposé avant ce moment (par défaut : maintenant).
+    """
+    def __init__(self, start, end, doctors=None, not_before=None):
+        self.days = date_range(start, end)
+        self.not_before = not_before
+        appointments = Appointment.objects.filter(date__gte=start, date__lte=end)
+        if doctors is not None:
+            doctors = list({doctor.pk: doctor for doctor in doctors}.values())
+            appointments = appointments.filter(doctor_id__in=[doctor.pk for doctor in doctors])
+        else:
+            doctors = Doctor.objects.all()
+        # Triés par nom : à heure égale, les créneaux sont proposés par ordre alphabétique des médecins
+        self.doctors = sorted(doctors, key=lambda doctor: doctor.name)
+        self.grids = {}
+        self._empty = SlotGrid()  # Grille partagée (en lecture seule) des (médecin, jour) sans rendez-vous
+        # Balayage des rendez-vous dans l'ordre chronologique : chaque intervalle est reporté dans la grille de son (médecin, jour)
+        rows = appointments.order_by('date', 'time').values_list('doctor_id', 'date', 'time', 'duration')
+        for doctor_id, day, start_time, duration in rows.iterator(chunk_size=5000):
+            grid = self.grids.get((doctor_id, day))
+            if grid is None:
+                grid = self.grids[(doctor_id, day)] = SlotGrid()
+            begin = minutes(start_time)
+            grid.mark_busy(begin, begin + (duration or DEFAULT_DURATION))
+
+    def _grid(self, doctor, day):
+        return self.grids.get((doctor.pk, day), self._empty)
+
+    def _earliest(self, day, after):
+        # Heure minimale (minutes depuis minuit) à proposer pour un jour, compte tenu de 'after' et de 'not_before'
+        earliest = minutes(after) if after is not None else None
+        if self.not_before is not None and day <= self.not_before.date():
+            if day < self.not_before.date():
+                return None  # Jour entièrement passé
+            current = self.not_before.time()
+            now = minutes(current) + (1 if current.second or current.microsecond else 0)  # Minute entamée : arrondi au supérieur
+            earliest = max(earliest or 0, now)
+        return earliest if earliest is not None else 0
+
+    def free_slots(self, doctor=None, duration=DEFAULT_DURATION, after=None, limit=10):
+        """
+        Retourne au plus 'limit' créneaux libres [(médecin, date, heure)], dans l'ordre chronologique.
+        Sans médecin, cherche chez tous les médecins (à heure égale, par ordre alphabétique des médecins).
+        'after' (datetime.time) ne propose, chaque jour, que les créneaux commençant à cette heure ou plus tard.
+        """
+        doctors = [doctor] if doctor else self.doctors
+        slots = []
+        for day in self.days:
+            earliest = self._earliest(day, after)
+            if earliest is None:
+                continue
+            wanted = limit - len(slots)
+            # Chaque médecin fournit au plus 'wanted' créneaux pour ce jour ; on garde les plus tôt
+            day_slots = sorted(
+                (start, rank, doctor)
+                for rank, doctor in enumerate(doctors)
+                for start in islice(self._grid(doctor, day).free_starts(duration, earliest), wanted)
+            )
+            slots.extend((doctor, day, time(start // 60, start % 60)) for start, _, doctor in day_slots[:wanted])
+            if len(slots) >= limit:
+                break
+        return slots
+
+    def first_free_slot(self, duration=DEFAULT_DURATION, after=None):
+        """
+        Retourne le premier créneau libre, tous médecins confondus, ou None.
+        """
+        slots = self.free_slots(duration=duration, after=after, limit=1)
+        return slots[0] if slots else None
+
+
+def next_free_slots(start, end, doctor=None, duration=DEFAULT_DURATION, after=None, limit=10, not_before=None):
+    """
+    Raccourci : charge la fenêtre [start, end] puis retourne les 'limit' prochains créneaux libres.
+    """
+    if not_before is None:
+        not_before = timezone.localtime()
+    finder = SlotFinder(start, end, doctors=[doctor] if doctor else None, not_before=not_before)
+    return finder.free_slots(doctor, duration=duration, after=after, limit=limit)
+
+
+def week_window(day):
+    """
+    Retourne le lundi et le dimanche de la semaine contenant 'day'.
+    """
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
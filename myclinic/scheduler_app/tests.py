@@ -1,15 +1,38 @@
-from django.test import TestCase, Client
+import threading
+from io import StringIO
+from unittest import mock, skipUnless
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import ProtectedError
+from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Appointment
-from .forms import AppointmentForm
+from django.utils import timezone
+from .models import Appointment, ArchivedAppointment, Doctor
+from .doctors import doctor_key
+from .forms import AppointmentForm, SeriesForm
+from .booking import DaySchedule, save_appointment
+from .agenda import load_agenda
+from . import batch, jobs
+from .slots import SlotFinder, SlotGrid
 from patient_app.models import Patient
+from jobs_app import queue
+from jobs_app.models import Job
+from myclinic import caching
+from myclinic.concurrency import VersionConflict
+from myclinic.testing import form_data, in_database_file
 from django.contrib.auth.models import User
-from datetime import date, time
+from datetime import date, datetime, time, timedelta
+from itertools import islice
 
 class AppointmentModelTests(TestCase):
     def setUp(self):
-        # Création d'un patient de test pour les tests de modèle de rendez-vous
+        # Création d'un patient et d'un médecin de test pour les tests de modèle de rendez-vous
         self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
 
     def test_appointment_creation(self):
         # Teste la création d'un objet Appointment.
@@ -17,18 +40,19 @@ class AppointmentModelTests(TestCase):
             patient=self.patient,
             date=date(2024, 12, 15),
             time=time(10, 00),
-            doctor_name="Dr. Smith"
+            doctor=self.doctor
         )
         self.assertEqual(appointment.patient, self.patient) # Vérifie que le patient associé au rendez-vous est correct.
         self.assertEqual(appointment.date, date(2024, 12, 15)) # Vérifie que la date du rendez-vous est correcte.
         self.assertEqual(appointment.time, time(10, 00)) # Vérifie que l'heure du rendez-vous est correcte.
-        self.assertEqual(appointment.doctor_name, "Dr. Smith") # Vérifie que le nom du médecin est correct.
+        self.assertEqual(appointment.doctor.name, "Dr. Smith") # Vérifie que le nom du médecin est correct.
         self.assertEqual(str(appointment), f"Test Patient - 2024-12-15 10:00:00") # Vérifie que la représentation en chaîne de caractères de l'objet est correcte.
 
 class AppointmentFormTests(TestCase):
     def setUp(self):
-        # Création d'un patient de test pour les tests de formulaire de rendez-vous
+        # Création d'un patient et d'un médecin de test pour les tests de formulaire de rendez-vous
         self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
 
     def test_valid_appointment_form(self):
         # Teste un formulaire de rendez-vous valide.
@@ -36,7 +60,7 @@ class AppointmentFormTests(TestCase):
             "patient": self.patient.pk,
             "date": "2024-12-15",
             "time": "10:00",
-            "doctor_name": "Dr. Smith",
+            "doctor": self.doctor.pk,
         }
         form = AppointmentForm(data=form_data)
         self.assertTrue(form.is_valid()) # Vérifie que le formulaire est valide.
@@ -47,7 +71,7 @@ class AppointmentFormTests(TestCase):
             "patient": "",  # Patient manquant
             "date": "invalid-date", # Date invalide
             "time" : "invalid-time", # Heure invalide
-            "doctor_name": "" # Nom du docteur manquant
+            "doctor": "" # Médecin manquant
         }
         form = AppointmentForm(data=form_data)
         self.assertFalse(form.is_valid()) # Vérifie que le formulaire est invalide.
@@ -55,7 +79,15 @@ class AppointmentFormTests(TestCase):
         self.assertIn("patient", form.errors) # Vérifie que l'erreur "patient" est présente.
         self.assertIn("date", form.errors) # Vérifie que l'erreur "date" est présente.
         self.assertIn("time", form.errors) # Vérifie que l'erreur "time" est présente.
-        self.assertIn("doctor_name", form.errors) # Vérifie que l'erreur "doctor_name" est présente.
+        self.assertIn("doctor", form.errors) # Vérifie que l'erreur "doctor" est présente.
+
+    def test_appointment_must_end_by_midnight(self):
+        # Teste qu'un rendez-vous qui déborde sur le jour suivant est refusé, et qu'un rendez-vous finissant à minuit est accepté.
+        form_data = {"patient": self.patient.pk, "date": "2024-12-15", "time": "23:45", "duration": 30, "doctor": self.doctor.pk}
+        form = AppointmentForm(data=form_data)
+        self.assertFalse(form.is_valid())
+        self.assertIn("must end by midnight", form.errors['__all__'][0])
+        self.assertTrue(AppointmentForm(data={**form_data, "duration": 15}).is_valid())
 
 class AppointmentViewTests(TestCase):
     def setUp(self):
@@ -64,15 +96,20 @@ class AppointmentViewTests(TestCase):
         self.user = User.objects.create_user(username='testuser', password='testpassword') # Création d'un utilisateur de test.
         self.client.login(username='testuser', password='testpassword') # Connexion de l'utilisateur de test.
         self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1)) # Création d'un patient de test.
+        self.smith = Doctor.objects.create(name="Dr. Smith") # Création des médecins de test.
+        self.jones = Doctor.objects.create(name="Dr. Jones")
+        self.brown = Doctor.objects.create(name="Dr. Brown")
         self.appointment = Appointment.objects.create( # Création d'un rendez-vous de test.
             patient=self.patient,
             date=date(2024, 12, 15),
             time=time(10, 00),
-            doctor_name="Dr. Smith"
+            doctor=self.smith
         )
 
     def test_appointment_list_view(self):
-        # Teste la vue qui affiche la liste des rendez-vous.
+        # Teste la vue qui affiche la liste des rendez-vous (réservée aux administrateurs).
+        self.user.is_staff = True
+        self.user.save()
         response = self.client.get(reverse('appointment_list'))
         self.assertEqual(response.status_code, 200) # Vérifie que le statut de la réponse HTTP est 200 (OK).
         self.assertIn(self.appointment, response.context['appointments']) # Vérifie que le rendez-vous de test est présent dans la liste des rendez-vous envoyée au template.
@@ -89,7 +126,7 @@ class AppointmentViewTests(TestCase):
             'patient': self.patient.pk,
             'date': '2024-12-16',
             'time': '14:00',
-            'doctor_name': 'Dr. Jones',
+            'doctor': self.jones.pk,
         }
         response = self.client.post(reverse('appointment_create'), new_appointment_data)
         self.assertEqual(response.status_code, 302) # Vérifie que le statut de la réponse HTTP est 302 (redirection).
@@ -107,14 +144,28 @@ class AppointmentViewTests(TestCase):
             'patient': self.patient.pk,
             'date': '2024-12-17',
             'time': '15:00',
-            'doctor_name': 'Dr. Brown',
+            'doctor': self.brown.pk,
         }
         response = self.client.post(reverse('appointment_update', args=[self.appointment.pk]), updated_appointment_data)
         self.assertEqual(response.status_code, 302) # Vérifie que le statut de la réponse HTTP est 302 (redirection).
         self.appointment.refresh_from_db() # Recharge l'objet rendez-vous depuis la base de données pour avoir les dernières modifications.
         self.assertEqual(self.appointment.date, date(2024, 12, 17)) # Vérifie que la date du rendez-vous a été mise à jour.
         self.assertEqual(self.appointment.time, time(15, 00)) # Vérifie que l'heure du rendez-vous a été mise à jour.
-        self.assertEqual(self.appointment.doctor_name, 'Dr. Brown') # Vérifie que le nom du médecin a été mis à jour.
+        self.assertEqual(self.appointment.doctor, self.brown) # Vérifie que le médecin a été mis à jour.
+
+    def test_appointment_update_conflict(self):
+        # Vérifie qu'un formulaire envoyé après un déplacement par lot du rendez-vous propose une fusion qui garde le déplacement et la modification.
+        url = reverse('appointment_update', args=[self.appointment.pk])
+        data = form_data(self.client.get(url).context['form'])
+        batch.reschedule(Appointment.objects.filter(pk=self.appointment.pk), timedelta(days=1))
+        response = self.client.post(url, {**data, 'duration': '45'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "changed by someone else")
+        merged = form_data(response.context['form'])
+        self.assertEqual((merged['date'], merged['duration']), ('2024-12-16', '45'))
+        self.assertEqual(self.client.post(url, merged).status_code, 302)
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.appointment.date, self.appointment.duration, self.appointment.version), (date(2024, 12, 16), 45, 3))
 
     def test_appointment_delete_view(self):
         # Teste la vue qui affiche la page de confirmation de suppression d'un rendez-vous.
@@ -131,4 +182,696 @@ class AppointmentViewTests(TestCase):
         # Teste l'accès aux vues protégées sans authentification.
         self.client.logout() # Déconnecte l'utilisateur.
         response = self.client.get(reverse('appointment_list'))
-        self.assertEqual(response.status_code, 302) # Vérifie que le statut de la réponse HTTP est 302 (redirection vers la page de connexion).
\ No newline at end of file
+        self.assertEqual(response.status_code, 302) # Vérifie que le statut de la réponse HTTP est 302 (redirection vers la page de connexion).
+
+class DoctorTests(TestCase):
+    def setUp(self):
+        # Mise en place : un administrateur connecté et un rendez-vous avec Dr. Smith.
+        self.client = Client()
+        self.admin = User.objects.create_superuser(username='admin', password='adminpassword')
+        self.client.login(username='admin', password='adminpassword')
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        Appointment.objects.create(patient=self.patient, date=date(2024, 12, 15), time=time(10, 0), doctor=self.doctor)
+
+    def test_doctor_key_groups_variants(self):
+        # Vérifie que les variantes d'un même nom (titre, casse, accents, espaces) ont la même clé de regroupement.
+        self.assertEqual(doctor_key("Dr. Émile Roux"), doctor_key("emile  roux"))
+        self.assertEqual(doctor_key("Docteur Emile Roux"), doctor_key("EMILE ROUX"))
+        self.assertNotEqual(doctor_key("Dr. Smith"), doctor_key("Dr. Jones"))
+
+    def test_doctor_with_appointments_is_protected(self):
+        # Vérifie qu'un médecin ayant des rendez-vous ne peut pas être supprimé.
+        with self.assertRaises(ProtectedError):
+            self.doctor.delete()
+
+    def test_admin_list_filter_without_distinct(self):
+        # Vérifie que la liste d'administration des rendez-vous ne lance aucun SELECT DISTINCT et charge le médecin avec chaque ligne.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:scheduler_app_appointment_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Dr. Smith")
+        self.assertFalse([q for q in queries if 'DISTINCT' in q['sql']])
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT') and 'FROM "scheduler_app_doctor" WHERE' in q['sql']])
+
+@skipUnless(connection.vendor == 'sqlite', "Les plans d'exécution testés sont ceux de SQLite.")
+class DoctorMigrationTests(TransactionTestCase):
+    def test_rollback_to_doctor_names_with_shared_slot(self):
+        # Vérifie que la migration 0004 se défait avec deux médecins sur un même créneau : les noms sont recopiés avant le retour de l'ancienne contrainte d'unicité, puis la migration se réapplique.
+        def scenario():
+            executor = MigrationExecutor(connection)
+            executor.migrate([('scheduler_app', '0004_doctor')])
+            apps = executor.loader.project_state([('scheduler_app', '0004_doctor'), ('patient_app', '0003_patient_search_text')]).apps
+            HistoricalPatient, HistoricalDoctor = apps.get_model('patient_app', 'Patient'), apps.get_model('scheduler_app', 'Doctor')
+            patient = HistoricalPatient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+            for name in ("Dr. Smith", "Dr. Jones"):
+                apps.get_model('scheduler_app', 'Appointment').objects.create(
+                    patient=patient, doctor=HistoricalDoctor.objects.create(name=name), date=date(2024, 12, 16), time=time(9, 0)
+                )
+            MigrationExecutor(connection).migrate([('scheduler_app', '0003_appointment_duration_unique_slot')])
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT doctor_name FROM scheduler_app_appointment ORDER BY doctor_name')
+                names = [name for name, in cursor.fetchall()]
+            executor = MigrationExecutor(connection)
+            executor.migrate(executor.loader.graph.leaf_nodes())
+            return names, sorted(Appointment.all_objects.values_list('doctor__name', flat=True))
+
+        names, doctors = in_database_file(scenario)
+        self.assertEqual(names, ["Dr. Jones", "Dr. Smith"])
+        self.assertEqual(doctors, ["Dr. Jones", "Dr. Smith"])
+
+
+class AppointmentQueryPlanTests(TestCase):
+    def assertUsesIndex(self, queryset):
+        # Vérifie, via EXPLAIN QUERY PLAN, que la requête ne parcourt pas la table sans index et ne trie pas avec un B-tree temporaire.
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            self.assertNotIn('USE TEMP B-TREE', line, plan)
+            if 'SCAN' in line:
+                self.assertIn('INDEX', line, plan)
+        return plan
+
+    def test_agenda_query_uses_date_time_index(self):
+        # La liste des rendez-vous (appointment_list) est parcourue dans l'ordre de l'index (date, time), sans tri.
+        plan = self.assertUsesIndex(Appointment.objects.select_related('patient').order_by('date', 'time'))
+        self.assertIn('appointment_date_time_idx', plan)
+
+    def test_date_range_query_uses_date_time_index(self):
+        # Un intervalle de dates est une recherche dans l'index (date, time).
+        plan = self.assertUsesIndex(
+            Appointment.objects.select_related('patient').filter(date__gte=date(2024, 12, 1), date__lt=date(2024, 12, 8)).order_by('date', 'time')
+        )
+        self.assertIn('appointment_date_time_idx', plan)
+
+    def test_doctor_agenda_query_uses_doctor_index(self):
+        # L'agenda d'un médecin est une recherche dans un index (doctor, date, time), déjà trié : l'index unique partiel
+        # des rendez-vous non annulés, ou l'index complet.
+        doctor_indexes = r'appointment_doctor_date_idx|unique_doctor_slot'
+        plan = self.assertUsesIndex(
+            Appointment.objects.select_related('patient').filter(doctor_id=1).order_by('date', 'time')
+        )
+        self.assertRegex(plan, doctor_indexes)
+        plan = self.assertUsesIndex(
+            Appointment.objects.filter(doctor_id=1, date__gte=date(2024, 12, 1)).order_by('date', 'time')
+        )
+        self.assertRegex(plan, doctor_indexes)
+        plan = self.assertUsesIndex(Appointment.all_objects.filter(doctor_id=1).order_by('date', 'time'))
+        self.assertIn('appointment_doctor_date_idx', plan)
+
+    def test_reminder_chunk_query_uses_date_time_index(self):
+        # Les tranches de la tâche de rappel sont lues dans l'index (date, time), sans tri, à partir du dernier rendez-vous traité.
+        for after in (None, (time(9, 0), 5)):
+            plan = self.assertUsesIndex(jobs.reminder_queryset(date(2024, 12, 2), after).select_related('patient', 'doctor')[:500])
+            self.assertIn('appointment_date_time_idx', plan)
+
+
+class AppointmentAgendaTests(TestCase):
+    def setUp(self):
+        # Mise en place : un utilisateur connecté, un cache vide et des rendez-vous sur plusieurs jours et médecins.
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.monday = date(2024, 12, 16)
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        other = Doctor.objects.create(name="Dr. Jones")
+        self.smith = Appointment.objects.create(patient=self.patient, date=self.monday, time=time(10, 0), doctor=self.doctor)
+        self.jones = Appointment.objects.create(patient=self.patient, date=self.monday, time=time(9, 0), doctor=other)
+        self.later = Appointment.objects.create(patient=self.patient, date=self.monday + timedelta(days=3), time=time(11, 0), doctor=self.doctor)
+        self.outside = Appointment.objects.create(patient=self.patient, date=self.monday + timedelta(days=10), time=time(8, 0), doctor=self.doctor)
+
+    def agenda_ids(self, response):
+        # Retourne les identifiants des rendez-vous affichés, jour par jour.
+        return {day: [row['id'] for row in rows] for day, rows in response.context['agenda']}
+
+    def test_day_view(self):
+        # Vérifie que la vue jour n'affiche que les rendez-vous du jour, triés par heure.
+        response = self.client.get(reverse('appointment_agenda_day', args=[self.monday]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.agenda_ids(response), {self.monday: [self.jones.pk, self.smith.pk]})
+        self.assertContains(response, "Test Patient")
+
+    def test_week_view_with_doctor(self):
+        # Vérifie que la vue semaine couvre du lundi au dimanche et filtre par médecin.
+        response = self.client.get(reverse('appointment_agenda_week', args=[self.monday + timedelta(days=2)]), {'doctor': self.doctor.pk})
+        agenda = self.agenda_ids(response)
+        self.assertEqual(len(agenda), 7)
+        self.assertEqual(min(agenda), self.monday)
+        self.assertEqual([pk for rows in agenda.values() for pk in rows], [self.smith.pk, self.later.pk])
+
+    def test_range_view_json(self):
+        # Vérifie le format JSON de l'agenda sur une période donnée.
+        response = self.client.get(reverse('appointment_agenda'), {'start': '2024-12-16', 'end': '2024-12-17', 'format': 'json'})
+        data = response.json()
+        self.assertEqual([day['date'] for day in data['days']], ['2024-12-16', '2024-12-17'])
+        self.assertEqual(data['days'][0]['appointments'][0]['patient_name'], "Test Patient")
+        self.assertEqual(data['days'][0]['appointments'][0]['time'], "09:00:00")
+        self.assertEqual(data['days'][0]['appointments'][0]['doctor_name'], "Dr. Jones")
+
+    def test_invalid_ranges(self):
+        # Vérifie qu'une date invalide ou une période trop longue renvoie une erreur 400.
+        self.assertEqual(self.client.get(reverse('appointment_agenda'), {'start': 'invalid'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('appointment_agenda'), {'start': '2024-01-01', 'end': '2024-12-31'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('appointment_agenda'), {'doctor': 'Dr. Smith'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('appointment_agenda'), {'doctor': '999'}).status_code, 404)
+
+    def test_cached_day_is_served_without_appointment_query(self):
+        # Vérifie qu'un jour déjà chargé est servi depuis le cache, sans lire les rendez-vous (seulement leur date de modification).
+        url = reverse('appointment_agenda_day', args=[self.monday])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual([q['sql'][:11] for q in queries if 'scheduler_app_appointment' in q['sql']], ['SELECT MAX('])
+
+    def test_cache_is_invalidated_on_changes(self):
+        # Vérifie que la création, le déplacement et la suppression d'un rendez-vous sont visibles immédiatement.
+        url = reverse('appointment_agenda_day', args=[self.monday])
+        self.client.get(url)
+        self.client.get(url, {'doctor': self.doctor.pk})
+        new = Appointment.objects.create(patient=self.patient, date=self.monday, time=time(12, 0), doctor=self.doctor)
+        self.assertIn(new.pk, self.agenda_ids(self.client.get(url, {'doctor': self.doctor.pk}))[self.monday])
+        moved = Appointment.objects.get(pk=self.jones.pk)
+        moved.date = self.monday + timedelta(days=1)
+        moved.save()
+        self.assertNotIn(self.jones.pk, self.agenda_ids(self.client.get(url))[self.monday])
+        self.smith.delete()
+        self.assertEqual(self.agenda_ids(self.client.get(url))[self.monday], [new.pk])
+
+    def test_full_list_is_staff_only(self):
+        # Vérifie que la liste complète redirige les utilisateurs non administrateurs vers l'agenda.
+        response = self.client.get(reverse('appointment_list'))
+        self.assertRedirects(response, reverse('appointment_agenda'), fetch_redirect_response=False)
+
+    def test_names_are_invalidated(self):
+        # Vérifie qu'un patient ou un médecin renommé apparaît immédiatement dans l'agenda et la liste complète en cache.
+        self.user.is_staff = True
+        self.user.save()
+        day_url, list_url = reverse('appointment_agenda_day', args=[self.monday]), reverse('appointment_list')
+        self.client.get(day_url)
+        self.client.get(list_url)
+        self.patient.name = "Renamed Patient"
+        self.patient.save()
+        self.assertContains(self.client.get(day_url), "Renamed Patient")
+        self.assertContains(self.client.get(list_url), "Renamed Patient")
+        self.doctor.name = "Dr. Renamed"
+        self.doctor.save()
+        self.assertContains(self.client.get(day_url), "Dr. Renamed")
+        self.assertContains(self.client.get(list_url), "Dr. Renamed")
+
+    def test_full_list_is_cached(self):
+        # Vérifie que la liste complète est servie depuis le cache (seule la date de modification est lue), puis rechargée après une modification de rendez-vous.
+        self.user.is_staff = True
+        self.user.save()
+        url = reverse('appointment_list')
+        self.assertContains(self.client.get(url), '<li>', count=4)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual([q['sql'][:11] for q in queries if 'scheduler_app_appointment' in q['sql']], ['SELECT MAX('])
+        self.later.delete()
+        self.assertContains(self.client.get(url), '<li>', count=3)
+        self.assertEqual(self.client.get(url).headers['Cache-Control'], 'private')
+
+
+    def test_agenda_day_not_modified(self):
+        # Vérifie qu'un jour de l'agenda présenté avec son ETag répond 304 sans lire l'agenda ni rendre la page, jusqu'à la modification d'un rendez-vous du jour.
+        url = reverse('appointment_agenda_day', args=[self.monday])
+        response = self.client.get(url)
+        etag = response.headers['ETag']
+        self.assertIn('Cookie', response.headers['Vary'])
+        self.assertIn('Last-Modified', response.headers)
+        stats = caching.stats.snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.templates, [])
+        self.assertEqual(caching.stats.snapshot(), stats)
+        self.assertEqual(len([q for q in queries if 'scheduler_app_appointment' in q['sql']]), 1)
+        json_etag = self.client.get(url, {'format': 'json'}).headers['ETag']
+        self.assertNotEqual(json_etag, etag)
+        self.assertEqual(self.client.get(url, {'format': 'json'}, headers={'if-none-match': json_etag}).status_code, 304)
+        # Un autre jour, ou un autre médecin, ne change pas la page
+        self.later.delete()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+        batch.cancel(Appointment.objects.filter(pk=self.smith.pk))
+        changed = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(self.agenda_ids(changed), {self.monday: [self.jones.pk]})
+
+    def test_full_list_not_modified_for_staff_only(self):
+        # Vérifie que la liste complète répond 304 à un administrateur qui l'a déjà, et qu'un non-administrateur est toujours redirigé.
+        self.user.is_staff = True
+        self.user.save()
+        url = reverse('appointment_list')
+        etag = self.client.get(url).headers['ETag']
+        not_modified = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Cookie', not_modified.headers['Vary'])
+        self.patient.name = "Renamed Patient"
+        self.patient.save()
+        self.assertContains(self.client.get(url, headers={'if-none-match': etag}), "Renamed Patient")
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertRedirects(response, reverse('appointment_agenda'), fetch_redirect_response=False)
+        self.assertNotIn('ETag', response.headers)
+
+
+class DayScheduleTests(TestCase):
+    def test_conflicts(self):
+        # Vérifie la détection des chevauchements : 9h00-9h30, 10h00-11h00 et 14h00-14h15.
+        schedule = DaySchedule([(540, 570, 1), (600, 660, 2), (840, 855, 3)])
+        self.assertEqual(schedule.conflicts(570, 600), [])  # Entre deux rendez-vous
+        self.assertEqual(schedule.conflicts(555, 585), [1])  # Chevauche la fin du premier
+        self.assertEqual(schedule.conflicts(630, 645), [2])  # À l'intérieur du deuxième
+        self.assertEqual(schedule.conflicts(500, 900), [1, 2, 3])  # Couvre toute la journée
+        self.assertEqual(schedule.conflicts(855, 900), [])  # Commence à la fin du dernier
+
+    def test_overlapping_existing_intervals(self):
+        # Vérifie qu'un long rendez-vous qui en recouvre d'autres est bien détecté.
+        schedule = DaySchedule([(540, 720, 1), (600, 615, 2)])
+        self.assertEqual(schedule.conflicts(700, 710), [1])
+
+    def test_add(self):
+        # Vérifie qu'un créneau ajouté est pris en compte par les recherches suivantes.
+        schedule = DaySchedule([(540, 570, 1)])
+        schedule.add(600, 630, 2)
+        self.assertEqual(schedule.conflicts(620, 640), [2])
+        self.assertEqual(len(schedule), 2)
+
+
+class AppointmentConflictTests(TestCase):
+    def setUp(self):
+        # Création d'un patient et d'un rendez-vous de 10h00 à 10h30 avec Dr. Smith.
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        self.appointment = Appointment.objects.create(patient=self.patient, date=date(2024, 12, 15), time=time(10, 0), doctor=self.doctor)
+
+    def form(self, **overrides):
+        # Construit un formulaire de réservation (par défaut 10h15 avec Dr. Smith le 15/12/2024).
+        data = {"patient": self.patient.pk, "date": "2024-12-15", "time": "10:15", "duration": "30", "doctor": self.doctor.pk}
+        data.update(overrides)
+        return AppointmentForm(data=data, instance=overrides.pop('instance', None))
+
+    def test_default_duration(self):
+        # Vérifie que la durée par défaut est de 30 minutes.
+        self.assertEqual(self.appointment.duration, 30)
+        form = self.form(time="11:00", duration="")
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['duration'], 30)
+
+    def test_overlapping_slot_is_rejected(self):
+        # Vérifie qu'un rendez-vous qui chevauche un autre rendez-vous du même médecin est refusé.
+        form = self.form()
+        self.assertFalse(form.is_valid())
+        self.assertIn("already has an appointment", str(form.non_field_errors()))
+
+    def test_adjacent_slot_and_other_doctor_are_accepted(self):
+        # Vérifie qu'un créneau adjacent, ou le même créneau avec un autre médecin, est accepté.
+        self.assertTrue(self.form(time="10:30").is_valid())
+        self.assertTrue(self.form(time="10:00", doctor=Doctor.objects.create(name="Dr. Jones").pk).is_valid())
+
+    def test_updating_own_slot_is_accepted(self):
+        # Vérifie qu'un rendez-vous peut être modifié sans entrer en conflit avec lui-même.
+        form = AppointmentForm(
+            data={"patient": self.patient.pk, "date": "2024-12-15", "time": "10:00", "duration": "45", "doctor": self.doctor.pk},
+            instance=self.appointment,
+        )
+        self.assertTrue(form.is_valid())
+        self.assertEqual(save_appointment(form).duration, 45)
+
+    def test_unique_slot_constraint(self):
+        # Vérifie que la base refuse deux rendez-vous au même créneau, même sans passer par le formulaire.
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Appointment.objects.create(patient=self.patient, date=date(2024, 12, 15), time=time(10, 0), doctor=self.doctor)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    def test_parallel_bookings_of_one_slot(self):
+        # Lance de nombreuses réservations simultanées du même créneau : une seule doit réussir, les autres doivent recevoir une erreur de formulaire.
+        patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        doctor = Doctor.objects.create(name="Dr. Smith")
+        threads_count = 12
+        barrier = threading.Barrier(threads_count)
+        results = []
+
+        def book(index):
+            try:
+                form = AppointmentForm(data={
+                    "patient": patient.pk, "date": "2024-12-15", "time": f"10:{index:02d}", "duration": "30", "doctor": doctor.pk,
+                })
+                self.assertTrue(form.is_valid())  # Toutes les validations passent avant la première réservation : pire cas de concurrence
+                barrier.wait()
+                results.append(save_appointment(form) is not None)
+            except Exception as exc:  # Toute exception non gérée fait échouer le test
+                results.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book, args=(index,)) for index in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), threads_count)
+        self.assertFalse([result for result in results if isinstance(result, Exception)], results)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_parallel_updates_of_one_appointment(self):
+        # Lance de nombreuses modifications simultanées du même rendez-vous (comparaison et échange, nouvel essai en cas de conflit) : aucune ne doit être perdue ni bloquée.
+        threads_count, updates = 6, 5
+        barrier = threading.Barrier(threads_count)
+        errors = []
+
+        def lengthen(pk):
+            try:
+                barrier.wait()
+                for _ in range(updates):
+                    while True:
+                        appointment = Appointment.objects.get(pk=pk)
+                        appointment.duration += 1
+                        try:
+                            appointment.save()
+                            break
+                        except VersionConflict:
+                            pass
+            except Exception as exc:  # Toute exception non gérée (base verrouillée, ...) fait échouer le test
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        def scenario():
+            patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+            doctor = Doctor.objects.create(name="Dr. Smith")
+            pk = Appointment.objects.create(patient=patient, doctor=doctor, date=date(2099, 1, 5), time=time(9, 0)).pk
+            threads = [threading.Thread(target=lengthen, args=(pk,)) for _ in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return Appointment.objects.values_list('duration', 'version').get(pk=pk)
+
+        self.assertEqual(in_database_file(scenario), (30 + threads_count * updates, 1 + threads_count * updates))
+        self.assertEqual(errors, [])
+
+
+class BatchOperationTests(TestCase):
+    def setUp(self):
+        # Mise en place : Dr. Smith a trois rendez-vous consécutifs le 02/03/2099 (9h00, 9h30, 10h00), Dr. Jones un à 9h30.
+        cache.clear()
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        self.other_doctor = Doctor.objects.create(name="Dr. Jones")
+        self.day = date(2099, 3, 2)
+        self.appointments = [
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.day, time=time(9 + i // 2, 30 * (i % 2)))
+            for i in range(3)
+        ]
+        Appointment.objects.create(patient=self.patient, doctor=self.other_doctor, date=self.day, time=time(9, 30))
+
+    def smith_times(self, day):
+        return list(Appointment.objects.filter(doctor=self.doctor, date=day).order_by('time').values_list('time', flat=True))
+
+    def test_reschedule_moves_back_to_back_appointments(self):
+        # Vérifie qu'un décalage d'une demi-heure déplace des rendez-vous consécutifs en deux requêtes UPDATE, quel que soit leur nombre.
+        load_agenda(self.day, self.day, self.doctor.pk)  # Met le jour en cache
+        with CaptureQueriesContext(connection) as queries:
+            moved = batch.reschedule(Appointment.objects.filter(doctor=self.doctor), timedelta(minutes=30))
+        self.assertEqual(moved, 3)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "scheduler_app_appointment"') for query in queries), 2)
+        self.assertEqual(self.smith_times(self.day), [time(9, 30), time(10, 0), time(10, 30)])
+        times = [row['time'] for row in load_agenda(self.day, self.day, self.doctor.pk)[self.day]]
+        self.assertEqual(times, [time(9, 30), time(10, 0), time(10, 30)])  # Le compartiment en cache a été invalidé
+
+    def test_reschedule_by_days_updates_patient_visits(self):
+        # Vérifie qu'un déplacement d'une semaine met à jour la prochaine visite du patient, mais pas les rendez-vous de l'autre médecin.
+        batch.reschedule(Appointment.objects.filter(doctor=self.doctor), timedelta(weeks=1))
+        self.assertEqual(self.smith_times(self.day + timedelta(weeks=1)), [time(9, 0), time(9, 30), time(10, 0)])
+        self.assertEqual(Appointment.objects.filter(date=self.day).count(), 1)
+        self.patient.refresh_from_db()
+        self.assertEqual((self.patient.appointment_count, self.patient.next_visit), (4, self.day))
+
+    def test_reschedule_conflict_writes_nothing(self):
+        # Vérifie qu'un seul conflit annule tout le lot et que les conflits sont listés.
+        blocker = Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=date(2099, 3, 9), time=time(10, 15))
+        with self.assertRaises(batch.BatchConflict) as raised:
+            batch.reschedule(Appointment.objects.filter(doctor=self.doctor, date=self.day), timedelta(weeks=1))
+        self.assertEqual(raised.exception.conflicts, [
+            {'doctor_id': self.doctor.pk, 'date': date(2099, 3, 9), 'time': time(10, 0), 'conflicts': [blocker.pk]},
+        ])
+        self.assertEqual(self.smith_times(self.day), [time(9, 0), time(9, 30), time(10, 0)])
+
+    def test_reschedule_past_midnight_writes_nothing(self):
+        # Vérifie qu'un décalage qui ferait déborder un rendez-vous sur le jour suivant est refusé comme un conflit.
+        late = Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.day, time=time(23, 0))
+        with self.assertRaises(batch.BatchConflict) as raised:
+            batch.reschedule(Appointment.objects.filter(doctor=self.doctor), timedelta(minutes=45))
+        self.assertEqual(raised.exception.conflicts, [
+            {'doctor_id': self.doctor.pk, 'date': self.day, 'time': time(23, 45), 'conflicts': []},
+        ])
+        late.refresh_from_db()
+        self.assertEqual(late.time, time(23, 0))
+        form = SeriesForm({'patient': self.patient.pk, 'doctor': self.doctor.pk, 'date': '2099-03-02', 'time': '23:45', 'count': 2})
+        self.assertIn("must end by midnight", form.errors['__all__'][0])
+
+    def test_cancel_frees_slots(self):
+        # Vérifie que l'annulation masque les rendez-vous, recalcule les visites et libère les créneaux.
+        self.assertEqual(batch.cancel(Appointment.objects.filter(doctor=self.doctor)), 3)
+        self.assertEqual(self.smith_times(self.day), [])
+        self.assertEqual(Appointment.all_objects.filter(status=Appointment.CANCELLED).count(), 3)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.appointment_count, 1)
+        form = AppointmentForm(data={"patient": self.patient.pk, "date": "2099-03-02", "time": "09:00", "duration": "30", "doctor": self.doctor.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertIsNotNone(save_appointment(form))
+        self.assertEqual(batch.cancel(Appointment.all_objects.filter(status=Appointment.CANCELLED)), 0)
+
+    def test_create_series(self):
+        # Vérifie qu'une série hebdomadaire de 12 rendez-vous est créée par un seul INSERT, ou pas du tout en cas de conflit.
+        with CaptureQueriesContext(connection) as queries:
+            created = batch.create_series(self.patient, self.other_doctor, date(2099, 3, 3), time(14, 0), 12)
+        self.assertEqual(len(created), 12)
+        self.assertEqual(sum(query['sql'].startswith('INSERT INTO "scheduler_app_appointment"') for query in queries), 1)
+        self.assertEqual(created[-1].date, date(2099, 3, 3) + timedelta(weeks=11))
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.appointment_count, 16)
+        with self.assertRaises(batch.BatchConflict):
+            batch.create_series(self.patient, self.doctor, date(2099, 2, 23), time(9, 45), 4)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 3)
+
+    def test_batch_endpoints(self):
+        # Vérifie les vues par lots : réservées aux administrateurs, nombre de rendez-vous touchés, erreurs 400 et 409.
+        User.objects.create_user(username='staff', password='testpassword', is_staff=True)
+        User.objects.create_user(username='user', password='testpassword')
+        params = {'doctor': self.doctor.pk, 'start': '2099-03-01', 'end': '2099-03-31', 'days': '1'}
+        self.client.login(username='user', password='testpassword')
+        self.assertEqual(self.client.post(reverse('appointment_batch_reschedule'), params).status_code, 403)
+        self.client.login(username='staff', password='testpassword')
+        self.assertEqual(self.client.get(reverse('appointment_batch_cancel')).status_code, 405)
+        response = self.client.post(reverse('appointment_batch_reschedule'), {**params, 'days': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(reverse('appointment_batch_reschedule'), params).json(), {'affected': 3})
+
+        series = {'patient': self.patient.pk, 'doctor': self.doctor.pk, 'date': '2099-02-24', 'time': '09:00', 'count': '2'}
+        response = self.client.post(reverse('appointment_batch_series'), series)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['conflicts'][0]['time'], '09:00')
+        data = self.client.post(reverse('appointment_batch_series'), {**series, 'every': '14'}).json()
+        self.assertEqual((data['affected'], len(data['ids'])), (2, 2))
+        self.assertEqual(self.client.post(reverse('appointment_batch_cancel'), params).json(), {'affected': 4})
+
+    def test_admin_actions(self):
+        # Vérifie les actions d'administration : annulation de la sélection, puis affichage des rendez-vous annulés.
+        User.objects.create_superuser(username='admin', password='testpassword')
+        self.client.login(username='admin', password='testpassword')
+        url = reverse('admin:scheduler_app_appointment_changelist')
+        selected = [appointment.pk for appointment in self.appointments[:2]]
+        response = self.client.post(url, {'action': 'cancel_appointments', '_selected_action': selected}, follow=True)
+        self.assertContains(response, "2 appointment(s) cancelled.")
+        self.assertEqual(self.smith_times(self.day), [time(10, 0)])
+        response = self.client.post(url, {'action': 'postpone_one_week', '_selected_action': [self.appointments[2].pk]}, follow=True)
+        self.assertContains(response, "1 appointment(s) moved.")
+        self.assertEqual(self.client.get(url, {'status__exact': 'cancelled'}).context['cl'].result_count, 2)
+
+
+class ReminderJobTests(TestCase):
+    def setUp(self):
+        # Mise en place : cinq rendez-vous demain de patients joignables par courriel (dont deux à la même heure), un d'un
+        # patient joignable par téléphone seulement, un rendez-vous annulé et un rendez-vous un autre jour.
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+        smith, jones = Doctor.objects.create(name="Dr. Smith"), Doctor.objects.create(name="Dr. Jones")
+
+        def book(index, doctor, at, contact, day=self.tomorrow):
+            patient = Patient.objects.create(name=f"Patient {index}", date_of_birth=date(1980, 1, 1), contact_info=contact)
+            return Appointment.objects.create(patient=patient, doctor=doctor, date=day, time=at)
+
+        slots = [(smith, time(9, 0)), (jones, time(9, 0)), (smith, time(9, 30)), (smith, time(10, 0)), (jones, time(10, 30))]
+        self.reminded = [book(index, doctor, at, f"patient{index}@example.com") for index, (doctor, at) in enumerate(slots)]
+        self.unreachable = book(5, smith, time(11, 0), "+33 6 00 00 00 00")
+        batch.cancel(Appointment.objects.filter(pk=book(6, smith, time(12, 0), "cancelled@example.com").pk))
+        book(7, smith, time(9, 0), "later@example.com", day=self.tomorrow + timedelta(days=1))
+
+    def run_jobs(self):
+        # Exécute les tâches en file jusqu'à ce qu'il n'y en ait plus
+        while claimed := queue.claim('test'):
+            for job in claimed:
+                self.assertEqual(queue.run(job, 'test'), Job.DONE)
+
+    def test_reminders_are_sent_in_chunks(self):
+        # Vérifie que les rappels de demain sont envoyés une fois par rendez-vous, par tranches enchaînées, puis jamais renvoyés.
+        with mock.patch.object(jobs, 'REMINDER_CHUNK_SIZE', 2):
+            jobs.send_reminders.enqueue()
+            self.run_jobs()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(appointment.patient.contact_info for appointment in self.reminded),
+        )
+        self.assertIn("with Dr. Jones", mail.outbox[1].body)
+        # Trois tranches de deux rendez-vous (le rendez-vous sans courriel compte), puis une tranche vide
+        self.assertEqual(Job.objects.filter(name='scheduler_app.send_reminders', status=Job.DONE).count(), 4)
+        handled = [*self.reminded, self.unreachable]
+        self.assertEqual(Appointment.objects.filter(reminder_date=self.tomorrow).count(), len(handled))
+        jobs.send_reminders.enqueue(day=self.tomorrow)
+        self.run_jobs()
+        self.assertEqual(len(mail.outbox), len(self.reminded))
+
+    def test_failed_chunk_is_retried_without_duplicates(self):
+        # Vérifie qu'une tranche dont l'envoi échoue est relancée plus tard, sans renvoyer les rappels des tranches déjà traitées.
+        with mock.patch.object(jobs, 'REMINDER_CHUNK_SIZE', 2):
+            jobs.send_reminders.enqueue()
+            self.assertEqual(queue.run(queue.claim('test')[0], 'test'), Job.DONE)
+            with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError("SMTP down")):
+                with self.assertLogs('jobs_app.queue', 'WARNING'):
+                    self.assertEqual(queue.run(queue.claim('test')[0], 'test'), Job.QUEUED)
+            retry = Job.objects.get(status=Job.QUEUED)
+            while claimed := queue.claim('test', now=retry.run_at):
+                self.assertEqual(queue.run(claimed[0], 'test'), Job.DONE)
+        self.assertEqual(len(mail.outbox), len(self.reminded))
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), len(self.reminded))
+
+
+class ArchiveAppointmentsTests(TestCase):
+    def setUp(self):
+        # Mise en place : un patient avec deux rendez-vous de plus de deux ans (dont un annulé), un d'il y a un an et un à venir.
+        cache.clear()
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        today = timezone.localdate()
+        self.old = [
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=today - timedelta(days=800), time=time(9 + i, 0))
+            for i in range(2)
+        ]
+        batch.cancel(Appointment.objects.filter(pk=self.old[1].pk))
+        self.recent = Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=today - timedelta(days=365), time=time(9, 0))
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=today + timedelta(days=7), time=time(9, 0))
+
+    def visits(self):
+        self.patient.refresh_from_db()
+        return self.patient.appointment_count, self.patient.last_visit, self.patient.next_visit
+
+    def test_command_archives_old_appointments(self):
+        # Vérifie que la commande déplace les rendez-vous anciens (annulés compris) dans l'archive, sans changer les visites du patient.
+        before = self.visits()
+        out = StringIO()
+        call_command('archive_appointments', batch_size=1, stdout=out)
+        self.assertIn("2 rendez-vous antérieurs", out.getvalue())
+        self.assertCountEqual(ArchivedAppointment.objects.values_list('pk', 'status'), [
+            (self.old[0].pk, Appointment.SCHEDULED), (self.old[1].pk, Appointment.CANCELLED),
+        ])
+        self.assertEqual(Appointment.all_objects.count(), 2)
+        self.assertEqual(self.visits(), before)
+        Appointment.objects.filter(pk=self.recent.pk).delete()  # Recalcule les visites : la dernière visite vient de l'archive
+        self.assertEqual(self.visits()[:2], (2, self.old[0].date))
+
+    def test_interrupted_archive_resumes(self):
+        # Vérifie qu'un archivage interrompu garde les lots validés, annule le lot en cours et reprend à la relance.
+        with mock.patch('scheduler_app.archiving.agenda.invalidate_days', side_effect=[None, RuntimeError("crash")]):
+            with self.assertRaises(RuntimeError):
+                call_command('archive_appointments', batch_size=1, stdout=StringIO())
+        self.assertEqual(ArchivedAppointment.objects.count(), 1)
+        self.assertEqual(Appointment.all_objects.count(), 3)
+        call_command('archive_appointments', batch_size=1, stdout=StringIO())
+        self.assertEqual(ArchivedAppointment.objects.count(), 2)
+        self.assertEqual(Appointment.all_objects.count(), 2)
+
+    def test_admin_archive_is_read_only(self):
+        # Vérifie que l'archive est consultable dans l'administration, sans ajout ni modification.
+        call_command('archive_appointments', days=300, stdout=StringIO())
+        User.objects.create_superuser(username='admin', password='testpassword')
+        self.client.login(username='admin', password='testpassword')
+        response = self.client.get(reverse('admin:scheduler_app_archivedappointment_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(self.client.get(reverse('admin:scheduler_app_archivedappointment_add')).status_code, 403)
+        self.assertNotContains(self.client.get(reverse('admin:scheduler_app_appointment_changelist')), str(self.recent.date))
+
+
+class FreeSlotTests(TestCase):
+    def setUp(self):
+        # Mise en place : deux médecins, Dr. Smith occupé de 8h00 à 9h00 et de 9h30 à 10h00 le lundi 5 janvier 2099.
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.patient = Patient.objects.create(name="Test Patient", date_of_birth=date(2000, 1, 1))
+        self.monday = date(2099, 1, 5)
+        self.smith = Doctor.objects.create(name="Dr. Smith")
+        self.jones = Doctor.objects.create(name="Dr. Jones")
+        Appointment.objects.create(patient=self.patient, date=self.monday, time=time(8, 0), duration=60, doctor=self.smith)
+        Appointment.objects.create(patient=self.patient, date=self.monday, time=time(9, 30), doctor=self.smith)
+        Appointment.objects.create(patient=self.patient, date=self.monday, time=time(8, 0), doctor=self.jones)
+
+    def test_grid(self):
+        # Vérifie la grille d'occupation : créneaux alignés sur 15 minutes, assez longs, après l'heure demandée.
+        grid = SlotGrid()
+        grid.mark_busy(8 * 60, 9 * 60)
+        grid.mark_busy(9 * 60 + 30, 10 * 60)
+        starts = list(islice(grid.free_starts(30), 3))
+        self.assertEqual(starts, [9 * 60, 10 * 60, 10 * 60 + 15])
+        self.assertEqual(next(grid.free_starts(45)), 10 * 60)  # 9h00-9h30 est trop court pour 45 minutes
+        self.assertEqual(next(grid.free_starts(30, after=14 * 60 + 5)), 14 * 60 + 15)
+        grid.mark_busy(8 * 60, 18 * 60)
+        self.assertEqual(list(grid.free_starts(30)), [])
+
+    def test_doctor_slots(self):
+        # Vérifie les prochains créneaux libres d'un médecin.
+        finder = SlotFinder(self.monday, self.monday + timedelta(days=6), doctors=[self.smith])
+        slots = finder.free_slots(self.smith, limit=3)
+        self.assertEqual(slots, [
+            (self.smith, self.monday, time(9, 0)),
+            (self.smith, self.monday, time(10, 0)),
+            (self.smith, self.monday, time(10, 15)),
+        ])
+
+    def test_any_doctor_after(self):
+        # Vérifie le premier créneau, tous médecins confondus, puis après 14h00.
+        finder = SlotFinder(self.monday, self.monday + timedelta(days=6))
+        self.assertEqual(finder.first_free_slot(), (self.jones, self.monday, time(8, 30)))
+        self.assertEqual(finder.first_free_slot(after=time(14, 0)), (self.jones, self.monday, time(14, 0)))
+
+    def test_not_before_skips_past_slots(self):
+        # Vérifie qu'aucun créneau passé n'est proposé.
+        finder = SlotFinder(self.monday, self.monday + timedelta(days=1), doctors=[self.smith], not_before=datetime(2099, 1, 5, 17, 50))
+        self.assertEqual(finder.free_slots(self.smith, limit=1), [(self.smith, self.monday + timedelta(days=1), time(8, 0))])
+
+    def test_window_is_loaded_with_one_query(self):
+        # Vérifie que la fenêtre est chargée en une seule requête, puis que les recherches se font en mémoire.
+        with self.assertNumQueries(1):
+            finder = SlotFinder(self.monday, self.monday + timedelta(days=89), doctors=[self.smith, self.jones])
+        with self.assertNumQueries(0):
+            finder.free_slots(limit=50)
+            finder.first_free_slot(after=time(14, 0))
+
+    def test_json_endpoint(self):
+        # Vérifie l'API JSON des créneaux libres.
+        response = self.client.get(reverse('appointment_free_slots'), {
+            'doctor': self.smith.pk, 'start': '2099-01-05', 'end': '2099-01-11', 'limit': 2, 'duration': 45,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['slots'], [
+            {'doctor_id': self.smith.pk, 'doctor': 'Dr. Smith', 'date': '2099-01-05', 'time': '10:00'},
+            {'doctor_id': self.smith.pk, 'doctor': 'Dr. Smith', 'date': '2099-01-05', 'time': '10:15'},
+        ])
+        self.assertEqual(self.client.get(reverse('appointment_free_slots'), {'after': '25:00'}).status_code, 400)
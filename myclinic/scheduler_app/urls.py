@@ -1,9 +1,18 @@
-from django.urls import path
-from . import views
+from django.urls import path, register_converter
+from . import converters, views
+
+register_converter(converters.DateConverter, 'date')
 
 urlpatterns = [
     path('', views.appointment_list, name='appointment_list'),
+    path('agenda/', views.appointment_agenda, name='appointment_agenda'),
+    path('agenda/day/<date:day>/', views.appointment_agenda_day, name='appointment_agenda_day'),
+    path('agenda/week/<date:day>/', views.appointment_agenda_week, name='appointment_agenda_week'),
+    path('slots/', views.appointment_free_slots, name='appointment_free_slots'),
     path('create/', views.appointment_create, name='appointment_create'),
     path('<int:pk>/update/', views.appointment_update, name='appointment_update'),
     path('<int:pk>/delete/', views.appointment_delete, name='appointment_delete'),
+    path('batch/reschedule/', views.appointment_batch_reschedule, name='appointment_batch_reschedule'),
+    path('batch/cancel/', views.appointment_batch_cancel, name='appointment_batch_cancel'),
+    path('batch/series/', views.appointment_batch_series, name='appointment_batch_series'),
 ]
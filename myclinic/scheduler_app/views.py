@@ -1,16 +1,222 @@
+from datetime import date, time, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Appointment
-from .forms import AppointmentForm
+from django.core.exceptions import BadRequest
+from django.db.models import Max, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
+from myclinic import caching
+from myclinic.conditional import add_validators, conditional_page, not_modified, page_validators
+from myclinic.database import read_replica
+from patient_app.models import Patient
+from .models import Appointment, Doctor
+from .forms import AppointmentForm, AppointmentRangeForm, RescheduleForm, SeriesForm
+from . import batch
+from .agenda import AGENDA_MAX_DAYS, day_versions, load_agenda
+from .booking import save_appointment
+from .models import DEFAULT_DURATION
+from .slots import SLOTS_MAX_DAYS, next_free_slots, week_window
+
+# Nombre de rendez-vous lus à la fois par la liste complète (un aller-retour vers le fil de la base par lot)
+APPOINTMENT_LIST_CHUNK_SIZE = 2000
+
+
+def _appointment_list_validators(request):
+    """
+    Validateurs HTTP de la liste des rendez-vous (voir myclinic/conditional.py) : dernière modification d'un rendez-vous
+    ou d'un patient, lue en une requête sur les index de updated_at. Aucun pour les non-administrateurs (redirigés).
+    """
+    if not request.user.is_staff:
+        return None
+    patients = Patient.all_objects.order_by('-updated_at').values('updated_at')[:1]
+    last_modified = Appointment.all_objects.aggregate(
+        last=Greatest(Max('updated_at'), Coalesce(Subquery(patients), Max('updated_at')))
+    )['last']
+    return page_validators(last_modified, ('appointment_list', 'staff'), [caching.APPOINTMENTS, caching.DOCTORS])
+
 
 @login_required
-def appointment_list(request):
+@cache_control(private=True)
+@read_replica
+@conditional_page(_appointment_list_validators)
+async def appointment_list(request):
     """
     Affiche la liste de tous les rendez-vous, triés par date et heure.
-    Utilise select_related pour optimiser les requêtes liées au patient.
+    Utilise select_related pour optimiser les requêtes liées au patient et au médecin.
+
+    Cette liste complète est réservée aux administrateurs (staff) ; les autres utilisateurs sont redirigés vers l'agenda.
+    La page rendue est mise en cache jusqu'à la prochaine modification d'un rendez-vous, d'un patient qui en a ou d'un médecin ;
+    un navigateur qui l'a déjà à jour reçoit 304, sans lecture des rendez-vous ni rendu.
+    Vue asynchrone : les rendez-vous sont lus par lots avec l'ORM asynchrone (aiterator), sans bloquer la boucle d'événements.
+    """
+    user = await request.auser()
+    if not user.is_staff:
+        return redirect('appointment_agenda')
+
+    async def render_page():
+        appointments = Appointment.objects.select_related('patient', 'doctor').all().order_by('date', 'time')
+        rows = [appointment async for appointment in appointments.aiterator(chunk_size=APPOINTMENT_LIST_CHUNK_SIZE)]
+        return render_to_string('scheduler_app/appointment_list.html', {'appointments': rows})
+
+    versions = [caching.APPOINTMENTS, caching.DOCTORS]
+    return HttpResponse(await caching.acached_page('appointment_list', [caching.audience(user)], versions, render_page))
+
+def _parse_date(value, default):
+    """
+    Convertit un paramètre 'AAAA-MM-JJ' en date, ou retourne 'default' s'il est absent.
+    """
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"Date invalide : {value}")
+
+
+def _parse_doctor(value):
+    """
+    Retourne le médecin désigné par son identifiant, ou None si le paramètre est absent.
+    """
+    if not value:
+        return None
+    try:
+        return get_object_or_404(Doctor, pk=int(value))
+    except ValueError:
+        raise BadRequest(f"Médecin invalide : {value}")
+
+
+def _render_agenda(request, start, end):
+    """
+    Affiche (ou renvoie en JSON avec '?format=json') les rendez-vous du 'start' au 'end' inclus,
+    éventuellement filtrés par médecin avec le paramètre 'doctor'.
+    Un navigateur qui a déjà la période à jour reçoit 304 (voir _agenda_validators), sans lecture de l'agenda ni rendu.
+    """
+    if end < start or (end - start).days >= AGENDA_MAX_DAYS:
+        raise BadRequest(f"La période demandée doit couvrir entre 1 et {AGENDA_MAX_DAYS} jours.")
+    doctor = _parse_doctor(request.GET.get('doctor'))
+    validators = _agenda_validators(request, start, end, doctor)
+    return add_validators(not_modified(request, validators) or _agenda_response(request, start, end, doctor), validators)
+
+
+def _agenda_validators(request, start, end, doctor):
+    """
+    Validateurs HTTP d'une période de l'agenda (voir myclinic/conditional.py) : dernière modification d'un rendez-vous
+    de la période ou de son patient, lue en une requête sur l'index (date, time) ou (doctor, date, time),
+    et versions des jours affichés.
+    """
+    appointments = Appointment.all_objects.filter(date__gte=start, date__lte=end)
+    if doctor:
+        appointments = appointments.filter(doctor=doctor)
+    last_modified = appointments.aggregate(last=Greatest(Max('updated_at'), Max('patient__updated_at')))['last']
+    doctor_id = doctor.pk if doctor else None
+    parts = ('agenda', start, end, doctor_id, request.GET.get('format'), caching.audience(request.user))
+    return page_validators(last_modified, parts, [*day_versions(start, end, doctor_id), caching.DOCTORS])
+
+
+def _agenda_response(request, start, end, doctor):
+    """
+    Lit l'agenda de la période et le renvoie en HTML ou en JSON.
+    """
+    agenda = load_agenda(start, end, doctor.pk if doctor else None)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'start': start,
+            'end': end,
+            'doctor': {'id': doctor.pk, 'name': doctor.name} if doctor else None,
+            'days': [{'date': day, 'appointments': rows} for day, rows in agenda.items()],
+        })
+
+    span = end - start + timedelta(days=1)
+    return render(request, 'scheduler_app/appointment_agenda.html', {
+        'agenda': list(agenda.items()),
+        'start': start,
+        'end': end,
+        'doctor': doctor,
+        'doctors': Doctor.objects.order_by('name').values_list('pk', 'name'),
+        'previous_start': start - span,
+        'previous_end': end - span,
+        'next_start': start + span,
+        'next_end': end + span,
+    })
+
+
+@login_required
+def appointment_agenda(request):
+    """
+    Affiche l'agenda sur une période donnée par les paramètres 'start' et 'end' (AAAA-MM-JJ, par défaut aujourd'hui),
+    pour tous les médecins ou pour celui donné par le paramètre 'doctor'.
+    """
+    start = _parse_date(request.GET.get('start'), timezone.localdate())
+    end = _parse_date(request.GET.get('end'), start)
+    return _render_agenda(request, start, end)
+
+
+@login_required
+def appointment_agenda_day(request, day):
+    """
+    Affiche l'agenda d'un jour.
+
+    Args:
+        day: Le jour à afficher.
+    """
+    return _render_agenda(request, day, day)
+
+
+@login_required
+def appointment_agenda_week(request, day):
+    """
+    Affiche l'agenda de la semaine (du lundi au dimanche) contenant un jour donné.
+
+    Args:
+        day: Un jour de la semaine à afficher.
+    """
+    monday = day - timedelta(days=day.weekday())
+    return _render_agenda(request, monday, monday + timedelta(days=6))
+
+
+@login_required
+def appointment_free_slots(request):
+    """
+    Renvoie en JSON les prochains créneaux libres.
+
+    Paramètres GET (tous optionnels) :
+        doctor: Identifiant du médecin ; sans médecin, cherche chez tous les médecins.
+        start, end: Fenêtre de recherche (AAAA-MM-JJ), par défaut la semaine en cours.
+        after: Heure minimale (HH:MM) des créneaux proposés chaque jour.
+        duration: Durée souhaitée en minutes (30 par défaut).
+        limit: Nombre maximal de créneaux renvoyés (10 par défaut, 100 au plus).
     """
-    appointments = Appointment.objects.select_related('patient').all().order_by('date', 'time')
-    return render(request, 'scheduler_app/appointment_list.html', {'appointments': appointments})
+    monday, sunday = week_window(timezone.localdate())
+    start = _parse_date(request.GET.get('start'), monday)
+    end = _parse_date(request.GET.get('end'), sunday if start == monday else start + timedelta(days=6))
+    if end < start or (end - start).days >= SLOTS_MAX_DAYS:
+        raise BadRequest(f"La période demandée doit couvrir entre 1 et {SLOTS_MAX_DAYS} jours.")
+    try:
+        after = time.fromisoformat(request.GET['after']) if request.GET.get('after') else None
+        duration = int(request.GET.get('duration', DEFAULT_DURATION))
+        limit = min(int(request.GET.get('limit', 10)), 100)
+    except ValueError:
+        raise BadRequest("Paramètre invalide.")
+    if duration < 1 or limit < 1:
+        raise BadRequest("La durée et le nombre de créneaux doivent être positifs.")
+
+    doctor = _parse_doctor(request.GET.get('doctor'))
+    slots = next_free_slots(start, end, doctor, duration=duration, after=after, limit=limit)
+    return JsonResponse({
+        'start': start,
+        'end': end,
+        'duration': duration,
+        'slots': [
+            {'doctor_id': slot_doctor.pk, 'doctor': slot_doctor.name, 'date': day, 'time': start_time.strftime('%H:%M')}
+            for slot_doctor, day, start_time in slots
+        ],
+    })
+
 
 @login_required
 def appointment_create(request):
@@ -22,8 +228,10 @@ def appointment_create(request):
     if request.method == 'POST':
         form = AppointmentForm(request.POST)  # Crée un formulaire avec les données soumises
         if form.is_valid():  # Vérifie si le formulaire est valide
-            form.save()  # Enregistre le nouveau rendez-vous dans la base de données
-            return redirect('appointment_list')  # Redirige vers la liste des rendez-vous
+            # Enregistre le nouveau rendez-vous, sauf si une réservation concurrente a pris le créneau entre-temps
+            appointment = save_appointment(form)
+            if appointment is not None:
+                return redirect('appointment_agenda_day', day=appointment.date)  # Redirige vers l'agenda du jour du rendez-vous
     else:
         form = AppointmentForm()  # Crée un formulaire vide pour une nouvelle saisie
     return render(request, 'scheduler_app/appointment_form.html', {'form': form})  # Affiche le formulaire
@@ -40,8 +248,9 @@ def appointment_update(request, pk):
     if request.method == 'POST':
         form = AppointmentForm(request.POST, instance=appointment)  # Met à jour le formulaire avec les données soumises
         if form.is_valid():
-            form.save()  # Enregistre les modifications dans la base de données
-            return redirect('appointment_list')  # Redirige vers la liste des rendez-vous
+            appointment = save_appointment(form)  # Enregistre les modifications, sauf si le créneau a été pris entre-temps
+            if appointment is not None:
+                return redirect('appointment_agenda_day', day=appointment.date)  # Redirige vers l'agenda du jour du rendez-vous
     else:
         form = AppointmentForm(instance=appointment)  # Remplit le formulaire avec les données existantes
     return render(request, 'scheduler_app/appointment_form.html', {'form': form})  # Affiche le formulaire mis à jour
@@ -57,6 +266,66 @@ def appointment_delete(request, pk):
     appointment = get_object_or_404(Appointment, pk=pk)  # Récupère le rendez-vous ou retourne 404
     if request.method == 'POST':
         appointment.delete()  # Supprime le rendez-vous de la base de données
-        return redirect('appointment_list')  # Redirige vers la liste des rendez-vous
+        return redirect('appointment_agenda_day', day=appointment.date)  # Redirige vers l'agenda du jour du rendez-vous
     # Rend la template de confirmation de suppression
     return render(request, 'scheduler_app/appointment_confirm_delete.html', {'appointment': appointment})
+
+
+def _run_batch(request, form_class, operation):
+    """
+    Exécute une opération par lot (réservée aux administrateurs) et renvoie en JSON le nombre de rendez-vous touchés :
+    {'affected': n, ...}. Erreurs : 403 hors administrateurs, 400 si les paramètres sont invalides,
+    409 avec la liste des créneaux en conflit (rien n'est alors modifié).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': "Réservé aux administrateurs."}, status=403)
+    form = form_class(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    try:
+        return JsonResponse(operation(form))
+    except batch.BatchConflict as exc:
+        conflicts = [{**conflict, 'time': conflict['time'].strftime('%H:%M')} for conflict in exc.conflicts]
+        return JsonResponse({'error': str(exc), 'conflicts': conflicts}, status=409)
+
+
+@login_required
+@require_POST
+def appointment_batch_reschedule(request):
+    """
+    Déplace d'un coup les rendez-vous d'un médecin sur une période, par exemple lorsqu'il est absent.
+
+    Paramètres POST : doctor, start et end (AAAA-MM-JJ, inclus), days et/ou minutes (décalage, éventuellement négatif).
+    """
+    return _run_batch(request, RescheduleForm, lambda form: {'affected': batch.reschedule(form.appointments(), form.offset())})
+
+
+@login_required
+@require_POST
+def appointment_batch_cancel(request):
+    """
+    Annule d'un coup les rendez-vous d'un médecin sur une période.
+
+    Paramètres POST : doctor, start et end (AAAA-MM-JJ, inclus).
+    """
+    return _run_batch(request, AppointmentRangeForm, lambda form: {'affected': batch.cancel(form.appointments())})
+
+
+@login_required
+@require_POST
+def appointment_batch_series(request):
+    """
+    Crée une série de rendez-vous récurrents, par exemple chaque semaine pendant 12 semaines.
+
+    Paramètres POST : patient, doctor, date (premier rendez-vous), time, duration (optionnel), count,
+    every (jours entre deux rendez-vous, 7 par défaut).
+    """
+    def create(form):
+        data = form.cleaned_data
+        created = batch.create_series(
+            data['patient'], data['doctor'], data['date'], data['time'], data['count'],
+            interval=timedelta(days=data['every']), duration=data['duration'],
+        )
+        return {'affected': len(created), 'ids': [appointment.pk for appointment in created]}
+
+    return _run_batch(request, SeriesForm, create)
@@ -0,0 +1,82 @@
+"""
+Champs dénormalisés des patients, calculés à partir de leurs rendez-vous : nombre de rendez-vous,
+dernière visite (dernier jour passé) et prochaine visite (premier jour à partir d'aujourd'hui).
+
+Ils sont recalculés par une seule requête UPDATE avec des sous-requêtes sur l'index (patient, date, time)
+(et sur l'index (patient, date) des rendez-vous archivés),
+à chaque création, modification ou suppression d'un rendez-vous (voir signals.py), ainsi qu'après les insertions en masse.
+Chaque recalcul invalide les fiches et la liste des patients en cache (voir myclinic/caching.py).
+La prochaine visite dépend du jour courant : une fois la date passée, le patient est "périmé" et
+refresh_stale_visits() le recalcule (appelé par la liste triée par prochaine visite et par la commande refresh_patient_visits).
+"""
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from myclinic import caching
+from patient_app.models import Patient
+from .models import Appointment, ArchivedAppointment
+
+# Nombre de patients recalculés par requête UPDATE lors d'un recalcul complet
+VISITS_BATCH_SIZE = 5000
+
+
+def visit_values(today=None):
+    """
+    Retourne les expressions des champs dénormalisés, à passer à Patient.objects.update().
+    """
+    today = today or timezone.localdate()
+    appointments = Appointment.objects.filter(patient=OuterRef('pk')).order_by().values('patient')
+    # Les rendez-vous archivés (tous passés, voir archiving.py) comptent aussi ; ils sont plus anciens que les
+    # rendez-vous restants, d'où la dernière visite lue dans l'archive seulement à défaut
+    archived = ArchivedAppointment.objects.filter(patient=OuterRef('pk'), status=Appointment.SCHEDULED).order_by().values('patient')
+    return {
+        'appointment_count': (
+            Coalesce(Subquery(appointments.annotate(count=Count('pk')).values('count')), 0)
+            + Coalesce(Subquery(archived.annotate(count=Count('pk')).values('count')), 0)
+        ),
+        'last_visit': Coalesce(
+            Subquery(appointments.filter(date__lt=today).annotate(day=Max('date')).values('day')),
+            Subquery(archived.annotate(day=Max('date')).values('day')),
+        ),
+        'next_visit': Subquery(appointments.filter(date__gte=today).annotate(day=Min('date')).values('day')),
+    }
+
+
+def update_patient_visits(patient_ids, today=None):
+    """
+    Recalcule les champs dénormalisés des patients donnés. Retourne le nombre de patients mis à jour.
+    """
+    patient_ids = {pk for pk in patient_ids if pk is not None}
+    if not patient_ids:
+        return 0
+    updated = Patient.objects.filter(pk__in=patient_ids).update(**visit_values(today))
+    caching.bump_on_commit(caching.PATIENT_LIST, *map(caching.patient_version, patient_ids))
+    return updated
+
+
+def refresh_stale_visits(today=None):
+    """
+    Recalcule les patients dont la prochaine visite est passée. Ne lit que l'index (next_visit, id) s'il n'y en a aucun.
+    """
+    today = today or timezone.localdate()
+    stale = Patient.objects.filter(next_visit__lt=today)
+    if not stale.exists():
+        return 0
+    updated = stale.update(**visit_values(today))
+    caching.bump_on_commit(caching.PATIENT_LIST, caching.ALL_PATIENTS)
+    return updated
+
+
+def refresh_all_visits(batch_size=VISITS_BATCH_SIZE, today=None):
+    """
+    Recalcule tous les patients, par fenêtres de clés primaires (une transaction courte par fenêtre).
+    Retourne le nombre de patients mis à jour.
+    """
+    values = visit_values(today)
+    last_pk = Patient.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    updated = 0
+    for low in range(0, last_pk + 1, batch_size):
+        updated += Patient.objects.filter(pk__gte=low, pk__lt=low + batch_size).update(**values)
+    caching.bump_on_commit(caching.PATIENT_LIST, caching.ALL_PATIENTS)
+    return updated
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class StatsAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'stats_app'
+
+    def ready(self):
+        # Enregistre les récepteurs de signaux qui tiennent les statistiques à jour (voir rollups.py)
+        from . import signals  # noqa: F401
@@ -0,0 +1,78 @@
+"""
+Tableau de bord de la page d'accueil, lu uniquement dans les statistiques précalculées (voir rollups.py) :
+deux requêtes, dont le coût dépend du nombre de jours affichés et de médecins, pas du nombre de rendez-vous ni de patients.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from scheduler_app.agenda import date_range
+from .models import BirthYearStats, DoctorDayStats
+
+# Nombre de jours affichés par défaut, et maximal
+DEFAULT_DAYS = 14
+MAX_DAYS = 92
+# Largeur des tranches d'âge (années) ; la dernière tranche regroupe tous les patients d'au moins LAST_AGE_BRACKET ans
+AGE_BRACKET = 10
+LAST_AGE_BRACKET = 90
+
+
+def _rate(part, total):
+    return round(100 * part / total, 1) if total else None
+
+
+def doctor_days(start, end):
+    """
+    Rendez-vous par médecin et par jour du 'start' au 'end' : une ligne par médecin ayant des rendez-vous sur la période,
+    par ordre de nom, avec le nombre de rendez-vous pris chaque jour (honorés ou non), d'annulations et le taux de rendez-vous
+    non honorés (None sans rendez-vous). Retourne (jours, lignes des médecins, totaux par jour).
+    """
+    days = date_range(start, end)
+    index = {day: position for position, day in enumerate(days)}
+    doctors = defaultdict(lambda: {'booked': [0] * len(days), 'cancelled': 0, 'no_show': 0})
+    rows = DoctorDayStats.objects.filter(day__gte=start, day__lte=end).values_list(
+        'doctor__name', 'day', 'scheduled', 'cancelled', 'no_show',
+    )
+    for name, day, scheduled, cancelled, no_show in rows:
+        doctor = doctors[name]
+        doctor['booked'][index[day]] += scheduled + no_show
+        doctor['cancelled'] += cancelled
+        doctor['no_show'] += no_show
+    lines = []
+    for name in sorted(doctors):
+        doctor = doctors[name]
+        booked = sum(doctor['booked'])
+        lines.append({'name': name, **doctor, 'total': booked, 'no_show_rate': _rate(doctor['no_show'], booked)})
+    totals = [sum(line['booked'][position] for line in lines) for position in range(len(days))]
+    return days, lines, totals
+
+
+def age_brackets(today):
+    """
+    Répartition des patients par tranche d'âge, d'après leur année de naissance (âge atteint dans l'année).
+    Retourne (tranches [{'label', 'patients', 'percent'}], nombre total de patients).
+    """
+    counts = [0] * (LAST_AGE_BRACKET // AGE_BRACKET + 1)
+    for year, patients in BirthYearStats.objects.values_list('year', 'patients'):
+        age = max(today.year - year, 0)
+        counts[min(age // AGE_BRACKET, len(counts) - 1)] += patients
+    total = sum(counts)
+    brackets = [
+        {'label': f'{low}–{low + AGE_BRACKET - 1}' if low < LAST_AGE_BRACKET else f'{low}+', 'patients': count, 'percent': _rate(count, total)}
+        for low, count in zip(range(0, LAST_AGE_BRACKET + 1, AGE_BRACKET), counts)
+    ]
+    return brackets, total
+
+
+def build(days=DEFAULT_DAYS, today=None):
+    """
+    Données du tableau de bord : les 'days' derniers jours jusqu'à aujourd'hui, et la répartition par âge.
+    """
+    today = today or timezone.localdate()
+    dates, doctors, totals = doctor_days(today - timedelta(days=days - 1), today)
+    brackets, patients = age_brackets(today)
+    return {
+        'days': dates, 'doctors': doctors, 'totals': totals, 'total': sum(totals),
+        'ages': brackets, 'patients': patients,
+    }
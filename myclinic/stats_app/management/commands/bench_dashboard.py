@@ -0,0 +1,106 @@
+import random
+import time as time_module
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from myclinic.benchmarking import benchmark_database, measure, summarize
+from myclinic.views import home
+from patient_app.models import Patient
+from scheduler_app.models import Appointment, ArchivedAppointment, Doctor
+from stats_app.dashboard import DEFAULT_DAYS
+from stats_app.rollups import rebuild_days
+
+# Répartition des statuts des rendez-vous générés
+STATUS_WEIGHTS = {Appointment.SCHEDULED: 85, Appointment.CANCELLED: 10, Appointment.NO_SHOW: 5}
+
+
+def live_dashboard(days):
+    """
+    Les mêmes chiffres que le tableau de bord, calculés à chaque fois depuis les rendez-vous et les patients.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    appointments = [
+        list(queryset.filter(date__gte=start, date__lte=today).values_list('doctor__name', 'date', 'status').annotate(count=Count('pk')).order_by())
+        for queryset in (Appointment.all_objects.all(), ArchivedAppointment.objects.all())
+    ]
+    ages = list(Patient.objects.values_list(ExtractYear('date_of_birth')).annotate(count=Count('pk')).order_by())
+    return appointments, ages
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la page d'accueil des administrateurs (tableau de bord lu dans les statistiques précalculées) sur des bases "
+        "jetables de taille croissante, comparée au même calcul fait directement sur les rendez-vous et les patients : "
+        "le tableau de bord ne doit pas ralentir avec la taille des tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,40000,160000', help="Nombres de rendez-vous, séparés par des virgules.")
+        parser.add_argument('--doctors', type=int, default=20, help="Nombre de médecins.")
+        parser.add_argument('--per-day', type=int, default=10, help="Rendez-vous par médecin et par jour.")
+        parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="Nombre de jours affichés par le tableau de bord.")
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre de mesures par opération.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes : liste de nombres séparés par des virgules.")
+        if min(sizes) < 1 or options['doctors'] < 1 or not 1 <= options['per_day'] <= 20 or options['repeat'] < 1:
+            raise CommandError("Les tailles, le nombre de médecins et de mesures doivent être strictement positifs ; --per-day entre 1 et 20.")
+        request = RequestFactory().get('/', {'days': options['days']})
+        request.user = User(username='bench', is_staff=True)
+        for size in sizes:
+            with benchmark_database():
+                self.populate(size, options)
+                with CaptureQueriesContext(connection) as queries:
+                    home(request)
+                dashboard = summarize(measure(lambda: home(request), options['repeat']))
+                live = summarize(measure(lambda: live_dashboard(options['days']), options['repeat']))
+                self.stdout.write(
+                    f"{size:>9} rendez-vous   tableau de bord p50 {dashboard['p50_ms']:>8.2f} ms ({len(queries)} requêtes)   "
+                    f"calcul direct p50 {live['p50_ms']:>8.2f} ms"
+                )
+
+    def populate(self, size, options):
+        """
+        Crée 'size' rendez-vous répartis sur les jours précédant aujourd'hui (un cinquième de patients en plus), puis
+        reconstruit les statistiques des rendez-vous (bulk_create n'émet pas post_save ; les patients sont comptés par signal).
+        """
+        rng = random.Random(options['seed'])
+        began = time_module.perf_counter()
+        today = timezone.localdate()
+        doctors = Doctor.objects.bulk_create(Doctor(name=f"Doctor {index:03d}") for index in range(options['doctors']))
+        patients = Patient.objects.bulk_create(
+            Patient(name=f"Patient {index}", date_of_birth=date(rng.randint(1925, 2024), rng.randint(1, 12), rng.randint(1, 28)))
+            for index in range(max(size // 5, 1))
+        )
+        starts = [time(hour, minute) for hour in range(8, 18) for minute in (0, 30)]
+        statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+        batch, created, offset = [], 0, 0
+        while created < size:
+            day = today - timedelta(days=offset)
+            for doctor in doctors:
+                for slot in rng.sample(starts, min(options['per_day'], size - created)):
+                    status = rng.choices(statuses, weights)[0]
+                    batch.append(Appointment(patient=rng.choice(patients), doctor=doctor, date=day, time=slot, status=status))
+                    created += 1
+                if created >= size:
+                    break
+            if len(batch) >= 20_000:
+                Appointment.objects.bulk_create(batch)
+                batch = []
+            offset += 1
+        Appointment.objects.bulk_create(batch)
+        rebuild_days()
+        self.stdout.write(f"{size} rendez-vous sur {offset} jours, {len(patients)} patients créés en {time_module.perf_counter() - began:.1f} s")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stats_app.rollups import REBUILD_DAYS_PER_BATCH, rebuild_birth_years, rebuild_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule toutes les statistiques du tableau de bord (rendez-vous par jour et par médecin, patients par année "
+        "de naissance), par tranches de jours d'une transaction chacune. À lancer après une modification directe en SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-days', type=int, default=REBUILD_DAYS_PER_BATCH, help="Nombre de jours recalculés par transaction.")
+
+    def handle(self, *args, **options):
+        if options['batch_days'] < 1:
+            raise CommandError("Le nombre de jours par transaction doit être strictement positif.")
+        began = time.perf_counter()
+
+        def progress(day, rows):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Jusqu'au {day} : {rows} (jour, médecin)")
+
+        rows = rebuild_days(options['batch_days'], progress)
+        years = rebuild_birth_years()
+        self.stdout.write(f"{rows} (jour, médecin) et {years} années de naissance recalculés ({time.perf_counter() - began:.1f} s).")
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+# Colonne de DoctorDayStats de chaque statut de rendez-vous
+STATUS_FIELDS = {'scheduled': 'scheduled', 'cancelled': 'cancelled', 'no_show': 'no_show'}
+
+
+def fill_stats(apps, schema_editor):
+    """
+    Calcule les statistiques des rendez-vous et des patients existants (une requête groupée par table),
+    comme rebuild_stats, pour que le tableau de bord soit juste dès la migration.
+    """
+    alias = schema_editor.connection.alias
+    DoctorDayStats = apps.get_model('stats_app', 'DoctorDayStats')
+    BirthYearStats = apps.get_model('stats_app', 'BirthYearStats')
+    stats = {}
+    for name in ('Appointment', 'ArchivedAppointment'):
+        rows = apps.get_model('scheduler_app', name).objects.using(alias).values_list('date', 'doctor_id', 'status')
+        for day, doctor_id, status, count in rows.annotate(count=Count('pk')).order_by():
+            row = stats.setdefault((day, doctor_id), DoctorDayStats(day=day, doctor_id=doctor_id))
+            setattr(row, STATUS_FIELDS[status], getattr(row, STATUS_FIELDS[status]) + count)
+    DoctorDayStats.objects.using(alias).bulk_create(stats.values(), batch_size=5000)
+    patients = apps.get_model('patient_app', 'Patient').objects.using(alias).filter(deleted_at__isnull=True)
+    years = patients.values_list(ExtractYear('date_of_birth')).annotate(count=Count('pk')).order_by()
+    BirthYearStats.objects.using(alias).bulk_create(BirthYearStats(year=year, patients=count) for year, count in years)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('patient_app', '0005_patient_deleted_at'),
+        ('scheduler_app', '0009_appointment_no_show'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BirthYearStats',
+            fields=[
+                ('year', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('patients', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DoctorDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('scheduled', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('no_show', models.PositiveIntegerField(default=0)),
+                ('doctor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='scheduler_app.doctor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'doctor'), name='doctor_day_stats_unique')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
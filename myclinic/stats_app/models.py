@@ -0,0 +1,37 @@
+from django.db import models
+
+from scheduler_app.models import Doctor
+
+
+class DoctorDayStats(models.Model):
+    """
+    Nombre de rendez-vous d'un médecin un jour donné, par statut (rendez-vous archivés compris).
+    Tenu à jour à chaque modification des rendez-vous (voir rollups.py) ; un (médecin, jour) sans rendez-vous n'a pas de ligne.
+    """
+    day = models.DateField()
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, db_index=False)
+    scheduled = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    no_show = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Une ligne par (jour, médecin) ; l'index sert aussi la lecture d'une période du tableau de bord
+            models.UniqueConstraint(fields=['day', 'doctor'], name='doctor_day_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.doctor_id}: {self.scheduled}/{self.cancelled}/{self.no_show}"
+
+
+class BirthYearStats(models.Model):
+    """
+    Nombre de patients (non supprimés) nés une année donnée, pour la répartition par âge du tableau de bord.
+    L'âge change chaque jour : c'est l'année de naissance, stable, qui est comptée.
+    """
+    year = models.PositiveSmallIntegerField(primary_key=True)
+    # Tenu par incréments (voir rollups.py) : un écart éventuel apparaît tel quel et disparaît avec rebuild_stats
+    patients = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.patients}"
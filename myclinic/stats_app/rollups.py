@@ -0,0 +1,134 @@
+"""
+Statistiques précalculées du tableau de bord (page d'accueil).
+
+Le tableau de bord ne lit que deux petites tables, quel que soit le nombre de rendez-vous et de patients :
+- DoctorDayStats : rendez-vous par (jour, médecin) et par statut, rendez-vous archivés compris ;
+- BirthYearStats : patients par année de naissance.
+
+Elles sont tenues à jour par les signaux des rendez-vous et des patients (voir signals.py), dans la transaction de
+la modification :
+- un (jour, médecin) touché est recompté depuis les rendez-vous (une requête sur l'index (doctor, date, time) et une
+  sur l'archive) : le résultat ne dépend pas de l'ordre des modifications concurrentes et corrige un éventuel écart ;
+- les années de naissance, sans index, sont tenues par incréments (F('patients') + n).
+
+Les écritures qui n'envoient aucun signal tiennent elles-mêmes les statistiques à jour :
+- l'import en masse (import_clinic_data, voir myclinic/importing.py) recompte les (jour, médecin) de chaque lot
+  dans sa transaction ; les patients qu'il crée sont comptés par le signal patients_bulk_created ;
+- le SQL direct de generate_load_data est suivi d'une reconstruction : rebuild_stats recalcule tout, par tranches de
+  jours d'une transaction chacune.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.db.models.functions import ExtractYear
+
+from patient_app.models import Patient
+from scheduler_app.agenda import ALL_DOCTORS
+from scheduler_app.models import Appointment, ArchivedAppointment
+from .models import BirthYearStats, DoctorDayStats
+
+# Nombre de jours recalculés par transaction lors d'une reconstruction
+REBUILD_DAYS_PER_BATCH = 31
+# Colonne de DoctorDayStats de chaque statut
+STATUS_FIELDS = {Appointment.SCHEDULED: 'scheduled', Appointment.CANCELLED: 'cancelled', Appointment.NO_SHOW: 'no_show'}
+
+
+def _count_days(filters):
+    """
+    Compte les rendez-vous actifs et archivés qui vérifient 'filters' par (jour, médecin) et par statut.
+    Retourne {(jour, médecin): Counter({colonne: nombre})}.
+    """
+    counts = defaultdict(Counter)
+    for queryset in (Appointment.all_objects.all(), ArchivedAppointment.objects.all()):
+        rows = queryset.filter(filters).values_list('date', 'doctor_id', 'status').annotate(count=Count('pk')).order_by()
+        for day, doctor_id, status, count in rows:
+            counts[day, doctor_id][STATUS_FIELDS[status]] += count
+    return counts
+
+
+def _save_days(counts):
+    DoctorDayStats.objects.bulk_create(
+        [DoctorDayStats(day=day, doctor_id=doctor_id, **{field: fields[field] for field in STATUS_FIELDS.values()})
+         for (day, doctor_id), fields in counts.items()],
+        update_conflicts=True, unique_fields=['day', 'doctor'], update_fields=list(STATUS_FIELDS.values()),
+    )
+
+
+def _buckets_filter(buckets, day_field, doctor_field):
+    days_by_doctor = defaultdict(set)
+    for day, doctor_id in buckets:
+        days_by_doctor[doctor_id].add(day)
+    return reduce(or_, (Q(**{doctor_field: doctor_id, f'{day_field}__in': days}) for doctor_id, days in days_by_doctor.items()))
+
+
+def recount_days(buckets):
+    """
+    Recompte les statistiques des (jour, médecin) de 'buckets'. Les (jour, médecin) sans rendez-vous sont supprimés.
+    """
+    buckets = {(day, doctor_id) for day, doctor_id in buckets if day is not None and doctor_id not in (None, ALL_DOCTORS)}
+    if not buckets:
+        return
+    with transaction.atomic():
+        counts = _count_days(_buckets_filter(buckets, 'date', 'doctor_id'))
+        _save_days(counts)
+        empty = buckets - counts.keys()
+        if empty:
+            DoctorDayStats.objects.filter(_buckets_filter(empty, 'day', 'doctor_id')).delete()
+
+
+def add_birth_years(deltas):
+    """
+    Ajoute aux nombres de patients par année de naissance les variations 'deltas' ({année: variation}).
+    """
+    deltas = {year: delta for year, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        BirthYearStats.objects.bulk_create([BirthYearStats(year=year) for year in deltas], ignore_conflicts=True)
+        for year, delta in deltas.items():
+            BirthYearStats.objects.filter(year=year).update(patients=F('patients') + delta)
+
+
+def rebuild_days(batch_days=REBUILD_DAYS_PER_BATCH, progress=None):
+    """
+    Recalcule toutes les statistiques des rendez-vous, par tranches de 'batch_days' jours (une transaction chacune :
+    les modifications faites pendant la reconstruction ne sont pas perdues). Retourne le nombre de (jour, médecin).
+    """
+    bounds = [
+        queryset.aggregate(first=Min('date'), last=Max('date'))
+        for queryset in (Appointment.all_objects.all(), ArchivedAppointment.objects.all())
+    ]
+    firsts = [bound['first'] for bound in bounds if bound['first']]
+    if not firsts:
+        DoctorDayStats.objects.all().delete()
+        return 0
+    first, last = min(firsts), max(bound['last'] for bound in bounds if bound['last'])
+    # Jours hors de la période des rendez-vous (rendez-vous supprimés depuis)
+    DoctorDayStats.objects.filter(Q(day__lt=first) | Q(day__gt=last)).delete()
+    rows, start = 0, first
+    while start <= last:
+        end = min(start + timedelta(days=batch_days - 1), last)
+        with transaction.atomic():
+            counts = _count_days(Q(date__gte=start, date__lte=end))
+            DoctorDayStats.objects.filter(day__gte=start, day__lte=end).delete()
+            _save_days(counts)
+        rows += len(counts)
+        if progress:
+            progress(end, rows)
+        start = end + timedelta(days=1)
+    return rows
+
+
+def rebuild_birth_years():
+    """
+    Recalcule les nombres de patients par année de naissance (un seul parcours des patients). Retourne le nombre d'années.
+    """
+    with transaction.atomic():
+        years = list(Patient.objects.values_list(ExtractYear('date_of_birth')).annotate(count=Count('pk')).order_by())
+        BirthYearStats.objects.all().delete()
+        created = BirthYearStats.objects.bulk_create(BirthYearStats(year=year, patients=count) for year, count in years)
+    return len(created)
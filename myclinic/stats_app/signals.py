@@ -0,0 +1,74 @@
+"""
+Tenue à jour des statistiques du tableau de bord à chaque modification des rendez-vous et des patients (voir rollups.py).
+"""
+from collections import Counter
+
+from django.db.models.functions import ExtractYear
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from patient_app.models import Patient
+from patient_app.signals import patients_bulk_created, patients_soft_deleted
+from scheduler_app.batch import appointments_batch_changed
+from . import rollups
+
+
+@receiver(post_save, sender='scheduler_app.Appointment')
+def count_saved_appointment(sender, instance, created, raw, **kwargs):
+    """
+    Recompte le (jour, médecin) d'un rendez-vous créé, et les anciens et nouveaux (jour, médecin) d'un rendez-vous
+    dont le jour, le médecin ou le statut ont changé.
+    """
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    old = (loaded.get('date'), loaded.get('doctor_id'))
+    if created or old != (instance.date, instance.doctor_id) or loaded.get('status') != instance.status:
+        rollups.recount_days({old, (instance.date, instance.doctor_id)})
+
+
+@receiver(post_delete, sender='scheduler_app.Appointment')
+def count_deleted_appointment(sender, instance, **kwargs):
+    rollups.recount_days({(instance.date, instance.doctor_id)})
+
+
+@receiver(appointments_batch_changed)
+def count_appointment_batch(sender, buckets, **kwargs):
+    rollups.recount_days(buckets)
+
+
+@receiver(post_save, sender='patient_app.Patient')
+def count_saved_patient(sender, instance, created, raw, **kwargs):
+    """
+    Compte un patient créé, et déplace un patient dont l'année de naissance ou la suppression logique ont changé.
+    """
+    if raw:
+        return
+    deltas = Counter()
+    if not created:
+        loaded = getattr(instance, '_loaded_values', {})
+        if 'date_of_birth' not in loaded or 'deleted_at' not in loaded:
+            return  # État précédent inconnu (instance non lue depuis la base)
+        if loaded['deleted_at'] is None:
+            deltas[loaded['date_of_birth'].year] -= 1
+    if instance.deleted_at is None:
+        deltas[instance.date_of_birth.year] += 1
+    rollups.add_birth_years(deltas)
+
+
+@receiver(post_delete, sender='patient_app.Patient')
+def count_deleted_patient(sender, instance, **kwargs):
+    # Un patient déjà supprimé logiquement n'est plus compté
+    if instance.deleted_at is None:
+        rollups.add_birth_years({instance.date_of_birth.year: -1})
+
+
+@receiver(patients_bulk_created)
+def count_bulk_created_patients(sender, patients, **kwargs):
+    rollups.add_birth_years(Counter(patient.date_of_birth.year for patient in patients if patient.deleted_at is None))
+
+
+@receiver(patients_soft_deleted)
+def count_soft_deleted_patients(sender, pks, using, **kwargs):
+    years = Patient.all_objects.using(using).filter(pk__in=pks).values_list(ExtractYear('date_of_birth'), flat=True)
+    rollups.add_birth_years({year: -count for year, count in Counter(years).items()})
@@ -0,0 +1,148 @@
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from patient_app.models import Patient
+from scheduler_app import batch
+from scheduler_app.archiving import archive_batch
+from scheduler_app.models import Appointment, Doctor
+from . import dashboard, rollups
+from .models import BirthYearStats, DoctorDayStats
+
+
+def snapshot():
+    days = set(DoctorDayStats.objects.values_list('day', 'doctor_id', 'scheduled', 'cancelled', 'no_show'))
+    years = set(BirthYearStats.objects.exclude(patients=0).values_list('year', 'patients'))
+    return days, years
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        # Mise en place : deux médecins, deux patients et trois rendez-vous passés de Dr. Smith.
+        cache.clear()
+        self.today = timezone.localdate()
+        self.patient = Patient.objects.create(name="Marc Durand", date_of_birth=date(1975, 3, 2))
+        self.other_patient = Patient.objects.create(name="Julie Martin", date_of_birth=date(2001, 7, 9))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        self.other_doctor = Doctor.objects.create(name="Dr. Jones")
+        self.appointments = [
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.today - timedelta(days=2), time=time(9 + i))
+            for i in range(3)
+        ]
+
+    def assertMatchesRebuild(self):
+        incremental = snapshot()
+        rollups.rebuild_days(batch_days=2)
+        rollups.rebuild_birth_years()
+        self.assertEqual(incremental, snapshot())
+
+    def test_saves_and_deletes_are_counted(self):
+        # Vérifie que les statistiques tenues par les signaux (création, changement de statut, de jour, de médecin, suppression) égalent une reconstruction.
+        day = self.today - timedelta(days=2)
+        self.assertEqual(snapshot()[0], {(day, self.doctor.pk, 3, 0, 0)})
+        first, second, _ = self.appointments
+        first.status = Appointment.CANCELLED
+        first.save()
+        second.date, second.doctor = self.today, self.other_doctor
+        second.save()
+        self.assertEqual(snapshot()[0], {(day, self.doctor.pk, 1, 1, 0), (self.today, self.other_doctor.pk, 1, 0, 0)})
+        self.assertMatchesRebuild()
+        second.delete()
+        self.assertFalse(DoctorDayStats.objects.filter(doctor=self.other_doctor).exists())
+        self.assertMatchesRebuild()
+
+    def test_batch_operations_are_counted(self):
+        # Vérifie que les opérations par lots (déplacement, annulation, non honorés, série) et l'archivage tiennent les statistiques à jour.
+        batch.reschedule(Appointment.objects.filter(pk=self.appointments[0].pk), timedelta(days=1))
+        batch.cancel(Appointment.objects.filter(pk=self.appointments[1].pk))
+        self.assertEqual(batch.mark_no_show(Appointment.objects.all()), 2)
+        batch.create_series(self.other_patient, self.other_doctor, self.today, time(14, 0), 3)
+        self.assertEqual(
+            DoctorDayStats.objects.aggregate(scheduled=Sum('scheduled'), cancelled=Sum('cancelled'), no_show=Sum('no_show')),
+            {'scheduled': 3, 'cancelled': 1, 'no_show': 2},
+        )
+        self.assertMatchesRebuild()
+        archive_batch(self.today)  # Les rendez-vous archivés restent comptés
+        self.assertMatchesRebuild()
+
+    def test_patients_are_counted_by_birth_year(self):
+        # Vérifie le comptage par année de naissance : modification, suppression logique, création par lot, restauration et suppression définitive.
+        self.assertEqual(snapshot()[1], {(1975, 1), (2001, 1)})
+        self.patient.date_of_birth = date(1976, 1, 1)
+        self.patient.save()
+        Patient.objects.bulk_create([Patient(name=f"Patient {i}", date_of_birth=date(1976, 5, i + 1)) for i in range(3)])
+        self.other_patient.delete()
+        self.assertEqual(snapshot()[1], {(1976, 4)})
+        self.assertMatchesRebuild()
+        restored = Patient.all_objects.get(pk=self.other_patient.pk)
+        restored.deleted_at = None
+        restored.save()
+        Patient.objects.filter(name="Patient 0").hard_delete()
+        self.assertEqual(snapshot()[1], {(1976, 3), (2001, 1)})
+        self.assertMatchesRebuild()
+
+    def test_rebuild_stats_command(self):
+        # Vérifie que rebuild_stats corrige des statistiques faussées, et que generate_load_data reconstruit les siennes.
+        DoctorDayStats.objects.update(scheduled=99)
+        BirthYearStats.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_stats', batch_days=1, stdout=out)
+        self.assertEqual(snapshot(), ({(self.today - timedelta(days=2), self.doctor.pk, 3, 0, 0)}, {(1975, 1), (2001, 1)}))
+        self.assertIn("1 (jour, médecin) et 2 années de naissance recalculés", out.getvalue())
+        call_command('generate_load_data', patients=50, appointments=100, days=3, workers=1, batch_size=40, start_date=self.today, stdout=out)
+        self.assertEqual(DoctorDayStats.objects.aggregate(total=Sum('scheduled'))['total'], 103)
+        self.assertEqual(BirthYearStats.objects.aggregate(total=Sum('patients'))['total'], 52)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        # Mise en place : un administrateur connecté, un patient de 30 ans, un rendez-vous honoré et un non honoré hier.
+        cache.clear()
+        self.today = timezone.localdate()
+        self.user = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.client.login(username='admin', password='testpassword')
+        self.patient = Patient.objects.create(name="Marc Durand", date_of_birth=date(self.today.year - 30, 1, 1))
+        self.doctor = Doctor.objects.create(name="Dr. Smith")
+        yesterday = self.today - timedelta(days=1)
+        for hour, status in ((9, Appointment.SCHEDULED), (10, Appointment.NO_SHOW)):
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=yesterday, time=time(hour), status=status)
+
+    def test_dashboard_data(self):
+        # Vérifie les rendez-vous par jour, le taux de non honorés et la répartition par tranche d'âge.
+        data = dashboard.build(days=3, today=self.today)
+        self.assertEqual(data['days'], [self.today - timedelta(days=2), self.today - timedelta(days=1), self.today])
+        self.assertEqual(data['doctors'], [{
+            'name': "Dr. Smith", 'booked': [0, 2, 0], 'cancelled': 0, 'no_show': 1, 'total': 2, 'no_show_rate': 50.0,
+        }])
+        self.assertEqual((data['totals'], data['total'], data['patients']), ([0, 2, 0], 2, 1))
+        self.assertEqual([(age['label'], age['percent']) for age in data['ages'] if age['patients']], [('30–39', 100.0)])
+        self.assertEqual(data['ages'][-1]['label'], '90+')
+
+    def test_home_reads_only_rollups(self):
+        # Vérifie que le tableau de bord est réservé aux administrateurs et que son nombre de requêtes ne dépend pas des données.
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, "Dr. Smith")
+        self.assertContains(response, "50.0 %")
+        for offset in range(30):
+            doctor = Doctor.objects.create(name=f"Dr. Old {offset}")
+            Appointment.objects.create(patient=self.patient, doctor=doctor, date=self.today - timedelta(days=100 + offset), time=time(9))
+        Patient.objects.bulk_create([Patient(name=f"Patient {i}", date_of_birth=date(1950 + i, 1, 1)) for i in range(20)])
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(reverse('home'))
+        self.assertEqual(len(after), len(before))
+        self.assertFalse(any('scheduler_app_appointment' in query['sql'] or 'patient_app_patient' in query['sql'] for query in after))
+        self.assertEqual(self.client.get(reverse('home'), {'days': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('home'), {'days': 'x'}).status_code, 400)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertNotContains(self.client.get(reverse('home')), "Dr. Smith")